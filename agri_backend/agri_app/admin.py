@@ -10,7 +10,10 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.html import format_html
 from django.db.models import Sum, F
-from .models import Utilisateur, Culture, Recolte, Depense, ConseilAgricole, RapportIA, Conversation, MessageChat, UserLocation, SupportMessage, ProduitAnnonce, NewsletterSubscription, ContactMessage
+from .models import Utilisateur, Culture, Recolte, Depense, ConseilAgricole, RapportIA, AppelIA, Conversation, MessageChat, ContexteSnapshot, UserLocation, UserLocationDailySummary, RegionalBenchmark, SupportMessage, ProduitAnnonce, NewsletterSubscription, ContactMessage
+from .analytics import annoter_cultures
+from .summaries import rafraichir_conseils_non_lus
+from .versioning import incrementer_version
 
 
 # --- INLINES ---
@@ -124,29 +127,35 @@ class CultureAdmin(admin.ModelAdmin):
     
     inlines = [RecolteInline, DepenseInline]
     
-    def total_recoltes(self, obj):
-        total = obj.recoltes.aggregate(
+    def get_queryset(self, request):
+        # Totaux calculés en une seule requête pour toute la page
+        return annoter_cultures(super().get_queryset(request)).select_related('utilisateur')
+
+    def _revenus(self, obj):
+        if hasattr(obj, 'ind_revenus'):
+            return obj.ind_revenus or 0
+        return obj.recoltes.aggregate(
             total_rev=Sum(F('quantite_recoltee') * F('prix_vente_unitaire'))
         )['total_rev'] or 0
-        return f"{total:,.0f} FCFA"
+
+    def _depenses(self, obj):
+        # Coût initial + dépenses liées
+        if hasattr(obj, 'ind_depenses_associees'):
+            depenses_directes = obj.ind_depenses_associees or 0
+        else:
+            depenses_directes = obj.depenses.aggregate(Sum('montant'))['montant__sum'] or 0
+        return obj.cout_total_initial + depenses_directes
+
+    def total_recoltes(self, obj):
+        return f"{self._revenus(obj):,.0f} FCFA"
     total_recoltes.short_description = "Revenus Totaux"
     
     def total_depenses(self, obj):
-        # Coût initial + dépenses liées
-        depenses_directes = obj.depenses.aggregate(Sum('montant'))['montant__sum'] or 0
-        total = obj.cout_total_initial + depenses_directes
-        return f"{total:,.0f} FCFA"
+        return f"{self._depenses(obj):,.0f} FCFA"
     total_depenses.short_description = "Dépenses Totales"
     
     def rentabilite(self, obj):
-        rev = obj.recoltes.aggregate(
-            total_rev=Sum(F('quantite_recoltee') * F('prix_vente_unitaire'))
-        )['total_rev'] or 0
-        
-        dep_directes = obj.depenses.aggregate(Sum('montant'))['montant__sum'] or 0
-        dep = dep_directes + obj.cout_total_initial
-        
-        profit = rev - dep
+        profit = self._revenus(obj) - self._depenses(obj)
         color = 'green' if profit >= 0 else 'red'
         profit_fmt = f"{profit:,.0f} FCFA"
         return format_html('<span style="color: {}; font-weight: bold;">{}</span>', color, profit_fmt)
@@ -340,12 +349,18 @@ class ConseilAgricoleAdmin(admin.ModelAdmin):
     lu_icon.short_description = "Lu"
     
     def marquer_comme_lu(self, request, queryset):
+        user_ids = list(queryset.values_list('utilisateur_id', flat=True))
         updated = queryset.update(lu=True)
+        rafraichir_conseils_non_lus(user_ids)
+        incrementer_version(*user_ids)
         self.message_user(request, f'{updated} conseil(s) marqué(s) comme lu(s).')
     marquer_comme_lu.short_description = "Marquer comme lu"
     
     def marquer_comme_non_lu(self, request, queryset):
+        user_ids = list(queryset.values_list('utilisateur_id', flat=True))
         updated = queryset.update(lu=False)
+        rafraichir_conseils_non_lus(user_ids)
+        incrementer_version(*user_ids)
         self.message_user(request, f'{updated} conseil(s) marqué(s) comme non lu(s).')
     marquer_comme_non_lu.short_description = "Marquer comme non lu"
 
@@ -412,7 +427,7 @@ class ConversationAdmin(admin.ModelAdmin):
     list_filter = ['date_creation', 'utilisateur']
     search_fields = ['titre', 'utilisateur__username']
     inlines = [MessageChatInline]
-    readonly_fields = ['date_creation', 'date_mise_a_jour']
+    readonly_fields = ['date_creation', 'date_mise_a_jour', 'resume', 'resume_jusqu_a']
     
     def nb_messages(self, obj):
         return obj.messages.count()
@@ -424,7 +439,7 @@ class MessageChatAdmin(admin.ModelAdmin):
     list_display = ['conversation', 'expediteur', 'apercu_contenu', 'date_envoi']
     list_filter = ['est_utilisateur', 'date_envoi', 'conversation__utilisateur']
     search_fields = ['contenu', 'conversation__titre']
-    readonly_fields = ['date_envoi', 'contexte_donnees']
+    readonly_fields = ['date_envoi', 'contexte', 'contexte_donnees', 'metadonnees']
     
     def expediteur(self, obj):
         return "Utilisateur" if obj.est_utilisateur else "IA"
@@ -441,11 +456,84 @@ class UserLocationAdmin(admin.ModelAdmin):
     list_filter = ['country', 'city', 'timestamp', 'utilisateur']
     search_fields = ['utilisateur__username', 'city', 'country', 'ip_address']
     readonly_fields = ['timestamp', 'ip_address', 'latitude', 'longitude', 'city', 'country']
+    list_select_related = ['utilisateur']
     
     def has_add_permission(self, request):
         return False
 
 
+@admin.register(UserLocationDailySummary)
+class UserLocationDailySummaryAdmin(admin.ModelAdmin):
+    """
+    Historique consolidé des localisations (voir la commande compact_user_locations).
+    """
+    list_display = ['utilisateur', 'jour', 'city', 'country', 'nb_evenements', 'derniere_ip']
+    list_filter = ['country', 'jour']
+    search_fields = ['utilisateur__username', 'city', 'country']
+    date_hierarchy = 'jour'
+    list_select_related = ['utilisateur']
+    readonly_fields = [
+        'utilisateur', 'jour', 'city', 'country', 'nb_evenements', 'derniere_ip',
+        'latitude', 'longitude', 'premiere_vue', 'derniere_vue'
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ContexteSnapshot)
+class ContexteSnapshotAdmin(admin.ModelAdmin):
+    """
+    Données contextuelles des messages IA, partagées entre messages identiques.
+    """
+    list_display = ['empreinte', 'taille', 'compresse', 'date_creation', 'nb_messages']
+    list_filter = ['compresse']
+    search_fields = ['empreinte']
+    readonly_fields = ['empreinte', 'taille', 'compresse', 'date_creation', 'donnees']
+
+    def nb_messages(self, obj):
+        return obj.messages.count()
+    nb_messages.short_description = "Messages"
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(AppelIA)
+class AppelIAAdmin(admin.ModelAdmin):
+    """
+    Télémétrie des appels aux modèles IA (agrégats : endpoint monitoring/appels-ia/).
+    """
+    list_display = ['date_appel', 'modele', 'endpoint', 'rang', 'resultat', 'code_http', 'latence_ms', 'tokens_prompt', 'tokens_reponse']
+    list_filter = ['modele', 'endpoint', 'resultat', 'rang', 'date_appel']
+    search_fields = ['modele', 'endpoint', 'erreur']
+    date_hierarchy = 'date_appel'
+    readonly_fields = [
+        'modele', 'endpoint', 'rang', 'resultat', 'code_http', 'latence_ms', 'premier_fragment_ms',
+        'tokens_prompt', 'tokens_reponse', 'erreur', 'date_appel'
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(RegionalBenchmark)
+class RegionalBenchmarkAdmin(admin.ModelAdmin):
+    """
+    Référentiels régionaux (recalculés par la commande compute_regional_benchmarks).
+    """
+    list_display = ['libelle', 'zone', 'saison', 'nb_agriculteurs', 'nb_cultures', 'rendement_moyen', 'cout_par_hectare', 'prix_vente_moyen', 'date_calcul']
+    list_filter = ['saison']
+    search_fields = ['culture_nom', 'libelle', 'zone']
+    readonly_fields = [
+        'culture_nom', 'libelle', 'zone', 'saison', 'nb_agriculteurs', 'nb_cultures',
+        'rendement_moyen', 'rendement_median', 'cout_par_hectare', 'prix_vente_moyen', 'date_calcul'
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(SupportMessage)
 class SupportMessageAdmin(admin.ModelAdmin):
     """
@@ -0,0 +1,87 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Clients OpenAI (API Groq) partagés par tout le processus.
+
+Créer un client par requête ouvre un nouveau pool de connexions, donc une
+nouvelle poignée de main TLS à chaque appel. Les clients sont ici créés au
+premier usage puis réutilisés, un par (clé API, point d'accès) :
+
+- `get_client()` : client synchrone, partagé entre les threads ;
+- `get_async_client()` : client asynchrone, un par boucle d'événements
+  (les connexions d'un client asynchrone appartiennent à sa boucle).
+
+Réglages (settings) : taille du pool et durée de maintien des connexions
+inactives (`AI_HTTP_MAX_CONNECTIONS`, `AI_HTTP_MAX_KEEPALIVE`,
+`AI_HTTP_KEEPALIVE_EXPIRY`), délais de connexion et de lecture
+(`AI_HTTP_CONNECT_TIMEOUT`, `AI_HTTP_READ_TIMEOUT`), nouvelles tentatives
+de connexion (`AI_HTTP_CONNECT_RETRIES`, sans risque : la requête n'a pas
+été envoyée) et nouvelles tentatives du client OpenAI après une réponse
+en erreur (`AI_HTTP_MAX_RETRIES`, 0 par défaut : le relais passe plutôt au
+modèle suivant).
+"""
+
+import threading
+import weakref
+
+import httpx
+from django.conf import settings
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+
+_clients = {}
+# boucle d'événements -> {(clé, point d'accès): client}
+_clients_async = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _limites():
+    return httpx.Limits(
+        max_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.AI_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.AI_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def delais(lecture=None):
+    """
+    Délais HTTP d'un appel : `lecture` secondes au plus (délai de lecture
+    par défaut), la connexion restant bornée par `AI_HTTP_CONNECT_TIMEOUT`.
+    """
+    if lecture is None:
+        lecture = settings.AI_HTTP_READ_TIMEOUT
+    return httpx.Timeout(lecture, connect=min(settings.AI_HTTP_CONNECT_TIMEOUT, lecture))
+
+
+def get_client(api_key, base_url):
+    """Client synchrone partagé pour (`api_key`, `base_url`)."""
+    cle = (api_key, base_url)
+    client = _clients.get(cle)
+    if client is None:
+        with _lock:
+            client = _clients.get(cle)
+            if client is None:
+                transport = httpx.HTTPTransport(limits=_limites(), retries=settings.AI_HTTP_CONNECT_RETRIES)
+                client = _clients[cle] = OpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    max_retries=settings.AI_HTTP_MAX_RETRIES,
+                    http_client=DefaultHttpxClient(transport=transport, timeout=delais()),
+                )
+    return client
+
+
+def get_async_client(api_key, base_url, loop):
+    """Client asynchrone partagé pour (`api_key`, `base_url`) sur la boucle `loop`."""
+    cle = (api_key, base_url)
+    with _lock:
+        clients = _clients_async.setdefault(loop, {})
+        client = clients.get(cle)
+        if client is None:
+            transport = httpx.AsyncHTTPTransport(limits=_limites(), retries=settings.AI_HTTP_CONNECT_RETRIES)
+            client = clients[cle] = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=settings.AI_HTTP_MAX_RETRIES,
+                http_client=DefaultAsyncHttpxClient(transport=transport, timeout=delais()),
+            )
+    return client
@@ -0,0 +1,330 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Mise en forme du contexte transmis à l'IA, dans un budget de tokens.
+
+Tant que le détail complet (toutes les cultures, récoltes et dépenses)
+tient dans le budget, il est transmis tel quel. Au-delà, le contexte est
+compacté, par ordre de priorité :
+
+1. statistiques globales ;
+2. résumés par culture, par catégorie de dépense et par mois ;
+3. moyennes régionales ;
+4. valeurs atypiques (écart interquartile) ;
+5. les lignes les plus récentes et les plus importantes de chaque table.
+
+Chaque ligne n'est ajoutée que si elle tient dans le budget restant : la
+taille du contexte est bornée quel que soit le volume de l'exploitation.
+Le nombre de tokens est estimé localement (`estimer_tokens`), sans appel
+réseau ni dépendance à un tokenizer.
+"""
+
+import math
+import re
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+
+
+ENTETE = "DONNÉES DE L'EXPLOITATION :"
+
+# Budget minimal : l'en-tête et les statistiques globales sont toujours inclus
+BUDGET_MINIMAL = 200
+
+# Nombre maximal de valeurs atypiques signalées par table
+MAX_ATYPIQUES = 5
+
+_MOTS = re.compile(r"\w+|[^\w\s]")
+
+
+def estimer_tokens(texte):
+    """
+    Estimation prudente du nombre de tokens d'un texte.
+
+    Chaque mot compte pour un token par tranche de quatre caractères, chaque
+    signe de ponctuation pour un token : les tokenizers BPE courants
+    produisent un peu moins de tokens sur du français.
+    """
+    return sum(math.ceil(len(mot) / 4) for mot in _MOTS.findall(texte))
+
+
+def _nombre(valeur):
+    """Valeur sérialisée (chaîne, nombre ou None) -> `Decimal`."""
+    try:
+        return Decimal(str(valeur)) if valeur not in (None, '') else Decimal('0')
+    except InvalidOperation:
+        return Decimal('0')
+
+
+def _fcfa(valeur):
+    return f"{valeur:.0f}"
+
+
+# --- Lignes de détail (format du contexte complet) ---
+
+def ligne_culture(c):
+    return f"- {c['nom']} : semée le {c['date_culture']}, superficie {c['superficie']} ha, coût semences {c['cout_achat_semences']} FCFA, main d'œuvre {c['cout_main_oeuvre']} FCFA."
+
+
+def ligne_recolte(r):
+    return f"- Récolte de {r['culture_nom']} le {r['date_recolte']} : {r['quantite_recoltee']} {r['unite_recolte']}, prix vente {r['prix_vente_unitaire']} FCFA/unité, dépenses récolte {r['depenses_liees_recolte']} FCFA."
+
+
+def ligne_depense(d):
+    return f"- {d['description']} ({d['categorie']}) : {d['montant']} FCFA le {d['date_depense']}."
+
+
+def _lignes_statistiques(data):
+    stats = data.get('stats', {})
+    return [
+        f"- Revenus totaux : {stats.get('revenus_totaux', 0)} FCFA",
+        f"- Dépenses totales : {stats.get('depenses_totales', 0)} FCFA",
+        f"- Bénéfice net : {stats.get('benefice_net', 0)} FCFA",
+        f"- Rendement moyen : {stats.get('rendement_moyen', 0)}",
+        f"- Culture la plus rentable : {stats.get('culture_plus_rentable', 'N/A')}",
+    ]
+
+
+def _lignes_mensuelles(data):
+    return [
+        f"- {m['mois']} : revenus {m['revenus']} FCFA, dépenses {m['depenses']} FCFA"
+        for m in data.get('evolution_mensuelle') or []
+    ]
+
+
+def _lignes_regionales(data):
+    lignes = []
+    for r in data.get('referentiels_regionaux') or []:
+        portee = "toutes zones" if r['portee'] == 'nationale' else f"zone {r['zone']}"
+        lignes.append(f"- {r['nom']} ({portee}, {r['nb_agriculteurs']} exploitations) : rendement moyen {r['rendement_moyen']}/ha, coût moyen {r['cout_par_hectare']} FCFA/ha, prix de vente moyen {r['prix_vente_moyen']} FCFA/unité")
+    return lignes
+
+
+def _lignes_completes(data):
+    """Toutes les lignes de l'exploitation, sans résumé (générées à la demande)."""
+    yield ENTETE
+
+    yield "\n--- CULTURES ---"
+    yield from map(ligne_culture, data.get('cultures') or [])
+    if not data.get('cultures'):
+        yield "Aucune culture enregistrée."
+
+    yield "\n--- RÉCOLTES ---"
+    yield from map(ligne_recolte, data.get('recoltes') or [])
+    if not data.get('recoltes'):
+        yield "Aucune récolte enregistrée."
+
+    yield "\n--- DÉPENSES GÉNÉRALES ---"
+    yield from map(ligne_depense, data.get('depenses') or [])
+    if not data.get('depenses'):
+        yield "Aucune dépense générale enregistrée."
+
+    yield "\n--- STATISTIQUES GLOBALES ---"
+    yield from _lignes_statistiques(data)
+
+    if data.get('evolution_mensuelle'):
+        yield "\n--- ÉVOLUTION MENSUELLE ---"
+        yield from _lignes_mensuelles(data)
+
+    if data.get('referentiels_regionaux'):
+        yield "\n--- MOYENNES RÉGIONALES ---"
+        yield from _lignes_regionales(data)
+
+
+def contexte_complet(data):
+    """Toutes les lignes de l'exploitation, sans résumé."""
+    return "\n".join(_lignes_completes(data)) + "\n"
+
+
+def _contexte_complet_borne(data, budget):
+    """Le contexte complet s'il tient dans `budget` tokens, sinon None (arrêt dès le dépassement)."""
+    lignes, tokens = [], 0
+    for ligne in _lignes_completes(data):
+        tokens += estimer_tokens(ligne) + 1
+        if tokens > budget:
+            return None
+        lignes.append(ligne)
+    return "\n".join(lignes) + "\n"
+
+
+# --- Résumés ---
+
+def _resume_cultures(data):
+    """Une ligne par nom de culture : parcelles, surface, récoltes, revenus, coûts."""
+    depenses_par_culture = {}
+    for d in data.get('depenses') or []:
+        if d.get('culture'):
+            depenses_par_culture[d['culture']] = depenses_par_culture.get(d['culture'], Decimal('0')) + _nombre(d['montant'])
+
+    quantites, depenses_recoltes = {}, {}
+    for r in data.get('recoltes') or []:
+        quantites[r['culture']] = quantites.get(r['culture'], Decimal('0')) + _nombre(r['quantite_recoltee'])
+        depenses_recoltes[r['culture']] = depenses_recoltes.get(r['culture'], Decimal('0')) + _nombre(r['depenses_liees_recolte'])
+
+    groupes = {}
+    for c in data.get('cultures') or []:
+        g = groupes.setdefault(c['nom'], {
+            'parcelles': 0, 'superficie': Decimal('0'), 'recoltes': 0, 'quantite': Decimal('0'),
+            'revenus': Decimal('0'), 'couts': Decimal('0'),
+        })
+        g['parcelles'] += 1
+        g['superficie'] += _nombre(c['superficie'])
+        g['recoltes'] += c.get('nombre_recoltes') or 0
+        g['quantite'] += quantites.get(c['id'], Decimal('0'))
+        g['revenus'] += _nombre(c.get('revenus_totaux'))
+        g['couts'] += (
+            _nombre(c['cout_achat_semences']) + _nombre(c['cout_main_oeuvre'])
+            + depenses_par_culture.get(c['id'], Decimal('0')) + depenses_recoltes.get(c['id'], Decimal('0'))
+        )
+
+    lignes = []
+    for nom, g in sorted(groupes.items(), key=lambda item: -item[1]['revenus']):
+        rendement = g['quantite'] / g['superficie'] if g['superficie'] > 0 else Decimal('0')
+        lignes.append(
+            f"- {nom} : {g['parcelles']} parcelle(s), {g['superficie']} ha, {g['recoltes']} récolte(s), "
+            f"quantité récoltée {g['quantite']} ({rendement:.1f}/ha), revenus {_fcfa(g['revenus'])} FCFA, "
+            f"coûts {_fcfa(g['couts'])} FCFA, bénéfice {_fcfa(g['revenus'] - g['couts'])} FCFA"
+        )
+    return lignes
+
+
+def _resume_categories(data):
+    """Une ligne par catégorie de dépense, de la plus coûteuse à la moins coûteuse."""
+    totaux = {}
+    for d in data.get('depenses') or []:
+        nombre, total = totaux.get(d['categorie'], (0, Decimal('0')))
+        totaux[d['categorie']] = (nombre + 1, total + _nombre(d['montant']))
+    return [
+        f"- {categorie} : {nombre} dépense(s), total {_fcfa(total)} FCFA"
+        for categorie, (nombre, total) in sorted(totaux.items(), key=lambda item: -item[1][1])
+    ]
+
+
+def _indices_atypiques(valeurs):
+    """Indices des valeurs hors de [Q1 - 1,5 IQR, Q3 + 1,5 IQR], les plus éloignées d'abord."""
+    valeurs = np.asarray(valeurs, dtype=np.float64)
+    if valeurs.size < 4:
+        return []
+    q1, mediane, q3 = np.percentile(valeurs, [25, 50, 75])
+    ecart = q3 - q1
+    hors = np.flatnonzero((valeurs > q3 + 1.5 * ecart) | (valeurs < q1 - 1.5 * ecart))
+    ordre = np.argsort(-np.abs(valeurs[hors] - mediane), kind='stable')
+    return [int(i) for i in hors[ordre][:MAX_ATYPIQUES]]
+
+
+def _atypiques(data):
+    depenses = data.get('depenses') or []
+    recoltes = data.get('recoltes') or []
+    lignes = [
+        f"{ligne_depense(depenses[i])} (montant inhabituel)"
+        for i in _indices_atypiques([_nombre(d['montant']) for d in depenses])
+    ]
+    revenus = [_nombre(r['quantite_recoltee']) * _nombre(r['prix_vente_unitaire']) for r in recoltes]
+    lignes += [
+        f"{ligne_recolte(recoltes[i])} (revenu inhabituel : {_fcfa(revenus[i])} FCFA)"
+        for i in _indices_atypiques(revenus)
+    ]
+    return lignes
+
+
+def _selection(lignes, champ_date, montant, nombre):
+    """Les `nombre` lignes les plus récentes et les plus importantes, de la plus récente à la plus ancienne."""
+    if len(lignes) <= nombre:
+        choisies = list(range(len(lignes)))
+    else:
+        par_date = sorted(range(len(lignes)), key=lambda i: str(lignes[i][champ_date]), reverse=True)
+        par_montant = sorted(range(len(lignes)), key=lambda i: montant(lignes[i]), reverse=True)
+        choisies = list(dict.fromkeys(par_date[:nombre - nombre // 2] + par_montant))[:nombre]
+    choisies.sort(key=lambda i: str(lignes[i][champ_date]), reverse=True)
+    return [lignes[i] for i in choisies]
+
+
+class _Redaction:
+    """Accumule des lignes tant que le budget de tokens le permet."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.tokens = 0
+        self.lignes = []
+
+    def ajouter(self, ligne, obligatoire=False):
+        cout = estimer_tokens(ligne) + 1
+        if not obligatoire and self.tokens + cout > self.budget:
+            return False
+        self.lignes.append(ligne)
+        self.tokens += cout
+        return True
+
+    def section(self, titre, lignes, total=None, obligatoire=False):
+        """Titre puis lignes tant qu'elles tiennent ; signale les lignes omises."""
+        if not lignes:
+            return
+        titre = f"\n--- {titre} ---"
+        if not obligatoire and self.tokens + estimer_tokens(titre) + estimer_tokens(lignes[0]) + 2 > self.budget:
+            return
+        self.ajouter(titre, obligatoire)
+        ajoutees = 0
+        for ligne in lignes:
+            if not self.ajouter(ligne, obligatoire):
+                break
+            ajoutees += 1
+        omises = (len(lignes) if total is None else total) - ajoutees
+        if omises > 0:
+            self.ajouter(f"(… {omises} autre(s) ligne(s) non détaillée(s))")
+
+    def texte(self):
+        return "\n".join(self.lignes) + "\n"
+
+
+def compacter_contexte(data, budget, lignes_detail=10):
+    """
+    Contexte de l'exploitation tenant dans `budget` tokens (estimés).
+
+    `lignes_detail` : nombre maximal de lignes détaillées par table
+    (cultures, récoltes, dépenses) en mode compacté.
+    """
+    complet = _contexte_complet_borne(data, budget)
+    if complet is not None:
+        return complet
+
+    cultures = data.get('cultures') or []
+    recoltes = data.get('recoltes') or []
+    depenses = data.get('depenses') or []
+
+    redaction = _Redaction(max(budget, BUDGET_MINIMAL))
+    redaction.ajouter(ENTETE, obligatoire=True)
+    redaction.ajouter(
+        f"(Données résumées : {len(cultures)} culture(s), {len(recoltes)} récolte(s) et "
+        f"{len(depenses)} dépense(s) au total ; seules les lignes les plus récentes ou "
+        f"les plus importantes sont détaillées.)",
+        obligatoire=True,
+    )
+    redaction.section("STATISTIQUES GLOBALES", _lignes_statistiques(data), obligatoire=True)
+    redaction.section("RÉSUMÉ PAR CULTURE", _resume_cultures(data))
+    redaction.section("DÉPENSES PAR CATÉGORIE", _resume_categories(data))
+    redaction.section("ÉVOLUTION MENSUELLE", _lignes_mensuelles(data))
+    redaction.section("MOYENNES RÉGIONALES", _lignes_regionales(data))
+    redaction.section("VALEURS ATYPIQUES", _atypiques(data))
+
+    redaction.section(
+        "RÉCOLTES RÉCENTES ET PRINCIPALES",
+        [ligne_recolte(r) for r in _selection(
+            recoltes, 'date_recolte',
+            lambda r: _nombre(r['quantite_recoltee']) * _nombre(r['prix_vente_unitaire']), lignes_detail,
+        )],
+        total=len(recoltes),
+    )
+    redaction.section(
+        "DÉPENSES RÉCENTES ET PRINCIPALES",
+        [ligne_depense(d) for d in _selection(
+            depenses, 'date_depense', lambda d: _nombre(d['montant']), lignes_detail,
+        )],
+        total=len(depenses),
+    )
+    redaction.section(
+        "CULTURES RÉCENTES ET PRINCIPALES",
+        [ligne_culture(c) for c in _selection(
+            cultures, 'date_culture', lambda c: _nombre(c.get('revenus_totaux')), lignes_detail,
+        )],
+        total=len(cultures),
+    )
+    return redaction.texte()
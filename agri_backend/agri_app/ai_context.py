@@ -0,0 +1,173 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Contexte des données de l'utilisateur transmis à l'IA (chatbot et rapports).
+
+Les données et leur texte mis en forme sont mis en cache sous la clé
+(utilisateur, version des données, calcul des référentiels régionaux) :
+tant qu'aucune culture, récolte ou dépense n'est modifiée, les tours de
+conversation suivants réutilisent le même contexte sans aucune requête
+sur ces tables. Une
+modification incrémente `Utilisateur.version_donnees`, donc change la clé :
+il n'y a rien à invalider.
+
+Le cache local au processus peut être doublé par le cache Django pour
+partager les contextes entre plusieurs workers.
+"""
+
+import json
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .analytics import annoter_cultures
+from .benchmarks import generation as generation_referentiels, referentiels_pour
+from .caching import TTLCache
+from .models import Culture, Recolte, Depense
+from .rollups import historique_mensuel
+from .serializers import CultureSerializer, RecolteSerializer, DepenseSerializer
+
+
+def _referentiels_par_nom(cultures):
+    """Un référentiel par nom de culture (le plus précis trouvé)."""
+    referentiels = referentiels_pour(
+        (c.id, c.nom, c.zone_geographique, c.date_culture) for c in cultures
+    )
+    par_nom = {}
+    for c in cultures:
+        if c.id in referentiels:
+            par_nom.setdefault(c.nom, {'nom': c.nom, **referentiels[c.id]})
+    return list(par_nom.values())
+
+
+def collecter_donnees(user):
+    """
+    Rassemble les données de l'utilisateur pour `GroqService`.
+
+    Requêtes en nombre constant : les totaux des cultures sont annotés et
+    les cultures liées aux récoltes et dépenses sont jointes. Le résultat ne
+    contient que des types JSON (il est enregistré avec les messages du
+    chatbot) : les montants calculés en `Decimal` deviennent des chaînes.
+    """
+    cultures = list(annoter_cultures(Culture.objects.filter(utilisateur=user)))
+    recoltes = list(Recolte.objects.filter(culture__utilisateur=user).select_related('culture'))
+    depenses = list(Depense.objects.filter(utilisateur=user).select_related('utilisateur', 'culture'))
+
+    revenus_totaux = sum((r.quantite_recoltee * r.prix_vente_unitaire for r in recoltes), Decimal('0'))
+    depenses_totales = (
+        sum((c.cout_achat_semences + c.cout_main_oeuvre for c in cultures), Decimal('0')) +
+        sum((r.depenses_liees_recolte for r in recoltes), Decimal('0')) +
+        sum((d.montant for d in depenses), Decimal('0'))
+    )
+
+    donnees = {
+        'cultures': CultureSerializer(cultures, many=True).data,
+        # `culture_nom` est fourni par le serializer
+        'recoltes': RecolteSerializer(recoltes, many=True).data,
+        'depenses': DepenseSerializer(depenses, many=True).data,
+        'stats': {
+            'revenus_totaux': float(revenus_totaux),
+            'depenses_totales': float(depenses_totales),
+            'benefice_net': float(revenus_totaux - depenses_totales),
+        },
+        # Série des 12 derniers mois, lue dans les cumuls mensuels
+        'evolution_mensuelle': historique_mensuel(user.pk),
+        # Moyennes régionales précalculées pour les cultures de l'utilisateur
+        'referentiels_regionaux': _referentiels_par_nom(cultures),
+    }
+    return json.loads(json.dumps(donnees, cls=DjangoJSONEncoder))
+
+
+class ContexteCache:
+    """
+    Contextes `(donnees, texte)` par (utilisateur, version, référentiels).
+
+    Une entrée dont le texte dépasse `max_chars` caractères n'est pas
+    conservée (elle est comptée dans `trop_volumineux`) : le cache reste
+    borné en mémoire même pour les très grosses exploitations.
+    """
+
+    key_prefix = 'ia:contexte:'
+
+    def __init__(self, maxsize=1000, ttl=3600, max_chars=50000, use_django_cache=False):
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.max_chars = max_chars
+        self.use_django_cache = use_django_cache
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.trop_volumineux = 0
+
+    def get(self, cle):
+        contexte = self.local.get(cle)
+        if contexte is None and self.use_django_cache:
+            contexte = cache.get(f'{self.key_prefix}{cle}')
+            if contexte is not None:
+                self.local.set(cle, contexte)
+                self.shared_hits += 1
+        if contexte is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return contexte
+
+    def set(self, cle, contexte):
+        if len(contexte[1]) > self.max_chars:
+            self.trop_volumineux += 1
+            return
+        self.local.set(cle, contexte)
+        if self.use_django_cache:
+            cache.set(f'{self.key_prefix}{cle}', contexte, self.ttl)
+
+    @property
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared_hits': self.shared_hits,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'trop_volumineux': self.trop_volumineux,
+            'size': len(self.local),
+            'max_chars': self.max_chars,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_contexte_cache():
+    """Cache des contextes du processus (créé au premier appel)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ContexteCache(
+                    maxsize=settings.AI_CONTEXT_CACHE_MAXSIZE,
+                    ttl=settings.AI_CONTEXT_CACHE_TTL,
+                    max_chars=settings.AI_CONTEXT_MAX_CHARS,
+                    use_django_cache=settings.AI_CONTEXT_CACHE_SHARED,
+                )
+    return _cache
+
+
+def contexte_utilisateur(user, ai_service):
+    """
+    `(donnees, texte)` du contexte de l'utilisateur, lus dans le cache ou
+    construits (texte mis en forme par `ai_service`).
+    """
+    cle = (
+        f'{user.pk}:{user.version_donnees}:{generation_referentiels()}:'
+        f'{settings.AI_CONTEXT_TOKEN_BUDGET}:{settings.AI_CONTEXT_DETAIL_ROWS}'
+    )
+    contexte_cache = get_contexte_cache()
+    contexte = contexte_cache.get(cle)
+    if contexte is None:
+        donnees = collecter_donnees(user)
+        contexte = (donnees, ai_service._prepare_context(donnees))
+        contexte_cache.set(cle, contexte)
+    return contexte
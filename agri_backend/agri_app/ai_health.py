@@ -0,0 +1,148 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+État de santé des modèles du relais Groq (disjoncteur et classement).
+
+Chaque appel à un modèle est enregistré (succès ou échec, durée) dans le
+cache Django : l'état est partagé entre les requêtes et, avec un cache
+commun (Redis, Memcached, base de données), entre les workers.
+
+- Un modèle limité (429) ou indisponible (503) est écarté (« circuit
+  ouvert ») pendant la durée indiquée par l'en-tête `Retry-After`, sinon
+  pendant `AI_CIRCUIT_COOLDOWN` secondes ;
+- au-delà de `AI_CIRCUIT_ERROR_RATE` d'échecs sur la fenêtre glissante
+  (au moins `AI_CIRCUIT_MIN_CALLS` appels), le circuit s'ouvre aussi ;
+- `ordre_relais()` place en tête les modèles disponibles, fiables et
+  rapides (taux d'erreur et p95 de la durée des appels), en conservant
+  l'ordre configuré entre modèles comparables. Les modèles écartés restent
+  en fin de relais, en dernier recours.
+
+Les mises à jour ne sont pas atomiques : deux workers qui enregistrent un
+appel au même instant peuvent en perdre un, ce qui ne fausse pas l'état.
+"""
+
+import math
+import time
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+PREFIXE = 'ia:sante:'
+# Granularité (ms) du classement : des modèles dont les scores diffèrent de
+# moins de cette durée gardent l'ordre configuré
+PAS_CLASSEMENT_MS = 500
+
+
+def _cle(model_name):
+    return f'{PREFIXE}{model_name}'
+
+
+def _etat_vide():
+    return {'ouvert_jusqu_a': 0.0, 'appels': [], 'derniere_erreur': ''}
+
+
+def _duree_conservation():
+    return int(max(settings.AI_HEALTH_WINDOW, settings.AI_CIRCUIT_MAX_COOLDOWN)) + 60
+
+
+def _fenetre(etat, maintenant):
+    debut = maintenant - settings.AI_HEALTH_WINDOW
+    return [appel for appel in etat['appels'] if appel[0] >= debut]
+
+
+def retry_after(erreur):
+    """Durée (secondes) demandée par l'en-tête `Retry-After` de l'erreur, ou None."""
+    response = getattr(erreur, 'response', None)
+    entetes = getattr(response, 'headers', None)
+    if not entetes:
+        return None
+    valeur = entetes.get('retry-after-ms')
+    if valeur:
+        try:
+            return float(valeur) / 1000
+        except ValueError:
+            pass
+    valeur = entetes.get('retry-after')
+    if not valeur:
+        return None
+    try:
+        return float(valeur)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valeur).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _code_http(erreur):
+    return getattr(erreur, 'status_code', None)
+
+
+def enregistrer(model_name, succes, duree_ms, erreur=None):
+    """Enregistre un appel au modèle et ouvre le circuit si nécessaire."""
+    maintenant = time.time()
+    etat = cache.get(_cle(model_name)) or _etat_vide()
+    appels = _fenetre(etat, maintenant)
+    appels.append((maintenant, bool(succes), round(duree_ms, 1)))
+    etat['appels'] = appels[-settings.AI_HEALTH_MAX_EVENTS:]
+
+    if not succes:
+        etat['derniere_erreur'] = str(erreur)[:200] if erreur is not None else ''
+        attente = None
+        if _code_http(erreur) in (429, 503):
+            attente = retry_after(erreur) or settings.AI_CIRCUIT_COOLDOWN
+        else:
+            echecs = sum(1 for _, ok, _ in etat['appels'] if not ok)
+            if (len(etat['appels']) >= settings.AI_CIRCUIT_MIN_CALLS
+                    and echecs / len(etat['appels']) >= settings.AI_CIRCUIT_ERROR_RATE):
+                attente = settings.AI_CIRCUIT_COOLDOWN
+        if attente is not None:
+            attente = min(attente, settings.AI_CIRCUIT_MAX_COOLDOWN)
+            etat['ouvert_jusqu_a'] = max(etat['ouvert_jusqu_a'], maintenant + attente)
+            print(f"Modèle {model_name} écarté pendant {attente:.0f}s : {etat['derniere_erreur']}")
+
+    cache.set(_cle(model_name), etat, _duree_conservation())
+
+
+def _p95(durees):
+    if not durees:
+        return 0.0
+    durees = sorted(durees)
+    return durees[min(len(durees) - 1, math.ceil(0.95 * len(durees)) - 1)]
+
+
+def _resume(model_name, etat, maintenant):
+    appels = _fenetre(etat, maintenant)
+    echecs = sum(1 for _, ok, _ in appels if not ok)
+    ouvert_jusqu_a = etat['ouvert_jusqu_a']
+    return {
+        'modele': model_name,
+        'circuit': 'ouvert' if ouvert_jusqu_a > maintenant else 'ferme',
+        'reouverture_dans_s': round(max(0.0, ouvert_jusqu_a - maintenant), 1),
+        'appels': len(appels),
+        'taux_erreur': round(echecs / len(appels), 4) if appels else 0.0,
+        'p95_ms': _p95([duree for _, ok, duree in appels if ok]),
+        'derniere_erreur': etat['derniere_erreur'],
+    }
+
+
+def etats(model_names):
+    """Résumé de l'état de chaque modèle (une lecture groupée du cache)."""
+    maintenant = time.time()
+    trouves = cache.get_many([_cle(m) for m in model_names])
+    return [_resume(m, trouves.get(_cle(m)) or _etat_vide(), maintenant) for m in model_names]
+
+
+def _score_ms(resume):
+    # Un taux d'erreur de 25 % pèse autant qu'un doublement de la durée
+    return resume['p95_ms'] * (1 + 4 * resume['taux_erreur']) + 4 * PAS_CLASSEMENT_MS * resume['taux_erreur']
+
+
+def ordre_relais(model_names):
+    """Modèles dans l'ordre où le relais doit les essayer."""
+    resumes = etats(model_names)
+    # `sorted` est stable : à score comparable, l'ordre configuré est conservé
+    classes = sorted(resumes, key=lambda r: (r['circuit'] == 'ouvert', int(_score_ms(r) // PAS_CLASSEMENT_MS)))
+    return [r['modele'] for r in classes]
@@ -0,0 +1,156 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Mémoire des conversations du chatbot : fenêtre glissante et résumé.
+
+Le modèle reçoit, avant le message courant :
+- le résumé des échanges anciens (`Conversation.resume`) ;
+- les derniers messages non résumés, tels quels.
+
+Les messages qui sortent de la fenêtre des `AI_CHAT_HISTORY_MESSAGES`
+derniers restent transmis tels quels jusqu'à en former un lot de
+`AI_CHAT_SUMMARY_BATCH` ; le lot est alors intégré au résumé (un appel au
+modèle) et `Conversation.resume_jusqu_a` avance jusqu'à son dernier message.
+La taille du prompt reste ainsi bornée quelle que soit la longueur de la
+conversation, et l'historique est lu en une requête indexée.
+
+Si le résumé échoue, le lot reste transmis tel quel et sera résumé au
+tour suivant.
+"""
+
+from collections import namedtuple
+
+from django.conf import settings
+
+from .models import Conversation, MessageChat
+
+
+Memoire = namedtuple('Memoire', ['conversation', 'resume', 'messages', 'a_resumer'])
+
+
+def _tronquer(texte, limite):
+    if len(texte) <= limite:
+        return texte
+    return texte[:limite].rstrip() + " [...]"
+
+
+def _requete_historique(conversation, avant_id=None):
+    """Messages non résumés, du plus récent au plus ancien (fenêtre + un lot au plus)."""
+    messages = MessageChat.objects.filter(conversation=conversation, id__gt=conversation.resume_jusqu_a)
+    if avant_id is not None:
+        messages = messages.filter(id__lt=avant_id)
+    limite = settings.AI_CHAT_HISTORY_MESSAGES + settings.AI_CHAT_SUMMARY_BATCH
+    return messages.order_by('-id').values_list('id', 'est_utilisateur', 'contenu')[:limite]
+
+
+def _memoire(conversation, lignes):
+    lignes = list(reversed(lignes))
+    debordement = max(0, len(lignes) - settings.AI_CHAT_HISTORY_MESSAGES)
+    return Memoire(
+        conversation=conversation,
+        resume=conversation.resume,
+        messages=lignes,
+        a_resumer=lignes[:debordement],
+    )
+
+
+def charger_memoire(conversation, avant_id=None):
+    """
+    Mémoire de `conversation` (une requête).
+
+    `avant_id` : identifiant du message courant, exclu de l'historique
+    puisqu'il est transmis séparément.
+    """
+    return _memoire(conversation, list(_requete_historique(conversation, avant_id)))
+
+
+async def acharger_memoire(conversation, avant_id=None):
+    """Équivalent asynchrone de `charger_memoire`."""
+    return _memoire(conversation, [ligne async for ligne in _requete_historique(conversation, avant_id)])
+
+
+def historique(memoire):
+    """Messages au format chat completions, à placer avant le message courant."""
+    messages = []
+    if memoire.resume:
+        messages.append({
+            "role": "system",
+            "content": "Résumé des échanges précédents de cette conversation :\n"
+                       + _tronquer(memoire.resume, settings.AI_CHAT_SUMMARY_MAX_CHARS),
+        })
+    for _, est_utilisateur, contenu in memoire.messages:
+        messages.append({
+            "role": "user" if est_utilisateur else "assistant",
+            "content": _tronquer(contenu, settings.AI_CHAT_MESSAGE_MAX_CHARS),
+        })
+    return messages
+
+
+def _prompts_resume(memoire):
+    system_instruction = """
+    Tu résumes une conversation entre un agriculteur et son assistant agricole.
+    Conserve les faits, chiffres, décisions, conseils donnés et questions restées en suspens.
+    Réponds uniquement avec le résumé, en français.
+    """
+    echanges = "\n".join(
+        f"{'Agriculteur' if est_utilisateur else 'Assistant'} : "
+        f"{_tronquer(contenu, settings.AI_CHAT_MESSAGE_MAX_CHARS)}"
+        for _, est_utilisateur, contenu in memoire.a_resumer
+    )
+    # Environ 7 caractères par mot en français
+    mots = max(50, settings.AI_CHAT_SUMMARY_MAX_CHARS // 7)
+    prompt = f"""
+    RÉSUMÉ ACTUEL :
+    {memoire.resume or "(aucun)"}
+
+    NOUVEAUX ÉCHANGES :
+    {echanges}
+
+    Rédige le nouveau résumé de toute la conversation en {mots} mots au plus.
+    """
+    return system_instruction, prompt
+
+
+def _doit_resumer(memoire, ai_service):
+    return bool(ai_service.api_key) and len(memoire.a_resumer) >= settings.AI_CHAT_SUMMARY_BATCH
+
+
+def _enregistrement(memoire, texte):
+    """Mise à jour conditionnelle : ignorée si une autre requête a déjà résumé ce lot."""
+    requete = Conversation.objects.filter(
+        pk=memoire.conversation.pk, resume_jusqu_a=memoire.conversation.resume_jusqu_a
+    )
+    valeurs = {
+        'resume': _tronquer(texte.strip(), settings.AI_CHAT_SUMMARY_MAX_CHARS),
+        'resume_jusqu_a': memoire.a_resumer[-1][0],
+    }
+    return requete, valeurs
+
+
+def resumer(memoire, ai_service):
+    """
+    Intègre au résumé le lot de messages sortis de la fenêtre, s'il est complet.
+
+    Retourne True si le résumé a été mis à jour.
+    """
+    if not _doit_resumer(memoire, ai_service):
+        return False
+    system_instruction, prompt = _prompts_resume(memoire)
+    texte, error = ai_service._call_with_relay(prompt, system_instruction, endpoint='resume')
+    if error or not texte:
+        print(f"Résumé de la conversation {memoire.conversation.pk} non mis à jour : {error}")
+        return False
+    requete, valeurs = _enregistrement(memoire, texte)
+    return requete.update(**valeurs) == 1
+
+
+async def aresumer(memoire, ai_service):
+    """Équivalent asynchrone de `resumer`."""
+    if not _doit_resumer(memoire, ai_service):
+        return False
+    system_instruction, prompt = _prompts_resume(memoire)
+    texte, error = await ai_service._acall_with_relay(prompt, system_instruction, endpoint='resume')
+    if error or not texte:
+        print(f"Résumé de la conversation {memoire.conversation.pk} non mis à jour : {error}")
+        return False
+    requete, valeurs = _enregistrement(memoire, texte)
+    return await requete.aupdate(**valeurs) == 1
@@ -0,0 +1,193 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Quotas des endpoints IA selon le plan d'abonnement (fenêtres glissantes).
+
+Chaque utilisateur dispose, selon `Utilisateur.plan_abonnement`, d'un quota
+de requêtes par famille d'endpoints (`chatbot`, `rapport`) et d'un quota de
+tokens commun (prompt + réponse, tous modèles confondus) ; capacités et
+périodes dans `AI_QUOTAS` et `AI_QUOTA_PERIODES`.
+
+- `verifier_quota(user, famille)` consomme une requête, ou refuse si le
+  quota de requêtes est atteint ou si le quota de tokens est épuisé ;
+- `consommer_tokens(user, tokens, quota)` compte ensuite les tokens
+  réellement consommés (connus après l'appel) : le quota peut être dépassé,
+  les requêtes suivantes attendent alors que la consommation redescende.
+
+La consommation est comptée par période dans des compteurs entiers du cache
+Django (`cache.add` pour les créer, `cache.incr` / `cache.decr` pour les
+modifier, opérations atomiques) ; la consommation estimée est celle de la
+période en cours plus celle de la précédente au prorata de ce qu'il en reste
+dans la fenêtre glissante : le quota se reconstitue au fil du temps. Une
+requête est d'abord comptée, puis rendue (`decr`) si elle dépasse le quota :
+des requêtes simultanées ne peuvent pas dépasser le quota ensemble.
+
+Cela suppose un cache partagé entre les workers, à `incr` atomique : Redis
+ou Memcached (voir `CACHE_BACKEND`). LocMemCache (propre à chaque processus),
+DatabaseCache et FileBasedCache (`incr` non atomique) ne sont pas pris en
+charge : les quotas sont désactivés par défaut (`AI_QUOTA_ENABLED`) et le
+serveur refuse de démarrer s'ils sont activés avec l'un de ces caches
+(erreur `agri_app.E001` de `python manage.py check`).
+
+Le personnel (`is_staff`) n'est pas limité.
+"""
+
+import math
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+PREFIXE = 'ia:quota:'
+
+# autorise : bool ; retry_after : secondes avant la prochaine requête possible ;
+# entetes : en-têtes `x-ratelimit-*` à ajouter à la réponse
+Quota = namedtuple('Quota', ['autorise', 'retry_after', 'entetes'])
+
+ILLIMITE = Quota(True, 0, {})
+
+
+class _Fenetre:
+    """Compteurs de la période en cours et de la précédente pour un quota."""
+
+    def __init__(self, user_id, seau, periode, maintenant):
+        self.periode = int(periode)
+        indice, ecoule = divmod(maintenant, self.periode)
+        self.ecoule = ecoule
+        self.cle = _cle(user_id, seau, int(indice))
+        self.cle_precedente = _cle(user_id, seau, int(indice) - 1)
+
+    def estimation(self, courant, precedent):
+        """Consommation dans la fenêtre glissante qui se termine maintenant."""
+        return courant + precedent * (1 - self.ecoule / self.periode)
+
+    def ajouter(self, quantite):
+        """Ajoute `quantite` au compteur de la période (atomique) et retourne sa valeur."""
+        cache.add(self.cle, 0, _duree_conservation(self.periode))
+        try:
+            return cache.incr(self.cle, quantite)
+        except ValueError:
+            # Compteur expiré entre `add` et `incr`
+            cache.add(self.cle, quantite, _duree_conservation(self.periode))
+            return quantite
+
+    def retirer(self, quantite):
+        try:
+            cache.decr(self.cle, quantite)
+        except ValueError:
+            pass
+
+    def attente(self, courant, precedent, capacite):
+        """Secondes avant que la consommation laisse au moins une unité (au moins 1)."""
+        limite = capacite - 1
+        if courant <= limite:
+            # La part de la période précédente décroît jusqu'à la fin de la période en cours
+            fraction = 1 - (limite - courant) / precedent if precedent else 0
+            attente = fraction * self.periode - self.ecoule
+        else:
+            # Il faut attendre la période suivante, où `courant` devient la part qui décroît
+            attente = self.periode - self.ecoule + (1 - limite / courant) * self.periode
+        return max(1, math.ceil(attente))
+
+    def reinitialisation(self, courant, precedent):
+        """Secondes avant que la consommation soit nulle."""
+        if courant:
+            return math.ceil(2 * self.periode - self.ecoule)
+        if precedent:
+            return math.ceil(self.periode - self.ecoule)
+        return 0
+
+
+def _cle(user_id, seau, indice):
+    return f'{PREFIXE}{user_id}:{seau}:{indice}'
+
+
+def _limites(user):
+    return settings.AI_QUOTAS.get(user.plan_abonnement) or settings.AI_QUOTAS['gratuit']
+
+
+def _entetes(suffixe, capacite, fenetre, courant, precedent):
+    # Même convention que les API OpenAI / Groq
+    restant = capacite - fenetre.estimation(courant, precedent)
+    return {
+        f'X-RateLimit-Limit-{suffixe}': str(capacite),
+        f'X-RateLimit-Remaining-{suffixe}': str(max(0, math.floor(restant))),
+        f'X-RateLimit-Reset-{suffixe}': f"{fenetre.reinitialisation(courant, precedent)}s",
+    }
+
+
+def _duree_conservation(periode):
+    # Un compteur sert pendant sa période puis comme période précédente
+    return 2 * int(periode) + 60
+
+
+def verifier_quota(user, famille):
+    """
+    Consomme une requête de `famille` (`'chatbot'` ou `'rapport'`) pour `user`.
+
+    Retourne un `Quota` ; s'il n'est pas autorisé, rien n'est consommé.
+    """
+    if not settings.AI_QUOTA_ENABLED or user.is_staff:
+        return ILLIMITE
+
+    limites = _limites(user)
+    capacite, capacite_tokens = limites[famille], limites['tokens']
+    maintenant = time.time()
+    fenetre = _Fenetre(user.pk, famille, settings.AI_QUOTA_PERIODES[famille], maintenant)
+    fenetre_tokens = _Fenetre(user.pk, 'tokens', settings.AI_QUOTA_PERIODES['tokens'], maintenant)
+
+    valeurs = cache.get_many([fenetre.cle_precedente, fenetre_tokens.cle, fenetre_tokens.cle_precedente])
+    precedent = valeurs.get(fenetre.cle_precedente, 0)
+    tokens = valeurs.get(fenetre_tokens.cle, 0)
+    tokens_precedents = valeurs.get(fenetre_tokens.cle_precedente, 0)
+    entetes_tokens = _entetes('Tokens', capacite_tokens, fenetre_tokens, tokens, tokens_precedents)
+
+    if fenetre_tokens.estimation(tokens, tokens_precedents) >= capacite_tokens:
+        courant = cache.get(fenetre.cle, 0)
+        entetes = {**_entetes('Requests', capacite, fenetre, courant, precedent), **entetes_tokens}
+        return Quota(False, fenetre_tokens.attente(tokens, tokens_precedents, capacite_tokens), entetes)
+
+    courant = fenetre.ajouter(1)
+    if fenetre.estimation(courant, precedent) > capacite:
+        fenetre.retirer(1)
+        courant -= 1
+        entetes = {**_entetes('Requests', capacite, fenetre, courant, precedent), **entetes_tokens}
+        return Quota(False, fenetre.attente(courant, precedent, capacite), entetes)
+
+    entetes = {**_entetes('Requests', capacite, fenetre, courant, precedent), **entetes_tokens}
+    return Quota(True, 0, entetes)
+
+
+def consommer_tokens(user, tokens, quota=ILLIMITE):
+    """
+    Ajoute `tokens` à la consommation de tokens de `user`.
+
+    Retourne `quota` avec les en-têtes de tokens mis à jour.
+    """
+    if not settings.AI_QUOTA_ENABLED or user.is_staff or not tokens:
+        return quota
+
+    capacite = _limites(user)['tokens']
+    fenetre = _Fenetre(user.pk, 'tokens', settings.AI_QUOTA_PERIODES['tokens'], time.time())
+    courant = fenetre.ajouter(int(tokens))
+    precedent = cache.get(fenetre.cle_precedente, 0)
+    return quota._replace(entetes={**quota.entetes, **_entetes('Tokens', capacite, fenetre, courant, precedent)})
+
+
+def appliquer_entetes(response, quota):
+    """Ajoute les en-têtes du quota à `response` et la retourne."""
+    for nom, valeur in quota.entetes.items():
+        response[nom] = valeur
+    if not quota.autorise:
+        response['Retry-After'] = str(quota.retry_after)
+    return response
+
+
+def message_quota_depasse(user, quota):
+    """Corps de la réponse 429."""
+    return {
+        'error': "Quota d'utilisation de l'IA atteint pour votre plan. Veuillez réessayer plus tard.",
+        'plan': user.plan_abonnement,
+        'retry_after': quota.retry_after,
+    }
@@ -0,0 +1,166 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Cache des réponses du chatbot aux questions répétées.
+
+Une réponse est réutilisée pour la même question (texte normalisé :
+minuscules, sans accents, ponctuation ni espaces superflus), posée par le
+même utilisateur sur le même contexte de données (empreinte du texte
+transmis au modèle), quelle que soit la conversation. Toute modification
+des données change le contexte, donc la clé : une réponse n'est jamais
+servie sur des données périmées.
+
+Les questions qui dépendent des messages précédents ne passent pas par le
+cache (`depend_de_l_historique`) : relances courtes ou qui renvoient à la
+conversation (« et pour le maïs ? », « explique ça »), et toute question
+posée dans une conversation déjà résumée.
+
+Éviction : la moins récemment utilisée au-delà de `maxsize` entrées (ou de
+`par_utilisateur` entrées pour un même utilisateur), et après `ttl` secondes.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .benchmarks import normaliser
+from .caching import TTLCache
+
+
+def normaliser_question(texte):
+    """« Quel est mon bénéfice ? » et « quel est mon benefice » donnent la même clé."""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', normaliser(texte)).split())
+
+
+def empreinte_contexte(contexte):
+    return hashlib.sha256((contexte or '').encode('utf-8')).hexdigest()
+
+
+# Une question de moins de mots est une relance de la conversation
+MOTS_MINIMUM = 4
+
+# Mots (normalisés) qui renvoient aux messages précédents
+MOTS_DE_RELANCE = {
+    'ca', 'cela', 'ceci', 'celui', 'celle', 'ceux', 'celles', 'pareil', 'pareille', 'encore',
+    'precedent', 'precedente', 'precedents', 'precedentes', 'dernier', 'derniere', 'autre', 'autres',
+}
+# Débuts de question qui prolongent la précédente
+DEBUTS_DE_RELANCE = ('et ', 'mais ', 'alors ', 'donc ', 'aussi ', 'sinon ', 'meme chose')
+# Expressions qui renvoient aux messages précédents
+EXPRESSIONS_DE_RELANCE = ('ci dessus', 'plus haut', 'tu as dit', 'tu m as dit', 'ta reponse', 'ton conseil', 'tes conseils')
+
+
+def depend_de_l_historique(question, historique):
+    """
+    Vrai si la réponse à `question` dépend des messages précédents
+    (voir `agri_app.ai_memory.historique`) : elle n'est alors pas mise en cache.
+    """
+    if not historique:
+        return False
+    # Résumé des échanges anciens : la conversation porte un contexte propre
+    if any(message['role'] == 'system' for message in historique):
+        return True
+    texte = normaliser_question(question)
+    mots = texte.split()
+    return (
+        len(mots) < MOTS_MINIMUM
+        or texte.startswith(DEBUTS_DE_RELANCE)
+        or not MOTS_DE_RELANCE.isdisjoint(mots)
+        or any(expression in texte for expression in EXPRESSIONS_DE_RELANCE)
+    )
+
+
+class ReponseCache:
+    """
+    Réponses par (utilisateur, question normalisée, empreinte du contexte).
+
+    LRU global borné à `maxsize` entrées avec expiration (`caching.TTLCache`),
+    et au plus `par_utilisateur` entrées par utilisateur (les moins récemment
+    utilisées sont retirées, comptées dans `evictions`) ; thread-safe. Chaque
+    entrée conserve la durée de l'appel au modèle qui l'a produite, pour
+    mesurer le temps économisé.
+    """
+
+    def __init__(self, maxsize=2000, par_utilisateur=20, ttl=1800, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.par_utilisateur = par_utilisateur
+        self.ttl = ttl
+        self.evictions = 0
+        self.latence_economisee_ms = 0.0
+        # cle -> (reponse, latence_ms)
+        self._data = TTLCache(maxsize=maxsize, ttl=ttl, timer=timer)
+        # utilisateur -> clés de ses entrées, de la moins à la plus récemment utilisée
+        self._cles_utilisateur = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cle(user_id, question, contexte):
+        return user_id, normaliser_question(question), empreinte_contexte(contexte)
+
+    def get(self, cle):
+        """`(reponse, latence_ms)` de l'appel d'origine, ou None."""
+        trouve = self._data.get(cle)
+        if trouve is None:
+            return None
+        with self._lock:
+            self.latence_economisee_ms += trouve[1]
+            cles = self._cles_utilisateur.get(cle[0])
+            if cles is not None and cle in cles:
+                cles.move_to_end(cle)
+        return trouve
+
+    def set(self, cle, reponse, latence_ms):
+        self._data.set(cle, (reponse, latence_ms))
+        with self._lock:
+            cles = self._cles_utilisateur.setdefault(cle[0], OrderedDict())
+            cles.pop(cle, None)
+            cles[cle] = None
+            # Entrées déjà expirées ou évincées du LRU global
+            for ancienne in [c for c in cles if c not in self._data]:
+                del cles[ancienne]
+            while len(cles) > self.par_utilisateur:
+                ancienne, _ = cles.popitem(last=False)
+                self._data.delete(ancienne)
+                self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+        with self._lock:
+            self._cles_utilisateur.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def stats(self):
+        stats = self._data.stats
+        return {
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'hit_rate': stats['hit_rate'],
+            'evictions': self.evictions,
+            'latence_economisee_ms': round(self.latence_economisee_ms, 1),
+            'size': stats['size'],
+            'utilisateurs': len(self._cles_utilisateur),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_reponse_cache():
+    """Cache des réponses du processus (créé au premier appel)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReponseCache(
+                    maxsize=settings.AI_RESPONSE_CACHE_MAXSIZE,
+                    par_utilisateur=settings.AI_RESPONSE_CACHE_PER_USER,
+                    ttl=settings.AI_RESPONSE_CACHE_TTL,
+                )
+    return _cache
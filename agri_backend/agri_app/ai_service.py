@@ -1,13 +1,50 @@
 # © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+import asyncio
 import os
 import json
-from openai import OpenAI
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import close_old_connections
+
+from .ai_clients import delais, get_async_client, get_client
+from .ai_compaction import compacter_contexte
+from .ai_health import enregistrer as enregistrer_appel, ordre_relais
+from .ai_response_cache import ReponseCache, depend_de_l_historique, get_reponse_cache
+from .ai_telemetry import enregistrer_appel as mesurer_appel, usage_tokens
+
+
+_executeur = None
+_executeur_lock = threading.Lock()
+
+
+def _executeur_relais():
+    """Threads du relais synchrone, partagés par le processus (au plus `AI_RELAY_WORKERS`)."""
+    global _executeur
+    if _executeur is None:
+        with _executeur_lock:
+            if _executeur is None:
+                _executeur = ThreadPoolExecutor(
+                    max_workers=settings.AI_RELAY_WORKERS, thread_name_prefix='groq-relais'
+                )
+    return _executeur
+
+
+def attendre_relais():
+    """Attend la fin des appels du relais synchrone en cours (tests, arrêt du processus)."""
+    global _executeur
+    with _executeur_lock:
+        executeur, _executeur = _executeur, None
+    if executeur is not None:
+        executeur.shutdown(wait=True)
+
 
 class GroqService:
     def __init__(self):
         self.api_key = getattr(settings, 'GROQ_API_KEY', os.environ.get("GROQ_API_KEY"))
-        self.base_url = "https://api.groq.com/openai/v1"
+        self.base_url = settings.GROQ_BASE_URL
         # Les trois modèles demandés pour le système de relais
         self.model_names = [
             "openai/gpt-oss-20b",
@@ -15,55 +52,251 @@ class GroqService:
             "llama-3.3-70b-versatile"
         ]
         
-        if self.api_key:
-            self.client = OpenAI(
-                api_key=self.api_key,
-                base_url=self.base_url,
+        # Origine de la dernière réponse du chatbot (enregistrée dans `MessageChat.metadonnees`)
+        self.metadonnees = {}
+
+        # Tokens consommés par les appels de ce service (quotas, voir `agri_app.ai_quotas`)
+        self.tokens_consommes = 0
+        self._tokens_lock = threading.Lock()
+
+        # Client partagé par le processus (pool de connexions maintenues ouvertes)
+        self.client = get_client(self.api_key, self.base_url) if self.api_key else None
+
+    def _messages(self, prompt, system_instruction=None, chat_history=None):
+        """`chat_history` : messages précédents (voir `agri_app.ai_memory.historique`)."""
+        messages = []
+        if system_instruction:
+            messages.append({"role": "system", "content": system_instruction})
+        messages.extend(chat_history or [])
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def _extra_args(self, model_name, is_json=False):
+        # Note: On utilise chat.completions car c'est le standard Groq/OpenAI.
+        # Si le modèle supporte le format JSON (comme llama-3-70b), on peut l'activer.
+        extra_args = {}
+        if is_json and "llama" in model_name.lower():
+            extra_args["response_format"] = {"type": "json_object"}
+        return extra_args
+
+    # --- Relais entre modèles : délais et requêtes parallèles (hedging) ---
+    # Chaque modèle dispose de `AI_MODEL_TIMEOUT` secondes et l'ensemble du
+    # relais de `AI_TOTAL_TIMEOUT`. Un modèle en erreur est remplacé aussitôt
+    # par le suivant ; un modèle qui n'a pas répondu après `AI_HEDGE_DELAY`
+    # secondes est doublé par le suivant, lancé en parallèle, et la première
+    # réponse valide l'emporte (0 : relais strictement séquentiel).
+    # Les modèles sont essayés dans l'ordre de `ai_health.ordre_relais` :
+    # un modèle limité ou en panne passe en dernier le temps de son délai.
+    # Chaque appel est mesuré (`ai_telemetry`) avec son `endpoint` et son
+    # rang dans le relais.
+
+    def _delai_modele(self, fin):
+        """Délai accordé à un modèle lancé maintenant (borné par le budget total)."""
+        return max(0.0, min(settings.AI_MODEL_TIMEOUT, fin - time.monotonic()))
+
+    def _attente_relais(self, fin, restants):
+        """Durée d'attente avant de relancer le modèle suivant en parallèle (None : jusqu'à la fin)."""
+        reste = fin - time.monotonic()
+        if restants and settings.AI_HEDGE_DELAY > 0:
+            return min(settings.AI_HEDGE_DELAY, reste)
+        return reste
+
+    def _compter_tokens(self, reponse):
+        tokens_prompt, tokens_reponse = usage_tokens(reponse)
+        with self._tokens_lock:
+            self.tokens_consommes += (tokens_prompt or 0) + (tokens_reponse or 0)
+
+    def _completion(self, model_name, messages, is_json, timeout, endpoint='autre', rang=0):
+        debut = time.perf_counter()
+        try:
+            response = self.client.with_options(timeout=delais(timeout)).chat.completions.create(
+                model=model_name,
+                messages=messages,
+                **self._extra_args(model_name, is_json)
+            )
+        except Exception as e:
+            enregistrer_appel(model_name, False, (time.perf_counter() - debut) * 1000, e)
+            mesurer_appel(model_name, endpoint, rang, debut, erreur=e)
+            raise
+        enregistrer_appel(model_name, True, (time.perf_counter() - debut) * 1000)
+        mesurer_appel(model_name, endpoint, rang, debut, reponse=response)
+        self._compter_tokens(response)
+        return response.choices[0].message.content
+
+    def _completion_en_flux(self, model_name, messages, timeout, endpoint, rang, annule):
+        """
+        Variante de `_completion` qui lit la réponse en flux : dès que `annule`
+        est positionné (appel devancé), la connexion est fermée et None retourné.
+        """
+        debut = time.perf_counter()
+        premier_fragment = dernier = None
+        fragments = []
+        try:
+            stream = self.client.with_options(timeout=delais(timeout)).chat.completions.create(
+                model=model_name,
+                messages=messages,
+                stream=True,
             )
-        else:
-            self.client = None
+            with stream:
+                for chunk in stream:
+                    if annule.is_set():
+                        mesurer_appel(model_name, endpoint, rang, debut, erreur=asyncio.CancelledError())
+                        return None
+                    # L'usage en tokens arrive dans le dernier fragment
+                    dernier = chunk
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if premier_fragment is None:
+                            premier_fragment = time.perf_counter()
+                        fragments.append(chunk.choices[0].delta.content)
+        except Exception as e:
+            enregistrer_appel(model_name, False, (time.perf_counter() - debut) * 1000, e)
+            mesurer_appel(model_name, endpoint, rang, debut, erreur=e, premier_fragment=premier_fragment)
+            raise
+        enregistrer_appel(model_name, True, (time.perf_counter() - debut) * 1000)
+        mesurer_appel(model_name, endpoint, rang, debut, reponse=dernier, premier_fragment=premier_fragment)
+        self._compter_tokens(dernier)
+        return "".join(fragments)
+
+    def _appel_relais(self, annule, model_name, messages, is_json, timeout, endpoint, rang):
+        """Appel d'un modèle du relais synchrone, exécuté dans un thread partagé."""
+        if annule.is_set():
+            return None
+        # Thread réutilisé d'une requête à l'autre : connexions à la base comme en fin de requête
+        close_old_connections()
+        try:
+            # Le mode JSON n'est pas disponible en flux sur l'API Groq
+            if 'response_format' in self._extra_args(model_name, is_json):
+                return self._completion(model_name, messages, is_json, timeout, endpoint, rang)
+            return self._completion_en_flux(model_name, messages, timeout, endpoint, rang, annule)
+        finally:
+            close_old_connections()
+
+    def _call_with_relay(self, prompt, system_instruction=None, is_json=False, chat_history=None, endpoint='autre'):
+        """
+        Système de relais : essaie les modèles un par un en cas d'erreur ou de
+        limite, et en parallèle si le modèle en cours tarde (voir ci-dessus).
 
-    def _call_with_relay(self, prompt, system_instruction=None, is_json=False):
-        """Système de relais : essaie les modèles un par un en cas d'erreur ou de limite."""
+        Les appels s'exécutent dans les threads partagés du processus
+        (`AI_RELAY_WORKERS`) et lisent la réponse en flux : un appel devancé
+        ferme sa connexion au fragment suivant. En mode JSON (lu d'un bloc),
+        un modèle devancé termine en arrière-plan (au plus `AI_MODEL_TIMEOUT`)
+        et sa réponse est ignorée.
+        """
         if not self.client:
             return None, "Clé API Groq non configurée."
 
+        messages = self._messages(prompt, system_instruction, chat_history)
+        fin = time.monotonic() + settings.AI_TOTAL_TIMEOUT
+        restants = ordre_relais(self.model_names)
+        en_cours = {}
+        last_error = ""
+        executeur = _executeur_relais()
+        # Positionné à la sortie : les appels encore en cours sont abandonnés
+        annule = threading.Event()
+
+        def lancer():
+            rang = len(self.model_names) - len(restants)
+            model_name = restants.pop(0)
+            future = executeur.submit(
+                self._appel_relais, annule, model_name, messages, is_json, self._delai_modele(fin), endpoint, rang
+            )
+            en_cours[future] = model_name
+
+        try:
+            lancer()
+            while en_cours:
+                attente = self._attente_relais(fin, restants)
+                if attente <= 0:
+                    last_error = f"délai total de {settings.AI_TOTAL_TIMEOUT}s dépassé"
+                    print(f"Relais Groq interrompu : {last_error}")
+                    break
+                termines, _ = wait(en_cours, timeout=attente, return_when=FIRST_COMPLETED)
+                if not termines:
+                    if restants and fin - time.monotonic() > 0:
+                        print(f"Le modèle {list(en_cours.values())[-1]} tarde : relance en parallèle sur {restants[0]}")
+                        lancer()
+                    continue
+                for future in termines:
+                    model_name = en_cours.pop(future)
+                    try:
+                        return future.result(), None
+                    except Exception as e:
+                        last_error = str(e)
+                        print(f"Erreur avec le modèle {model_name} : {last_error}")
+                # En cas de quota (429) ou autre erreur, on passe au modèle suivant
+                if restants:
+                    lancer()
+        finally:
+            annule.set()
+            for future in en_cours:
+                future.cancel()
+
+        return None, f"Tous les modèles Groq ont échoué. Dernière erreur : {last_error}"
+
+    def _stream_with_relay(self, prompt, system_instruction=None, chat_history=None, endpoint='autre'):
+        """
+        Relais en mode streaming : génère les fragments de texte de la réponse.
+
+        Un modèle qui échoue avant d'avoir produit le moindre fragment est
+        remplacé par le suivant. Une erreur après le premier fragment est
+        propagée (le début de la réponse a déjà été transmis). Si tous les
+        modèles échouent, lève `RuntimeError` avec le message du relais.
+        """
+        if not self.client:
+            raise RuntimeError("Clé API Groq non configurée.")
+
         last_error = ""
-        for model_name in self.model_names:
+        fin = time.monotonic() + settings.AI_TOTAL_TIMEOUT
+        for rang, model_name in enumerate(ordre_relais(self.model_names)):
+            emis = False
+            debut = time.perf_counter()
+            premier_fragment = dernier = None
+            delai = self._delai_modele(fin)
+            if delai <= 0:
+                last_error = f"délai total de {settings.AI_TOTAL_TIMEOUT}s dépassé"
+                break
             try:
-                messages = []
-                if system_instruction:
-                    messages.append({"role": "system", "content": system_instruction})
-                messages.append({"role": "user", "content": prompt})
-
-                # Note: On utilise chat.completions car c'est le standard Groq/OpenAI.
-                # Si le modèle supporte le format JSON (comme llama-3-70b), on peut l'activer.
-                extra_args = {}
-                if is_json and "llama" in model_name.lower():
-                    extra_args["response_format"] = {"type": "json_object"}
-
-                response = self.client.chat.completions.create(
+                # Le délai s'applique à la connexion et à l'attente de chaque fragment
+                stream = self.client.with_options(timeout=delais(delai)).chat.completions.create(
                     model=model_name,
-                    messages=messages,
-                    **extra_args
+                    messages=self._messages(prompt, system_instruction, chat_history),
+                    stream=True,
                 )
-                
-                return response.choices[0].message.content, None
+                for chunk in stream:
+                    # L'usage en tokens arrive dans le dernier fragment
+                    dernier = chunk
+                    # Certains fragments (rôle, usage) ne contiennent pas de texte
+                    if not chunk.choices:
+                        continue
+                    fragment = chunk.choices[0].delta.content
+                    if fragment:
+                        if not emis:
+                            premier_fragment = time.perf_counter()
+                        emis = True
+                        yield fragment
+                if emis:
+                    enregistrer_appel(model_name, True, (time.perf_counter() - debut) * 1000)
+                    mesurer_appel(model_name, endpoint, rang, debut, reponse=dernier, premier_fragment=premier_fragment)
+                    self._compter_tokens(dernier)
+                    return
+                last_error = "réponse vide"
+                print(f"Réponse vide du modèle {model_name}")
+                enregistrer_appel(model_name, False, (time.perf_counter() - debut) * 1000, last_error)
+                mesurer_appel(model_name, endpoint, rang, debut, erreur=last_error, reponse=dernier)
             except Exception as e:
+                enregistrer_appel(model_name, False, (time.perf_counter() - debut) * 1000, e)
+                mesurer_appel(model_name, endpoint, rang, debut, erreur=e, premier_fragment=premier_fragment)
+                if emis:
+                    raise
                 last_error = str(e)
                 print(f"Erreur avec le modèle {model_name} : {last_error}")
-                # En cas de quota (429) ou autre erreur, on passe au modèle suivant
+                # Aucun fragment transmis : on passe au modèle suivant
                 continue
-        
-        return None, f"Tous les modèles Groq ont échoué. Dernière erreur : {last_error}"
 
-    def generate_response(self, user_data, user_message, chat_history=None):
-        if not self.api_key:
-            return "L'API Groq n'est pas configurée. Veuillez ajouter votre clé API dans le fichier .env."
+        raise RuntimeError(f"Tous les modèles Groq ont échoué. Dernière erreur : {last_error}")
 
-        # Préparer le contexte
-        context = self._prepare_context(user_data)
-        system_instruction = f"""
+    def _chat_system_instruction(self, context):
+        return f"""
         Tu es un assistant agricole expert nommé "Agri-Conseiller". 
         Ton rôle est d'aider l'agriculteur à gérer son exploitation en te basant sur ses données réelles.
         
@@ -79,61 +312,116 @@ class GroqService:
         6. Si tu ne trouves pas l'information dans les données, précise-le poliment.
         """
 
-        response_text, error = self._call_with_relay(user_message, system_instruction)
+    # --- Cache des réponses (questions répétées sur les mêmes données) ---
+
+    def _cle_cache(self, user_id, user_message, context, use_cache, chat_history=None):
+        """Clé du cache des réponses, ou None si le cache n'est pas utilisé pour cette question."""
+        if not (use_cache and settings.AI_RESPONSE_CACHE_ENABLED) or user_id is None:
+            return None
+        if depend_de_l_historique(user_message, chat_history):
+            return None
+        return ReponseCache.cle(user_id, user_message, context)
+
+    def _reponse_en_cache(self, cle):
+        if cle is None:
+            self.metadonnees = {'cache': 'off'}
+            return None
+        trouve = get_reponse_cache().get(cle)
+        if trouve is None:
+            self.metadonnees = {'cache': 'miss'}
+            return None
+        response_text, latence_ms = trouve
+        self.metadonnees = {'cache': 'hit', 'latence_ms': 0, 'latence_economisee_ms': latence_ms}
+        return response_text
+
+    def _mettre_en_cache(self, cle, response_text, debut):
+        latence_ms = round((time.perf_counter() - debut) * 1000, 1)
+        self.metadonnees['latence_ms'] = latence_ms
+        if cle is not None and response_text:
+            get_reponse_cache().set(cle, response_text, latence_ms)
+
+    def generate_response(self, user_data, user_message, chat_history=None, context=None, user_id=None, use_cache=True):
+        """
+        Réponse du chatbot à `user_message`.
+
+        Avec `user_id`, une question déjà posée sur les mêmes données est
+        servie par le cache des réponses (sauf `use_cache=False`) ; l'origine
+        de la réponse est indiquée dans `self.metadonnees`.
+        """
+        if not self.api_key:
+            return "L'API Groq n'est pas configurée. Veuillez ajouter votre clé API dans le fichier .env."
+
+        # Préparer le contexte (ou réutiliser celui fourni, déjà mis en cache)
+        if context is None:
+            context = self._prepare_context(user_data)
+
+        cle = self._cle_cache(user_id, user_message, context, use_cache, chat_history)
+        response_text = self._reponse_en_cache(cle)
+        if response_text is not None:
+            return response_text
+
+        system_instruction = self._chat_system_instruction(context)
+        debut = time.perf_counter()
+        response_text, error = self._call_with_relay(
+            user_message, system_instruction, chat_history=chat_history, endpoint='chatbot'
+        )
         
         if error:
             return f"Désolé, je rencontre des difficultés techniques : {error}. Vérifiez votre connexion ou réessayez plus tard."
         
+        self._mettre_en_cache(cle, response_text, debut)
         return response_text
 
-    def _prepare_context(self, data):
-        """Formate les données utilisateur en une chaîne lisible pour l'IA."""
-        context = "DONNÉES DE L'EXPLOITATION :\n"
-        
-        # Cultures
-        context += "\n--- CULTURES ---\n"
-        if data.get('cultures'):
-            for c in data['cultures']:
-                context += f"- {c['nom']} : semée le {c['date_culture']}, superficie {c['superficie']} ha, coût semences {c['cout_achat_semences']} FCFA, main d'œuvre {c['cout_main_oeuvre']} FCFA.\n"
-        else:
-            context += "Aucune culture enregistrée.\n"
-
-        # Récoltes
-        context += "\n--- RÉCOLTES ---\n"
-        if data.get('recoltes'):
-            for r in data['recoltes']:
-                context += f"- Récolte de {r['culture_nom']} le {r['date_recolte']} : {r['quantite_recoltee']} {r['unite_recolte']}, prix vente {r['prix_vente_unitaire']} FCFA/unité, dépenses récolte {r['depenses_liees_recolte']} FCFA.\n"
-        else:
-            context += "Aucune récolte enregistrée.\n"
-
-        # Dépenses
-        context += "\n--- DÉPENSES GÉNÉRALES ---\n"
-        if data.get('depenses'):
-            for d in data['depenses']:
-                context += f"- {d['description']} ({d['categorie']}) : {d['montant']} FCFA le {d['date_depense']}.\n"
-        else:
-            context += "Aucune dépense générale enregistrée.\n"
-
-        # Statistiques globales
-        stats = data.get('stats', {})
-        context += "\n--- STATISTIQUES GLOBALES ---\n"
-        context += f"- Revenus totaux : {stats.get('revenus_totaux', 0)} FCFA\n"
-        context += f"- Dépenses totales : {stats.get('depenses_totales', 0)} FCFA\n"
-        context += f"- Bénéfice net : {stats.get('benefice_net', 0)} FCFA\n"
-        context += f"- Rendement moyen : {stats.get('rendement_moyen', 0)}\n"
-        context += f"- Culture la plus rentable : {stats.get('culture_plus_rentable', 'N/A')}\n"
-
-        return context
-
-    def generate_full_report(self, user_data, previous_reports_summary=None):
+    def generate_response_stream(self, user_data, user_message, chat_history=None, context=None, user_id=None, use_cache=True):
         """
-        Génère un rapport d'analyse complet et structuré au format JSON.
+        Variante de `generate_response` qui génère la réponse fragment par fragment.
+
+        Les messages d'indisponibilité, comme une réponse trouvée dans le
+        cache, sont générés en un fragment unique ; une erreur survenue après
+        le premier fragment est propagée à l'appelant.
         """
         if not self.api_key:
-            return None
+            yield "L'API Groq n'est pas configurée. Veuillez ajouter votre clé API dans le fichier .env."
+            return
 
-        context = self._prepare_context(user_data)
-        
+        if context is None:
+            context = self._prepare_context(user_data)
+
+        cle = self._cle_cache(user_id, user_message, context, use_cache, chat_history)
+        response_text = self._reponse_en_cache(cle)
+        if response_text is not None:
+            yield response_text
+            return
+
+        system_instruction = self._chat_system_instruction(context)
+        debut = time.perf_counter()
+        fragments = []
+        try:
+            for fragment in self._stream_with_relay(user_message, system_instruction, chat_history, endpoint='chatbot_stream'):
+                fragments.append(fragment)
+                yield fragment
+        except RuntimeError as e:
+            if fragments:
+                raise
+            yield f"Désolé, je rencontre des difficultés techniques : {e}. Vérifiez votre connexion ou réessayez plus tard."
+            return
+        self._mettre_en_cache(cle, "".join(fragments), debut)
+
+    def _prepare_context(self, data):
+        """
+        Formate les données utilisateur en une chaîne lisible pour l'IA.
+
+        Au-delà de `AI_CONTEXT_TOKEN_BUDGET` tokens, le détail est remplacé
+        par des résumés (voir `agri_app.ai_compaction`).
+        """
+        return compacter_contexte(
+            data,
+            settings.AI_CONTEXT_TOKEN_BUDGET,
+            lignes_detail=settings.AI_CONTEXT_DETAIL_ROWS,
+        )
+
+    def _report_prompts(self, context, previous_reports_summary=None):
+        """Instruction système et prompt du rapport complet."""
         history_context = ""
         if previous_reports_summary:
             history_context = f"\nVoici un résumé des rapports précédents pour analyser la progression :\n{previous_reports_summary}"
@@ -162,13 +450,14 @@ class GroqService:
                 "performance_cultures": [{{"nom": "Maïs", "rendement": 5.2, "moyenne_regionale": 4.5}}]
             }}
         }}
-        """
 
-        response_text, error = self._call_with_relay(prompt, system_instruction, is_json=True)
-        
-        if error or not response_text:
-            return None
+        Pour "moyenne_regionale", utilise uniquement le rendement moyen indiqué dans la section
+        MOYENNES RÉGIONALES ; si la culture n'y figure pas, mets null (n'invente aucune valeur).
+        """
+        return system_instruction, prompt
 
+    def _parse_report(self, response_text):
+        """Extrait l'objet JSON de la réponse du modèle (None si invalide)."""
         try:
             # Nettoyer la réponse pour ne garder que le JSON
             text = response_text.strip()
@@ -182,3 +471,240 @@ class GroqService:
             print(f"Erreur lors du parsing JSON : {e}")
             return None
 
+    def generate_full_report(self, user_data, previous_reports_summary=None, context=None):
+        """
+        Génère un rapport d'analyse complet et structuré au format JSON.
+
+        `context` : texte déjà préparé (voir `agri_app.ai_context`), sinon
+        construit à partir de `user_data`.
+        """
+        if not self.api_key:
+            return None
+
+        if context is None:
+            context = self._prepare_context(user_data)
+        system_instruction, prompt = self._report_prompts(context, previous_reports_summary)
+
+        response_text, error = self._call_with_relay(prompt, system_instruction, is_json=True, endpoint='rapport')
+        
+        if error or not response_text:
+            return None
+
+        return self._parse_report(response_text)
+
+    # --- Variantes asynchrones (vues ASGI) ---
+
+    async def _acompletion(self, client, model_name, messages, is_json, timeout, endpoint='autre', rang=0):
+        # L'état de santé est enregistré hors de la boucle d'événements (cache Django synchrone) ;
+        # la télémétrie ne fait que déposer la mesure dans sa file
+        enregistrer = sync_to_async(enregistrer_appel, thread_sensitive=False)
+        debut = time.perf_counter()
+        try:
+            response = await client.with_options(timeout=delais(timeout)).chat.completions.create(
+                model=model_name,
+                messages=messages,
+                **self._extra_args(model_name, is_json)
+            )
+        except asyncio.CancelledError as e:
+            # Devancé par un autre modèle, ou délai total dépassé
+            mesurer_appel(model_name, endpoint, rang, debut, erreur=e)
+            raise
+        except Exception as e:
+            mesurer_appel(model_name, endpoint, rang, debut, erreur=e)
+            await enregistrer(model_name, False, (time.perf_counter() - debut) * 1000, e)
+            raise
+        mesurer_appel(model_name, endpoint, rang, debut, reponse=response)
+        self._compter_tokens(response)
+        await enregistrer(model_name, True, (time.perf_counter() - debut) * 1000)
+        return response.choices[0].message.content
+
+    async def _acall_with_relay(self, prompt, system_instruction=None, is_json=False, chat_history=None, endpoint='autre'):
+        """
+        Équivalent asynchrone de `_call_with_relay` (client `AsyncOpenAI`) ;
+        les appels devancés ou hors délai sont annulés.
+        """
+        if not self.api_key:
+            return None, "Clé API Groq non configurée."
+
+        messages = self._messages(prompt, system_instruction, chat_history)
+        fin = time.monotonic() + settings.AI_TOTAL_TIMEOUT
+        restants = await sync_to_async(ordre_relais, thread_sensitive=False)(self.model_names)
+        en_cours = {}
+        last_error = ""
+
+        client = get_async_client(self.api_key, self.base_url, asyncio.get_running_loop())
+
+        def lancer():
+            rang = len(self.model_names) - len(restants)
+            model_name = restants.pop(0)
+            tache = asyncio.create_task(
+                self._acompletion(client, model_name, messages, is_json, self._delai_modele(fin), endpoint, rang)
+            )
+            en_cours[tache] = model_name
+
+        try:
+            lancer()
+            while en_cours:
+                attente = self._attente_relais(fin, restants)
+                if attente <= 0:
+                    last_error = f"délai total de {settings.AI_TOTAL_TIMEOUT}s dépassé"
+                    print(f"Relais Groq interrompu : {last_error}")
+                    break
+                termines, _ = await asyncio.wait(en_cours, timeout=attente, return_when=asyncio.FIRST_COMPLETED)
+                if not termines:
+                    if restants and fin - time.monotonic() > 0:
+                        print(f"Le modèle {list(en_cours.values())[-1]} tarde : relance en parallèle sur {restants[0]}")
+                        lancer()
+                    continue
+                for tache in termines:
+                    model_name = en_cours.pop(tache)
+                    try:
+                        return tache.result(), None
+                    except Exception as e:
+                        last_error = str(e)
+                        print(f"Erreur avec le modèle {model_name} : {last_error}")
+                # En cas de quota (429) ou autre erreur, on passe au modèle suivant
+                if restants:
+                    lancer()
+        finally:
+            for tache in en_cours:
+                tache.cancel()
+            if en_cours:
+                await asyncio.gather(*en_cours, return_exceptions=True)
+
+        return None, f"Tous les modèles Groq ont échoué. Dernière erreur : {last_error}"
+
+    async def _astream_with_relay(self, prompt, system_instruction=None, chat_history=None, endpoint='autre'):
+        """
+        Équivalent asynchrone de `_stream_with_relay` (client `AsyncOpenAI`) :
+        générateur asynchrone des fragments de texte de la réponse.
+        """
+        if not self.api_key:
+            raise RuntimeError("Clé API Groq non configurée.")
+
+        enregistrer = sync_to_async(enregistrer_appel, thread_sensitive=False)
+        client = get_async_client(self.api_key, self.base_url, asyncio.get_running_loop())
+        last_error = ""
+        fin = time.monotonic() + settings.AI_TOTAL_TIMEOUT
+        modeles = await sync_to_async(ordre_relais, thread_sensitive=False)(self.model_names)
+        for rang, model_name in enumerate(modeles):
+            emis = False
+            debut = time.perf_counter()
+            premier_fragment = dernier = None
+            delai = self._delai_modele(fin)
+            if delai <= 0:
+                last_error = f"délai total de {settings.AI_TOTAL_TIMEOUT}s dépassé"
+                break
+            try:
+                stream = await client.with_options(timeout=delais(delai)).chat.completions.create(
+                    model=model_name,
+                    messages=self._messages(prompt, system_instruction, chat_history),
+                    stream=True,
+                )
+                async with stream:
+                    async for chunk in stream:
+                        dernier = chunk
+                        if not chunk.choices:
+                            continue
+                        fragment = chunk.choices[0].delta.content
+                        if fragment:
+                            if not emis:
+                                premier_fragment = time.perf_counter()
+                            emis = True
+                            yield fragment
+                if emis:
+                    mesurer_appel(model_name, endpoint, rang, debut, reponse=dernier, premier_fragment=premier_fragment)
+                    self._compter_tokens(dernier)
+                    await enregistrer(model_name, True, (time.perf_counter() - debut) * 1000)
+                    return
+                last_error = "réponse vide"
+                print(f"Réponse vide du modèle {model_name}")
+                mesurer_appel(model_name, endpoint, rang, debut, erreur=last_error, reponse=dernier)
+                await enregistrer(model_name, False, (time.perf_counter() - debut) * 1000, last_error)
+            except (asyncio.CancelledError, GeneratorExit):
+                # Client déconnecté : la connexion au modèle est fermée par `async with`
+                mesurer_appel(model_name, endpoint, rang, debut, erreur=asyncio.CancelledError(),
+                              premier_fragment=premier_fragment)
+                raise
+            except Exception as e:
+                mesurer_appel(model_name, endpoint, rang, debut, erreur=e, premier_fragment=premier_fragment)
+                await enregistrer(model_name, False, (time.perf_counter() - debut) * 1000, e)
+                if emis:
+                    raise
+                last_error = str(e)
+                print(f"Erreur avec le modèle {model_name} : {last_error}")
+                continue
+
+        raise RuntimeError(f"Tous les modèles Groq ont échoué. Dernière erreur : {last_error}")
+
+    async def agenerate_response(self, user_data, user_message, chat_history=None, context=None, user_id=None, use_cache=True):
+        """Équivalent asynchrone de `generate_response`."""
+        if not self.api_key:
+            return "L'API Groq n'est pas configurée. Veuillez ajouter votre clé API dans le fichier .env."
+
+        if context is None:
+            context = self._prepare_context(user_data)
+
+        cle = self._cle_cache(user_id, user_message, context, use_cache, chat_history)
+        response_text = self._reponse_en_cache(cle)
+        if response_text is not None:
+            return response_text
+
+        system_instruction = self._chat_system_instruction(context)
+        debut = time.perf_counter()
+        response_text, error = await self._acall_with_relay(
+            user_message, system_instruction, chat_history=chat_history, endpoint='chatbot_async'
+        )
+
+        if error:
+            return f"Désolé, je rencontre des difficultés techniques : {error}. Vérifiez votre connexion ou réessayez plus tard."
+
+        self._mettre_en_cache(cle, response_text, debut)
+        return response_text
+
+    async def agenerate_response_stream(self, user_data, user_message, chat_history=None, context=None, user_id=None, use_cache=True):
+        """Équivalent asynchrone de `generate_response_stream` (générateur asynchrone)."""
+        if not self.api_key:
+            yield "L'API Groq n'est pas configurée. Veuillez ajouter votre clé API dans le fichier .env."
+            return
+
+        if context is None:
+            context = self._prepare_context(user_data)
+
+        cle = self._cle_cache(user_id, user_message, context, use_cache, chat_history)
+        response_text = self._reponse_en_cache(cle)
+        if response_text is not None:
+            yield response_text
+            return
+
+        system_instruction = self._chat_system_instruction(context)
+        debut = time.perf_counter()
+        fragments = []
+        try:
+            async for fragment in self._astream_with_relay(
+                user_message, system_instruction, chat_history, endpoint='chatbot_stream_async'
+            ):
+                fragments.append(fragment)
+                yield fragment
+        except RuntimeError as e:
+            if fragments:
+                raise
+            yield f"Désolé, je rencontre des difficultés techniques : {e}. Vérifiez votre connexion ou réessayez plus tard."
+            return
+        self._mettre_en_cache(cle, "".join(fragments), debut)
+
+    async def agenerate_full_report(self, user_data, previous_reports_summary=None, context=None):
+        """Équivalent asynchrone de `generate_full_report`."""
+        if not self.api_key:
+            return None
+
+        if context is None:
+            context = self._prepare_context(user_data)
+        system_instruction, prompt = self._report_prompts(context, previous_reports_summary)
+
+        response_text, error = await self._acall_with_relay(prompt, system_instruction, is_json=True, endpoint='rapport_async')
+
+        if error or not response_text:
+            return None
+
+        return self._parse_report(response_text)
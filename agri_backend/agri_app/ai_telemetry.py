@@ -0,0 +1,269 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Télémétrie des appels aux modèles du relais Groq.
+
+Chaque appel à un modèle (`GroqService`) produit une mesure : modèle,
+endpoint, rang dans le relais, résultat, latence, tokens consommés. La
+mesure est déposée sans bloquer dans une file bornée, qu'un thread de fond
+vide dans la table `AppelIA` par lots (`BulkWriteBuffer`) : la requête ne
+paie ni écriture en base ni verrou SQLite, et la télémétrie peut être
+enregistrée depuis une vue asynchrone comme depuis les threads du relais.
+
+Quand la file est pleine, les nouvelles mesures sont abandonnées (comptées
+dans `dropped`) : la télémétrie ne doit jamais ralentir les réponses.
+
+`agregats()` calcule, par jour et par modèle, les percentiles de latence,
+les erreurs, les relais et les tokens (voir l'endpoint `monitoring/appels-ia/`).
+"""
+
+import asyncio
+import atexit
+import math
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .buffers import BulkWriteBuffer
+
+
+def resultat(erreur):
+    """Résultat d'un appel (`AppelIA.RESULTAT_CHOICES`) d'après l'exception levée."""
+    if erreur is None:
+        return 'succes'
+    if isinstance(erreur, asyncio.CancelledError):
+        return 'annule'
+    if getattr(erreur, 'status_code', None) == 429:
+        return 'limite'
+    # openai.APITimeoutError, httpx.TimeoutException, TimeoutError
+    if isinstance(erreur, TimeoutError) or 'Timeout' in type(erreur).__name__:
+        return 'delai'
+    return 'erreur'
+
+
+def usage_tokens(objet):
+    """
+    `(tokens_prompt, tokens_reponse)` d'une réponse ou d'un fragment de flux.
+
+    L'usage d'une réponse en flux arrive dans le dernier fragment : champ
+    `usage` (API OpenAI) ou `x_groq.usage` (API Groq).
+    """
+    usage = getattr(objet, 'usage', None)
+    if usage is None:
+        x_groq = getattr(objet, 'x_groq', None) or {}
+        usage = x_groq.get('usage') if isinstance(x_groq, dict) else getattr(x_groq, 'usage', None)
+    if usage is None:
+        return None, None
+    if isinstance(usage, dict):
+        return usage.get('prompt_tokens'), usage.get('completion_tokens')
+    return getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None)
+
+
+class Telemetrie:
+    """
+    File bornée + thread de fond + écriture groupée des mesures `AppelIA`.
+
+    Le thread est (re)démarré paresseusement dans chaque processus (il ne
+    survit pas à un fork). `vider()` écrit immédiatement les mesures en
+    attente (arrêt du processus, shell).
+    """
+
+    def __init__(self, maxsize=10000, buffer=None):
+        from .models import AppelIA
+
+        self.buffer = buffer if buffer is not None else BulkWriteBuffer(AppelIA)
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self.stats = {
+            'submitted': 0,
+            'dropped': 0,
+        }
+
+    def enregistrer(self, **champs):
+        """Dépose une mesure (champs de `AppelIA`) sans bloquer. Retourne False si abandonnée."""
+        try:
+            self._queue.put_nowait(champs)
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return False
+        self.stats['submitted'] += 1
+        self._ensure_worker()
+        return True
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == pid:
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == pid:
+                return
+            self._worker = threading.Thread(target=self._run, name='ai-telemetry-writer', daemon=True)
+            self._worker_pid = pid
+            self._worker.start()
+
+    def _ajouter(self, champs):
+        from .models import AppelIA
+
+        self.buffer.add(AppelIA(**champs))
+
+    def _run(self):
+        while True:
+            try:
+                champs = self._queue.get(timeout=self.buffer.flush_interval)
+            except queue.Empty:
+                self.buffer.flush_if_due()
+                close_old_connections()
+                continue
+            try:
+                self._ajouter(champs)
+                self.buffer.flush_if_due()
+            except Exception as e:
+                print(f"Erreur télémétrie IA : {e}")
+            finally:
+                self._queue.task_done()
+                close_old_connections()
+
+    def vider(self):
+        """Écrit de façon synchrone les mesures en attente. Retourne le nb de lignes écrites."""
+        while True:
+            try:
+                champs = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                self._ajouter(champs)
+            finally:
+                self._queue.task_done()
+        return self.buffer.flush()
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'queue_size': self._queue.qsize(),
+            'write_buffer': self.buffer.get_stats(),
+        }
+
+
+_telemetrie = None
+_telemetrie_lock = threading.Lock()
+
+
+def get_telemetrie():
+    """Télémétrie du processus, construite à partir des settings."""
+    global _telemetrie
+    if _telemetrie is None:
+        with _telemetrie_lock:
+            if _telemetrie is None:
+                from .models import AppelIA
+
+                _telemetrie = Telemetrie(
+                    maxsize=settings.AI_TELEMETRY_QUEUE_SIZE,
+                    buffer=BulkWriteBuffer(
+                        AppelIA,
+                        max_size=settings.AI_TELEMETRY_BATCH_SIZE,
+                        flush_interval=settings.AI_TELEMETRY_FLUSH_INTERVAL,
+                    ),
+                )
+    return _telemetrie
+
+
+@atexit.register
+def _flush_on_exit():
+    # Arrêt d'un worker gunicorn : ne pas perdre les mesures en attente
+    if _telemetrie is not None:
+        _telemetrie.vider()
+
+
+def enregistrer_appel(model_name, endpoint, rang, debut, erreur=None, reponse=None, premier_fragment=None):
+    """
+    Mesure d'un appel à `model_name` commencé à `debut` (`time.perf_counter()`).
+
+    `reponse` : réponse (ou dernier fragment) portant l'usage en tokens ;
+    `premier_fragment` : instant (`perf_counter`) du premier fragment d'un flux.
+    """
+    if not settings.AI_TELEMETRY_ENABLED:
+        return
+    tokens_prompt, tokens_reponse = usage_tokens(reponse) if reponse is not None else (None, None)
+    get_telemetrie().enregistrer(
+        modele=model_name,
+        endpoint=endpoint,
+        rang=rang,
+        resultat=resultat(erreur),
+        code_http=getattr(erreur, 'status_code', None),
+        latence_ms=round((time.perf_counter() - debut) * 1000, 1),
+        premier_fragment_ms=round((premier_fragment - debut) * 1000, 1) if premier_fragment else None,
+        tokens_prompt=tokens_prompt,
+        tokens_reponse=tokens_reponse,
+        erreur=str(erreur)[:200] if erreur is not None else '',
+        date_appel=timezone.now(),
+    )
+
+
+def _percentile(valeurs, p):
+    if not valeurs:
+        return None
+    return valeurs[min(len(valeurs) - 1, math.ceil(p / 100 * len(valeurs)) - 1)]
+
+
+def _groupe():
+    return {'appels': 0, 'resultats': {}, 'relais': 0, 'latences': [], 'tokens_prompt': 0, 'tokens_reponse': 0}
+
+
+def _resume(cle, noms, groupe):
+    latences = sorted(groupe['latences'])
+    return {
+        **dict(zip(noms, cle)),
+        'appels': groupe['appels'],
+        'resultats': groupe['resultats'],
+        'taux_erreur': round(1 - groupe['resultats'].get('succes', 0) / groupe['appels'], 4),
+        'appels_relais': groupe['relais'],
+        'latence_ms': {
+            'p50': _percentile(latences, 50),
+            'p95': _percentile(latences, 95),
+            'p99': _percentile(latences, 99),
+        },
+        'tokens_prompt': groupe['tokens_prompt'],
+        'tokens_reponse': groupe['tokens_reponse'],
+    }
+
+
+def agregats(depuis):
+    """
+    Statistiques des appels depuis `depuis`, par (jour, modèle) et par (jour, endpoint).
+
+    Percentiles calculés sur les appels réussis ; `appels_relais` compte les
+    appels à un modèle de secours (rang > 0). Les lignes sont parcourues une
+    fois, par paquets : la mémoire reste proportionnelle au nombre d'appels
+    réussis de la période.
+    """
+    from .models import AppelIA
+
+    lignes = (
+        AppelIA.objects.filter(date_appel__gte=depuis)
+        .annotate(jour=TruncDate('date_appel'))
+        .order_by()
+        .values_list('jour', 'modele', 'endpoint', 'rang', 'resultat', 'latence_ms', 'tokens_prompt', 'tokens_reponse')
+    )
+    par_modele, par_endpoint = {}, {}
+    for jour, modele, endpoint, rang, res, latence, tokens_prompt, tokens_reponse in lignes.iterator(chunk_size=2000):
+        for groupe in (par_modele.setdefault((jour, modele), _groupe()),
+                       par_endpoint.setdefault((jour, endpoint), _groupe())):
+            groupe['appels'] += 1
+            groupe['resultats'][res] = groupe['resultats'].get(res, 0) + 1
+            groupe['relais'] += rang > 0
+            if res == 'succes':
+                groupe['latences'].append(latence)
+            groupe['tokens_prompt'] += tokens_prompt or 0
+            groupe['tokens_reponse'] += tokens_reponse or 0
+
+    return {
+        'modeles': [_resume(cle, ('jour', 'modele'), g) for cle, g in sorted(par_modele.items())],
+        'endpoints': [_resume(cle, ('jour', 'endpoint'), g) for cle, g in sorted(par_endpoint.items())],
+    }
@@ -0,0 +1,258 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Indicateurs de performance des cultures, calculés de façon vectorisée.
+
+Les colonnes de chaque culture (superficie, coûts, revenus, quantités
+récoltées) sont chargées en une seule requête puis converties en tableaux
+NumPy ; tous les indicateurs (rendement/ha, bénéfice, ROI, marge,
+percentiles, classements) sont calculés sur les tableaux entiers.
+
+Les montants sont stockés en entiers (dix-millièmes de FCFA) : les sommes
+sont exactes et reconverties en `Decimal` en sortie. Seuls les ratios
+(rendement, ROI, marge) sont calculés en flottants. La mise à l'échelle
+est faite par la base (`ROUND(montant * 10000)`), ce qui évite de créer un
+`Decimal` par valeur et corrige les artefacts flottants de SQLite.
+"""
+
+from decimal import Decimal, ROUND_HALF_EVEN
+
+import numpy as np
+from django.db.models import BigIntegerField, Count, DecimalField, F, FloatField, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, Round
+
+from .models import Recolte, Depense
+
+
+# Les revenus (quantité x prix, 2 décimales chacun) ont 4 décimales
+DECIMALES = 4
+ECHELLE = 10 ** DECIMALES
+_QUANTUM = Decimal(1).scaleb(-DECIMALES)
+_INT64_MAX = np.iinfo(np.int64).max
+
+PERCENTILES = (25, 50, 75, 90)
+
+
+def annoter_cultures(queryset):
+    """
+    Ajoute aux cultures leurs totaux agrégés, en une seule requête.
+
+    `ind_revenus`, `ind_depenses_associees`, `ind_total_recolte` et
+    `ind_nb_recoltes` sont utilisés par les serializers, l'admin et
+    `IndicateursCultures` au lieu de requêtes par culture.
+    """
+    def somme(model, expression):
+        return Subquery(
+            model.objects.filter(culture=OuterRef('pk')).values('culture').annotate(
+                total=Sum(expression)
+            ).values('total'),
+            output_field=DecimalField(),
+        )
+
+    nb_recoltes = Subquery(
+        Recolte.objects.filter(culture=OuterRef('pk')).values('culture').annotate(
+            total=Count('pk')
+        ).values('total'),
+        output_field=IntegerField(),
+    )
+
+    return queryset.annotate(
+        ind_revenus=Coalesce(somme(Recolte, F('quantite_recoltee') * F('prix_vente_unitaire')), Decimal('0')),
+        ind_depenses_associees=Coalesce(somme(Depense, F('montant')), Decimal('0')),
+        ind_total_recolte=Coalesce(somme(Recolte, F('quantite_recoltee')), Decimal('0')),
+        ind_nb_recoltes=Coalesce(nb_recoltes, 0),
+    )
+
+
+def vers_entier(valeur):
+    """Montant -> entier en dix-millièmes (arrondi bancaire, corrige les flottants SQLite)."""
+    if valeur is None:
+        return 0
+    if not isinstance(valeur, Decimal):
+        valeur = Decimal(str(valeur))
+    return int(valeur.quantize(_QUANTUM, rounding=ROUND_HALF_EVEN).scaleb(DECIMALES))
+
+
+def vers_decimal(entier):
+    """Entier en dix-millièmes -> `Decimal` exact."""
+    return Decimal(int(entier)).scaleb(-DECIMALES)
+
+
+def _en_entiers(expression):
+    """Montant -> entier en dix-millièmes, calculé par la base."""
+    return Cast(Round(expression * ECHELLE), BigIntegerField())
+
+
+def _colonne_montants(valeurs):
+    """
+    Colonne de montants -> tableau d'entiers exacts (dix-millièmes).
+
+    Accepte des entiers déjà mis à l'échelle (chargement SQL) ou des
+    `Decimal` (convertis un par un). Le tableau est en int64 tant que les
+    sommes ne peuvent pas déborder, sinon en entiers Python (dtype object).
+    """
+    if isinstance(valeurs, np.ndarray):
+        return valeurs
+    entiers = [v if type(v) is int else vers_entier(v) for v in valeurs]
+    try:
+        tableau = np.array(entiers, dtype=np.int64)
+    except OverflowError:
+        return np.array(entiers, dtype=object)
+    borne = int(np.abs(tableau).max()) if len(entiers) else 0
+    # Marge pour les sommes de colonnes (dépenses = coûts + dépenses associées)
+    if borne * max(len(entiers), 1) < _INT64_MAX // 4:
+        return tableau
+    return np.array(entiers, dtype=object)
+
+
+def _ratio(numerateur, denominateur, facteur=1.0):
+    """numerateur / denominateur * facteur, 0 là où le dénominateur est nul."""
+    numerateur = np.asarray(numerateur, dtype=np.float64)
+    denominateur = np.asarray(denominateur, dtype=np.float64)
+    resultat = np.zeros_like(numerateur)
+    np.divide(numerateur, denominateur, out=resultat, where=denominateur > 0)
+    return resultat * facteur
+
+
+class IndicateursCultures:
+    """
+    Indicateurs d'un ensemble de cultures, stockés en colonnes NumPy.
+
+    Construction : `depuis_queryset(Culture.objects.filter(...))` (une
+    requête) ou `depuis_lignes(...)` à partir de tuples déjà chargés. Les
+    montants peuvent être des entiers en dix-millièmes ou des `Decimal`.
+    """
+
+    # Colonnes chargées par `depuis_queryset` (montants en dix-millièmes)
+    COLONNES = [
+        'ids', 'noms', 'superficie', 'total_recolte', 'nb_recoltes',
+        'couts_initiaux', 'depenses_associees', 'revenus',
+    ]
+
+    def __init__(self, ids, noms, superficie, total_recolte, nb_recoltes,
+                 couts_initiaux, depenses_associees, revenus):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.noms = list(noms)
+        self.superficie = np.asarray(superficie, dtype=np.float64)
+        self.total_recolte = np.asarray(total_recolte, dtype=np.float64)
+        self.nb_recoltes = np.asarray(nb_recoltes, dtype=np.int64)
+        # Montants exacts en dix-millièmes
+        self.couts_initiaux = _colonne_montants(couts_initiaux)
+        self.depenses_associees = _colonne_montants(depenses_associees)
+        self.revenus = _colonne_montants(revenus)
+        self._calculer()
+
+    @classmethod
+    def requete_colonnes(cls, queryset):
+        """`values_list` des `COLONNES`, converties par la base (une requête)."""
+        return annoter_cultures(queryset).values_list(
+            'id',
+            'nom',
+            Cast('superficie', FloatField()),
+            Cast('ind_total_recolte', FloatField()),
+            'ind_nb_recoltes',
+            _en_entiers(F('cout_achat_semences') + F('cout_main_oeuvre')),
+            _en_entiers(F('ind_depenses_associees')),
+            _en_entiers(F('ind_revenus')),
+        )
+
+    @classmethod
+    def depuis_queryset(cls, queryset):
+        return cls.depuis_lignes(cls.requete_colonnes(queryset))
+
+    @classmethod
+    def depuis_lignes(cls, lignes):
+        """À partir de tuples ordonnés comme `COLONNES`."""
+        lignes = list(lignes)
+        # Transposition lignes -> colonnes (faite en C par zip)
+        colonnes = list(zip(*lignes)) if lignes else [()] * len(cls.COLONNES)
+        return cls(**dict(zip(cls.COLONNES, colonnes)))
+
+    def _calculer(self):
+        self.depenses = self.couts_initiaux + self.depenses_associees
+        self.benefice = self.revenus - self.depenses
+        self.rendement = _ratio(self.total_recolte, self.superficie)
+        self.roi = _ratio(self.benefice, self.depenses, 100.0)
+        self.marge = _ratio(self.benefice, self.revenus, 100.0)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- Totaux exacts ---
+
+    def totaux(self):
+        """Revenus, dépenses et bénéfice de l'ensemble, en `Decimal` exacts."""
+        revenus = vers_decimal(self.revenus.sum()) if len(self) else Decimal('0')
+        depenses = vers_decimal(self.depenses.sum()) if len(self) else Decimal('0')
+        return {
+            'revenus': revenus,
+            'depenses': depenses,
+            'benefice': revenus - depenses,
+        }
+
+    def ratios_globaux(self):
+        """ROI, marge et efficacité des coûts de l'ensemble (en flottants)."""
+        totaux = self.totaux()
+        revenus, depenses, benefice = totaux['revenus'], totaux['depenses'], totaux['benefice']
+        return {
+            'roi': float(benefice / depenses * 100) if depenses > 0 else 0,
+            'marge': float(benefice / revenus * 100) if revenus > 0 else 0,
+            'efficacite_couts': float(revenus / depenses) if depenses > 0 else 0,
+        }
+
+    # --- Statistiques ---
+
+    def productivite_moyenne(self):
+        """Moyenne des rendements strictement positifs."""
+        positifs = self.rendement[self.rendement > 0]
+        return float(positifs.mean()) if positifs.size else 0
+
+    def percentiles(self, colonne='rendement', q=PERCENTILES, positifs=True):
+        """Percentiles d'une colonne (`rendement`, `roi`, `marge`, `benefice`...)."""
+        valeurs = np.asarray(getattr(self, colonne), dtype=np.float64)
+        if colonne in ('benefice', 'revenus', 'depenses'):
+            valeurs = valeurs / ECHELLE
+        if positifs:
+            valeurs = valeurs[valeurs > 0]
+        if not valeurs.size:
+            return {f'p{p}': 0.0 for p in q}
+        return {f'p{p}': float(v) for p, v in zip(q, np.percentile(valeurs, q))}
+
+    def rangs(self, colonne='benefice'):
+        """Rang de chaque culture (1 = meilleure) selon une colonne, ordre stable."""
+        valeurs = np.asarray(getattr(self, colonne), dtype=np.float64)
+        ordre = np.argsort(-valeurs, kind='stable')
+        rangs = np.empty(len(self), dtype=np.int64)
+        rangs[ordre] = np.arange(1, len(self) + 1)
+        return rangs
+
+    def meilleure(self, colonne='rendement'):
+        """Index de la culture ayant la plus grande valeur (None si vide)."""
+        if not len(self):
+            return None
+        return int(np.argmax(np.asarray(getattr(self, colonne), dtype=np.float64)))
+
+    # --- Sorties ---
+
+    def benefice_decimal(self, index):
+        return vers_decimal(self.benefice[index])
+
+    def par_culture(self):
+        """Une entrée par culture, avec tous les indicateurs et les rangs."""
+        rang_benefice = self.rangs('benefice')
+        rang_rendement = self.rangs('rendement')
+        return [
+            {
+                'id': int(self.ids[i]),
+                'nom': self.noms[i],
+                'revenus': float(vers_decimal(self.revenus[i])),
+                'depenses': float(vers_decimal(self.depenses[i])),
+                'benefice': float(vers_decimal(self.benefice[i])),
+                'rendement': float(self.rendement[i]),
+                'roi': float(self.roi[i]),
+                'marge': float(self.marge[i]),
+                'nb_recoltes': int(self.nb_recoltes[i]),
+                'rang_benefice': int(rang_benefice[i]),
+                'rang_rendement': int(rang_rendement[i]),
+            }
+            for i in range(len(self))
+        ]
@@ -6,4 +6,5 @@ class AgriAppConfig(AppConfig):
     name = 'agri_app'
 
     def ready(self):
+        import agri_app.checks
         import agri_app.signals
@@ -0,0 +1,197 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Référentiels régionaux des cultures (`RegionalBenchmark`).
+
+- `calculer_referentiels()` agrège, en une seule requête sur l'ensemble des
+  agriculteurs, le rendement par hectare, le coût par hectare et le prix de
+  vente de chaque (culture, zone, saison) ; appelé chaque nuit par la
+  commande `compute_regional_benchmarks` ;
+- `referentiels_pour()` retrouve le référentiel de cultures données en une
+  requête indexée, sans jamais parcourir les données des autres
+  utilisateurs pendant une requête HTTP.
+
+Chaque culture alimente quatre groupes : sa zone et sa saison, sa zone
+toutes saisons, toutes zones pour sa saison, et toutes zones toutes
+saisons. La recherche retient le groupe le plus précis publié. Seules les
+cultures ayant au moins une récolte sont prises en compte.
+"""
+
+import unicodedata
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .analytics import annoter_cultures, _ratio
+from .models import Culture, RegionalBenchmark
+
+
+TOUTES_ZONES = '*'
+TOUTES_SAISONS = 'toutes'
+
+# Saison de plantation selon le mois (calendrier agricole d'Afrique de l'Ouest)
+SAISONS_PAR_MOIS = {
+    1: 'seche', 2: 'seche', 3: 'seche',
+    4: 'grande_pluies', 5: 'grande_pluies', 6: 'grande_pluies', 7: 'grande_pluies',
+    8: 'petite_pluies', 9: 'petite_pluies', 10: 'petite_pluies',
+    11: 'seche', 12: 'seche',
+}
+
+
+def normaliser(texte):
+    """Clé de regroupement : minuscules, sans accents ni espaces superflus."""
+    texte = unicodedata.normalize('NFKD', texte or '')
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return ' '.join(texte.lower().split())
+
+
+def saison_de(jour):
+    return SAISONS_PAR_MOIS[jour.month]
+
+
+def _groupes(nom, zone, saison):
+    """Groupes alimentés par une culture, du plus précis au plus large."""
+    return [
+        (nom, zone, saison),
+        (nom, zone, TOUTES_SAISONS),
+        (nom, TOUTES_ZONES, saison),
+        (nom, TOUTES_ZONES, TOUTES_SAISONS),
+    ]
+
+
+def _arrondi(valeur):
+    return Decimal(str(round(float(valeur), 2)))
+
+
+def calculer_referentiels(min_agriculteurs=None):
+    """
+    Calcule les référentiels de tous les groupes atteignant le seuil.
+
+    Retourne des `RegionalBenchmark` non enregistrés. Un groupe est retenu
+    s'il compte au moins `min_agriculteurs` agriculteurs distincts
+    (`BENCHMARK_MIN_AGRICULTEURS` par défaut).
+    """
+    if min_agriculteurs is None:
+        min_agriculteurs = settings.BENCHMARK_MIN_AGRICULTEURS
+
+    lignes = annoter_cultures(Culture.objects.all()).filter(
+        ind_nb_recoltes__gt=0, superficie__gt=0
+    ).values_list(
+        'utilisateur_id',
+        'nom',
+        'zone_geographique',
+        'date_culture',
+        Cast('superficie', FloatField()),
+        Cast('ind_total_recolte', FloatField()),
+        Cast(F('cout_achat_semences') + F('cout_main_oeuvre') + F('ind_depenses_associees'), FloatField()),
+        Cast('ind_revenus', FloatField()),
+    ).order_by()
+
+    utilisateurs, superficie, recolte, couts, revenus = [], [], [], [], []
+    membres = {}
+    libelles = {}
+    for index, (user_id, nom, zone, jour, *valeurs) in enumerate(lignes.iterator(chunk_size=2000)):
+        utilisateurs.append(user_id)
+        superficie.append(valeurs[0])
+        recolte.append(valeurs[1])
+        couts.append(valeurs[2])
+        revenus.append(valeurs[3])
+        cle_nom = normaliser(nom)
+        libelles.setdefault(cle_nom, nom.strip())
+        for groupe in _groupes(cle_nom, normaliser(zone), saison_de(jour)):
+            membres.setdefault(groupe, []).append(index)
+
+    if not membres:
+        return []
+
+    utilisateurs = np.asarray(utilisateurs, dtype=np.int64)
+    recolte = np.asarray(recolte, dtype=np.float64)
+    revenus = np.asarray(revenus, dtype=np.float64)
+    rendement = _ratio(recolte, superficie)
+    cout_hectare = _ratio(couts, superficie)
+
+    maintenant = timezone.now()
+    referentiels = []
+    for (nom, zone, saison), indices in membres.items():
+        indices = np.asarray(indices, dtype=np.int64)
+        nb_agriculteurs = np.unique(utilisateurs[indices]).size
+        if nb_agriculteurs < min_agriculteurs:
+            continue
+        quantite = recolte[indices].sum()
+        referentiels.append(RegionalBenchmark(
+            culture_nom=nom,
+            libelle=libelles[nom],
+            zone=zone,
+            saison=saison,
+            nb_agriculteurs=nb_agriculteurs,
+            nb_cultures=indices.size,
+            rendement_moyen=_arrondi(rendement[indices].mean()),
+            rendement_median=_arrondi(np.median(rendement[indices])),
+            cout_par_hectare=_arrondi(cout_hectare[indices].mean()),
+            # Prix moyen pondéré par les quantités : revenus totaux / quantité totale
+            prix_vente_moyen=_arrondi(revenus[indices].sum() / quantite if quantite > 0 else 0),
+            date_calcul=maintenant,
+        ))
+    return referentiels
+
+
+def publier_referentiels(referentiels):
+    """Remplace la table des référentiels (une seule transaction)."""
+    with transaction.atomic():
+        RegionalBenchmark.objects.all().delete()
+        RegionalBenchmark.objects.bulk_create(referentiels, batch_size=500)
+    return len(referentiels)
+
+
+def generation():
+    """Date du dernier calcul : invalide les réponses mises en cache qui en dépendent."""
+    derniere = RegionalBenchmark.objects.order_by('-date_calcul').values_list('date_calcul', flat=True).first()
+    return derniere.isoformat() if derniere else ''
+
+
+def _serialiser(referentiel):
+    return {
+        'culture': referentiel.libelle,
+        'zone': referentiel.zone,
+        'saison': referentiel.saison,
+        'portee': 'nationale' if referentiel.zone == TOUTES_ZONES else 'zone',
+        'nb_agriculteurs': referentiel.nb_agriculteurs,
+        'rendement_moyen': float(referentiel.rendement_moyen),
+        'rendement_median': float(referentiel.rendement_median),
+        'cout_par_hectare': float(referentiel.cout_par_hectare),
+        'prix_vente_moyen': float(referentiel.prix_vente_moyen),
+    }
+
+
+def referentiels_pour(cultures):
+    """
+    Référentiel le plus précis de chaque culture, en une requête indexée.
+
+    `cultures` : tuples `(cle, nom, zone, date_culture)` ; `date_culture`
+    peut être None (toutes saisons). Retourne {cle: dict} ; les cultures
+    sans référentiel publié sont absentes.
+    """
+    candidats = {}
+    for cle, nom, zone, jour in cultures:
+        saison = saison_de(jour) if jour else TOUTES_SAISONS
+        candidats[cle] = _groupes(normaliser(nom), normaliser(zone), saison)
+    if not candidats:
+        return {}
+
+    noms = {groupes[0][0] for groupes in candidats.values()}
+    zones = {groupes[0][1] for groupes in candidats.values()} | {TOUTES_ZONES}
+    trouves = {
+        (r.culture_nom, r.zone, r.saison): r
+        for r in RegionalBenchmark.objects.filter(culture_nom__in=noms, zone__in=zones)
+    }
+
+    resultats = {}
+    for cle, groupes in candidats.items():
+        referentiel = next((trouves[g] for g in groupes if g in trouves), None)
+        if referentiel is not None:
+            resultats[cle] = _serialiser(referentiel)
+    return resultats
@@ -0,0 +1,109 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Tampon d'écriture groupée pour les tables alimentées en continu.
+
+Plutôt qu'un `objects.create()` par événement (une transaction et un verrou
+d'écriture SQLite à chaque fois), les instances sont accumulées puis
+insérées par lots avec `bulk_create`.
+"""
+
+import threading
+import time
+
+
+class BulkWriteBuffer:
+    """
+    Accumule des instances non sauvegardées d'un modèle et les insère par lots.
+
+    Le tampon est vidé quand il atteint `max_size` éléments, ou par
+    `flush_if_due()` quand le plus ancien élément attend depuis plus de
+    `flush_interval` secondes. La mémoire reste bornée : si l'insertion
+    échoue, le lot est abandonné (compté dans `failed_rows`) plutôt que
+    conservé indéfiniment.
+
+    Les champs `auto_now_add` reçoivent l'heure de l'insertion, soit au plus
+    `flush_interval` secondes après l'événement.
+    """
+
+    def __init__(self, model, max_size=100, flush_interval=5.0):
+        self.model = model
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._items = []
+        # Lot en cours d'insertion (ni dans le tampon ni encore visible en base)
+        self._in_flight = []
+        self._oldest_at = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.stats = {
+            'flushes': 0,
+            'rows_written': 0,
+            'failed_rows': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+        }
+
+    def add(self, obj):
+        with self._lock:
+            if not self._items:
+                self._oldest_at = time.monotonic()
+            self._items.append(obj)
+            full = len(self._items) >= self.max_size
+        if full:
+            self.flush()
+
+    def flush_if_due(self):
+        with self._lock:
+            due = bool(self._items) and time.monotonic() - self._oldest_at >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Insère immédiatement tout le contenu du tampon. Retourne le nb de lignes écrites."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._items = self._items, []
+                self._in_flight = batch
+                self._oldest_at = None
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                self.model.objects.bulk_create(batch, batch_size=self.max_size)
+            except Exception as e:
+                self.stats['failed_rows'] += len(batch)
+                print(f"Erreur écriture groupée {self.model.__name__} ({len(batch)} lignes): {e}")
+                return 0
+            finally:
+                with self._lock:
+                    self._in_flight = []
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.stats['flushes'] += 1
+                self.stats['last_flush_ms'] = round(elapsed_ms, 3)
+                self.stats['max_flush_ms'] = round(max(self.stats['max_flush_ms'], elapsed_ms), 3)
+                self.stats['total_flush_ms'] += elapsed_ms
+
+            self.stats['rows_written'] += len(batch)
+            return len(batch)
+
+    def last_pending(self, predicate):
+        """Dernière instance non encore écrite en base qui vérifie `predicate`, ou None."""
+        with self._lock:
+            for obj in reversed(self._in_flight + self._items):
+                if predicate(obj):
+                    return obj
+        return None
+
+    def __len__(self):
+        return len(self._items)
+
+    def get_stats(self):
+        flushes = self.stats['flushes']
+        return {
+            **self.stats,
+            'total_flush_ms': round(self.stats['total_flush_ms'], 3),
+            'avg_flush_ms': round(self.stats['total_flush_ms'] / flushes, 3) if flushes else 0.0,
+            'pending': len(self._items),
+        }
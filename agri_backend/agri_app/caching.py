@@ -0,0 +1,73 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Cache mémoire local au processus, avec éviction LRU et expiration (TTL).
+"""
+
+import threading
+import time
+
+import cachetools
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Dictionnaire borné et thread-safe (`cachetools.TTLCache` protégé par un verrou).
+
+    - au-delà de `maxsize` entrées, la moins récemment utilisée est évincée ;
+    - une entrée plus ancienne que `ttl` secondes est considérée absente.
+
+    Les compteurs `hits` / `misses` permettent de mesurer l'efficacité du cache.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = cachetools.TTLCache(maxsize=maxsize, ttl=ttl, timer=timer)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            # Les entrées expirées ne sont retirées qu'à la prochaine écriture
+            self._data.expire()
+            return len(self._data)
+
+    @property
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'size': len(self),
+            'maxsize': self.maxsize,
+        }
@@ -0,0 +1,30 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Vérifications de configuration (`python manage.py check`, lancées aussi au
+démarrage du serveur).
+"""
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+# Caches sans `incr` atomique partagé entre processus (voir `agri_app.ai_quotas`)
+CACHES_NON_PRIS_EN_CHARGE = ('.LocMemCache', '.DatabaseCache', '.FileBasedCache', '.DummyCache')
+
+
+@register(Tags.caches)
+def verifier_cache_quotas(app_configs, **kwargs):
+    """Les quotas IA (`ai_quotas`) supposent un cache commun à `incr` atomique (Redis, Memcached)."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if settings.AI_QUOTA_ENABLED and backend.endswith(CACHES_NON_PRIS_EN_CHARGE):
+        return [Error(
+            f"Les quotas IA sont activés avec le cache {backend.rsplit('.', 1)[-1]}, qui n'est pas "
+            "pris en charge : les compteurs ne sont pas partagés entre workers ou pas mis à jour "
+            "de façon atomique.",
+            hint="Configurer un cache Redis ou Memcached (CACHE_BACKEND, par exemple "
+                 "django.core.cache.backends.redis.RedisCache), ou désactiver AI_QUOTA_ENABLED. "
+                 "Avec LocMemCache et un seul processus, ajouter 'agri_app.E001' à "
+                 "SILENCED_SYSTEM_CHECKS.",
+            id='agri_app.E001',
+        )]
+    return []
@@ -0,0 +1,324 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Serveur local imitant l'API chat completions (compatible OpenAI / Groq).
+
+Sert aux tests de charge et au développement hors ligne, sans appel réseau
+externe ni clé : chaque requête est retenue selon une loi de latence, puis
+reçoit une réponse au format OpenAI (complète, ou en flux SSE, fragment par
+fragment, si `stream` est demandé). Bibliothèque standard uniquement.
+
+    serveur = FakeLLMServer(latence='lognormal:0.8:0.4').demarrer()
+    # GROQ_BASE_URL = serveur.base_url
+    serveur.arreter()
+
+Options :
+- `latence` : secondes, ou loi (voir `loi_latence`) ; `latences` : loi par
+  modèle ;
+- `delai_token` : pause entre deux fragments d'une réponse en flux ;
+- `erreurs` : code HTTP renvoyé systématiquement par certains modèles ;
+- `taux_429` : proportion de requêtes refusées par une 429 (quota), avec
+  l'en-tête `Retry-After: retry_after` si indiqué ;
+- les demandes de rapport (prompt de `GroqService.generate_full_report`)
+  reçoivent un rapport JSON valide (`RAPPORT_PAR_DEFAUT`).
+
+    FakeLLMServer(latences={'openai/gpt-oss-20b': 30}, erreurs={'openai/gpt-oss-120b': 503})
+
+Les compteurs (`stats`) indiquent notamment le nombre maximal de requêtes
+traitées simultanément, les requêtes reçues par modèle, les connexions
+acceptées et les 429 émises.
+"""
+
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+REPONSE_PAR_DEFAUT = (
+    "Voici mon analyse de votre exploitation : vos cultures progressent bien. "
+    "Surveillez vos dépenses d'engrais et comparez vos rendements à la moyenne régionale."
+)
+
+RAPPORT_PAR_DEFAUT = {
+    "titre": "Rapport de test : une saison prometteuse",
+    "analyse_complete": (
+        "## Situation générale\n\nVos revenus couvrent vos dépenses et vos rendements "
+        "progressent.\n\n## Points d'attention\n\nLes coûts d'engrais augmentent plus vite "
+        "que les ventes."
+    ),
+    "propositions_amelioration": (
+        "- Grouper les achats d'engrais avec d'autres producteurs\n"
+        "- Étaler les ventes pour profiter des meilleurs prix\n"
+        "- Suivre le rendement par parcelle"
+    ),
+    "points_progression": "Le bénéfice net progresse par rapport au rapport précédent.",
+    "donnees_graphiques": {
+        "evolution_financiere": [
+            {"label": "Jan", "revenus": 120000, "depenses": 80000},
+            {"label": "Fév", "revenus": 95000, "depenses": 70000},
+            {"label": "Mar", "revenus": 140000, "depenses": 90000},
+        ],
+        "repartition_depenses": [
+            {"name": "Semences", "value": 45000},
+            {"name": "Engrais", "value": 60000},
+            {"name": "Main d'oeuvre", "value": 75000},
+        ],
+        "performance_cultures": [
+            {"nom": "Maïs", "rendement": 2.4, "moyenne_regionale": None},
+        ],
+    },
+}
+
+
+def loi_latence(spec, generateur=None):
+    """
+    Fonction sans argument retournant une latence (secondes, jamais négative).
+
+    `spec` : un nombre (latence constante) ou une chaîne parmi `'0.5'`,
+    `'uniform:MIN:MAX'`, `'normal:MOYENNE:ECART'`,
+    `'lognormal:MEDIANE:SIGMA'` (queue longue, la plus réaliste) et
+    `'exp:MOYENNE'`. Lève `ValueError` si la loi est inconnue.
+    """
+    generateur = generateur or random.Random()
+    if isinstance(spec, (int, float)):
+        valeur = float(spec)
+        return lambda: valeur
+    nom, *parametres = str(spec).split(':')
+    try:
+        parametres = [float(p) for p in parametres]
+        if not parametres:
+            valeur = float(nom)
+            return lambda: valeur
+        if nom == 'uniform' and len(parametres) == 2:
+            return lambda: generateur.uniform(*parametres)
+        if nom == 'normal' and len(parametres) == 2:
+            return lambda: generateur.gauss(*parametres)
+        if nom == 'lognormal' and len(parametres) == 2:
+            mediane, sigma = parametres
+            return lambda: mediane * generateur.lognormvariate(0.0, sigma)
+        if nom == 'exp' and len(parametres) == 1 and parametres[0] > 0:
+            return lambda: generateur.expovariate(1 / parametres[0])
+    except ValueError:
+        pass
+    raise ValueError(f"Loi de latence inconnue : {spec!r}")
+
+
+def _demande_rapport(requete):
+    """Vrai pour le prompt du rapport complet (structure JSON attendue)."""
+    return any('"analyse_complete"' in str(m.get('content', '')) for m in requete.get('messages', []))
+
+
+class _Serveur(ThreadingHTTPServer):
+    daemon_threads = True
+    # File d'attente des connexions : les tests de charge en ouvrent beaucoup à la fois
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Un client qui abandonne sa requête (délai, requête parallèle annulée) n'est pas une erreur
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.fake.ouvrir_connexion()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _repondre_json(self, code, corps, entetes=None):
+        contenu = json.dumps(corps).encode('utf-8')
+        self.send_response(code)
+        for nom, valeur in (entetes or {}).items():
+            self.send_header(nom, valeur)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(contenu)))
+        self.end_headers()
+        self.wfile.write(contenu)
+
+    def _repondre_erreur(self, code, retry_after=None):
+        entetes = {'Retry-After': str(retry_after)} if code == 429 and retry_after else None
+        self._repondre_json(code, {'error': {'message': f'Erreur simulée {code}', 'type': 'fake_error'}}, entetes)
+
+    def do_POST(self):
+        fake = self.server.fake
+        longueur = int(self.headers.get('Content-Length') or 0)
+        try:
+            requete = json.loads(self.rfile.read(longueur) or b'{}')
+        except ValueError:
+            requete = {}
+
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._repondre_json(404, {'error': {'message': 'Not found'}})
+            return
+
+        modele = requete.get('model', 'fake-model')
+        fake.entrer(modele)
+        try:
+            # Quota dépassé : refus immédiat, comme l'API réelle
+            if fake.tirer_429():
+                self._repondre_erreur(429, fake.retry_after)
+                return
+            time.sleep(fake.latence_pour(modele))
+            texte = json.dumps(fake.rapport, ensure_ascii=False) if _demande_rapport(requete) else fake.reponse
+            if modele in fake.erreurs:
+                self._repondre_erreur(fake.erreurs[modele], fake.retry_after)
+            elif requete.get('stream'):
+                self._repondre_flux(modele, texte, fake.delai_token, _tokens_prompt(requete))
+            else:
+                self._repondre_json(200, _completion(modele, texte, _tokens_prompt(requete)))
+        finally:
+            fake.sortir()
+
+    def _repondre_flux(self, modele, texte, delai_token=0.0, tokens_prompt=0):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        identifiant = f'chatcmpl-{uuid.uuid4().hex[:12]}'
+        for index, mot in enumerate(texte.split(' ')):
+            if index and delai_token:
+                time.sleep(delai_token)
+            # Comme les tokens réels, l'espace précède le mot : le texte reconstitué est identique
+            self._ecrire_morceau(_fragment(identifiant, modele, (' ' if index else '') + mot))
+        # Comme l'API Groq : l'usage accompagne le dernier fragment (`x_groq.usage`)
+        self._ecrire_morceau(_fragment(identifiant, modele, None, fin='stop', usage=_usage(tokens_prompt, texte)))
+        self._ecrire_morceau('data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _ecrire_morceau(self, texte):
+        donnees = texte.encode('utf-8')
+        self.wfile.write(f'{len(donnees):x}\r\n'.encode('ascii') + donnees + b'\r\n')
+        self.wfile.flush()
+
+
+def _tokens_prompt(requete):
+    # Approximation : un token par mot
+    return sum(len(str(m.get('content', '')).split()) for m in requete.get('messages', []))
+
+
+def _usage(tokens_prompt, texte):
+    tokens_reponse = len(texte.split())
+    return {'prompt_tokens': tokens_prompt, 'completion_tokens': tokens_reponse, 'total_tokens': tokens_prompt + tokens_reponse}
+
+
+def _completion(modele, texte, tokens_prompt=0):
+    return {
+        'id': f'chatcmpl-{uuid.uuid4().hex[:12]}',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': modele,
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': texte},
+            'finish_reason': 'stop',
+        }],
+        'usage': _usage(tokens_prompt, texte),
+    }
+
+
+def _fragment(identifiant, modele, texte, fin=None, usage=None):
+    delta = {'content': texte} if texte is not None else {}
+    corps = {
+        'id': identifiant,
+        'object': 'chat.completion.chunk',
+        'created': int(time.time()),
+        'model': modele,
+        'choices': [{'index': 0, 'delta': delta, 'finish_reason': fin}],
+    }
+    if usage:
+        corps['x_groq'] = {'usage': usage}
+    return f'data: {json.dumps(corps)}\n\n'
+
+
+class FakeLLMServer:
+    """Serveur HTTP en arrière-plan (un thread par connexion)."""
+
+    def __init__(self, host='127.0.0.1', port=0, latence=0.5, reponse=REPONSE_PAR_DEFAUT, latences=None,
+                 erreurs=None, retry_after=None, taux_429=0.0, delai_token=0.0, rapport=None, graine=None):
+        self._aleatoire = random.Random(graine)
+        self._loi = loi_latence(latence, self._aleatoire)
+        # modèle -> loi de latence ; modèle -> code HTTP d'erreur
+        self._lois = {modele: loi_latence(spec, self._aleatoire) for modele, spec in (latences or {}).items()}
+        self.erreurs = dict(erreurs or {})
+        self.reponse = reponse
+        self.rapport = rapport or RAPPORT_PAR_DEFAUT
+        self.taux_429 = taux_429
+        # En-tête Retry-After (secondes) des réponses 429
+        self.retry_after = retry_after
+        self.delai_token = delai_token
+        self.erreurs_429 = 0
+        self.requetes = 0
+        # Connexions TCP acceptées : moins que de requêtes si les clients les réutilisent
+        self.connexions = 0
+        self.par_modele = {}
+        self.en_cours = 0
+        self.max_simultanees = 0
+        self._lock = threading.Lock()
+        self._serveur = _Serveur((host, port), _Handler)
+        self._serveur.fake = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._serveur.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def latence_pour(self, modele):
+        with self._lock:
+            return max(0.0, self._lois.get(modele, self._loi)())
+
+    def tirer_429(self):
+        with self._lock:
+            if self.taux_429 and self._aleatoire.random() < self.taux_429:
+                self.erreurs_429 += 1
+                return True
+            return False
+
+    def ouvrir_connexion(self):
+        with self._lock:
+            self.connexions += 1
+
+    def entrer(self, modele=None):
+        with self._lock:
+            self.requetes += 1
+            if modele:
+                self.par_modele[modele] = self.par_modele.get(modele, 0) + 1
+            self.en_cours += 1
+            self.max_simultanees = max(self.max_simultanees, self.en_cours)
+
+    def sortir(self):
+        with self._lock:
+            self.en_cours -= 1
+
+    def demarrer(self):
+        self._thread = threading.Thread(target=self._serveur.serve_forever, name='fake-llm', daemon=True)
+        self._thread.start()
+        return self
+
+    def servir(self):
+        """Sert au premier plan jusqu'à interruption (Ctrl+C)."""
+        self._serveur.serve_forever()
+
+    def arreter(self):
+        self._serveur.shutdown()
+        self._serveur.server_close()
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                'requetes': self.requetes,
+                'connexions': self.connexions,
+                'en_cours': self.en_cours,
+                'max_simultanees': self.max_simultanees,
+                'erreurs_429': self.erreurs_429,
+                'par_modele': dict(self.par_modele),
+            }
@@ -0,0 +1,379 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Pipeline de géolocalisation des utilisateurs en arrière-plan.
+
+Le middleware se contente de déposer le couple (utilisateur, IP) dans une
+file bornée puis rend la main immédiatement. Un thread de fond résout
+l'adresse IP auprès du fournisseur configuré et enregistre les
+`UserLocation`, en dehors du chemin de la requête, par lots (`bulk_create`).
+"""
+
+import atexit
+import os
+import queue
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+from .buffers import BulkWriteBuffer
+from .caching import TTLCache
+
+
+GeoResult = namedtuple('GeoResult', ['latitude', 'longitude', 'city', 'country'])
+
+
+class GeocoderIPProvider:
+    """
+    Fournisseur en ligne basé sur `geocoder.ip()` (IP-API par défaut).
+
+    Effectue un appel HTTP sortant : ne doit jamais être appelé dans le
+    chemin d'une requête.
+    """
+
+    def lookup(self, ip_address):
+        import geocoder
+
+        g = geocoder.ip(ip_address)
+        if not g.ok:
+            return None
+        return GeoResult(g.lat, g.lng, g.city, g.country)
+
+
+class StaticGeoProvider:
+    """
+    Fournisseur factice pour les tests et le développement local.
+
+    Ne fait aucun appel réseau : renvoie le résultat associé à l'IP dans
+    `results`, sinon `default`. Les IP demandées sont conservées dans
+    `lookups` pour pouvoir vérifier les appels.
+    """
+
+    def __init__(self, results=None, default=None):
+        self.results = dict(results or {})
+        self.default = default if default is not None else GeoResult(6.3703, 2.3912, 'Cotonou', 'Benin')
+        self.lookups = []
+
+    def lookup(self, ip_address):
+        self.lookups.append(ip_address)
+        return self.results.get(ip_address, self.default)
+
+
+class LocationDedupCache:
+    """
+    Mémorise la dernière localisation enregistrée pour chaque utilisateur.
+
+    Une recherche pour (user_id, client_ip) est un succès quand l'IP est
+    celle de la dernière localisation connue : ni l'appel au fournisseur ni
+    la lecture de `UserLocation` ne sont alors nécessaires. L'entrée est
+    indexée par utilisateur (et non par couple) pour qu'un retour sur une
+    ancienne IP (A -> B -> A) soit bien détecté comme un changement.
+
+    Le cache local au processus peut être doublé par le cache Django pour
+    partager l'information entre plusieurs workers.
+    """
+
+    key_prefix = 'geoloc:last:'
+
+    def __init__(self, maxsize=10000, ttl=3600, use_django_cache=False):
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.use_django_cache = use_django_cache
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+
+    def is_known(self, user_id, ip_address):
+        entry = self.local.get(user_id)
+        if entry is None and self.use_django_cache:
+            entry = cache.get(f'{self.key_prefix}{user_id}')
+            if entry is not None:
+                self.local.set(user_id, entry)
+                if entry['ip'] == ip_address:
+                    self.shared_hits += 1
+        if entry is not None and entry['ip'] == ip_address:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def remember(self, user_id, ip_address, result):
+        entry = {
+            'ip': ip_address,
+            'city': result.city if result else None,
+            'country': result.country if result else None,
+        }
+        self.local.set(user_id, entry)
+        if self.use_django_cache:
+            cache.set(f'{self.key_prefix}{user_id}', entry, self.ttl)
+
+    def forget(self, user_id):
+        self.local.delete(user_id)
+        if self.use_django_cache:
+            cache.delete(f'{self.key_prefix}{user_id}')
+
+    @property
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared_hits': self.shared_hits,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'size': len(self.local),
+        }
+
+
+class GeolocationPipeline:
+    """
+    File bornée + thread de fond pour la résolution des adresses IP.
+
+    Politique de rejet : lorsque la file est pleine, le nouvel événement est
+    abandonné (compté dans `dropped`). La requête suivante du même
+    utilisateur le soumettra de nouveau, la perte est donc sans conséquence.
+    Un même couple (utilisateur, IP) n'est jamais présent deux fois dans la
+    file : les soumissions en double sont fusionnées (`coalesced`).
+
+    Quand l'IP n'a pas changé depuis la dernière localisation enregistrée
+    (voir `LocationDedupCache`), l'événement est ignoré dès la soumission.
+
+    Les nouvelles localisations passent par un `BulkWriteBuffer`, vidé sur
+    seuil de taille ou de temps, et à l'arrêt du processus (`shutdown`).
+    """
+
+    def __init__(self, provider, maxsize=1000, run_async=True, dedup=None, buffer=None):
+        from .models import UserLocation
+
+        self.provider = provider
+        self.run_async = run_async
+        self.dedup = dedup if dedup is not None else LocationDedupCache()
+        self.buffer = buffer if buffer is not None else BulkWriteBuffer(UserLocation)
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stopping = threading.Event()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self.stats = {
+            'submitted': 0,
+            'coalesced': 0,
+            'dropped': 0,
+            'processed': 0,
+            'saved': 0,
+            'failed': 0,
+        }
+
+    def submit(self, user_id, ip_address):
+        """Dépose un événement sans bloquer. Retourne False s'il a été ignoré."""
+        if self.dedup.is_known(user_id, ip_address):
+            return False
+
+        if not self.run_async:
+            self.process(user_id, ip_address)
+            return True
+
+        key = (user_id, ip_address)
+        with self._lock:
+            if key in self._pending:
+                self.stats['coalesced'] += 1
+                return False
+            try:
+                self._queue.put_nowait(key)
+            except queue.Full:
+                self.stats['dropped'] += 1
+                return False
+            self._pending.add(key)
+            self.stats['submitted'] += 1
+
+        self._ensure_worker()
+        return True
+
+    def _ensure_worker(self):
+        # Le thread ne survit pas à un fork (workers gunicorn) : on le
+        # (re)démarre paresseusement dans chaque processus.
+        pid = os.getpid()
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == pid:
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == pid:
+                return
+            self._worker = threading.Thread(
+                target=self._run,
+                name='geolocation-worker',
+                daemon=True,
+            )
+            self._worker_pid = pid
+            self._worker.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                user_id, ip_address = self._queue.get(timeout=self.buffer.flush_interval)
+            except queue.Empty:
+                self.buffer.flush_if_due()
+                close_old_connections()
+                continue
+            try:
+                self.process(user_id, ip_address)
+                self.buffer.flush_if_due()
+            finally:
+                with self._lock:
+                    self._pending.discard((user_id, ip_address))
+                self._queue.task_done()
+                close_old_connections()
+
+    def shutdown(self, timeout=5.0):
+        """Arrête le worker, traite les événements restants et vide le tampon."""
+        self._stopping.set()
+        worker = self._worker
+        if worker is not None and worker.is_alive() and self._worker_pid == os.getpid():
+            worker.join(timeout)
+        self.drain()
+        self.buffer.flush()
+
+    def drain(self):
+        """Traite de façon synchrone tous les événements en attente."""
+        while True:
+            try:
+                user_id, ip_address = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self.process(user_id, ip_address)
+            finally:
+                with self._lock:
+                    self._pending.discard((user_id, ip_address))
+                self._queue.task_done()
+
+    def _compter(self, nom):
+        # `process` s'exécute dans le worker et, en mode synchrone, dans les threads des requêtes
+        with self._lock:
+            self.stats[nom] += 1
+
+    def process(self, user_id, ip_address):
+        """Résout l'IP et enregistre une nouvelle localisation si elle a changé."""
+        from .models import UserLocation
+
+        try:
+            result = self.provider.lookup(ip_address)
+            self._compter('processed')
+            if result is None:
+                # IP non résolue (réseau local...) : inutile de réessayer à chaque requête
+                self.dedup.remember(user_id, ip_address, None)
+                return False
+
+            # Vérifier la dernière localisation de l'utilisateur : d'abord celles
+            # encore dans le tampon (A -> B -> A avant l'écriture), puis la base.
+            last_location = self.buffer.last_pending(lambda loc: loc.utilisateur_id == user_id)
+            if last_location is None:
+                last_location = UserLocation.objects.filter(
+                    utilisateur_id=user_id
+                ).first()  # Ordonné par -timestamp par défaut dans Meta
+
+            # On considère que c'est la même si ville, pays et IP sont identiques
+            if (last_location and
+                    last_location.city == result.city and
+                    last_location.country == result.country and
+                    last_location.ip_address == ip_address):
+                self.dedup.remember(user_id, ip_address, result)
+                return False
+
+            self.buffer.add(UserLocation(
+                utilisateur_id=user_id,
+                ip_address=ip_address,
+                latitude=result.latitude,
+                longitude=result.longitude,
+                city=result.city,
+                country=result.country
+            ))
+            if not self.run_async:
+                self.buffer.flush()
+            self.dedup.remember(user_id, ip_address, result)
+            self._compter('saved')
+            return True
+        except Exception as e:
+            self._compter('failed')
+            print(f"Erreur géolocalisation ({ip_address}): {e}")
+            return False
+
+    @property
+    def queue_size(self):
+        return self._queue.qsize()
+
+    def get_stats(self):
+        """Compteurs du pipeline et du cache de déduplication (par processus)."""
+        with self._lock:
+            compteurs = dict(self.stats)
+        return {
+            **compteurs,
+            'queue_size': self.queue_size,
+            'dedup_cache': self.dedup.stats,
+            'write_buffer': self.buffer.get_stats(),
+        }
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def _build_dedup_cache():
+    return LocationDedupCache(
+        maxsize=settings.GEOLOCATION_DEDUP_MAXSIZE,
+        ttl=settings.GEOLOCATION_DEDUP_TTL,
+        use_django_cache=settings.GEOLOCATION_DEDUP_SHARED,
+    )
+
+
+def _build_write_buffer():
+    from .models import UserLocation
+
+    return BulkWriteBuffer(
+        UserLocation,
+        max_size=settings.GEOLOCATION_WRITE_BATCH_SIZE,
+        flush_interval=settings.GEOLOCATION_WRITE_FLUSH_INTERVAL,
+    )
+
+
+def get_pipeline():
+    """Retourne le pipeline du processus, construit à partir des settings."""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                provider_class = import_string(settings.GEOLOCATION_PROVIDER)
+                _pipeline = GeolocationPipeline(
+                    provider=provider_class(),
+                    maxsize=settings.GEOLOCATION_QUEUE_SIZE,
+                    run_async=settings.GEOLOCATION_ASYNC,
+                    dedup=_build_dedup_cache(),
+                    buffer=_build_write_buffer(),
+                )
+    return _pipeline
+
+
+@atexit.register
+def _flush_on_exit():
+    # Arrêt d'un worker gunicorn : ne pas perdre les localisations en attente
+    if _pipeline is not None:
+        _pipeline.shutdown()
+
+
+def reset_pipeline(provider=None, **kwargs):
+    """
+    Remplace le pipeline du processus (tests, shell).
+
+    Exemple : `reset_pipeline(StaticGeoProvider(), run_async=False)`.
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if provider is None:
+            _pipeline = None
+        else:
+            kwargs.setdefault('maxsize', settings.GEOLOCATION_QUEUE_SIZE)
+            kwargs.setdefault('dedup', _build_dedup_cache())
+            kwargs.setdefault('buffer', _build_write_buffer())
+            _pipeline = GeolocationPipeline(provider=provider, **kwargs)
+    return _pipeline
@@ -0,0 +1,280 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Base locale de correspondance plages IP -> localisation.
+
+Le fichier d'index est un binaire compact (construit par la commande
+`build_ip_index` à partir d'un export CSV) :
+
+    en-tête  : magic 'AGIP', version, nb de plages, taille de la table JSON
+    starts   : uint32[nb_plages]  début de plage (trié)
+    ends     : uint32[nb_plages]  fin de plage (incluse)
+    loc_ids  : uint32[nb_plages]  indice dans la table des localisations
+    locations: JSON [[lat, lng, ville, pays], ...]
+
+Les colonnes sont lues directement dans le fichier mappé en mémoire (mmap)
+et parcourues par recherche dichotomique : aucune copie, aucun appel réseau.
+Seules les adresses IPv4 sont couvertes.
+"""
+
+import bisect
+import csv
+import ipaddress
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+
+from .geolocation import GeoResult
+
+
+MAGIC = b'AGIP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')  # magic, version, réservé, nb plages, taille JSON
+
+CSV_FIELDS = ['ip_start', 'ip_end', 'country', 'city', 'latitude', 'longitude']
+
+
+class IPDatabaseError(Exception):
+    """Fichier d'index absent, corrompu ou de version inconnue."""
+
+
+def ip_to_int(ip_address):
+    """
+    Convertit une IPv4 (texte ou entier) en entier ; None pour une IPv6.
+
+    Lève `ValueError` pour une adresse invalide ou un entier hors de
+    l'intervalle IPv4 (0 à 0xFFFFFFFF), qui ne tiendrait pas dans l'index.
+    """
+    if isinstance(ip_address, int):
+        value = ip_address
+    else:
+        value = str(ip_address).strip()
+        if not value.isdigit():
+            address = ipaddress.ip_address(value)
+            return int(address) if address.version == 4 else None
+        value = int(value)
+    if not 0 <= value <= 0xFFFFFFFF:
+        raise ValueError(f"Entier hors de l'intervalle IPv4 : {value}")
+    return value
+
+
+def _swapped(view):
+    column = array('I', view)
+    column.byteswap()
+    view.release()
+    return column
+
+
+class IPRangeDatabase:
+    """Index de plages IPv4 mappé en mémoire, interrogé par dichotomie."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise IPDatabaseError(f"Index IP vide : {self.path}")
+
+        if len(self._mmap) < HEADER.size:
+            self.close()
+            raise IPDatabaseError(f"Index IP tronqué : {self.path}")
+        magic, version, _, count, locations_size = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise IPDatabaseError(f"Format d'index IP inconnu : {self.path}")
+
+        column_size = count * 4
+        expected = HEADER.size + 3 * column_size + locations_size
+        if len(self._mmap) != expected:
+            self.close()
+            raise IPDatabaseError(f"Index IP corrompu : {self.path}")
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+        self._starts = view[offset:offset + column_size].cast('I')
+        offset += column_size
+        self._ends = view[offset:offset + column_size].cast('I')
+        offset += column_size
+        self._loc_ids = view[offset:offset + column_size].cast('I')
+        offset += column_size
+        if sys.byteorder != 'little':
+            # Le fichier est en little-endian : copie convertie sur les
+            # architectures big-endian (cas marginal, sans mmap direct).
+            self._starts, self._ends, self._loc_ids = (
+                _swapped(self._starts), _swapped(self._ends), _swapped(self._loc_ids)
+            )
+        self._locations = [
+            GeoResult(*location)
+            for location in json.loads(bytes(view[offset:offset + locations_size]).decode('utf-8'))
+        ]
+        self.count = count
+        self.mtime = os.path.getmtime(self.path)
+
+    def lookup(self, ip_address):
+        """Retourne la `GeoResult` couvrant l'adresse, ou None."""
+        try:
+            value = ip_to_int(ip_address)
+        except ValueError:
+            return None
+        if value is None:
+            return None
+        index = bisect.bisect_right(self._starts, value) - 1
+        if index < 0 or value > self._ends[index]:
+            return None
+        return self._locations[self._loc_ids[index]]
+
+    def close(self):
+        for column in ('_starts', '_ends', '_loc_ids'):
+            view = getattr(self, column, None)
+            if isinstance(view, memoryview):
+                view.release()
+        if getattr(self, '_mmap', None) is not None:
+            self._mmap.close()
+        self._file.close()
+
+
+def read_csv_ranges(source):
+    """
+    Lit un export CSV `ip_start,ip_end,country,city,latitude,longitude`.
+
+    L'en-tête est facultatif ; les adresses peuvent être en notation
+    pointée ou entières. Les lignes IPv6 ou invalides sont ignorées.
+    Retourne (plages, nb_lignes_ignorées).
+    """
+    ranges = []
+    skipped = 0
+    reader = csv.reader(source)
+    for row in reader:
+        if not row or row[0].strip().lower() == CSV_FIELDS[0]:
+            continue
+        try:
+            start = ip_to_int(row[0])
+            end = ip_to_int(row[1])
+            if start is None or end is None or end < start:
+                skipped += 1
+                continue
+            country = row[2].strip() or None
+            city = (row[3].strip() or None) if len(row) > 3 else None
+            latitude = float(row[4]) if len(row) > 4 and row[4].strip() else None
+            longitude = float(row[5]) if len(row) > 5 and row[5].strip() else None
+        except (ValueError, IndexError):
+            skipped += 1
+            continue
+        ranges.append((start, end, (latitude, longitude, city, country)))
+    return ranges, skipped
+
+
+def write_index(ranges, path):
+    """
+    Écrit l'index binaire de façon atomique (fichier temporaire + rename),
+    pour que les workers en cours puissent le recharger sans lire un
+    fichier partiel. Les plages qui chevauchent la précédente sont ignorées.
+    Retourne (nb_plages_écrites, nb_chevauchements).
+    """
+    ranges = sorted(ranges, key=lambda item: (item[0], item[1]))
+    starts, ends, loc_ids = array('I'), array('I'), array('I')
+    locations = []
+    location_ids = {}
+    overlaps = 0
+
+    for start, end, location in ranges:
+        if ends and start <= ends[-1]:
+            overlaps += 1
+            continue
+        location_id = location_ids.get(location)
+        if location_id is None:
+            location_id = location_ids[location] = len(locations)
+            locations.append(list(location))
+        starts.append(start)
+        ends.append(end)
+        loc_ids.append(location_id)
+
+    if sys.byteorder != 'little':
+        for column in (starts, ends, loc_ids):
+            column.byteswap()
+
+    locations_blob = json.dumps(locations, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            output.write(HEADER.pack(MAGIC, VERSION, 0, len(starts), len(locations_blob)))
+            starts.tofile(output)
+            ends.tofile(output)
+            loc_ids.tofile(output)
+            output.write(locations_blob)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return len(starts), overlaps
+
+
+class OfflineIPProvider:
+    """
+    Fournisseur de géolocalisation basé sur l'index local.
+
+    Si l'adresse n'est pas couverte (ou si l'index est absent), la
+    recherche est déléguée au fournisseur de repli configuré
+    (`GEOLOCATION_FALLBACK_PROVIDER`, le fournisseur en ligne par défaut).
+    L'index est rechargé automatiquement lorsqu'il est reconstruit.
+    """
+
+    # Intervalle minimal (en secondes) entre deux vérifications du fichier
+    reload_interval = 60
+
+    def __init__(self, path=None, fallback=None):
+        from django.conf import settings
+        from django.utils.module_loading import import_string
+
+        self.path = str(path or settings.GEOLOCATION_IP_DATABASE)
+        if fallback is None and settings.GEOLOCATION_FALLBACK_PROVIDER:
+            fallback = import_string(settings.GEOLOCATION_FALLBACK_PROVIDER)()
+        self.fallback = fallback
+        self._database = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'fallbacks': 0}
+
+    def _get_database(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return self._database
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return self._database
+            if self._database is None or mtime != self._database.mtime:
+                try:
+                    database = IPRangeDatabase(self.path)
+                except (OSError, IPDatabaseError) as e:
+                    print(f"Erreur chargement index IP : {e}")
+                    return self._database
+                # L'ancien index n'est pas fermé explicitement : une
+                # recherche concurrente peut encore l'utiliser.
+                self._database = database
+            return self._database
+
+    def lookup(self, ip_address):
+        database = self._get_database()
+        if database is not None:
+            result = database.lookup(ip_address)
+            if result is not None:
+                self.stats['hits'] += 1
+                return result
+        self.stats['misses'] += 1
+        if self.fallback is None:
+            return None
+        self.stats['fallbacks'] += 1
+        return self.fallback.lookup(ip_address)
@@ -0,0 +1,285 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Test de charge des endpoints IA contre un faux LLM local.
+
+Démarre `agri_app.fake_llm.FakeLLMServer` (ou utilise `--base-url`), puis
+envoie `--requests` requêtes à chaque endpoint choisi (`--endpoint`,
+répétable), dont `--concurrency` simultanées, réparties entre les
+utilisateurs `--user` (répétable) :
+
+- `chatbot`, `chatbot-stream`, `rapport` : vues synchrones, un thread par
+  requête simultanée, comme un serveur WSGI multi-thread ;
+- `chatbot-async`, `chatbot-stream-async`, `rapport-async` : vues
+  asynchrones, depuis une seule boucle asyncio de ce processus, comme un
+  worker ASGI.
+
+Pour chaque endpoint : débit, latences p50 / p95 / p99 (et délai du premier
+fragment pour le flux), erreurs, requêtes SQL (total et par requête) et
+activité du faux LLM. Aucun appel à l'API Groq n'est effectué.
+
+Le cache des réponses est désactivé pour ces requêtes (`"cache": false`) :
+chaque requête appelle le modèle. Les quotas par plan d'abonnement ne
+s'appliquent qu'avec `--quotas`. Les conversations et rapports créés
+pendant le test sont supprimés à la fin (sauf avec `--keep`).
+
+Usage :
+    python manage.py benchmark_ai --user demo
+    python manage.py benchmark_ai --user demo --user demo2 --concurrency 100 --latency lognormal:0.8:0.5
+    python manage.py benchmark_ai --user demo --endpoint chatbot --endpoint chatbot-async --requests 50
+    python manage.py benchmark_ai --user demo --endpoint chatbot-stream --token-delay 0.02
+    python manage.py benchmark_ai --user demo --endpoint chatbot-stream-async --token-delay 0.02
+    python manage.py benchmark_ai --user demo --endpoint rapport-async --rate-429 0.2 --retry-after 1
+    python manage.py benchmark_ai --user demo --endpoint chatbot-async --quotas
+"""
+
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from agri_app.fake_llm import FakeLLMServer, loi_latence
+from agri_app.models import Conversation, RapportIA, Utilisateur
+
+
+def _question(i):
+    return {'message': f'Question de test {i}', 'cache': False}
+
+
+# endpoint -> (URL, vue asynchrone, corps de la requête n° i)
+ENDPOINTS = {
+    'chatbot': ('/api/chatbot/', False, _question),
+    'chatbot-stream': ('/api/chatbot/stream/', False, _question),
+    'chatbot-async': ('/api/chatbot/async/', True, _question),
+    'chatbot-stream-async': ('/api/chatbot/stream/async/', True, _question),
+    'rapport': ('/api/rapports/generer/', False, lambda i: {}),
+    'rapport-async': ('/api/rapports/generer/async/', True, lambda i: {}),
+}
+
+
+def _percentile(valeurs, p):
+    valeurs = sorted(valeurs)
+    if not valeurs:
+        return 0.0
+    return valeurs[min(len(valeurs) - 1, int(round(p / 100 * (len(valeurs) - 1))))]
+
+
+class CompteurRequetes:
+    """Compte les requêtes SQL de toutes les connexions, tous threads confondus."""
+
+    def __init__(self):
+        self.total = 0
+        self._lock = threading.Lock()
+        self._connexions = []
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.total += 1
+        return execute(sql, params, many, context)
+
+    def _brancher(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+            self._connexions.append(connection)
+
+    def __enter__(self):
+        # Connexions ouvertes pendant le test (threads des vues) et celles du thread courant
+        connection_created.connect(self._brancher)
+        for connection in connections.all():
+            self._brancher(connection)
+        return self
+
+    def __exit__(self, *exc):
+        connection_created.disconnect(self._brancher)
+        for connection in self._connexions:
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+
+
+class Resultats:
+    """Mesures d'un endpoint (thread-safe)."""
+
+    def __init__(self):
+        self.latences = []
+        self.premiers_fragments = []
+        self.erreurs = []
+        self._lock = threading.Lock()
+
+    def ajouter(self, latence, code, premier_fragment=None):
+        with self._lock:
+            self.latences.append(latence)
+            if premier_fragment is not None:
+                self.premiers_fragments.append(premier_fragment)
+            if code != 200:
+                self.erreurs.append(code)
+
+
+class Command(BaseCommand):
+    help = "Mesure débit, latences et requêtes SQL des endpoints IA contre un faux LLM local."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', required=True,
+                            help="Nom d'utilisateur (ou id) ; répéter l'option pour répartir la charge")
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS),
+                            help="Endpoint à mesurer (chatbot-async par défaut) ; option répétable")
+        parser.add_argument('--requests', type=int, default=100, help="Nombre de requêtes par endpoint")
+        parser.add_argument('--concurrency', type=int, default=50, help="Requêtes simultanées au plus")
+        parser.add_argument('--latency', default='0.5',
+                            help="Latence du faux LLM : secondes ou loi (uniform:0.2:1, normal:0.8:0.2, "
+                                 "lognormal:0.8:0.5, exp:0.8)")
+        parser.add_argument('--token-delay', type=float, default=0.0, help="Pause entre deux fragments du flux (secondes)")
+        parser.add_argument('--rate-429', type=float, default=0.0, help="Proportion de réponses 429 du faux LLM")
+        parser.add_argument('--retry-after', type=int, help="En-tête Retry-After des réponses 429 (secondes)")
+        parser.add_argument('--seed', type=int, help="Graine des tirages aléatoires du faux LLM")
+        parser.add_argument('--base-url', help="Faux LLM déjà lancé (ex. http://127.0.0.1:8001/v1)")
+        parser.add_argument('--quotas', action='store_true', help="Appliquer les quotas des plans d'abonnement")
+        parser.add_argument('--keep', action='store_true', help="Conserver les conversations et rapports créés")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--requests et --concurrency doivent être au moins égaux à 1.")
+        try:
+            loi_latence(options['latency'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        utilisateurs = [self._utilisateur(valeur) for valeur in options['user']]
+        cles = [Token.objects.get_or_create(user=user)[0].key for user in utilisateurs]
+        debut_test = timezone.now()
+
+        serveur = None
+        base_url = options['base_url']
+        if not base_url:
+            serveur = FakeLLMServer(
+                latence=options['latency'], delai_token=options['token_delay'], taux_429=options['rate_429'],
+                retry_after=options['retry_after'], graine=options['seed'],
+            ).demarrer()
+            base_url = serveur.base_url
+
+        try:
+            with override_settings(GROQ_API_KEY='fake', GROQ_BASE_URL=base_url, AI_QUOTA_ENABLED=options['quotas']):
+                for endpoint in options['endpoint'] or ['chatbot-async']:
+                    url, asynchrone, corps = ENDPOINTS[endpoint]
+                    avant = serveur.stats if serveur else None
+                    with CompteurRequetes() as compteur:
+                        if asynchrone:
+                            duree, resultats = asyncio.run(self._charge_async(
+                                url, corps, cles, options['requests'], options['concurrency'],
+                                flux=endpoint == 'chatbot-stream-async',
+                            ))
+                        else:
+                            duree, resultats = self._charge_threads(
+                                url, corps, cles, options['requests'], options['concurrency'],
+                                flux=endpoint == 'chatbot-stream',
+                            )
+                    self._rapport(endpoint, options['requests'], duree, resultats, compteur.total)
+                    if serveur:
+                        self._rapport_llm(avant, serveur.stats)
+        finally:
+            if serveur:
+                serveur.arreter()
+            if not options['keep']:
+                self._nettoyer(utilisateurs, debut_test)
+
+    def _utilisateur(self, valeur):
+        utilisateurs = Utilisateur.objects.filter(username=valeur)
+        if valeur.isdigit():
+            utilisateurs = utilisateurs | Utilisateur.objects.filter(pk=int(valeur))
+        user = utilisateurs.first()
+        if user is None:
+            raise CommandError(f"Utilisateur introuvable : {valeur}")
+        return user
+
+    async def _charge_async(self, url, corps, cles, nombre, concurrence, flux=False):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrence)
+        resultats = Resultats()
+
+        async def une_requete(i):
+            async with semaphore:
+                entetes = {'Authorization': f'Token {cles[i % len(cles)]}'}
+                debut = time.perf_counter()
+                premier_fragment = None
+                response = await client.post(url, corps(i), content_type='application/json', headers=entetes)
+                if flux and response.streaming:
+                    async for morceau in response.streaming_content:
+                        if premier_fragment is None and b'"delta"' in morceau:
+                            premier_fragment = time.perf_counter() - debut
+                resultats.ajouter(time.perf_counter() - debut, response.status_code, premier_fragment)
+
+        debut = time.perf_counter()
+        await asyncio.gather(*(une_requete(i) for i in range(nombre)))
+        return time.perf_counter() - debut, resultats
+
+    def _charge_threads(self, url, corps, cles, nombre, concurrence, flux=False):
+        local = threading.local()
+        resultats = Resultats()
+
+        def une_requete(i):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            entetes = {'Authorization': f'Token {cles[i % len(cles)]}'}
+            debut = time.perf_counter()
+            premier_fragment = None
+            response = local.client.post(url, corps(i), content_type='application/json', headers=entetes)
+            if flux and response.streaming:
+                for morceau in response.streaming_content:
+                    if premier_fragment is None and b'"delta"' in morceau:
+                        premier_fragment = time.perf_counter() - debut
+            resultats.ajouter(time.perf_counter() - debut, response.status_code, premier_fragment)
+
+        def executer(i):
+            try:
+                une_requete(i)
+            finally:
+                # Chaque thread a sa connexion à la base : la fermer avant la fin du thread
+                connections.close_all()
+
+        debut = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrence, thread_name_prefix='benchmark-ai') as executor:
+            list(executor.map(executer, range(nombre)))
+        return time.perf_counter() - debut, resultats
+
+    def _rapport(self, titre, nombre, duree, resultats, requetes_sql):
+        latences = resultats.latences
+        self.stdout.write(self.style.MIGRATE_HEADING(titre))
+        self.stdout.write(
+            f"  {nombre} requête(s) en {duree:.2f}s, soit {nombre / duree:.1f} requête(s)/s ; latence "
+            f"p50 {statistics.median(latences) * 1000:.0f} ms, p95 {_percentile(latences, 95) * 1000:.0f} ms, "
+            f"p99 {_percentile(latences, 99) * 1000:.0f} ms"
+        )
+        if resultats.premiers_fragments:
+            self.stdout.write(
+                f"  Premier fragment : p50 {statistics.median(resultats.premiers_fragments) * 1000:.0f} ms, "
+                f"p95 {_percentile(resultats.premiers_fragments, 95) * 1000:.0f} ms"
+            )
+        self.stdout.write(f"  Requêtes SQL : {requetes_sql} au total, {requetes_sql / nombre:.1f} par requête")
+        if resultats.erreurs:
+            self.stdout.write(self.style.ERROR(
+                f"  {len(resultats.erreurs)} erreur(s) : codes {sorted(set(resultats.erreurs))}"
+            ))
+
+    def _rapport_llm(self, avant, apres):
+        self.stdout.write(
+            f"  Faux LLM : {apres['requetes'] - avant['requetes']} appel(s), "
+            f"{apres['erreurs_429'] - avant['erreurs_429']} réponse(s) 429, "
+            f"au plus {apres['max_simultanees']} requête(s) simultanée(s) depuis le début du test"
+        )
+
+    def _nettoyer(self, utilisateurs, debut_test):
+        conversations, _ = Conversation.objects.filter(
+            utilisateur__in=utilisateurs, date_creation__gte=debut_test
+        ).delete()
+        rapports = list(RapportIA.objects.filter(utilisateur__in=utilisateurs, date_creation__gte=debut_test))
+        for rapport in rapports:
+            if rapport.pdf_file:
+                rapport.pdf_file.delete(save=False)
+            rapport.delete()
+        self.stdout.write(f"{conversations} objet(s) de conversation et {len(rapports)} rapport(s) de test supprimé(s).")
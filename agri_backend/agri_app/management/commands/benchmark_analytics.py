@@ -0,0 +1,184 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Mesure le calcul des indicateurs de cultures (`agri_app.analytics`).
+
+Compare, sur des données synthétiques, le calcul vectorisé NumPy à une
+boucle Python en `Decimal` produisant les mêmes indicateurs (ROI, marge,
+rendement par culture, percentiles, classement), et vérifie que les
+totaux sont identiques.
+
+Usage :
+    python manage.py benchmark_analytics
+    python manage.py benchmark_analytics --sizes 1000 10000 50000 --repeat 5
+    python manage.py benchmark_analytics --user 42   # données réelles d'un compte
+"""
+
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from agri_app.analytics import PERCENTILES, IndicateursCultures, annoter_cultures, vers_decimal, vers_entier
+from agri_app.models import Culture, Utilisateur
+
+
+# Colonnes brutes (Decimal) équivalentes, pour le calcul de référence
+CHAMPS_ORM = [
+    'id', 'nom', 'superficie', 'cout_achat_semences', 'cout_main_oeuvre',
+    'ind_revenus', 'ind_depenses_associees', 'ind_total_recolte', 'ind_nb_recoltes',
+]
+
+
+def _montant(rng, maximum):
+    return Decimal(rng.randint(0, maximum * 100)) / 100
+
+
+def generer_lignes(nombre, seed=42):
+    """
+    Cultures synthétiques, sous deux formes équivalentes :
+
+    - tuples de `Decimal` tels que les renvoie l'ORM (calcul de référence) ;
+    - tuples `IndicateursCultures.COLONNES`, montants en dix-millièmes, tels
+      que les renvoie `IndicateursCultures.requete_colonnes()`.
+    """
+    rng = random.Random(seed)
+    decimales, colonnes = [], []
+    for i in range(nombre):
+        nb_recoltes = rng.randint(0, 4)
+        quantites = [_montant(rng, 5000) for _ in range(nb_recoltes)]
+        prix = [_montant(rng, 800) for _ in range(nb_recoltes)]
+        ligne = (
+            i + 1,
+            f"Culture {i % 50}",
+            _montant(rng, 20) if rng.random() > 0.05 else Decimal('0'),
+            _montant(rng, 200000),
+            _montant(rng, 300000),
+            sum((q * p for q, p in zip(quantites, prix)), Decimal('0')),
+            _montant(rng, 100000),
+            sum(quantites, Decimal('0')),
+            nb_recoltes,
+        )
+        decimales.append(ligne)
+        _id, nom, superficie, achat, main_oeuvre, revenus, associees, total_recolte, nb = ligne
+        colonnes.append((
+            _id, nom, float(superficie), float(total_recolte), nb,
+            vers_entier(achat + main_oeuvre), vers_entier(associees), vers_entier(revenus),
+        ))
+    return decimales, colonnes
+
+
+def _percentiles(valeurs, q=PERCENTILES):
+    """Percentiles par interpolation linéaire (même méthode que NumPy)."""
+    valeurs = sorted(valeurs)
+    if not valeurs:
+        return {f'p{p}': 0.0 for p in q}
+    resultat = {}
+    for p in q:
+        position = (len(valeurs) - 1) * p / 100
+        bas = int(position)
+        haut = min(bas + 1, len(valeurs) - 1)
+        resultat[f'p{p}'] = float(valeurs[bas] + (valeurs[haut] - valeurs[bas]) * Decimal(str(position - bas)))
+    return resultat
+
+
+def calcul_reference(lignes):
+    """Mêmes indicateurs, calculés culture par culture en Python/Decimal."""
+    total_revenus = Decimal('0')
+    total_depenses = Decimal('0')
+    cultures = []
+    for _id, nom, superficie, achat, main_oeuvre, revenus, associees, total_recolte, _nb in lignes:
+        depenses = achat + main_oeuvre + associees
+        benefice = revenus - depenses
+        total_revenus += revenus
+        total_depenses += depenses
+        cultures.append({
+            'nom': nom,
+            'benefice': benefice,
+            'rendement': total_recolte / superficie if superficie > 0 else Decimal('0'),
+            'roi': benefice / depenses * 100 if depenses > 0 else Decimal('0'),
+            'marge': benefice / revenus * 100 if revenus > 0 else Decimal('0'),
+        })
+    rendements = [c['rendement'] for c in cultures if c['rendement'] > 0]
+    _percentiles(rendements)
+    _percentiles([c['benefice'] for c in cultures])
+    classement = sorted(range(len(cultures)), key=lambda i: cultures[i]['benefice'], reverse=True)
+    for rang, i in enumerate(classement, 1):
+        cultures[i]['rang_benefice'] = rang
+    meilleure = max(range(len(cultures)), key=lambda i: cultures[i]['rendement']) if cultures else None
+    return {
+        'revenus': total_revenus,
+        'depenses': total_depenses,
+        'productivite': sum(rendements) / len(rendements) if rendements else 0,
+        'meilleure': meilleure,
+    }
+
+
+def calcul_vectorise(lignes):
+    indicateurs = IndicateursCultures.depuis_lignes(lignes)
+    totaux = indicateurs.totaux()
+    indicateurs.ratios_globaux()
+    indicateurs.percentiles('rendement')
+    indicateurs.percentiles('benefice', positifs=False)
+    indicateurs.rangs('benefice')
+    return {
+        'revenus': totaux['revenus'],
+        'depenses': totaux['depenses'],
+        'productivite': indicateurs.productivite_moyenne(),
+        'meilleure': indicateurs.meilleure('rendement'),
+    }
+
+
+def _chrono(fonction, lignes, repeat):
+    meilleur = None
+    for _ in range(repeat):
+        debut = time.perf_counter()
+        resultat = fonction(lignes)
+        duree = (time.perf_counter() - debut) * 1000
+        meilleur = duree if meilleur is None else min(meilleur, duree)
+    return resultat, meilleur
+
+
+class Command(BaseCommand):
+    help = "Compare le calcul vectorisé des indicateurs de cultures à une boucle Python."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 50000],
+                            help="Nombres de cultures à simuler")
+        parser.add_argument('--repeat', type=int, default=3, help="Répétitions (meilleur temps retenu)")
+        parser.add_argument('--user', type=int, help="Mesurer sur les cultures réelles d'un utilisateur")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat doit être au moins égal à 1.")
+
+        if options['user']:
+            if not Utilisateur.objects.filter(pk=options['user']).exists():
+                raise CommandError(f"Utilisateur {options['user']} introuvable.")
+            cultures = Culture.objects.filter(utilisateur_id=options['user'])
+            debut = time.perf_counter()
+            decimales = list(annoter_cultures(cultures).values_list(*CHAMPS_ORM))
+            t_orm = (time.perf_counter() - debut) * 1000
+            debut = time.perf_counter()
+            colonnes = list(IndicateursCultures.requete_colonnes(cultures))
+            t_sql = (time.perf_counter() - debut) * 1000
+            self.stdout.write(
+                f"Chargement de {len(colonnes)} culture(s) : {t_orm:.1f} ms (Decimal), "
+                f"{t_sql:.1f} ms (colonnes converties par la base)"
+            )
+            jeux = [(len(colonnes), decimales, colonnes)]
+        else:
+            jeux = [(taille, *generer_lignes(taille)) for taille in options['sizes']]
+
+        self.stdout.write(f"{'cultures':>10} {'python (ms)':>12} {'numpy (ms)':>11} {'gain':>7}  totaux")
+        for taille, decimales, colonnes in jeux:
+            # Les montants SQLite peuvent porter des artefacts flottants : on compare après arrondi
+            reference, t_ref = _chrono(calcul_reference, decimales, options['repeat'])
+            vectorise, t_vec = _chrono(calcul_vectorise, colonnes, options['repeat'])
+            identiques = all(
+                vers_decimal(vers_entier(reference[cle])) == vectorise[cle]
+                for cle in ('revenus', 'depenses')
+            ) and reference['meilleure'] == vectorise['meilleure']
+            gain = t_ref / t_vec if t_vec else 0
+            etat = self.style.SUCCESS("identiques") if identiques else self.style.ERROR("DIFFÉRENTS")
+            self.stdout.write(f"{taille:>10} {t_ref:>12.1f} {t_vec:>11.1f} {gain:>6.1f}x  {etat}")
@@ -0,0 +1,53 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Construit (ou rafraîchit) l'index binaire des plages IP à partir d'un export CSV.
+
+Usage :
+    python manage.py build_ip_index ip_ranges.csv
+    python manage.py build_ip_index ip_ranges.csv --output /chemin/index.bin
+
+Format CSV attendu (en-tête facultatif) :
+    ip_start,ip_end,country,city,latitude,longitude
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from agri_app.ip_database import IPRangeDatabase, read_csv_ranges, write_index
+
+
+class Command(BaseCommand):
+    help = "Construit l'index local des plages IP utilisé pour la géolocalisation."
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Fichier CSV des plages IP")
+        parser.add_argument(
+            '--output',
+            default=str(settings.GEOLOCATION_IP_DATABASE),
+            help="Chemin de l'index à générer (défaut : GEOLOCATION_IP_DATABASE)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            with open(options['source'], newline='', encoding='utf-8') as source:
+                ranges, skipped = read_csv_ranges(source)
+        except OSError as e:
+            raise CommandError(f"Impossible de lire {options['source']} : {e}")
+
+        if not ranges:
+            raise CommandError("Aucune plage IPv4 valide trouvée dans le fichier.")
+
+        written, overlaps = write_index(ranges, options['output'])
+
+        # Vérification : l'index doit se recharger correctement
+        database = IPRangeDatabase(options['output'])
+        database.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{written} plages écrites dans {options['output']} en {elapsed:.2f}s "
+            f"({skipped} ligne(s) invalide(s), {overlaps} chevauchement(s) ignoré(s))."
+        ))
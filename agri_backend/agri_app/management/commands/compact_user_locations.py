@@ -0,0 +1,178 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Consolide et purge l'historique brut des localisations utilisateurs.
+
+Les `UserLocation` plus anciennes que la durée de rétention sont agrégées
+par (utilisateur, jour, pays, ville) dans `UserLocationDailySummary`, puis
+supprimées (et optionnellement archivées en CSV compressé).
+
+Le traitement se fait par lots, chacun dans sa propre transaction courte,
+pour pouvoir tourner sur une base en production sans verrou prolongé.
+
+Usage :
+    python manage.py compact_user_locations
+    python manage.py compact_user_locations --retention-days 30 --chunk-size 500
+    python manage.py compact_user_locations --archive-dir /var/backups/locations
+    python manage.py compact_user_locations --dry-run
+"""
+
+import csv
+import gzip
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from agri_app.models import UserLocation, UserLocationDailySummary
+
+
+FIELDS = ['id', 'utilisateur_id', 'ip_address', 'latitude', 'longitude', 'city', 'country', 'timestamp']
+
+
+class Command(BaseCommand):
+    help = "Agrège les localisations anciennes en résumés journaliers puis les supprime."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=settings.USER_LOCATION_RETENTION_DAYS,
+            help="Âge (en jours) au-delà duquel les localisations brutes sont compactées",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help="Nombre de lignes traitées par transaction",
+        )
+        parser.add_argument(
+            '--archive-dir',
+            help="Archiver les lignes supprimées dans un CSV compressé de ce dossier",
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help="Pause (en secondes) entre deux lots pour laisser passer les écritures",
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Affiche le nombre de lignes concernées sans rien modifier",
+        )
+
+    def handle(self, *args, **options):
+        if options['retention_days'] < 1:
+            raise CommandError("--retention-days doit être au moins égal à 1.")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size doit être au moins égal à 1.")
+
+        cutoff = timezone.now() - timedelta(days=options['retention_days'])
+        queryset = UserLocation.objects.filter(timestamp__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f"{queryset.count()} localisation(s) antérieure(s) au {cutoff:%d/%m/%Y %H:%M} à compacter.")
+            return
+
+        archive = None
+        if options['archive_dir']:
+            os.makedirs(options['archive_dir'], exist_ok=True)
+            path = os.path.join(options['archive_dir'], f"user_locations_{timezone.now():%Y%m%d_%H%M%S}.csv.gz")
+            archive = gzip.open(path, 'wt', newline='', encoding='utf-8')
+            writer = csv.writer(archive)
+            writer.writerow(FIELDS)
+
+        total_rows = 0
+        total_chunks = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                with transaction.atomic():
+                    rows = list(queryset.order_by('pk').values(*FIELDS)[:options['chunk_size']])
+                    if not rows:
+                        break
+                    self._merge_into_summaries(rows)
+                    UserLocation.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+
+                # Archivé une fois le lot validé : un lot annulé (erreur, conflit de
+                # verrou) sera retraité au prochain passage, sans doublon dans l'archive.
+                if archive:
+                    writer.writerows([row[field] for field in FIELDS] for row in rows)
+
+                total_rows += len(rows)
+                total_chunks += 1
+                if options['pause']:
+                    time.sleep(options['pause'])
+        finally:
+            if archive:
+                archive.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{total_rows} localisation(s) compactée(s) en {total_chunks} lot(s) ({elapsed:.2f}s)."
+        ))
+
+    def _merge_into_summaries(self, rows):
+        """Fusionne un lot de localisations brutes dans les résumés journaliers."""
+        groups = {}
+        for row in rows:
+            key = (
+                row['utilisateur_id'],
+                timezone.localtime(row['timestamp']).date(),
+                row['country'] or '',
+                row['city'] or '',
+            )
+            group = groups.get(key)
+            if group is None:
+                groups[key] = group = {
+                    'nb_evenements': 0,
+                    'premiere_vue': row['timestamp'],
+                    'derniere_vue': row['timestamp'],
+                    'derniere_ip': row['ip_address'],
+                    'latitude': row['latitude'],
+                    'longitude': row['longitude'],
+                }
+            group['nb_evenements'] += 1
+            group['premiere_vue'] = min(group['premiere_vue'], row['timestamp'])
+            if row['timestamp'] >= group['derniere_vue']:
+                group['derniere_vue'] = row['timestamp']
+                group['derniere_ip'] = row['ip_address']
+                group['latitude'] = row['latitude']
+                group['longitude'] = row['longitude']
+
+        existing = {
+            (s.utilisateur_id, s.jour, s.country, s.city): s
+            for s in UserLocationDailySummary.objects.select_for_update().filter(
+                utilisateur_id__in={key[0] for key in groups},
+                jour__in={key[1] for key in groups},
+            )
+        }
+
+        to_create = []
+        to_update = []
+        for key, group in groups.items():
+            summary = existing.get(key)
+            if summary is None:
+                user_id, jour, country, city = key
+                to_create.append(UserLocationDailySummary(
+                    utilisateur_id=user_id, jour=jour, country=country, city=city, **group
+                ))
+                continue
+            summary.nb_evenements += group['nb_evenements']
+            summary.premiere_vue = min(summary.premiere_vue, group['premiere_vue'])
+            if group['derniere_vue'] >= summary.derniere_vue:
+                summary.derniere_vue = group['derniere_vue']
+                summary.derniere_ip = group['derniere_ip']
+                summary.latitude = group['latitude']
+                summary.longitude = group['longitude']
+            to_update.append(summary)
+
+        UserLocationDailySummary.objects.bulk_create(to_create)
+        UserLocationDailySummary.objects.bulk_update(
+            to_update,
+            ['nb_evenements', 'premiere_vue', 'derniere_vue', 'derniere_ip', 'latitude', 'longitude'],
+        )
@@ -0,0 +1,50 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Recalcule les référentiels régionaux des cultures (`RegionalBenchmark`).
+
+À planifier chaque nuit (cron, systemd timer...) ; la table est remplacée
+en une seule transaction, les lectures ne voient jamais un état partiel.
+
+Usage :
+    python manage.py compute_regional_benchmarks
+    python manage.py compute_regional_benchmarks --min-agriculteurs 10
+    python manage.py compute_regional_benchmarks --dry-run
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from agri_app.benchmarks import calculer_referentiels, publier_referentiels, TOUTES_ZONES
+
+
+class Command(BaseCommand):
+    help = "Recalcule les référentiels régionaux (rendement, coût/ha, prix) de toutes les cultures."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-agriculteurs', type=int, default=settings.BENCHMARK_MIN_AGRICULTEURS,
+            help="Nombre minimal d'agriculteurs distincts pour publier un groupe"
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Calcule sans enregistrer")
+
+    def handle(self, *args, **options):
+        if options['min_agriculteurs'] < 1:
+            raise CommandError("--min-agriculteurs doit être au moins égal à 1.")
+
+        debut = time.perf_counter()
+        referentiels = calculer_referentiels(options['min_agriculteurs'])
+        duree = time.perf_counter() - debut
+
+        nb_zones = sum(1 for r in referentiels if r.zone != TOUTES_ZONES)
+        resume = (
+            f"{len(referentiels)} référentiel(s) calculé(s) dont {nb_zones} par zone "
+            f"(seuil : {options['min_agriculteurs']} agriculteur(s)) en {duree:.2f}s."
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"[dry-run] {resume}"))
+            return
+
+        publier_referentiels(referentiels)
+        self.stdout.write(self.style.SUCCESS(resume))
@@ -0,0 +1,60 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Supprime les mesures de télémétrie IA (`AppelIA`) plus anciennes que la
+durée de conservation, par lots courts pour ne pas bloquer les écritures.
+
+Usage :
+    python manage.py purge_ai_telemetry
+    python manage.py purge_ai_telemetry --retention-days 7 --chunk-size 5000
+    python manage.py purge_ai_telemetry --dry-run
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from agri_app.models import AppelIA
+
+
+class Command(BaseCommand):
+    help = "Supprime les mesures de télémétrie des appels IA plus anciennes que la durée de conservation."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=settings.AI_TELEMETRY_RETENTION_DAYS,
+            help="Âge (en jours) au-delà duquel les mesures sont supprimées",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help="Nombre de lignes supprimées par requête",
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Affiche le nombre de mesures concernées sans rien supprimer",
+        )
+
+    def handle(self, *args, **options):
+        if options['retention_days'] < 1 or options['chunk_size'] < 1:
+            raise CommandError("--retention-days et --chunk-size doivent être au moins égaux à 1.")
+
+        limite = timezone.now() - timedelta(days=options['retention_days'])
+        anciennes = AppelIA.objects.filter(date_appel__lt=limite)
+        if options['dry_run']:
+            self.stdout.write(f"{anciennes.count()} mesure(s) antérieure(s) au {limite:%d/%m/%Y} à supprimer.")
+            return
+
+        total = 0
+        while True:
+            ids = list(anciennes.order_by('id').values_list('id', flat=True)[:options['chunk_size']])
+            if not ids:
+                break
+            supprimees, _ = AppelIA.objects.filter(id__in=ids).delete()
+            total += supprimees
+        self.stdout.write(self.style.SUCCESS(f"{total} mesure(s) de télémétrie IA supprimée(s)."))
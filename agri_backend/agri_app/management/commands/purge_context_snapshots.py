@@ -0,0 +1,36 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Supprime les snapshots de contexte qui ne sont plus référencés.
+
+Un `ContexteSnapshot` devient orphelin quand tous les messages qui le
+référencent ont été supprimés (suppression d'une conversation, par exemple).
+
+Usage :
+    python manage.py purge_context_snapshots
+    python manage.py purge_context_snapshots --dry-run
+"""
+
+from django.core.management.base import BaseCommand
+
+from agri_app.models import ContexteSnapshot
+from agri_app.snapshots import purger_orphelins
+
+
+class Command(BaseCommand):
+    help = "Supprime les snapshots de contexte IA qui ne sont plus référencés par aucun message."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Affiche le nombre de snapshots orphelins sans rien supprimer",
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            orphelins = ContexteSnapshot.objects.filter(messages__isnull=True).count()
+            self.stdout.write(f"{orphelins} snapshot(s) orphelin(s).")
+            return
+
+        supprimes = purger_orphelins()
+        self.stdout.write(self.style.SUCCESS(f"{supprimes} snapshot(s) orphelin(s) supprimé(s)."))
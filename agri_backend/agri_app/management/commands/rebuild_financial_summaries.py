@@ -0,0 +1,79 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Reconstruit ou vérifie les résumés financiers (`UserFinancialSummary`).
+
+Usage :
+    python manage.py rebuild_financial_summaries            # tout recalculer
+    python manage.py rebuild_financial_summaries --verify   # signaler les dérives
+    python manage.py rebuild_financial_summaries --verify --fix
+    python manage.py rebuild_financial_summaries --user 42
+"""
+
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from agri_app.models import Utilisateur, UserFinancialSummary
+from agri_app.summaries import calculer_resume, reconstruire_resume
+
+
+# Les montants sont comparés au centime près
+PRECISION = Decimal('0.01')
+
+
+def _normaliser(valeur):
+    if isinstance(valeur, (Decimal, float)):
+        return Decimal(str(valeur)).quantize(PRECISION)
+    return valeur
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les résumés financiers des utilisateurs, ou vérifie leur cohérence."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help="Compare sans modifier et signale les dérives")
+        parser.add_argument('--fix', action='store_true', help="Avec --verify : reconstruit les résumés en dérive")
+        parser.add_argument('--user', type=int, help="Limiter à un utilisateur (id)")
+
+    def handle(self, *args, **options):
+        users = Utilisateur.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(pk=options['user'])
+
+        if not options['verify']:
+            count = 0
+            for user_id in users.values_list('pk', flat=True).iterator():
+                reconstruire_resume(user_id)
+                count += 1
+            self.stdout.write(self.style.SUCCESS(f"{count} résumé(s) reconstruit(s)."))
+            return
+
+        stored = {
+            resume.utilisateur_id: resume
+            for resume in UserFinancialSummary.objects.filter(utilisateur__in=users)
+        }
+        checked = drifted = missing = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            checked += 1
+            resume = stored.get(user_id)
+            if resume is None:
+                # Pas encore construit : il le sera à la première lecture
+                missing += 1
+                continue
+            attendu = calculer_resume(user_id)
+            ecarts = [
+                f"{champ}: {getattr(resume, champ)} != {valeur}"
+                for champ, valeur in attendu.items()
+                if _normaliser(getattr(resume, champ)) != _normaliser(valeur)
+            ]
+            if ecarts:
+                drifted += 1
+                self.stdout.write(self.style.WARNING(f"Utilisateur {user_id} : " + ", ".join(ecarts)))
+                if options['fix']:
+                    reconstruire_resume(user_id)
+
+        message = f"{checked} utilisateur(s) vérifié(s), {drifted} résumé(s) en dérive, {missing} non construit(s)."
+        if drifted:
+            self.stdout.write(self.style.ERROR(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
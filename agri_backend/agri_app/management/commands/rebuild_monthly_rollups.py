@@ -0,0 +1,85 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Reconstruit ou vérifie les cumuls mensuels (`UserMonthlyRollup`).
+
+Usage :
+    python manage.py rebuild_monthly_rollups            # tout recalculer
+    python manage.py rebuild_monthly_rollups --verify   # signaler les écarts
+    python manage.py rebuild_monthly_rollups --verify --fix
+    python manage.py rebuild_monthly_rollups --user 42
+"""
+
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from agri_app.models import Utilisateur, UserMonthlyRollup
+from agri_app.rollups import CHAMPS_CUMUL, calculer_cumuls, reconstruire_cumuls
+
+
+# Les montants sont comparés au centime près
+PRECISION = Decimal('0.01')
+ZERO = {champ: Decimal('0') for champ in CHAMPS_CUMUL}
+
+
+def _normaliser(valeurs):
+    return {champ: Decimal(valeurs[champ]).quantize(PRECISION) for champ in CHAMPS_CUMUL}
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les cumuls mensuels des utilisateurs, ou vérifie leur cohérence."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help="Compare sans modifier et signale les écarts")
+        parser.add_argument('--fix', action='store_true', help="Avec --verify : reconstruit les utilisateurs en écart")
+        parser.add_argument('--user', type=int, help="Limiter à un utilisateur (id)")
+
+    def handle(self, *args, **options):
+        users = Utilisateur.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(pk=options['user'])
+
+        if not options['verify']:
+            total_users = total_rows = 0
+            for user_id in users.values_list('pk', flat=True).iterator():
+                total_rows += reconstruire_cumuls(user_id)
+                total_users += 1
+            self.stdout.write(self.style.SUCCESS(
+                f"{total_rows} cumul(s) reconstruit(s) pour {total_users} utilisateur(s)."
+            ))
+            return
+
+        checked = drifted = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            checked += 1
+            attendus = {cle: _normaliser(valeurs) for cle, valeurs in calculer_cumuls(user_id).items()}
+            stockes = {
+                (ligne['mois'], ligne['culture_id']): _normaliser(ligne)
+                for ligne in UserMonthlyRollup.objects.filter(utilisateur_id=user_id).values('mois', 'culture_id', *CHAMPS_CUMUL)
+            }
+            # Une ligne à zéro (toutes ses sources supprimées) équivaut à une ligne absente
+            ecarts = [
+                (cle, stockes.get(cle, ZERO), attendus.get(cle, ZERO))
+                for cle in set(attendus) | set(stockes)
+                if stockes.get(cle, ZERO) != attendus.get(cle, ZERO)
+            ]
+            if not ecarts:
+                continue
+
+            drifted += 1
+            for (mois, culture_id), stocke, attendu in sorted(ecarts, key=lambda e: (e[0][0], e[0][1] or 0)):
+                details = ", ".join(
+                    f"{champ}: {stocke[champ]} != {attendu[champ]}"
+                    for champ in CHAMPS_CUMUL if stocke[champ] != attendu[champ]
+                )
+                self.stdout.write(self.style.WARNING(
+                    f"Utilisateur {user_id}, {mois:%m/%Y}, culture {culture_id or '-'} : {details}"
+                ))
+            if options['fix']:
+                reconstruire_cumuls(user_id)
+
+        message = f"{checked} utilisateur(s) vérifié(s), {drifted} avec des cumuls en écart."
+        if drifted:
+            self.stdout.write(self.style.ERROR(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,49 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Lance un faux serveur LLM compatible OpenAI (voir `agri_app.fake_llm`).
+
+Usage :
+    python manage.py run_fake_llm --port 8001 --latency 0.5
+    python manage.py run_fake_llm --latency lognormal:0.8:0.5 --token-delay 0.02 --rate-429 0.1 --retry-after 2
+    # puis, pour l'application : GROQ_BASE_URL=http://127.0.0.1:8001/v1 GROQ_API_KEY=fake
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from agri_app.fake_llm import FakeLLMServer
+
+
+class Command(BaseCommand):
+    help = "Lance un faux serveur LLM local (API chat completions) pour les tests de charge."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--latency', default='0.5',
+                            help="Durée de chaque réponse : secondes ou loi (uniform:0.2:1, normal:0.8:0.2, "
+                                 "lognormal:0.8:0.5, exp:0.8)")
+        parser.add_argument('--token-delay', type=float, default=0.0, help="Pause entre deux fragments du flux (secondes)")
+        parser.add_argument('--rate-429', type=float, default=0.0, help="Proportion de requêtes refusées par une 429")
+        parser.add_argument('--retry-after', type=int, help="En-tête Retry-After des réponses 429 (secondes)")
+        parser.add_argument('--seed', type=int, help="Graine des tirages aléatoires")
+
+    def handle(self, *args, **options):
+        try:
+            serveur = FakeLLMServer(
+                options['host'], options['port'], latence=options['latency'], delai_token=options['token_delay'],
+                taux_429=options['rate_429'], retry_after=options['retry_after'], graine=options['seed'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Faux LLM sur {serveur.base_url} (latence {options['latency']}). Ctrl+C pour arrêter."
+        ))
+        try:
+            serveur.servir()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            serveur.arreter()
+            stats = serveur.stats
+            self.stdout.write(f"{stats['requetes']} requête(s) servie(s), au plus {stats['max_simultanees']} "
+                              f"simultanée(s), {stats['erreurs_429']} réponse(s) 429.")
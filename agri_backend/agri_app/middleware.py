@@ -1,13 +1,49 @@
-import geocoder
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from ipware import get_client_ip
-from django.utils import timezone
-from .models import UserLocation
+from whitenoise.middleware import WhiteNoiseMiddleware
+from .geolocation import get_pipeline
+
+# Sous ASGI, un seul middleware synchrone suffit à faire passer chaque requête
+# par le même thread : les middlewares du projet acceptent donc les deux modes.
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise, utilisable aussi par les vues asynchrones (ASGI)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
 
 class LocationTrackingMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         # Code exécuté avant la vue
         if request.user.is_authenticated:
             self.track_location(request)
@@ -15,7 +51,14 @@ class LocationTrackingMiddleware:
         response = self.get_response(request)
         return response
 
-    def track_location(self, request):
+    async def __acall__(self, request):
+        user = await request.auser()
+        if user.is_authenticated:
+            # `submit` ne fait que déposer l'événement dans la file : aucun blocage
+            self.track_location(request, user)
+        return await self.get_response(request)
+
+    def track_location(self, request, user=None):
         try:
             client_ip, is_routable = get_client_ip(request)
             
@@ -26,40 +69,10 @@ class LocationTrackingMiddleware:
                     # client_ip = '8.8.8.8' 
                     pass
 
-                # Obtenir la localisation via geocoder (utilise IP-API par défaut)
-                g = geocoder.ip(client_ip)
-                
-                if g.ok:
-                    lat = g.lat
-                    lng = g.lng
-                    city = g.city
-                    country = g.country
-                    
-                    # Vérifier la dernière localisation de l'utilisateur
-                    last_location = UserLocation.objects.filter(
-                        utilisateur=request.user
-                    ).first() # Ordonné par -timestamp par défaut dans Meta
-                    
-                    should_save = True
-                    
-                    if last_location:
-                        # Comparer avec la localisation actuelle
-                        # On considère que c'est la même si ville et pays sont identiques
-                        # Ou si les coordonnées sont très proches (optionnel)
-                        if (last_location.city == city and 
-                            last_location.country == country and
-                            last_location.ip_address == client_ip):
-                            should_save = False
-                    
-                    if should_save:
-                        UserLocation.objects.create(
-                            utilisateur=request.user,
-                            ip_address=client_ip,
-                            latitude=lat,
-                            longitude=lng,
-                            city=city,
-                            country=country
-                        )
+                # La résolution de l'IP (appel HTTP sortant) et l'écriture en base
+                # sont faites en arrière-plan : on se contente d'enregistrer
+                # l'événement sans bloquer la requête.
+                get_pipeline().submit((user or request.user).pk, client_ip)
         except Exception as e:
             # Ne pas bloquer la requête si le tracking échoue
             print(f"Erreur tracking localisation: {e}")
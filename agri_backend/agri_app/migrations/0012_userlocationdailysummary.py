@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agri_app', '0011_contactmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserLocationDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField(verbose_name='Jour')),
+                ('city', models.CharField(blank=True, default='', max_length=100, verbose_name='Ville')),
+                ('country', models.CharField(blank=True, default='', max_length=100, verbose_name='Pays')),
+                ('nb_evenements', models.PositiveIntegerField(default=0, verbose_name='Nombre de localisations')),
+                ('derniere_ip', models.GenericIPAddressField(blank=True, null=True, verbose_name='Dernière adresse IP')),
+                ('latitude', models.FloatField(blank=True, null=True, verbose_name='Latitude')),
+                ('longitude', models.FloatField(blank=True, null=True, verbose_name='Longitude')),
+                ('premiere_vue', models.DateTimeField(verbose_name='Première localisation')),
+                ('derniere_vue', models.DateTimeField(verbose_name='Dernière localisation')),
+            ],
+            options={
+                'verbose_name': 'Localisation journalière',
+                'verbose_name_plural': 'Localisations journalières',
+                'ordering': ['-jour'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userlocation',
+            index=models.Index(fields=['timestamp'], name='agri_app_us_timesta_0fcf5b_idx'),
+        ),
+        migrations.AddField(
+            model_name='userlocationdailysummary',
+            name='utilisateur',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='locations_journalieres', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur'),
+        ),
+        migrations.AddIndex(
+            model_name='userlocationdailysummary',
+            index=models.Index(fields=['utilisateur', '-jour'], name='agri_app_us_utilisa_54d2d1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userlocationdailysummary',
+            index=models.Index(fields=['country', 'city'], name='agri_app_us_country_3ba563_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='userlocationdailysummary',
+            constraint=models.UniqueConstraint(fields=('utilisateur', 'jour', 'country', 'city'), name='unique_localisation_journaliere'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:02
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agri_app', '0012_userlocationdailysummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserFinancialSummary',
+            fields=[
+                ('utilisateur', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resume_financier', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Agriculteur')),
+                ('total_cultures', models.IntegerField(default=0, verbose_name='Nombre de cultures')),
+                ('total_recoltes', models.IntegerField(default=0, verbose_name='Nombre de récoltes')),
+                ('revenus_totaux', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=20, verbose_name='Revenus totaux')),
+                ('depenses_cultures', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=18, verbose_name='Coûts initiaux des cultures')),
+                ('depenses_recoltes', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=18, verbose_name='Dépenses liées aux récoltes')),
+                ('depenses_generales', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=18, verbose_name='Dépenses générales')),
+                ('culture_plus_rentable', models.CharField(default='Aucune', max_length=100, verbose_name='Culture la plus rentable')),
+                ('rendement_moyen', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=16, verbose_name='Rendement moyen')),
+                ('conseils_non_lus', models.IntegerField(default=0, verbose_name='Conseils non lus')),
+                ('date_mise_a_jour', models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')),
+            ],
+            options={
+                'verbose_name': 'Résumé financier',
+                'verbose_name_plural': 'Résumés financiers',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agri_app', '0013_userfinancialsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='utilisateur',
+            name='version_donnees',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Incrémentée à chaque modification des cultures, récoltes, dépenses ou conseils (cache des réponses)', verbose_name='Version des données'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:08
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth
+
+
+def remplir_cumuls(apps, schema_editor):
+    """Construit les cumuls mensuels à partir des données existantes."""
+    Culture = apps.get_model('agri_app', 'Culture')
+    Recolte = apps.get_model('agri_app', 'Recolte')
+    Depense = apps.get_model('agri_app', 'Depense')
+    UserMonthlyRollup = apps.get_model('agri_app', 'UserMonthlyRollup')
+
+    cumuls = {}
+
+    def ajouter(lignes):
+        for ligne in lignes:
+            cle = (ligne.pop('utilisateur'), ligne.pop('mois'), ligne.pop('culture'))
+            valeurs = cumuls.setdefault(cle, {})
+            for champ, total in ligne.items():
+                valeurs[champ] = valeurs.get(champ, Decimal('0')) + (total or Decimal('0'))
+
+    ajouter(Recolte.objects.annotate(
+        utilisateur=F('culture__utilisateur'), mois=TruncMonth('date_recolte')
+    ).values('utilisateur', 'mois', 'culture').annotate(
+        revenus=Sum(F('quantite_recoltee') * F('prix_vente_unitaire')),
+        depenses_recoltes=Sum('depenses_liees_recolte'),
+    ).order_by())
+    ajouter(Depense.objects.annotate(mois=TruncMonth('date_depense')).values(
+        'utilisateur', 'mois', 'culture'
+    ).annotate(depenses_generales=Sum('montant')).order_by())
+    ajouter(Culture.objects.annotate(mois=TruncMonth('date_culture'), culture=F('pk')).values(
+        'utilisateur', 'mois', 'culture'
+    ).annotate(couts_initiaux=Sum(F('cout_achat_semences') + F('cout_main_oeuvre'))).order_by())
+
+    UserMonthlyRollup.objects.bulk_create([
+        UserMonthlyRollup(utilisateur_id=user_id, mois=mois, culture_id=culture_id, **valeurs)
+        for (user_id, mois, culture_id), valeurs in cumuls.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agri_app', '0014_utilisateur_version_donnees'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(help_text='Premier jour du mois', verbose_name='Mois')),
+                ('revenus', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=20, verbose_name='Revenus des récoltes')),
+                ('depenses_recoltes', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=18, verbose_name='Dépenses liées aux récoltes')),
+                ('depenses_generales', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=18, verbose_name='Dépenses')),
+                ('couts_initiaux', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=18, verbose_name='Coûts initiaux des cultures')),
+                ('date_mise_a_jour', models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')),
+                ('culture', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cumuls_mensuels', to='agri_app.culture', verbose_name='Culture')),
+                ('utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cumuls_mensuels', to=settings.AUTH_USER_MODEL, verbose_name='Agriculteur')),
+            ],
+            options={
+                'verbose_name': 'Cumul mensuel',
+                'verbose_name_plural': 'Cumuls mensuels',
+                'ordering': ['utilisateur', 'mois'],
+                'indexes': [models.Index(fields=['utilisateur', 'mois'], name='agri_app_us_utilisa_47309c_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('culture__isnull', False)), fields=('utilisateur', 'mois', 'culture'), name='unique_cumul_mensuel_culture'), models.UniqueConstraint(condition=models.Q(('culture__isnull', True)), fields=('utilisateur', 'mois'), name='unique_cumul_mensuel_sans_culture')],
+            },
+        ),
+        migrations.RunPython(remplir_cumuls, migrations.RunPython.noop),
+    ]
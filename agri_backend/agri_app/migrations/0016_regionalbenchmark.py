@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agri_app', '0015_usermonthlyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegionalBenchmark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('culture_nom', models.CharField(max_length=100, verbose_name='Culture (normalisée)')),
+                ('libelle', models.CharField(max_length=100, verbose_name='Nom affiché')),
+                ('zone', models.CharField(help_text="'*' pour toutes les zones", max_length=200, verbose_name='Zone (normalisée)')),
+                ('saison', models.CharField(choices=[('seche', 'Saison sèche (novembre - mars)'), ('grande_pluies', 'Grande saison des pluies (avril - juillet)'), ('petite_pluies', 'Petite saison des pluies (août - octobre)'), ('toutes', 'Toutes saisons')], max_length=20, verbose_name='Saison de plantation')),
+                ('nb_agriculteurs', models.PositiveIntegerField(verbose_name="Nombre d'agriculteurs")),
+                ('nb_cultures', models.PositiveIntegerField(verbose_name='Nombre de cultures')),
+                ('rendement_moyen', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Rendement moyen (par ha)')),
+                ('rendement_median', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Rendement médian (par ha)')),
+                ('cout_par_hectare', models.DecimalField(decimal_places=2, max_digits=16, verbose_name='Coût moyen par hectare (FCFA)')),
+                ('prix_vente_moyen', models.DecimalField(decimal_places=2, help_text='Pondéré par les quantités vendues', max_digits=14, verbose_name='Prix de vente moyen (FCFA/unité)')),
+                ('date_calcul', models.DateTimeField(verbose_name='Date du calcul')),
+            ],
+            options={
+                'verbose_name': 'Référentiel régional',
+                'verbose_name_plural': 'Référentiels régionaux',
+                'ordering': ['culture_nom', 'zone', 'saison'],
+                'constraints': [models.UniqueConstraint(fields=('culture_nom', 'zone', 'saison'), name='unique_referentiel_regional')],
+            },
+        ),
+    ]
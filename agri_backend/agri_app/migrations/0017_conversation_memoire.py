@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agri_app', '0016_regionalbenchmark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='resume',
+            field=models.TextField(blank=True, help_text="Résumé glissant des messages sortis de la fenêtre transmise à l'IA", verbose_name='Résumé des échanges anciens'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='resume_jusqu_a',
+            field=models.PositiveBigIntegerField(default=0, help_text='Identifiant du dernier message intégré au résumé', verbose_name="Résumé jusqu'au message"),
+        ),
+        migrations.AddIndex(
+            model_name='messagechat',
+            index=models.Index(fields=['conversation', '-id'], name='agri_app_me_convers_db565e_idx'),
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:33
+
+import hashlib
+import json
+import zlib
+
+import django.db.models.deletion
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models
+
+
+TAILLE_LOT = 500
+
+
+def compacter_contextes(apps, schema_editor):
+    """Remplace les copies de `contexte_donnees` par des snapshots partagés, par lots."""
+    MessageChat = apps.get_model('agri_app', 'MessageChat')
+    ContexteSnapshot = apps.get_model('agri_app', 'ContexteSnapshot')
+
+    identifiants = {}
+    dernier = 0
+    while True:
+        lot = list(
+            MessageChat.objects.filter(pk__gt=dernier, contexte_donnees__isnull=False)
+            .order_by('pk').values_list('pk', 'contexte_donnees')[:TAILLE_LOT]
+        )
+        if not lot:
+            break
+        dernier = lot[-1][0]
+
+        # Même encodage que `agri_app.snapshots` (JSON canonique, zlib au-delà de 512 octets)
+        par_empreinte = {}
+        messages = []
+        for pk, donnees in lot:
+            octets = json.dumps(
+                donnees, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'), ensure_ascii=False
+            ).encode('utf-8')
+            empreinte = hashlib.sha256(octets).hexdigest()
+            par_empreinte.setdefault(empreinte, octets)
+            messages.append((pk, empreinte))
+
+        nouvelles = [e for e in par_empreinte if e not in identifiants]
+        identifiants.update(
+            ContexteSnapshot.objects.filter(empreinte__in=nouvelles).values_list('empreinte', 'pk')
+        )
+        ContexteSnapshot.objects.bulk_create([
+            ContexteSnapshot(
+                empreinte=empreinte,
+                contenu=zlib.compress(octets, 6) if len(octets) >= 512 else octets,
+                compresse=len(octets) >= 512,
+                taille=len(octets),
+            )
+            for empreinte, octets in par_empreinte.items() if empreinte not in identifiants
+        ])
+        identifiants.update(
+            ContexteSnapshot.objects.filter(empreinte__in=nouvelles).values_list('empreinte', 'pk')
+        )
+
+        MessageChat.objects.bulk_update(
+            [MessageChat(pk=pk, contexte_id=identifiants[empreinte]) for pk, empreinte in messages],
+            ['contexte'],
+        )
+
+
+def restaurer_contextes(apps, schema_editor):
+    """Recopie les données des snapshots dans chaque message, par lots."""
+    MessageChat = apps.get_model('agri_app', 'MessageChat')
+    ContexteSnapshot = apps.get_model('agri_app', 'ContexteSnapshot')
+
+    donnees = {}
+    dernier = 0
+    while True:
+        lot = list(
+            MessageChat.objects.filter(pk__gt=dernier, contexte__isnull=False)
+            .order_by('pk').values_list('pk', 'contexte_id')[:TAILLE_LOT]
+        )
+        if not lot:
+            break
+        dernier = lot[-1][0]
+        manquants = {contexte_id for _, contexte_id in lot} - donnees.keys()
+        for snapshot in ContexteSnapshot.objects.filter(pk__in=manquants):
+            contenu = bytes(snapshot.contenu)
+            donnees[snapshot.pk] = json.loads(zlib.decompress(contenu) if snapshot.compresse else contenu)
+        MessageChat.objects.bulk_update(
+            [MessageChat(pk=pk, contexte_donnees=donnees[contexte_id]) for pk, contexte_id in lot],
+            ['contexte_donnees'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agri_app', '0017_conversation_memoire'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContexteSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('empreinte', models.CharField(max_length=64, unique=True, verbose_name='Empreinte SHA-256')),
+                ('contenu', models.BinaryField(help_text='JSON canonique en UTF-8, compressé avec zlib si `compresse`', verbose_name='Contenu')),
+                ('compresse', models.BooleanField(default=False, verbose_name='Compressé')),
+                ('taille', models.PositiveIntegerField(default=0, help_text='Taille du JSON non compressé', verbose_name='Taille (octets)')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de contexte',
+                'verbose_name_plural': 'Snapshots de contexte',
+                'ordering': ['-date_creation'],
+            },
+        ),
+        migrations.AddField(
+            model_name='messagechat',
+            name='contexte',
+            field=models.ForeignKey(blank=True, help_text='Snapshot des données utilisées pour générer la réponse (si IA)', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='messages', to='agri_app.contextesnapshot', verbose_name='Données contextuelles'),
+        ),
+        migrations.RunPython(compacter_contextes, restaurer_contextes),
+        migrations.RemoveField(
+            model_name='messagechat',
+            name='contexte_donnees',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agri_app', '0018_contextesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagechat',
+            name='metadonnees',
+            field=models.JSONField(blank=True, default=dict, help_text="Origine de la réponse IA : cache ('hit', 'miss', 'off') et latences en ms", verbose_name='Métadonnées'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:47
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agri_app', '0019_messagechat_metadonnees'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppelIA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modele', models.CharField(max_length=100, verbose_name='Modèle')),
+                ('endpoint', models.CharField(help_text="Usage de l'appel : chatbot, chatbot_stream, rapport, resume...", max_length=50, verbose_name='Endpoint')),
+                ('rang', models.PositiveSmallIntegerField(default=0, help_text='0 pour le premier modèle essayé, 1 pour le suivant, etc.', verbose_name='Rang dans le relais')),
+                ('resultat', models.CharField(choices=[('succes', 'Succès'), ('erreur', 'Erreur'), ('limite', 'Quota dépassé (429)'), ('delai', 'Délai dépassé'), ('annule', 'Annulé')], max_length=10, verbose_name='Résultat')),
+                ('code_http', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Code HTTP')),
+                ('latence_ms', models.FloatField(verbose_name='Latence (ms)')),
+                ('premier_fragment_ms', models.FloatField(blank=True, help_text='Délai avant le premier fragment (réponses en flux)', null=True, verbose_name='Premier fragment (ms)')),
+                ('tokens_prompt', models.PositiveIntegerField(blank=True, null=True, verbose_name='Tokens du prompt')),
+                ('tokens_reponse', models.PositiveIntegerField(blank=True, null=True, verbose_name='Tokens de la réponse')),
+                ('erreur', models.CharField(blank=True, max_length=200, verbose_name='Erreur')),
+                ('date_appel', models.DateTimeField(default=django.utils.timezone.now, verbose_name="Date de l'appel")),
+            ],
+            options={
+                'verbose_name': 'Appel IA',
+                'verbose_name_plural': 'Appels IA',
+                'ordering': ['-date_appel'],
+                'indexes': [models.Index(fields=['date_appel', 'modele'], name='agri_app_ap_date_ap_144246_idx')],
+            },
+        ),
+    ]
@@ -6,8 +6,12 @@ Ce fichier contient tous les modèles Django nécessaires pour gérer
 les données agricoles : utilisateurs, cultures, récoltes et dépenses.
 """
 
+import json
+import zlib
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
@@ -72,11 +76,28 @@ class Utilisateur(AbstractUser):
         auto_now_add=True,
         verbose_name="Date de création du compte"
     )
+
+    version_donnees = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Version des données",
+        help_text="Incrémentée à chaque modification des cultures, récoltes, dépenses ou conseils (cache des réponses)"
+    )
     
     class Meta:
         verbose_name = "Utilisateur"
         verbose_name_plural = "Utilisateurs"
     
+    def save(self, *args, **kwargs):
+        # `version_donnees` n'est modifiée que par `versioning.incrementer_version` (F() + 1) :
+        # une sauvegarde complète d'un utilisateur chargé avant un incrément ne doit pas l'annuler
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'version_donnees'
+            ]
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.username})"
 
@@ -460,6 +481,272 @@ class ConseilAgricole(models.Model):
         return f"{self.titre} ({self.get_type_conseil_display()})"
 
 
+class UserFinancialSummary(models.Model):
+    """
+    Résumé financier dénormalisé d'un agriculteur (tableau de bord).
+
+    Maintenu incrémentalement par les signaux de Culture, Recolte, Depense et
+    ConseilAgricole (voir `agri_app.summaries`) : le tableau de bord devient
+    la lecture d'une seule ligne. La commande `rebuild_financial_summaries`
+    permet de tout recalculer ou de vérifier l'absence de dérive.
+    """
+    utilisateur = models.OneToOneField(
+        Utilisateur,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='resume_financier',
+        verbose_name="Agriculteur"
+    )
+
+    total_cultures = models.IntegerField(default=0, verbose_name="Nombre de cultures")
+    total_recoltes = models.IntegerField(default=0, verbose_name="Nombre de récoltes")
+
+    revenus_totaux = models.DecimalField(
+        max_digits=20,
+        decimal_places=4,
+        default=Decimal('0'),
+        verbose_name="Revenus totaux"
+    )
+
+    depenses_cultures = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=Decimal('0'),
+        verbose_name="Coûts initiaux des cultures"
+    )
+
+    depenses_recoltes = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=Decimal('0'),
+        verbose_name="Dépenses liées aux récoltes"
+    )
+
+    depenses_generales = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=Decimal('0'),
+        verbose_name="Dépenses générales"
+    )
+
+    culture_plus_rentable = models.CharField(
+        max_length=100,
+        default='Aucune',
+        verbose_name="Culture la plus rentable"
+    )
+
+    rendement_moyen = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=Decimal('0'),
+        verbose_name="Rendement moyen"
+    )
+
+    conseils_non_lus = models.IntegerField(default=0, verbose_name="Conseils non lus")
+
+    date_mise_a_jour = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Dernière mise à jour"
+    )
+
+    class Meta:
+        verbose_name = "Résumé financier"
+        verbose_name_plural = "Résumés financiers"
+
+    def __str__(self):
+        return f"Résumé financier - {self.utilisateur.username}"
+
+    @property
+    def depenses_totales(self):
+        return self.depenses_cultures + self.depenses_recoltes + self.depenses_generales
+
+    @property
+    def benefice_net(self):
+        return self.revenus_totaux - self.depenses_totales
+
+
+class UserMonthlyRollup(models.Model):
+    """
+    Totaux mensuels d'un agriculteur, ventilés par culture.
+
+    Une ligne par (utilisateur, mois, culture) ; `culture` est vide pour les
+    dépenses non rattachées à une culture. Maintenu incrémentalement par les
+    signaux (voir `agri_app.rollups`) : les séries temporelles lisent
+    quelques dizaines de lignes au lieu de parcourir récoltes et dépenses.
+    La commande `rebuild_monthly_rollups` recalcule ou vérifie la table.
+    """
+    utilisateur = models.ForeignKey(
+        Utilisateur,
+        on_delete=models.CASCADE,
+        related_name='cumuls_mensuels',
+        verbose_name="Agriculteur"
+    )
+
+    mois = models.DateField(
+        verbose_name="Mois",
+        help_text="Premier jour du mois"
+    )
+
+    culture = models.ForeignKey(
+        Culture,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='cumuls_mensuels',
+        verbose_name="Culture"
+    )
+
+    revenus = models.DecimalField(
+        max_digits=20,
+        decimal_places=4,
+        default=Decimal('0'),
+        verbose_name="Revenus des récoltes"
+    )
+
+    depenses_recoltes = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=Decimal('0'),
+        verbose_name="Dépenses liées aux récoltes"
+    )
+
+    depenses_generales = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=Decimal('0'),
+        verbose_name="Dépenses"
+    )
+
+    couts_initiaux = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=Decimal('0'),
+        verbose_name="Coûts initiaux des cultures"
+    )
+
+    date_mise_a_jour = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Dernière mise à jour"
+    )
+
+    class Meta:
+        verbose_name = "Cumul mensuel"
+        verbose_name_plural = "Cumuls mensuels"
+        ordering = ['utilisateur', 'mois']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['utilisateur', 'mois', 'culture'],
+                condition=models.Q(culture__isnull=False),
+                name='unique_cumul_mensuel_culture'
+            ),
+            # NULL n'est jamais égal à NULL : contrainte séparée sans culture
+            models.UniqueConstraint(
+                fields=['utilisateur', 'mois'],
+                condition=models.Q(culture__isnull=True),
+                name='unique_cumul_mensuel_sans_culture'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['utilisateur', 'mois']),
+        ]
+
+    def __str__(self):
+        return f"{self.utilisateur.username} - {self.mois:%m/%Y}"
+
+
+class RegionalBenchmark(models.Model):
+    """
+    Référentiel régional d'une culture : moyennes de tous les agriculteurs.
+
+    Une ligne par (culture, zone, saison), calculée chaque nuit par la
+    commande `compute_regional_benchmarks` (voir `agri_app.benchmarks`).
+    Les noms et zones sont normalisés (minuscules, sans accents) ; la zone
+    '*' et la saison 'toutes' regroupent toutes les zones ou saisons. Un
+    groupe n'est publié qu'à partir d'un nombre minimal d'agriculteurs
+    distincts, pour qu'aucune exploitation ne soit identifiable.
+    """
+    SAISON_CHOICES = [
+        ('seche', 'Saison sèche (novembre - mars)'),
+        ('grande_pluies', 'Grande saison des pluies (avril - juillet)'),
+        ('petite_pluies', 'Petite saison des pluies (août - octobre)'),
+        ('toutes', 'Toutes saisons'),
+    ]
+
+    culture_nom = models.CharField(
+        max_length=100,
+        verbose_name="Culture (normalisée)"
+    )
+
+    libelle = models.CharField(
+        max_length=100,
+        verbose_name="Nom affiché"
+    )
+
+    zone = models.CharField(
+        max_length=200,
+        verbose_name="Zone (normalisée)",
+        help_text="'*' pour toutes les zones"
+    )
+
+    saison = models.CharField(
+        max_length=20,
+        choices=SAISON_CHOICES,
+        verbose_name="Saison de plantation"
+    )
+
+    nb_agriculteurs = models.PositiveIntegerField(
+        verbose_name="Nombre d'agriculteurs"
+    )
+
+    nb_cultures = models.PositiveIntegerField(
+        verbose_name="Nombre de cultures"
+    )
+
+    rendement_moyen = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        verbose_name="Rendement moyen (par ha)"
+    )
+
+    rendement_median = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        verbose_name="Rendement médian (par ha)"
+    )
+
+    cout_par_hectare = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        verbose_name="Coût moyen par hectare (FCFA)"
+    )
+
+    prix_vente_moyen = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        verbose_name="Prix de vente moyen (FCFA/unité)",
+        help_text="Pondéré par les quantités vendues"
+    )
+
+    date_calcul = models.DateTimeField(
+        verbose_name="Date du calcul"
+    )
+
+    class Meta:
+        verbose_name = "Référentiel régional"
+        verbose_name_plural = "Référentiels régionaux"
+        ordering = ['culture_nom', 'zone', 'saison']
+        constraints = [
+            # Sert aussi d'index pour la recherche par (culture, zone, saison)
+            models.UniqueConstraint(
+                fields=['culture_nom', 'zone', 'saison'],
+                name='unique_referentiel_regional'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.libelle} - {self.zone} ({self.saison})"
+
+
 class Conversation(models.Model):
     """
     Regroupe une série d'échanges entre l'utilisateur et l'IA.
@@ -487,6 +774,18 @@ class Conversation(models.Model):
         verbose_name="Dernière activité"
     )
     
+    resume = models.TextField(
+        blank=True,
+        verbose_name="Résumé des échanges anciens",
+        help_text="Résumé glissant des messages sortis de la fenêtre transmise à l'IA"
+    )
+    
+    resume_jusqu_a = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="Résumé jusqu'au message",
+        help_text="Identifiant du dernier message intégré au résumé"
+    )
+    
     class Meta:
         ordering = ['-date_mise_a_jour']
         verbose_name = "Conversation IA"
@@ -496,6 +795,57 @@ class Conversation(models.Model):
         return f"{self.titre or 'Nouvelle conversation'} ({self.date_creation.strftime('%d/%m/%Y')})"
 
 
+class ContexteSnapshot(models.Model):
+    """
+    Données contextuelles transmises à l'IA, stockées une seule fois.
+
+    Identifiées par l'empreinte SHA-256 de leur JSON canonique : les messages
+    générés à partir des mêmes données partagent le même snapshot (voir
+    `agri_app.snapshots`).
+    """
+    empreinte = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name="Empreinte SHA-256"
+    )
+    
+    contenu = models.BinaryField(
+        verbose_name="Contenu",
+        help_text="JSON canonique en UTF-8, compressé avec zlib si `compresse`"
+    )
+    
+    compresse = models.BooleanField(
+        default=False,
+        verbose_name="Compressé"
+    )
+    
+    taille = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Taille (octets)",
+        help_text="Taille du JSON non compressé"
+    )
+    
+    date_creation = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Date de création"
+    )
+    
+    class Meta:
+        ordering = ['-date_creation']
+        verbose_name = "Snapshot de contexte"
+        verbose_name_plural = "Snapshots de contexte"
+    
+    @property
+    def donnees(self):
+        contenu = bytes(self.contenu)
+        if self.compresse:
+            contenu = zlib.decompress(contenu)
+        return json.loads(contenu)
+    
+    def __str__(self):
+        return f"{self.empreinte[:12]} ({self.taille} octets)"
+
+
 class MessageChat(models.Model):
     """
     Un message individuel dans une conversation (User ou IA).
@@ -522,18 +872,37 @@ class MessageChat(models.Model):
         verbose_name="Date d'envoi"
     )
     
-    contexte_donnees = models.JSONField(
+    contexte = models.ForeignKey(
+        ContexteSnapshot,
+        on_delete=models.PROTECT,
         null=True,
         blank=True,
+        related_name='messages',
         verbose_name="Données contextuelles",
         help_text="Snapshot des données utilisées pour générer la réponse (si IA)"
     )
     
+    metadonnees = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Métadonnées",
+        help_text="Origine de la réponse IA : cache ('hit', 'miss', 'off') et latences en ms"
+    )
+    
     class Meta:
         ordering = ['date_envoi']
+        indexes = [
+            # Fenêtre des derniers messages d'une conversation (mémoire du chatbot)
+            models.Index(fields=['conversation', '-id']),
+        ]
         verbose_name = "Message Chat"
         verbose_name_plural = "Messages Chat"
     
+    @property
+    def contexte_donnees(self):
+        """Données utilisées pour générer la réponse (lues dans le snapshot)."""
+        return self.contexte.donnees if self.contexte_id else None
+    
     def __str__(self):
         sender = "User" if self.est_utilisateur else "IA"
         return f"{sender}: {self.contenu[:50]}..."
@@ -599,6 +968,59 @@ class RapportIA(models.Model):
         return f"Rapport du {self.date_creation.strftime('%d/%m/%Y')} - {self.utilisateur.username}"
 
 
+class AppelIA(models.Model):
+    """
+    Télémétrie d'un appel à un modèle du relais Groq (voir `agri_app.ai_telemetry`).
+
+    Une ligne par modèle sollicité : un relais qui passe au modèle suivant ou
+    le double en parallèle produit plusieurs lignes, distinguées par `rang`.
+    """
+    RESULTAT_CHOICES = [
+        ('succes', 'Succès'),
+        ('erreur', 'Erreur'),
+        ('limite', 'Quota dépassé (429)'),
+        ('delai', 'Délai dépassé'),
+        ('annule', 'Annulé'),
+    ]
+
+    modele = models.CharField(max_length=100, verbose_name="Modèle")
+    endpoint = models.CharField(
+        max_length=50,
+        verbose_name="Endpoint",
+        help_text="Usage de l'appel : chatbot, chatbot_stream, rapport, resume..."
+    )
+    rang = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Rang dans le relais",
+        help_text="0 pour le premier modèle essayé, 1 pour le suivant, etc."
+    )
+    resultat = models.CharField(max_length=10, choices=RESULTAT_CHOICES, verbose_name="Résultat")
+    code_http = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Code HTTP")
+    latence_ms = models.FloatField(verbose_name="Latence (ms)")
+    premier_fragment_ms = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="Premier fragment (ms)",
+        help_text="Délai avant le premier fragment (réponses en flux)"
+    )
+    tokens_prompt = models.PositiveIntegerField(null=True, blank=True, verbose_name="Tokens du prompt")
+    tokens_reponse = models.PositiveIntegerField(null=True, blank=True, verbose_name="Tokens de la réponse")
+    erreur = models.CharField(max_length=200, blank=True, verbose_name="Erreur")
+    # Heure de l'appel (et non de l'insertion, différée par l'écriture groupée)
+    date_appel = models.DateTimeField(default=timezone.now, verbose_name="Date de l'appel")
+
+    class Meta:
+        verbose_name = "Appel IA"
+        verbose_name_plural = "Appels IA"
+        ordering = ['-date_appel']
+        indexes = [
+            models.Index(fields=['date_appel', 'modele']),
+        ]
+
+    def __str__(self):
+        return f"{self.modele} ({self.endpoint}) - {self.resultat} en {self.latence_ms:.0f} ms"
+
+
 class UserLocation(models.Model):
     """
     Modèle pour stocker l'historique de localisation de l'utilisateur.
@@ -651,12 +1073,95 @@ class UserLocation(models.Model):
         verbose_name_plural = "Localisations Utilisateurs"
         indexes = [
             models.Index(fields=['utilisateur', '-timestamp']),
+            models.Index(fields=['timestamp']),
         ]
     
     def __str__(self):
         return f"{self.utilisateur.username} - {self.city}, {self.country} ({self.timestamp})"
 
 
+class UserLocationDailySummary(models.Model):
+    """
+    Agrégat journalier des localisations d'un utilisateur, par ville et pays.
+
+    Alimenté par la commande `compact_user_locations`, qui y consolide les
+    `UserLocation` plus anciennes que la durée de rétention avant de les supprimer.
+    """
+    utilisateur = models.ForeignKey(
+        Utilisateur,
+        on_delete=models.CASCADE,
+        related_name='locations_journalieres',
+        verbose_name="Utilisateur"
+    )
+
+    jour = models.DateField(
+        verbose_name="Jour"
+    )
+
+    city = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        verbose_name="Ville"
+    )
+
+    country = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        verbose_name="Pays"
+    )
+
+    nb_evenements = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Nombre de localisations"
+    )
+
+    derniere_ip = models.GenericIPAddressField(
+        null=True,
+        blank=True,
+        verbose_name="Dernière adresse IP"
+    )
+
+    latitude = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="Latitude"
+    )
+
+    longitude = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="Longitude"
+    )
+
+    premiere_vue = models.DateTimeField(
+        verbose_name="Première localisation"
+    )
+
+    derniere_vue = models.DateTimeField(
+        verbose_name="Dernière localisation"
+    )
+
+    class Meta:
+        ordering = ['-jour']
+        verbose_name = "Localisation journalière"
+        verbose_name_plural = "Localisations journalières"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['utilisateur', 'jour', 'country', 'city'],
+                name='unique_localisation_journaliere'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['utilisateur', '-jour']),
+            models.Index(fields=['country', 'city']),
+        ]
+
+    def __str__(self):
+        return f"{self.utilisateur.username} - {self.city}, {self.country} ({self.jour})"
+
+
 class SupportMessage(models.Model):
     """
     Modèle pour les messages de support et propositions des utilisateurs.
@@ -0,0 +1,128 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Maintenance des cumuls mensuels (`UserMonthlyRollup`).
+
+- `appliquer_cumul()` ajoute une variation au cumul d'un (utilisateur,
+  mois, culture), appelé par les signaux à chaque enregistrement ou
+  suppression ;
+- `calculer_cumuls()` / `reconstruire_cumuls()` recalculent tout à partir
+  des tables sources (commande `rebuild_monthly_rollups`) ;
+- `historique_mensuel()` fournit la série mensuelle d'un utilisateur.
+
+Une suppression ne crée jamais de ligne : le cumul concerné existe déjà,
+ou il vient d'être supprimé en cascade avec la culture ou l'utilisateur.
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Sum, F
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Culture, Recolte, Depense, UserMonthlyRollup
+from .timeseries import ajouter_mois
+
+
+CHAMPS_CUMUL = ['revenus', 'depenses_recoltes', 'depenses_generales', 'couts_initiaux']
+
+
+def mois_de(jour):
+    """Premier jour du mois d'une date (les dates peuvent arriver en texte ISO)."""
+    if isinstance(jour, str):
+        jour = date.fromisoformat(jour[:10])
+    return date(jour.year, jour.month, 1)
+
+
+def appliquer_cumul(user_id, jour, culture_id, creer=True, **deltas):
+    """Ajoute des variations au cumul (utilisateur, mois de `jour`, culture)."""
+    deltas = {champ: valeur for champ, valeur in deltas.items() if valeur}
+    if user_id is None or jour is None or not deltas:
+        return
+    mois = mois_de(jour)
+    cumul = UserMonthlyRollup.objects.filter(utilisateur_id=user_id, mois=mois, culture_id=culture_id)
+    updates = {champ: F(champ) + valeur for champ, valeur in deltas.items()}
+    if cumul.update(**updates) or not creer:
+        return
+    try:
+        with transaction.atomic():
+            UserMonthlyRollup.objects.create(
+                utilisateur_id=user_id, mois=mois, culture_id=culture_id, **deltas
+            )
+    except IntegrityError:
+        # Création concurrente : la ligne existe désormais
+        cumul.update(**updates)
+
+
+def calculer_cumuls(user_id):
+    """Recalcule les cumuls d'un utilisateur : {(mois, culture_id): {champ: total}}."""
+    cumuls = {}
+
+    def ajouter(lignes):
+        for ligne in lignes:
+            valeurs = cumuls.setdefault(
+                (ligne.pop('mois'), ligne.pop('culture_id')),
+                {champ: Decimal('0') for champ in CHAMPS_CUMUL},
+            )
+            for champ, total in ligne.items():
+                valeurs[champ] += total or Decimal('0')
+
+    ajouter(Recolte.objects.filter(
+        culture__utilisateur_id=user_id
+    ).annotate(mois=TruncMonth('date_recolte')).values('mois', 'culture_id').annotate(
+        revenus=Sum(F('quantite_recoltee') * F('prix_vente_unitaire')),
+        depenses_recoltes=Sum('depenses_liees_recolte'),
+    ).order_by())
+
+    ajouter(Depense.objects.filter(
+        utilisateur_id=user_id
+    ).annotate(mois=TruncMonth('date_depense')).values('mois', 'culture_id').annotate(
+        depenses_generales=Sum('montant'),
+    ).order_by())
+
+    ajouter(Culture.objects.filter(
+        utilisateur_id=user_id
+    ).annotate(mois=TruncMonth('date_culture'), culture_id=F('pk')).values('mois', 'culture_id').annotate(
+        couts_initiaux=Sum(F('cout_achat_semences') + F('cout_main_oeuvre')),
+    ).order_by())
+
+    return cumuls
+
+
+def reconstruire_cumuls(user_id):
+    """Remplace tous les cumuls d'un utilisateur par un recalcul complet."""
+    lignes = [
+        UserMonthlyRollup(utilisateur_id=user_id, mois=mois, culture_id=culture_id, **valeurs)
+        for (mois, culture_id), valeurs in calculer_cumuls(user_id).items()
+    ]
+    with transaction.atomic():
+        UserMonthlyRollup.objects.filter(utilisateur_id=user_id).delete()
+        UserMonthlyRollup.objects.bulk_create(lignes)
+    return len(lignes)
+
+
+def historique_mensuel(user_id, nb_mois=12):
+    """Revenus et dépenses des `nb_mois` derniers mois, lus dans les cumuls."""
+    fin = mois_de(timezone.localdate())
+    debut = ajouter_mois(fin, -(nb_mois - 1))
+    totaux = {
+        ligne['mois']: ligne
+        for ligne in UserMonthlyRollup.objects.filter(
+            utilisateur_id=user_id, mois__gte=debut, mois__lte=fin
+        ).values('mois').annotate(
+            total_revenus=Sum('revenus'),
+            total_depenses=Sum(F('depenses_recoltes') + F('depenses_generales') + F('couts_initiaux')),
+        ).order_by()
+    }
+
+    historique = []
+    for i in range(nb_mois):
+        mois = ajouter_mois(debut, i)
+        ligne = totaux.get(mois, {})
+        historique.append({
+            'mois': mois.strftime('%Y-%m'),
+            'revenus': float(ligne.get('total_revenus') or 0),
+            'depenses': float(ligne.get('total_depenses') or 0),
+        })
+    return historique
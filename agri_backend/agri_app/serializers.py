@@ -9,6 +9,7 @@ pour convertir les modèles en JSON et vice versa.
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from .models import Utilisateur, Culture, Recolte, Depense, ConseilAgricole, RapportIA, Conversation, MessageChat, SupportMessage, ProduitAnnonce, NewsletterSubscription, ContactMessage
+from .analytics import vers_decimal, vers_entier
 
 
 class UtilisateurSerializer(serializers.ModelSerializer):
@@ -112,7 +113,7 @@ class CultureSerializer(serializers.ModelSerializer):
     
     utilisateur = serializers.StringRelatedField(read_only=True)
     cout_total_initial = serializers.ReadOnlyField()
-    rendement_par_hectare = serializers.ReadOnlyField()
+    rendement_par_hectare = serializers.SerializerMethodField()
     nombre_recoltes = serializers.SerializerMethodField()
     revenus_totaux = serializers.SerializerMethodField()
     
@@ -127,12 +128,30 @@ class CultureSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'date_creation', 'date_modification']
     
+    # Les vues annotent le queryset (`analytics.annoter_cultures`) : les champs
+    # `ind_*` évitent une requête par culture ; à défaut, calcul classique.
+
+    def get_rendement_par_hectare(self, obj):
+        """Calcule le rendement par hectare si des récoltes existent."""
+        total_recolte = getattr(obj, 'ind_total_recolte', None)
+        if total_recolte is None:
+            return obj.rendement_par_hectare
+        if obj.superficie and obj.superficie > 0:
+            return total_recolte / obj.superficie
+        return 0
+    
     def get_nombre_recoltes(self, obj):
         """Retourne le nombre de récoltes pour cette culture."""
+        nombre = getattr(obj, 'ind_nb_recoltes', None)
+        if nombre is not None:
+            return nombre
         return obj.recoltes.count()
     
     def get_revenus_totaux(self, obj):
         """Calcule les revenus totaux de toutes les récoltes de cette culture."""
+        revenus = getattr(obj, 'ind_revenus', None)
+        if revenus is not None:
+            return vers_decimal(vers_entier(revenus))
         return sum(recolte.revenus_totaux for recolte in obj.recoltes.all())
 
 
@@ -310,9 +329,13 @@ class MessageChatSerializer(serializers.ModelSerializer):
     """
     Serializer pour les messages du chat.
     """
+    # Données lues dans le snapshot (`MessageChat.contexte_donnees`)
+    contexte_donnees = serializers.JSONField(read_only=True)
+
     class Meta:
         model = MessageChat
-        fields = ['id', 'est_utilisateur', 'contenu', 'date_envoi', 'contexte_donnees']
+        # `contexte` : identifiant du snapshot des données
+        fields = ['id', 'est_utilisateur', 'contenu', 'date_envoi', 'contexte_donnees', 'contexte']
         read_only_fields = ['date_envoi']
 
 
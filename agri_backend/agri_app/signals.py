@@ -3,10 +3,13 @@
 Signaux Django pour déclencher des notifications automatiques.
 """
 
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from decimal import Decimal
-from .models import Culture, Recolte, Depense, RapportIA, ConseilAgricole, Utilisateur
+from .models import Culture, Recolte, Depense, RapportIA, ConseilAgricole, Utilisateur, UserFinancialSummary
+from .summaries import appliquer_deltas, rafraichir_classement
+from .rollups import appliquer_cumul, reconstruire_cumuls
+from .versioning import incrementer_version
 
 @receiver(post_save, sender=Utilisateur)
 def notify_welcome(sender, instance, created, **kwargs):
@@ -86,3 +89,256 @@ def notify_new_report(sender, instance, created, **kwargs):
             type_conseil='technique',
             priorite='moyenne'
         )
+
+
+# --- Résumé financier : maintenance incrémentale ---
+
+# Valeurs lues avant chaque modification pour calculer les variations
+ETAT_PRECEDENT = {
+    Culture: ['utilisateur_id', 'cout_achat_semences', 'cout_main_oeuvre', 'date_culture'],
+    Recolte: ['culture__utilisateur_id', 'culture_id', 'quantite_recoltee', 'prix_vente_unitaire', 'depenses_liees_recolte', 'date_recolte'],
+    Depense: ['utilisateur_id', 'culture_id', 'montant', 'date_depense'],
+    ConseilAgricole: ['utilisateur_id', 'lu'],
+}
+
+
+def memoriser_etat_precedent(sender, instance, raw=False, **kwargs):
+    """Mémorise l'état en base d'une instance modifiée (None pour une création)."""
+    etat = None
+    if instance.pk and not raw:
+        etat = sender.objects.filter(pk=instance.pk).values(*ETAT_PRECEDENT[sender]).first()
+    instance._etat_precedent = etat
+
+
+for _model in ETAT_PRECEDENT:
+    pre_save.connect(memoriser_etat_precedent, sender=_model, dispatch_uid=f'etat_precedent_{_model.__name__}')
+
+
+def _dec(valeur):
+    return Decimal(str(valeur)) if valeur is not None else Decimal('0')
+
+
+def _invalider_resumes(*user_ids):
+    """Supprime les résumés concernés : ils seront reconstruits à la prochaine lecture."""
+    UserFinancialSummary.objects.filter(utilisateur_id__in=[u for u in user_ids if u]).delete()
+
+
+def _utilisateur_recolte(recolte):
+    # Mémorisé sur l'instance : plusieurs récepteurs en ont besoin pour le même événement
+    memo = getattr(recolte, '_utilisateur_memo', None)
+    if memo is None or memo[0] != recolte.culture_id:
+        user_id = Culture.objects.filter(pk=recolte.culture_id).values_list('utilisateur_id', flat=True).first()
+        memo = recolte._utilisateur_memo = (recolte.culture_id, user_id)
+    return memo[1]
+
+
+@receiver(post_save, sender=Culture)
+def resume_culture_enregistree(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    cout = _dec(instance.cout_achat_semences) + _dec(instance.cout_main_oeuvre)
+    ancien = getattr(instance, '_etat_precedent', None)
+    if ancien is None:
+        appliquer_deltas(instance.utilisateur_id, total_cultures=1, depenses_cultures=cout)
+    elif ancien['utilisateur_id'] != instance.utilisateur_id:
+        # Changement de propriétaire (admin) : les récoltes suivent la culture
+        _invalider_resumes(ancien['utilisateur_id'], instance.utilisateur_id)
+        return
+    else:
+        ancien_cout = _dec(ancien['cout_achat_semences']) + _dec(ancien['cout_main_oeuvre'])
+        appliquer_deltas(instance.utilisateur_id, depenses_cultures=cout - ancien_cout)
+    rafraichir_classement(instance.utilisateur_id)
+
+
+@receiver(post_delete, sender=Culture)
+def resume_culture_supprimee(sender, instance, **kwargs):
+    cout = _dec(instance.cout_achat_semences) + _dec(instance.cout_main_oeuvre)
+    appliquer_deltas(instance.utilisateur_id, total_cultures=-1, depenses_cultures=-cout)
+    rafraichir_classement(instance.utilisateur_id)
+
+
+@receiver(post_save, sender=Recolte)
+def resume_recolte_enregistree(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    user_id = _utilisateur_recolte(instance)
+    revenus = _dec(instance.quantite_recoltee) * _dec(instance.prix_vente_unitaire)
+    depenses = _dec(instance.depenses_liees_recolte)
+    ancien = getattr(instance, '_etat_precedent', None)
+    if ancien is None:
+        appliquer_deltas(user_id, total_recoltes=1, revenus_totaux=revenus, depenses_recoltes=depenses)
+    elif ancien['culture__utilisateur_id'] != user_id:
+        _invalider_resumes(ancien['culture__utilisateur_id'], user_id)
+        return
+    else:
+        appliquer_deltas(
+            user_id,
+            revenus_totaux=revenus - _dec(ancien['quantite_recoltee']) * _dec(ancien['prix_vente_unitaire']),
+            depenses_recoltes=depenses - _dec(ancien['depenses_liees_recolte']),
+        )
+    rafraichir_classement(user_id)
+
+
+@receiver(post_delete, sender=Recolte)
+def resume_recolte_supprimee(sender, instance, **kwargs):
+    user_id = _utilisateur_recolte(instance)
+    appliquer_deltas(
+        user_id,
+        total_recoltes=-1,
+        revenus_totaux=-(_dec(instance.quantite_recoltee) * _dec(instance.prix_vente_unitaire)),
+        depenses_recoltes=-_dec(instance.depenses_liees_recolte),
+    )
+    rafraichir_classement(user_id)
+
+
+@receiver(post_save, sender=Depense)
+def resume_depense_enregistree(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    ancien = getattr(instance, '_etat_precedent', None)
+    if ancien is None:
+        appliquer_deltas(instance.utilisateur_id, depenses_generales=_dec(instance.montant))
+    elif ancien['utilisateur_id'] != instance.utilisateur_id:
+        _invalider_resumes(ancien['utilisateur_id'], instance.utilisateur_id)
+        return
+    else:
+        appliquer_deltas(instance.utilisateur_id, depenses_generales=_dec(instance.montant) - _dec(ancien['montant']))
+    # Les dépenses rattachées à une culture modifient sa rentabilité
+    if instance.culture_id or (ancien and ancien['culture_id']):
+        rafraichir_classement(instance.utilisateur_id)
+
+
+@receiver(post_delete, sender=Depense)
+def resume_depense_supprimee(sender, instance, **kwargs):
+    appliquer_deltas(instance.utilisateur_id, depenses_generales=-_dec(instance.montant))
+    if instance.culture_id:
+        rafraichir_classement(instance.utilisateur_id)
+
+
+@receiver(post_save, sender=ConseilAgricole)
+def resume_conseil_enregistre(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    ancien = getattr(instance, '_etat_precedent', None)
+    if ancien is None:
+        if not instance.lu:
+            appliquer_deltas(instance.utilisateur_id, conseils_non_lus=1)
+    elif ancien['utilisateur_id'] != instance.utilisateur_id:
+        _invalider_resumes(ancien['utilisateur_id'], instance.utilisateur_id)
+    elif ancien['lu'] != instance.lu:
+        appliquer_deltas(instance.utilisateur_id, conseils_non_lus=-1 if instance.lu else 1)
+
+
+@receiver(post_delete, sender=ConseilAgricole)
+def resume_conseil_supprime(sender, instance, **kwargs):
+    if not instance.lu:
+        appliquer_deltas(instance.utilisateur_id, conseils_non_lus=-1)
+
+
+
+# --- Cumuls mensuels : maintenance incrémentale ---
+
+def _cout_initial(culture):
+    return _dec(culture.cout_achat_semences) + _dec(culture.cout_main_oeuvre)
+
+
+@receiver(post_save, sender=Culture)
+def cumul_culture_enregistree(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    ancien = getattr(instance, '_etat_precedent', None)
+    if ancien and ancien['utilisateur_id'] != instance.utilisateur_id:
+        # Les récoltes suivent la culture chez le nouveau propriétaire
+        reconstruire_cumuls(ancien['utilisateur_id'])
+        reconstruire_cumuls(instance.utilisateur_id)
+        return
+    if ancien:
+        appliquer_cumul(
+            instance.utilisateur_id, ancien['date_culture'], instance.pk,
+            couts_initiaux=-(_dec(ancien['cout_achat_semences']) + _dec(ancien['cout_main_oeuvre'])),
+        )
+    appliquer_cumul(instance.utilisateur_id, instance.date_culture, instance.pk, couts_initiaux=_cout_initial(instance))
+
+
+@receiver(post_delete, sender=Culture)
+def cumul_culture_supprimee(sender, instance, **kwargs):
+    # En général déjà supprimé en cascade avec la culture
+    appliquer_cumul(
+        instance.utilisateur_id, instance.date_culture, instance.pk, creer=False,
+        couts_initiaux=-_cout_initial(instance),
+    )
+
+
+@receiver(post_save, sender=Recolte)
+def cumul_recolte_enregistree(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    ancien = getattr(instance, '_etat_precedent', None)
+    if ancien:
+        appliquer_cumul(
+            ancien['culture__utilisateur_id'], ancien['date_recolte'], ancien['culture_id'],
+            revenus=-(_dec(ancien['quantite_recoltee']) * _dec(ancien['prix_vente_unitaire'])),
+            depenses_recoltes=-_dec(ancien['depenses_liees_recolte']),
+        )
+    appliquer_cumul(
+        _utilisateur_recolte(instance), instance.date_recolte, instance.culture_id,
+        revenus=_dec(instance.quantite_recoltee) * _dec(instance.prix_vente_unitaire),
+        depenses_recoltes=_dec(instance.depenses_liees_recolte),
+    )
+
+
+@receiver(post_delete, sender=Recolte)
+def cumul_recolte_supprimee(sender, instance, **kwargs):
+    appliquer_cumul(
+        _utilisateur_recolte(instance), instance.date_recolte, instance.culture_id, creer=False,
+        revenus=-(_dec(instance.quantite_recoltee) * _dec(instance.prix_vente_unitaire)),
+        depenses_recoltes=-_dec(instance.depenses_liees_recolte),
+    )
+
+
+@receiver(post_save, sender=Depense)
+def cumul_depense_enregistree(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    ancien = getattr(instance, '_etat_precedent', None)
+    if ancien:
+        appliquer_cumul(
+            ancien['utilisateur_id'], ancien['date_depense'], ancien['culture_id'],
+            depenses_generales=-_dec(ancien['montant']),
+        )
+    appliquer_cumul(
+        instance.utilisateur_id, instance.date_depense, instance.culture_id,
+        depenses_generales=_dec(instance.montant),
+    )
+
+
+@receiver(post_delete, sender=Depense)
+def cumul_depense_supprimee(sender, instance, **kwargs):
+    appliquer_cumul(
+        instance.utilisateur_id, instance.date_depense, instance.culture_id, creer=False,
+        depenses_generales=-_dec(instance.montant),
+    )
+
+# --- Version des données : invalide le cache des réponses ---
+
+def _proprietaires(sender, instance):
+    """Utilisateur(s) dont les données changent : propriétaire actuel et précédent."""
+    if sender is Recolte:
+        user_id = _utilisateur_recolte(instance)
+        cle_ancien = 'culture__utilisateur_id'
+    else:
+        user_id = instance.utilisateur_id
+        cle_ancien = 'utilisateur_id'
+    ancien = getattr(instance, '_etat_precedent', None)
+    return user_id, ancien[cle_ancien] if ancien else None
+
+
+def version_donnees_modifiee(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    incrementer_version(*_proprietaires(sender, instance))
+
+
+for _model in (Culture, Recolte, Depense, ConseilAgricole):
+    post_save.connect(version_donnees_modifiee, sender=_model, dispatch_uid=f'version_save_{_model.__name__}')
+    post_delete.connect(version_donnees_modifiee, sender=_model, dispatch_uid=f'version_delete_{_model.__name__}')
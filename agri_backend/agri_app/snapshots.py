@@ -0,0 +1,65 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Stockage par contenu des données contextuelles des messages du chatbot.
+
+Chaque réponse de l'IA référence le `ContexteSnapshot` des données qui ont
+servi à la générer. Les données sont identifiées par l'empreinte SHA-256 de
+leur JSON canonique (clés triées, sans espaces) : tant que les données de
+l'utilisateur ne changent pas, tous ses messages partagent le même snapshot,
+retrouvé par une requête sur l'index unique de l'empreinte.
+"""
+
+import hashlib
+import json
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import ContexteSnapshot
+
+
+def canonique(donnees):
+    """JSON canonique (UTF-8) : la même donnée donne toujours les mêmes octets."""
+    return json.dumps(
+        donnees, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'), ensure_ascii=False
+    ).encode('utf-8')
+
+
+def empreinte(octets):
+    return hashlib.sha256(octets).hexdigest()
+
+
+def compresser(octets):
+    """`(contenu, compresse)` à enregistrer pour le JSON canonique `octets`."""
+    if settings.AI_SNAPSHOT_COMPRESSION and len(octets) >= settings.AI_SNAPSHOT_COMPRESS_MIN_BYTES:
+        return zlib.compress(octets, 6), True
+    return octets, False
+
+
+def snapshot_id(donnees):
+    """
+    Identifiant du snapshot de `donnees` (créé s'il n'existe pas encore).
+
+    None si `donnees` est None.
+    """
+    if donnees is None:
+        return None
+    octets = canonique(donnees)
+    cle = empreinte(octets)
+    identifiant = ContexteSnapshot.objects.filter(empreinte=cle).values_list('pk', flat=True).first()
+    if identifiant is None:
+        # Compressé seulement à la création ; `get_or_create` gère la création concurrente
+        contenu, compresse = compresser(octets)
+        snapshot, _ = ContexteSnapshot.objects.get_or_create(
+            empreinte=cle,
+            defaults={'contenu': contenu, 'compresse': compresse, 'taille': len(octets)},
+        )
+        identifiant = snapshot.pk
+    return identifiant
+
+
+def purger_orphelins():
+    """Supprime les snapshots qui ne sont plus référencés par aucun message."""
+    supprimes, _ = ContexteSnapshot.objects.filter(messages__isnull=True).delete()
+    return supprimes
@@ -0,0 +1,38 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Server-Sent Events (SSE) pour les réponses générées progressivement.
+
+Chaque événement est une ligne `event:` optionnelle suivie d'une ligne
+`data:` contenant un objet JSON, puis d'une ligne vide.
+"""
+
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+def evenement_sse(donnees, evenement=None):
+    """Sérialise un événement SSE (`donnees` en JSON sur une seule ligne)."""
+    lignes = []
+    if evenement:
+        lignes.append(f"event: {evenement}")
+    lignes.append(f"data: {json.dumps(donnees, ensure_ascii=False)}")
+    return "\n".join(lignes) + "\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Accepte `Accept: text/event-stream` pour les vues en streaming.
+
+    Les réponses DRF ordinaires de ces vues (erreurs de validation, 404)
+    sont alors rendues sous la forme d'un unique événement `error`.
+    """
+
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return evenement_sse(data, 'error').encode(self.charset)
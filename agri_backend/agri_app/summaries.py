@@ -0,0 +1,146 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Maintenance du résumé financier dénormalisé (`UserFinancialSummary`).
+
+- `calculer_resume()` recalcule toutes les valeurs à partir des tables sources ;
+- `appliquer_deltas()` et `rafraichir_classement()` sont appelés par les
+  signaux pour maintenir le résumé de façon incrémentale ;
+- `get_resume_financier()` est utilisé par le tableau de bord.
+
+Les mises à jour incrémentales ne créent jamais de ligne : un résumé absent
+est construit intégralement à la première lecture, ce qui évite toute
+écriture pour un utilisateur en cours de suppression.
+"""
+
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Sum, Avg, F, Subquery, OuterRef, DecimalField
+from django.db.models.functions import Coalesce
+
+from .models import Culture, Recolte, Depense, ConseilAgricole, UserFinancialSummary
+
+
+CHAMPS_ADDITIFS = [
+    'total_cultures', 'total_recoltes', 'revenus_totaux',
+    'depenses_cultures', 'depenses_recoltes', 'depenses_generales',
+    'conseils_non_lus',
+]
+
+
+def calculer_classement(user_id):
+    """Culture la plus rentable et rendement moyen (non décomposables en deltas)."""
+    revenues_subquery = Recolte.objects.filter(
+        culture=OuterRef('pk')
+    ).values('culture').annotate(
+        total=Sum(F('quantite_recoltee') * F('prix_vente_unitaire'))
+    ).values('total')
+
+    expenses_subquery = Depense.objects.filter(
+        culture=OuterRef('pk')
+    ).values('culture').annotate(
+        total=Sum('montant')
+    ).values('total')
+
+    culture_plus_rentable_obj = Culture.objects.filter(
+        utilisateur_id=user_id
+    ).annotate(
+        total_revenus=Coalesce(Subquery(revenues_subquery, output_field=DecimalField()), Decimal('0.0')),
+        total_depenses_associees=Coalesce(Subquery(expenses_subquery, output_field=DecimalField()), Decimal('0.0'))
+    ).annotate(
+        benefice_net_culture=F('total_revenus') - (F('cout_achat_semences') + F('cout_main_oeuvre') + F('total_depenses_associees'))
+    ).filter(total_revenus__gt=0).order_by('-benefice_net_culture').values_list('nom', flat=True).first()
+
+    # Moyenne du rendement (quantité récoltée / superficie) de chaque culture récoltée
+    rendement_moyen = Culture.objects.filter(
+        utilisateur_id=user_id,
+        superficie__gt=0,
+        recoltes__isnull=False
+    ).annotate(
+        total_recolte=Sum('recoltes__quantite_recoltee')
+    ).aggregate(
+        moyenne=Avg(F('total_recolte') / F('superficie'))
+    )['moyenne'] or Decimal('0')
+
+    return {
+        'culture_plus_rentable': culture_plus_rentable_obj or "Aucune",
+        'rendement_moyen': Decimal(str(round(rendement_moyen, 2))),
+    }
+
+
+def calculer_resume(user_id):
+    """Recalcule toutes les valeurs du résumé à partir des tables sources."""
+    recoltes = Recolte.objects.filter(culture__utilisateur_id=user_id)
+    cultures = Culture.objects.filter(utilisateur_id=user_id)
+
+    recoltes_totaux = recoltes.aggregate(
+        revenus=Sum(F('quantite_recoltee') * F('prix_vente_unitaire')),
+        depenses=Sum('depenses_liees_recolte'),
+    )
+
+    return {
+        'total_cultures': cultures.count(),
+        'total_recoltes': recoltes.count(),
+        'revenus_totaux': recoltes_totaux['revenus'] or Decimal('0'),
+        'depenses_cultures': cultures.aggregate(
+            total=Sum('cout_achat_semences') + Sum('cout_main_oeuvre')
+        )['total'] or Decimal('0'),
+        'depenses_recoltes': recoltes_totaux['depenses'] or Decimal('0'),
+        'depenses_generales': Depense.objects.filter(
+            utilisateur_id=user_id
+        ).aggregate(total=Sum('montant'))['total'] or Decimal('0'),
+        'conseils_non_lus': ConseilAgricole.objects.filter(
+            utilisateur_id=user_id, lu=False
+        ).count(),
+        **calculer_classement(user_id),
+    }
+
+
+def reconstruire_resume(user_id):
+    """Recalcule et enregistre le résumé complet d'un utilisateur."""
+    valeurs = calculer_resume(user_id)
+    try:
+        with transaction.atomic():
+            resume, _ = UserFinancialSummary.objects.update_or_create(
+                utilisateur_id=user_id, defaults=valeurs
+            )
+    except IntegrityError:
+        # Création concurrente : l'autre requête a déjà inséré la ligne
+        UserFinancialSummary.objects.filter(utilisateur_id=user_id).update(**valeurs)
+        resume = UserFinancialSummary.objects.get(utilisateur_id=user_id)
+    return resume
+
+
+def get_resume_financier(user):
+    """Retourne le résumé de l'utilisateur, construit à la première lecture."""
+    resume = UserFinancialSummary.objects.filter(utilisateur=user).first()
+    if resume is None:
+        resume = reconstruire_resume(user.pk)
+    return resume
+
+
+def appliquer_deltas(user_id, **deltas):
+    """Ajoute des variations aux champs additifs du résumé (s'il existe)."""
+    updates = {
+        champ: F(champ) + valeur
+        for champ, valeur in deltas.items()
+        if valeur
+    }
+    if user_id is None or not updates:
+        return
+    UserFinancialSummary.objects.filter(utilisateur_id=user_id).update(**updates)
+
+
+def rafraichir_classement(user_id):
+    """Recalcule la culture la plus rentable et le rendement moyen (s'il existe un résumé)."""
+    if user_id is None or not UserFinancialSummary.objects.filter(utilisateur_id=user_id).exists():
+        return
+    UserFinancialSummary.objects.filter(utilisateur_id=user_id).update(**calculer_classement(user_id))
+
+
+def rafraichir_conseils_non_lus(user_ids):
+    """Recompte les conseils non lus (après un `queryset.update()` qui contourne les signaux)."""
+    for user_id in set(user_ids):
+        UserFinancialSummary.objects.filter(utilisateur_id=user_id).update(
+            conseils_non_lus=ConseilAgricole.objects.filter(utilisateur_id=user_id, lu=False).count()
+        )
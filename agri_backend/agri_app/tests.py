@@ -1,3 +1,1585 @@
-from django.test import TestCase
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Tests de l'application agri_app.
 
-# Create your tests here.
+Lancer avec : python manage.py test agri_app
+"""
+
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+import httpx
+import openai
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import ProtectedError, QuerySet
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .ai_context import ContexteCache, contexte_utilisateur
+from .ai_clients import get_async_client, get_client
+from .ai_compaction import BUDGET_MINIMAL, compacter_contexte, estimer_tokens
+from .ai_health import enregistrer, etats, ordre_relais
+from .ai_memory import charger_memoire, historique, resumer
+from .ai_quotas import consommer_tokens, verifier_quota
+from .ai_response_cache import ReponseCache, get_reponse_cache
+from .analytics import IndicateursCultures, annoter_cultures
+from .benchmarks import calculer_referentiels, publier_referentiels, referentiels_pour
+from .buffers import BulkWriteBuffer
+from .caching import TTLCache
+from .checks import verifier_cache_quotas
+from .ai_service import GroqService, attendre_relais
+from .ai_telemetry import Telemetrie
+from .fake_llm import REPONSE_PAR_DEFAUT, FakeLLMServer
+from .geolocation import GeolocationPipeline, GeoResult, LocationDedupCache, StaticGeoProvider
+from .ip_database import IPRangeDatabase, ip_to_int, read_csv_ranges, write_index
+from .models import (
+    AppelIA, ConseilAgricole, ContexteSnapshot, Conversation, Culture, Depense, MessageChat, Recolte,
+    UserFinancialSummary, UserLocation, UserLocationDailySummary, UserMonthlyRollup, Utilisateur,
+)
+from .rollups import CHAMPS_CUMUL, calculer_cumuls, reconstruire_cumuls
+from .serializers import CultureSerializer
+from .snapshots import purger_orphelins, snapshot_id
+from .summaries import calculer_resume, get_resume_financier, reconstruire_resume
+from .timeseries import MAX_PERIODES, lister_periodes, parse_periode, serie_financiere
+
+
+def donnees_exploitation(nb_cultures):
+    """Données au format de `ai_context.collecter_donnees` : 3 récoltes et 5 dépenses par culture."""
+    debut = date(2024, 1, 1)
+    noms = ['Maïs', 'Manioc', 'Igname', 'Soja', 'Riz', 'Tomate']
+    cultures, recoltes, depenses = [], [], []
+    for i in range(nb_cultures):
+        cultures.append({
+            'id': i + 1,
+            'nom': noms[i % len(noms)],
+            'date_culture': str(debut + timedelta(days=i % 700)),
+            'superficie': f"{1 + i % 5}.50",
+            'cout_achat_semences': f"{20000 + i * 7 % 50000}.00",
+            'cout_main_oeuvre': f"{15000 + i * 11 % 40000}.00",
+            'nombre_recoltes': 3,
+            'revenus_totaux': f"{(120000 + i * 13 % 90000) * 3}.00",
+        })
+        for j in range(3):
+            recoltes.append({
+                'culture': i + 1,
+                'culture_nom': noms[i % len(noms)],
+                'date_recolte': str(debut + timedelta(days=(i + 90 * j) % 700)),
+                'quantite_recoltee': f"{100 + (i + j) % 400}.00",
+                'unite_recolte': 'kg',
+                'prix_vente_unitaire': f"{250 + (i * j) % 300}.00",
+                'depenses_liees_recolte': f"{5000 + j * 1000}.00",
+            })
+        for j in range(5):
+            depenses.append({
+                'culture': i + 1 if j % 2 else None,
+                'description': f"Achat n°{i * 5 + j} pour la parcelle {i + 1}",
+                'categorie': ['engrais', 'semences', 'transport', 'materiel', 'autre'][j],
+                'montant': f"{3000 + (i * 17 + j * 101) % 60000}.00",
+                'date_depense': str(debut + timedelta(days=(i * 3 + j) % 700)),
+            })
+    return {
+        'cultures': cultures,
+        'recoltes': recoltes,
+        'depenses': depenses,
+        'stats': {
+            'revenus_totaux': 123456789,
+            'depenses_totales': 98765432,
+            'benefice_net': 24691357,
+            'rendement_moyen': 2.4,
+            'culture_plus_rentable': 'Maïs',
+        },
+        'evolution_mensuelle': [
+            {'mois': f"2024-{m:02d}", 'revenus': 100000 * m, 'depenses': 80000 * m} for m in range(1, 13)
+        ],
+    }
+
+
+class CompactionContexteTests(SimpleTestCase):
+    """La taille du contexte transmis à l'IA reste bornée quel que soit le volume de données."""
+
+    def test_taille_bornee_quand_les_donnees_augmentent(self):
+        for budget in (50, 500, 4000):
+            for nb_cultures in (1, 10, 100, 1000, 5000):
+                with self.subTest(budget=budget, cultures=nb_cultures):
+                    contexte = compacter_contexte(donnees_exploitation(nb_cultures), budget)
+                    self.assertLessEqual(estimer_tokens(contexte), max(budget, BUDGET_MINIMAL))
+
+    def test_statistiques_toujours_presentes(self):
+        for budget in (0, 50, 500, 4000):
+            for nb_cultures in (0, 1, 100, 5000):
+                with self.subTest(budget=budget, cultures=nb_cultures):
+                    contexte = compacter_contexte(donnees_exploitation(nb_cultures), budget)
+                    self.assertIn("STATISTIQUES GLOBALES", contexte)
+                    self.assertIn("Bénéfice net : 24691357 FCFA", contexte)
+
+    def test_contexte_complet_quand_il_tient_dans_le_budget(self):
+        contexte = compacter_contexte(donnees_exploitation(2), 4000)
+        self.assertNotIn("Données résumées", contexte)
+        self.assertIn("Achat n°9 pour la parcelle 2", contexte)
+
+    def test_resume_au_dela_du_budget(self):
+        contexte = compacter_contexte(donnees_exploitation(1000), 4000)
+        self.assertIn("Données résumées : 1000 culture(s), 3000 récolte(s) et 5000 dépense(s)", contexte)
+        self.assertIn("RÉSUMÉ PAR CULTURE", contexte)
+
+
+PRINCIPAL, SECOURS, DERNIER = 'openai/gpt-oss-20b', 'openai/gpt-oss-120b', 'llama-3.3-70b-versatile'
+
+
+class RelaisModelesTests(SimpleTestCase):
+    """Relais entre modèles (`GroqService._call_with_relay` et `_acall_with_relay`) contre le faux LLM."""
+
+    def setUp(self):
+        # L'état de santé des modèles (ordre du relais) est conservé dans le cache
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+
+    def serveur(self, **options):
+        options.setdefault('latence', 0.05)
+        serveur = FakeLLMServer(**options).demarrer()
+        self.addCleanup(serveur.arreter)
+        reglages = override_settings(
+            GROQ_API_KEY='fake', GROQ_BASE_URL=serveur.base_url, AI_TELEMETRY_ENABLED=False,
+            AI_MODEL_TIMEOUT=5.0, AI_TOTAL_TIMEOUT=10.0, AI_HEDGE_DELAY=0.2,
+        )
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        # Avant le retour aux réglages initiaux (les nettoyages s'exécutent en ordre inverse)
+        self.addCleanup(attendre_relais)
+        return serveur
+
+    def test_modele_lent_double_par_le_suivant(self):
+        # Seul le modèle de secours répond rapidement
+        serveur = self.serveur(latences={PRINCIPAL: 2, DERNIER: 2})
+        debut = time.monotonic()
+        texte, erreur = GroqService()._call_with_relay("Bonjour", endpoint='chatbot')
+        self.assertIsNone(erreur)
+        self.assertEqual(texte, REPONSE_PAR_DEFAUT)
+        # La réponse du modèle de secours l'emporte, sans attendre le modèle principal
+        self.assertLess(time.monotonic() - debut, 1.5)
+        self.assertEqual(serveur.stats['par_modele'][SECOURS], 1)
+
+    def test_appel_devance_ferme_sa_connexion(self):
+        # Réponse de 100 mots lue en 5 s
+        serveur = self.serveur(latence=0, reponse=' '.join(['mot'] * 100), delai_token=0.05)
+        service = GroqService()
+        annule = threading.Event()
+        resultat = []
+        appel = threading.Thread(target=lambda: resultat.append(service._completion_en_flux(
+            PRINCIPAL, service._messages("Bonjour"), 10, 'chatbot', 0, annule,
+        )))
+        appel.start()
+        time.sleep(0.3)
+        debut = time.monotonic()
+        annule.set()
+        appel.join(5)
+        self.assertLess(time.monotonic() - debut, 1)
+        self.assertEqual(resultat, [None])
+        # Le faux LLM cesse d'émettre une fois la connexion fermée
+        limite = time.monotonic() + 2
+        while serveur.stats['en_cours'] and time.monotonic() < limite:
+            time.sleep(0.05)
+        self.assertEqual(serveur.stats['en_cours'], 0)
+
+    def test_delai_total_depasse(self):
+        self.serveur(latence=5)
+        with self.settings(AI_TOTAL_TIMEOUT=0.6, AI_HEDGE_DELAY=0.1):
+            debut = time.monotonic()
+            texte, erreur = GroqService()._call_with_relay("Bonjour", endpoint='chatbot')
+            duree = time.monotonic() - debut
+        self.assertIsNone(texte)
+        self.assertIn("délai total de 0.6s dépassé", erreur)
+        self.assertLess(duree, 1.5)
+
+    def test_modele_limite_remplace_par_le_suivant(self):
+        serveur = self.serveur(erreurs={PRINCIPAL: 429}, retry_after=30)
+        service = GroqService()
+        texte, erreur = service._call_with_relay("Bonjour", endpoint='chatbot')
+        self.assertIsNone(erreur)
+        self.assertEqual(texte, REPONSE_PAR_DEFAUT)
+        self.assertEqual(serveur.stats['par_modele'], {PRINCIPAL: 1, SECOURS: 1})
+        # Disjoncteur ouvert : le modèle limité passe en dernier
+        self.assertEqual(ordre_relais(service.model_names)[-1], PRINCIPAL)
+
+    async def test_modele_lent_double_par_le_suivant_async(self):
+        serveur = self.serveur(latences={PRINCIPAL: 2, DERNIER: 2})
+        debut = time.monotonic()
+        texte, erreur = await GroqService()._acall_with_relay("Bonjour", endpoint='chatbot_async')
+        self.assertIsNone(erreur)
+        self.assertEqual(texte, REPONSE_PAR_DEFAUT)
+        self.assertLess(time.monotonic() - debut, 1.5)
+        self.assertEqual(serveur.stats['par_modele'][SECOURS], 1)
+
+    async def test_delai_total_depasse_async(self):
+        self.serveur(latence=5)
+        with self.settings(AI_TOTAL_TIMEOUT=0.6, AI_HEDGE_DELAY=0.1):
+            debut = time.monotonic()
+            texte, erreur = await GroqService()._acall_with_relay("Bonjour", endpoint='chatbot_async')
+            duree = time.monotonic() - debut
+        self.assertIsNone(texte)
+        self.assertIn("délai total de 0.6s dépassé", erreur)
+        self.assertLess(duree, 1.5)
+
+    async def test_modele_limite_remplace_par_le_suivant_async(self):
+        serveur = self.serveur(erreurs={PRINCIPAL: 429}, retry_after=30)
+        texte, erreur = await GroqService()._acall_with_relay("Bonjour", endpoint='chatbot_async')
+        self.assertIsNone(erreur)
+        self.assertEqual(texte, REPONSE_PAR_DEFAUT)
+        self.assertEqual(serveur.stats['par_modele'], {PRINCIPAL: 1, SECOURS: 1})
+
+
+class IndexIPTests(SimpleTestCase):
+    """Construction de l'index IP à partir d'un export CSV."""
+
+    def test_ip_to_int_hors_intervalle(self):
+        self.assertEqual(ip_to_int('0'), 0)
+        self.assertEqual(ip_to_int(4294967295), 4294967295)
+        self.assertEqual(ip_to_int('41.138.89.1'), 696932609)
+        self.assertIsNone(ip_to_int('2001:db8::1'))
+        for valeur in (4294967296, -1, '99999999999'):
+            with self.subTest(valeur=valeur), self.assertRaises(ValueError):
+                ip_to_int(valeur)
+
+    def test_lignes_hors_intervalle_ignorees(self):
+        source = io.StringIO(
+            "ip_start,ip_end,country,city,latitude,longitude\n"
+            "41.138.89.0,41.138.89.255,Benin,Cotonou,6.3703,2.3912\n"
+            "4294967296,4294967300,Benin,Porto-Novo,6.4969,2.6289\n"
+            "100,99999999999,Benin,Parakou,9.3372,2.6303\n"
+        )
+        ranges, skipped = read_csv_ranges(source)
+        self.assertEqual((len(ranges), skipped), (1, 2))
+
+        with tempfile.TemporaryDirectory() as dossier:
+            chemin = os.path.join(dossier, 'ip.idx')
+            self.assertEqual(write_index(ranges, chemin), (1, 0))
+            base = IPRangeDatabase(chemin)
+            try:
+                self.assertEqual(base.lookup('41.138.89.7').city, 'Cotonou')
+                self.assertIsNone(base.lookup('8.8.8.8'))
+            finally:
+                base.close()
+
+
+class ChatbotFluxAsyncTests(TestCase):
+    """Endpoint `chatbot/stream/async/` (générateur asynchrone) contre le faux LLM."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        serveur = FakeLLMServer(latence=0.05).demarrer()
+        self.addCleanup(serveur.arreter)
+        reglages = override_settings(
+            GROQ_API_KEY='fake', GROQ_BASE_URL=serveur.base_url, AI_TELEMETRY_ENABLED=False,
+        )
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.user = Utilisateur.objects.create_user(username='flux', password='secret-flux-123')
+        self.entetes = {'Authorization': f'Token {Token.objects.create(user=self.user).key}'}
+
+    async def test_fragments_puis_reponse_enregistree(self):
+        response = await self.async_client.post(
+            '/api/chatbot/stream/async/', {'message': 'Bonjour', 'cache': False},
+            content_type='application/json', headers=self.entetes,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        corps = b''.join([morceau async for morceau in response.streaming_content]).decode('utf-8')
+
+        self.assertTrue(corps.startswith('event: conversation\n'))
+        self.assertIn('"delta": "Voici"', corps)
+        self.assertIn('event: done\n', corps)
+        reponse = await MessageChat.objects.filter(est_utilisateur=False).alatest('id')
+        self.assertEqual(reponse.contenu.strip(), REPONSE_PAR_DEFAUT)
+
+    async def test_conversation_introuvable(self):
+        response = await self.async_client.post(
+            '/api/chatbot/stream/async/', {'message': 'Bonjour', 'conversation_id': 999999},
+            content_type='application/json', headers=self.entetes,
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(AI_QUOTA_ENABLED=True)
+class QuotaConversationIntrouvableTests(TestCase):
+    """Une conversation introuvable (404) ne consomme pas le quota de requêtes."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = Utilisateur.objects.create_user(username='quota', password='secret-quota-123')
+        self.entetes = {'Authorization': f'Token {Token.objects.create(user=self.user).key}'}
+
+    def test_endpoints_chatbot(self):
+        quotas = {'gratuit': {'chatbot': 1, 'rapport': 1, 'tokens': 1000}}
+        for url in ('/api/chatbot/', '/api/chatbot/stream/', '/api/chatbot/async/', '/api/chatbot/stream/async/'):
+            with self.subTest(url=url), self.settings(AI_QUOTAS=quotas):
+                cache.clear()
+                for _ in range(2):
+                    response = self.client.post(
+                        url, {'message': 'Bonjour', 'conversation_id': 999999},
+                        content_type='application/json', headers=self.entetes,
+                    )
+                    self.assertEqual(response.status_code, 404)
+                self.assertTrue(verifier_quota(self.user, 'chatbot').autorise)
+
+
+@override_settings(AI_QUOTA_ENABLED=True, AI_QUOTA_PERIODES={'chatbot': 3600, 'rapport': 86400, 'tokens': 86400})
+class QuotasIATests(TestCase):
+    """Quotas des endpoints IA par plan d'abonnement (compteurs atomiques du cache)."""
+
+    quotas = {
+        'gratuit': {'chatbot': 2, 'rapport': 1, 'tokens': 100000},
+        'pro': {'chatbot': 5, 'rapport': 2, 'tokens': 100000},
+        'expert': {'chatbot': 8, 'rapport': 3, 'tokens': 100000},
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        reglages = override_settings(AI_QUOTAS=self.quotas)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.user = Utilisateur.objects.create_user(username='quotas', password='secret-quotas-123')
+        self.entetes = {'Authorization': f'Token {Token.objects.create(user=self.user).key}'}
+
+    def a(self, instant):
+        # Début d'une période d'un jour, pour que les fenêtres soient prévisibles
+        return mock.patch('agri_app.ai_quotas.time.time', return_value=86400.0 * 1000 + instant)
+
+    def consommer(self, user, famille='chatbot'):
+        autorises = 0
+        while verifier_quota(user, famille).autorise:
+            autorises += 1
+        return autorises
+
+    def test_429_avec_retry_after_sans_appel_au_modele(self):
+        serveur = FakeLLMServer(latence=0.01).demarrer()
+        self.addCleanup(serveur.arreter)
+        with self.settings(GROQ_API_KEY='fake', GROQ_BASE_URL=serveur.base_url, AI_TELEMETRY_ENABLED=False):
+            reponses = [
+                self.client.post('/api/chatbot/', {'message': f'Question {i}', 'cache': False},
+                                 content_type='application/json', headers=self.entetes)
+                for i in range(3)
+            ]
+
+        self.assertEqual([r.status_code for r in reponses], [200, 200, 429])
+        self.assertEqual(reponses[0]['X-RateLimit-Limit-Requests'], '2')
+        self.assertEqual(reponses[0]['X-RateLimit-Remaining-Requests'], '1')
+        self.assertEqual(reponses[1]['X-RateLimit-Remaining-Requests'], '0')
+        self.assertEqual(reponses[0]['X-RateLimit-Limit-Tokens'], '100000')
+        # Les tokens de la réponse sont déduits du quota de tokens
+        self.assertLess(int(reponses[1]['X-RateLimit-Remaining-Tokens']), 100000)
+        refus = reponses[2]
+        self.assertGreater(int(refus['Retry-After']), 0)
+        self.assertEqual(refus.json()['retry_after'], int(refus['Retry-After']))
+        self.assertEqual(refus.json()['plan'], 'gratuit')
+        # Le modèle n'est pas appelé au-delà du quota
+        self.assertEqual(serveur.stats['requetes'], 2)
+
+    def test_remplissage_au_prorata(self):
+        with self.a(1800):
+            self.assertEqual(self.consommer(self.user), 2)
+            quota = verifier_quota(self.user, 'chatbot')
+        # Période suivante : le quota revient à mesure que la période précédente s'éloigne
+        attente = 1800 + quota.retry_after
+        with self.a(attente - 1):
+            self.assertFalse(verifier_quota(self.user, 'chatbot').autorise)
+        with self.a(attente):
+            self.assertTrue(verifier_quota(self.user, 'chatbot').autorise)
+            self.assertFalse(verifier_quota(self.user, 'chatbot').autorise)
+        # Deux périodes après la dernière requête, le quota est entièrement reconstitué
+        with self.a(attente + 2 * 3600):
+            self.assertEqual(self.consommer(self.user), 2)
+
+    def test_limites_par_plan(self):
+        for plan, limites in self.quotas.items():
+            with self.subTest(plan=plan), self.a(0):
+                user = Utilisateur.objects.create_user(username=f'quotas-{plan}', plan_abonnement=plan)
+                self.assertEqual(self.consommer(user), limites['chatbot'])
+                self.assertEqual(self.consommer(user, 'rapport'), limites['rapport'])
+
+    def test_quota_de_tokens_epuise(self):
+        with self.a(0):
+            quota = consommer_tokens(self.user, 100000, verifier_quota(self.user, 'chatbot'))
+            self.assertEqual(quota.entetes['X-RateLimit-Remaining-Tokens'], '0')
+            refus = verifier_quota(self.user, 'chatbot')
+        self.assertFalse(refus.autorise)
+        self.assertGreater(refus.retry_after, 0)
+        # Le refus pour les tokens ne consomme pas de requête
+        self.assertEqual(refus.entetes['X-RateLimit-Remaining-Requests'], '1')
+
+    def test_personnel_non_limite(self):
+        admin = Utilisateur.objects.create_user(username='quotas-admin', is_staff=True)
+        for _ in range(10):
+            quota = verifier_quota(admin, 'chatbot')
+            self.assertTrue(quota.autorise)
+            self.assertEqual(quota.entetes, {})
+
+    def test_requetes_simultanees(self):
+        resultats = []
+        with self.a(0):
+            threads = [
+                threading.Thread(target=lambda: resultats.append(verifier_quota(self.user, 'chatbot').autorise))
+                for _ in range(20)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(sum(resultats), 2)
+
+
+class VerificationCacheQuotasTests(SimpleTestCase):
+    """Erreur `agri_app.E001` : quotas activés avec un cache non pris en charge."""
+
+    locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    base = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'agri_cache'}}
+    redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+
+    def test_erreur(self):
+        for caches in (self.locmem, self.base):
+            with self.settings(AI_QUOTA_ENABLED=True, CACHES=caches):
+                self.assertEqual([w.id for w in verifier_cache_quotas(None)], ['agri_app.E001'])
+        with self.settings(AI_QUOTA_ENABLED=False, CACHES=self.locmem):
+            self.assertEqual(verifier_cache_quotas(None), [])
+        with self.settings(AI_QUOTA_ENABLED=True, CACHES=self.redis):
+            self.assertEqual(verifier_cache_quotas(None), [])
+
+
+class MonitoringIATests(TestCase):
+    """Endpoints de suivi de l'IA réservés au personnel."""
+
+    def setUp(self):
+        admin = Utilisateur.objects.create_user(username='admin-ia', password='secret-admin-123', is_staff=True)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=admin).key}'
+
+    def test_nombre_de_jours_borne(self):
+        for url in ('/api/monitoring/reponses-ia/', '/api/monitoring/appels-ia/'):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'days': 99999999})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['jours'], 90)
+                self.assertEqual(self.client.get(url, {'days': 'abc'}).status_code, 400)
+
+
+class CompactageLocalisationsTests(TestCase):
+    """Commande `compact_user_locations` avec archive CSV."""
+
+    def setUp(self):
+        user = Utilisateur.objects.create_user(username='geo', password='secret-geo-123')
+        for ip in ('41.138.89.1', '41.138.89.2', '41.138.89.3'):
+            UserLocation.objects.create(utilisateur=user, ip_address=ip, city='Cotonou', country='Benin')
+        UserLocation.objects.update(timestamp=timezone.now() - timedelta(days=400))
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.dossier = dossier.name
+
+    def lignes_archivees(self):
+        (nom,) = os.listdir(self.dossier)
+        with gzip.open(os.path.join(self.dossier, nom), 'rt', newline='', encoding='utf-8') as archive:
+            return list(csv.reader(archive))[1:]
+
+    def test_archive_et_resumes(self):
+        call_command('compact_user_locations', retention_days=30, chunk_size=2,
+                     archive_dir=self.dossier, stdout=io.StringIO())
+        self.assertFalse(UserLocation.objects.exists())
+        self.assertEqual(len(self.lignes_archivees()), 3)
+        self.assertEqual(UserLocationDailySummary.objects.get().nb_evenements, 3)
+
+    def test_lot_annule_non_archive(self):
+        suppression = QuerySet.delete
+        appels = []
+
+        def suppression_puis_erreur(queryset):
+            appels.append(queryset)
+            if len(appels) == 2:
+                raise RuntimeError("échec simulé")
+            return suppression(queryset)
+
+        with mock.patch.object(QuerySet, 'delete', suppression_puis_erreur):
+            with self.assertRaises(RuntimeError):
+                call_command('compact_user_locations', retention_days=30, chunk_size=2,
+                             archive_dir=self.dossier, stdout=io.StringIO())
+        # Seul le premier lot (validé) est archivé ; le second est resté en base
+        self.assertEqual(UserLocation.objects.count(), 1)
+        self.assertEqual([ligne[2] for ligne in self.lignes_archivees()], ['41.138.89.1', '41.138.89.2'])
+
+
+IP_A, IP_B = '41.138.89.1', '102.64.0.1'
+
+
+class PipelineGeolocalisationTests(TestCase):
+    """`GeolocationPipeline` avec un fournisseur sans réseau."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = Utilisateur.objects.create_user(username='pipeline', password='secret-geo-123')
+        self.provider = StaticGeoProvider(results={IP_B: GeoResult(6.4969, 2.6289, 'Porto-Novo', 'Benin')})
+
+    def villes(self):
+        return list(UserLocation.objects.filter(utilisateur=self.user).order_by('pk').values_list('city', flat=True))
+
+    def test_enregistrement_et_deduplication(self):
+        pipeline = GeolocationPipeline(self.provider, run_async=False, dedup=LocationDedupCache())
+        self.assertTrue(pipeline.submit(self.user.pk, IP_A))
+        self.assertFalse(pipeline.submit(self.user.pk, IP_A))
+        self.assertEqual(self.villes(), ['Cotonou'])
+        # Dédupliquée dès la soumission : le fournisseur n'est appelé qu'une fois
+        self.assertEqual(self.provider.lookups, [IP_A])
+        self.assertEqual((pipeline.stats['saved'], pipeline.dedup.stats['hits']), (1, 1))
+
+        # Cache local perdu (autre worker, expiration) : la base sert de référence
+        pipeline.dedup.forget(self.user.pk)
+        self.assertFalse(pipeline.process(self.user.pk, IP_A))
+        self.assertEqual(self.villes(), ['Cotonou'])
+
+    def test_retour_sur_une_ancienne_ip(self):
+        pipeline = GeolocationPipeline(self.provider, run_async=False, dedup=LocationDedupCache())
+        for ip in (IP_A, IP_B, IP_A):
+            self.assertTrue(pipeline.submit(self.user.pk, ip))
+        self.assertEqual(self.villes(), ['Cotonou', 'Porto-Novo', 'Cotonou'])
+
+    def test_retour_sur_une_ancienne_ip_avant_ecriture(self):
+        # Mode asynchrone : les localisations restent dans le tampon jusqu'au vidage
+        tampon = BulkWriteBuffer(UserLocation, max_size=100, flush_interval=3600)
+        pipeline = GeolocationPipeline(self.provider, run_async=True, dedup=LocationDedupCache(), buffer=tampon)
+        self.assertEqual([pipeline.process(self.user.pk, ip) for ip in (IP_A, IP_B, IP_A, IP_A)],
+                         [True, True, True, False])
+        self.assertEqual(self.villes(), [])
+        tampon.flush()
+        self.assertEqual(self.villes(), ['Cotonou', 'Porto-Novo', 'Cotonou'])
+
+    def test_compteurs_sous_verrou(self):
+        # `process` s'exécute dans le worker et dans les threads des requêtes : chaque
+        # mise à jour des compteurs doit se faire sous le verrou du pipeline
+        pipeline = GeolocationPipeline(self.provider, run_async=False, dedup=LocationDedupCache())
+        hors_verrou = []
+
+        class Compteurs(dict):
+            def __setitem__(compteurs, nom, valeur):
+                if not pipeline._lock.locked():
+                    hors_verrou.append(nom)
+                super().__setitem__(nom, valeur)
+
+        pipeline.stats = Compteurs(pipeline.stats)
+        pipeline.provider.lookup = mock.Mock(side_effect=[GeoResult(6.3703, 2.3912, 'Cotonou', 'Benin'), None, OSError])
+        for ip in (IP_A, IP_B, '10.0.0.1'):
+            pipeline.submit(self.user.pk, ip)
+        self.assertEqual(hors_verrou, [])
+        self.assertEqual(
+            {nom: pipeline.get_stats()[nom] for nom in ('processed', 'saved', 'failed')},
+            {'processed': 2, 'saved': 1, 'failed': 1},
+        )
+
+def _centimes(valeur):
+    return Decimal(valeur).quantize(Decimal('0.01')) if isinstance(valeur, (Decimal, int, float)) else valeur
+
+
+class DonneesAgricolesMixin:
+    """Création de cultures, récoltes et dépenses de test."""
+
+    def culture(self, user, nom='Maïs', jour=date(2025, 3, 10)):
+        return Culture.objects.create(
+            utilisateur=user, nom=nom, date_culture=jour, quantite_semee=Decimal('25'),
+            cout_achat_semences=Decimal('30000'), cout_main_oeuvre=Decimal('45000'),
+            zone_geographique='Abomey-Calavi', superficie=Decimal('2.5'),
+        )
+
+    def recolte(self, culture, jour=date(2025, 7, 2)):
+        return Recolte.objects.create(
+            culture=culture, date_recolte=jour, quantite_recoltee=Decimal('1200'),
+            prix_vente_unitaire=Decimal('275.50'), depenses_liees_recolte=Decimal('15000'),
+        )
+
+    def depense(self, user, culture=None, jour=date(2025, 4, 15), montant='42000'):
+        return Depense.objects.create(
+            utilisateur=user, culture=culture, description='Engrais NPK', categorie='engrais',
+            montant=Decimal(montant), date_depense=jour,
+        )
+
+
+class ResumesIncrementauxTests(DonneesAgricolesMixin, TestCase):
+    """
+    `UserFinancialSummary` et `UserMonthlyRollup`, maintenus par les signaux,
+    restent égaux à un recalcul complet (`calculer_resume`, `calculer_cumuls`).
+    """
+
+    def setUp(self):
+        self.u1 = Utilisateur.objects.create_user(username='resume1', password='secret-resume-123')
+        self.u2 = Utilisateur.objects.create_user(username='resume2', password='secret-resume-123')
+        # Résumés et cumuls existants : ils sont ensuite mis à jour par variations
+        for user in (self.u1, self.u2):
+            reconstruire_resume(user.pk)
+            reconstruire_cumuls(user.pk)
+
+    def verifier(self, etape):
+        for user in (self.u1, self.u2):
+            with self.subTest(etape=etape, utilisateur=user.username):
+                resume = UserFinancialSummary.objects.filter(utilisateur=user).first()
+                if resume is None:
+                    # Résumé invalidé : reconstruit à la prochaine lecture
+                    resume = reconstruire_resume(user.pk)
+                attendu = {champ: _centimes(valeur) for champ, valeur in calculer_resume(user.pk).items()}
+                self.assertEqual({champ: _centimes(getattr(resume, champ)) for champ in attendu}, attendu)
+
+                zero = {champ: Decimal('0.00') for champ in CHAMPS_CUMUL}
+                cumuls = {
+                    (ligne['mois'], ligne['culture_id']): {champ: _centimes(ligne[champ]) for champ in CHAMPS_CUMUL}
+                    for ligne in UserMonthlyRollup.objects.filter(utilisateur=user).values('mois', 'culture_id', *CHAMPS_CUMUL)
+                }
+                attendus = {
+                    cle: {champ: _centimes(valeurs[champ]) for champ in CHAMPS_CUMUL}
+                    for cle, valeurs in calculer_cumuls(user.pk).items()
+                }
+                # Une ligne à zéro (sources supprimées) équivaut à une ligne absente
+                self.assertEqual(
+                    {cle: v for cle, v in cumuls.items() if v != zero},
+                    {cle: v for cle, v in attendus.items() if v != zero},
+                )
+
+    def test_creation_modification_suppression(self):
+        culture = self.culture(self.u1)
+        autre = self.culture(self.u1, nom='Soja', jour=date(2025, 5, 1))
+        recolte = self.recolte(culture)
+        depense = self.depense(self.u1, culture)
+        self.depense(self.u1, montant='150000.75')
+        self.verifier('création')
+
+        recolte.quantite_recoltee = Decimal('900')
+        recolte.date_recolte = date(2025, 8, 20)
+        recolte.save()
+        culture.cout_main_oeuvre = Decimal('60000')
+        culture.date_culture = date(2025, 2, 1)
+        culture.save()
+        depense.montant = Decimal('10000')
+        depense.culture = autre
+        depense.save()
+        self.verifier('modification')
+
+        recolte.culture = autre
+        recolte.save()
+        self.verifier('récolte rattachée à une autre culture')
+
+        recolte.delete()
+        depense.delete()
+        self.verifier('suppression')
+        culture.delete()
+        autre.delete()
+        self.verifier('suppression des cultures')
+
+    def test_changement_de_proprietaire(self):
+        culture = self.culture(self.u1)
+        self.recolte(culture)
+        self.depense(self.u1, culture)
+        depense = self.depense(self.u1)
+        culture_u2 = self.culture(self.u2, nom='Igname')
+        recolte = self.recolte(culture_u2, jour=date(2025, 9, 1))
+        self.verifier('création')
+
+        culture.utilisateur = self.u2
+        culture.save()
+        self.verifier('culture')
+
+        depense.utilisateur = self.u2
+        depense.save()
+        self.verifier('dépense')
+
+        recolte.culture = self.culture(self.u1, nom='Riz')
+        recolte.save()
+        self.verifier('récolte')
+
+
+class GetConditionnelCulturesTests(TestCase):
+    """ETag de la liste des cultures : validateur calculé sans les totaux annotés."""
+
+    def test_304_sans_annotations(self):
+        user = Utilisateur.objects.create_user(username='etag', password='secret-etag-123')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=user).key}'
+        Culture.objects.create(
+            utilisateur=user, nom='Maïs', date_culture=date(2025, 3, 10), quantite_semee=Decimal('25'),
+            cout_achat_semences=Decimal('30000'), cout_main_oeuvre=Decimal('45000'),
+            zone_geographique='Abomey-Calavi', superficie=Decimal('2.5'),
+        )
+        response = self.client.get('/api/cultures/', {'nom': 'ma'})
+        self.assertEqual(response.status_code, 200)
+
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get('/api/cultures/', {'nom': 'ma'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        validateur = [q['sql'] for q in requetes.captured_queries if 'MAX(' in q['sql']]
+        self.assertEqual(len(validateur), 1)
+        self.assertNotIn('agri_app_recolte', validateur[0])
+        self.assertNotIn('agri_app_depense', validateur[0])
+
+
+class TTLCacheTests(SimpleTestCase):
+    """Cache local `caching.TTLCache` : éviction LRU, expiration et compteurs."""
+
+    def test_lru_expiration_compteurs(self):
+        horloge = [0.0]
+        local = TTLCache(maxsize=2, ttl=10, timer=lambda: horloge[0])
+        local.set('a', 1)
+        local.set('b', 2)
+        self.assertEqual(local.get('a'), 1)
+        local.set('c', 3)  # évince 'b', le moins récemment utilisé
+        self.assertEqual([local.get(cle) for cle in 'abc'], [1, None, 3])
+        local.delete('c')
+        self.assertEqual(len(local), 1)
+
+        horloge[0] = 10.5
+        self.assertIsNone(local.get('a'))
+        self.assertEqual(len(local), 0)
+        self.assertEqual(local.stats, {'hits': 3, 'misses': 2, 'hit_rate': 0.6, 'size': 0, 'maxsize': 2})
+
+
+class CacheReponsesTests(DonneesAgricolesMixin, TestCase):
+    """Cache des réponses du chatbot, compté en appels au faux LLM."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        get_reponse_cache().clear()
+        self.addCleanup(get_reponse_cache().clear)
+        self.serveur = FakeLLMServer(latence=0.01).demarrer()
+        self.addCleanup(self.serveur.arreter)
+        reglages = override_settings(
+            GROQ_API_KEY='fake', GROQ_BASE_URL=self.serveur.base_url, AI_TELEMETRY_ENABLED=False,
+        )
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.user = Utilisateur.objects.create_user(username='cache-ia', password='secret-cache-123')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=self.user).key}'
+        self.culture(self.user)
+
+    def poser(self, message, **donnees):
+        response = self.client.post('/api/chatbot/', {'message': message, **donnees}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def metadonnees(self):
+        return list(
+            MessageChat.objects.filter(est_utilisateur=False).order_by('id').values_list('metadonnees__cache', flat=True)
+        )
+
+    def test_question_repetee_dans_la_conversation(self):
+        question = 'Quel est mon bénéfice total cette saison ?'
+        conversation_id = self.poser(question)['conversation_id']
+        self.poser(question, conversation_id=conversation_id)
+        # Autre conversation, même question (écrite autrement)
+        reponse = self.poser('quel est mon benefice total cette saison')['response']
+
+        self.assertEqual(self.serveur.stats['requetes'], 1)
+        self.assertEqual(reponse, REPONSE_PAR_DEFAUT)
+        self.assertEqual(self.metadonnees(), ['miss', 'hit', 'hit'])
+        derniere = MessageChat.objects.filter(est_utilisateur=False).latest('id').metadonnees
+        self.assertEqual(derniere['latence_ms'], 0)
+        self.assertGreater(derniere['latence_economisee_ms'], 0)
+
+    def test_donnees_modifiees(self):
+        question = 'Quel est mon bénéfice total cette saison ?'
+        self.poser(question)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.depense(self.user)
+        self.poser(question)
+        self.assertEqual(self.serveur.stats['requetes'], 2)
+        self.assertEqual(self.metadonnees(), ['miss', 'miss'])
+
+    def test_relance_dans_la_conversation(self):
+        conversation_id = self.poser('Quelle culture me rapporte le plus ?')['conversation_id']
+        for _ in range(2):
+            self.poser('Et pour le maïs ?', conversation_id=conversation_id)
+        self.assertEqual(self.serveur.stats['requetes'], 3)
+        self.assertEqual(self.metadonnees(), ['miss', 'off', 'off'])
+
+    def test_cache_desactive_par_la_requete(self):
+        question = 'Quel est mon bénéfice total cette saison ?'
+        for _ in range(2):
+            self.poser(question, cache=False)
+        self.assertEqual(self.serveur.stats['requetes'], 2)
+        self.assertEqual(self.metadonnees(), ['off', 'off'])
+
+    def test_limite_par_utilisateur(self):
+        reponses = ReponseCache(maxsize=10, par_utilisateur=2, ttl=60)
+        cles = [ReponseCache.cle(self.user.pk, f'Question numéro {i}', 'contexte') for i in range(3)]
+        autre = ReponseCache.cle(self.user.pk + 1, 'Question numéro 0', 'contexte')
+        reponses.set(autre, 'autre', 10)
+        reponses.set(cles[0], 'r0', 10)
+        reponses.set(cles[1], 'r1', 10)
+        # La plus récemment utilisée est conservée
+        self.assertEqual(reponses.get(cles[0]), ('r0', 10))
+        reponses.set(cles[2], 'r2', 10)
+
+        self.assertIsNone(reponses.get(cles[1]))
+        self.assertEqual(reponses.get(cles[0]), ('r0', 10))
+        self.assertEqual(reponses.get(autre), ('autre', 10))
+        self.assertEqual(reponses.stats['evictions'], 1)
+        self.assertEqual(len(reponses), 3)
+
+
+class SnapshotsContexteTests(TestCase):
+    """Données contextuelles des messages stockées dans des snapshots partagés."""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(username='snapshots', password='secret-snap-123')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=self.user).key}'
+        self.conversation = Conversation.objects.create(utilisateur=self.user, titre='Snapshots')
+
+    def message(self, donnees):
+        return MessageChat.objects.create(
+            conversation=self.conversation, est_utilisateur=False, contenu='Réponse', contexte_id=snapshot_id(donnees),
+        )
+
+    def test_contexte_donnees_expose_par_l_api(self):
+        donnees = donnees_exploitation(2)
+        self.message(donnees)
+        self.message(donnees)
+        with self.assertNumQueries(3):
+            # Authentification, conversation, messages avec leurs snapshots
+            response = self.client.get(f'/api/conversations/{self.conversation.id}/')
+        self.assertEqual(response.status_code, 200)
+        messages = response.json()['messages']
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(messages[0]['contexte_donnees'], json.loads(json.dumps(donnees, cls=DjangoJSONEncoder)))
+        self.assertEqual(messages[0]['contexte'], messages[1]['contexte'])
+
+    def test_purger_orphelins(self):
+        utilise = self.message({'cultures': 1})
+        orphelin = ContexteSnapshot.objects.get(pk=snapshot_id({'cultures': 2}))
+
+        self.assertEqual(purger_orphelins(), 1)
+        self.assertFalse(ContexteSnapshot.objects.filter(pk=orphelin.pk).exists())
+        self.assertTrue(ContexteSnapshot.objects.filter(pk=utilise.contexte_id).exists())
+        # Un snapshot référencé ne peut pas être supprimé (PROTECT)
+        with self.assertRaises(ProtectedError):
+            utilise.contexte.delete()
+
+
+class MigrationSnapshotsTests(TransactionTestCase):
+    """Migration 0018 : copies de `contexte_donnees` remplacées par des snapshots, et retour."""
+
+    avant = [('agri_app', '0017_conversation_memoire')]
+    apres = [('agri_app', '0018_contextesnapshot')]
+
+    def migrer(self, cible):
+        executeur = MigrationExecutor(connection)
+        executeur.loader.build_graph()
+        executeur.migrate(cible)
+        return executeur.loader.project_state(cible).apps
+
+    def tearDown(self):
+        self.migrer(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_aller_retour(self):
+        apps = self.migrer(self.avant)
+        Utilisateur = apps.get_model('agri_app', 'Utilisateur')
+        Conversation = apps.get_model('agri_app', 'Conversation')
+        MessageChat = apps.get_model('agri_app', 'MessageChat')
+        user = Utilisateur.objects.create(username='migration', password='!')
+        conversation = Conversation.objects.create(utilisateur=user, titre='Migration')
+        grand = {'cultures': [{'nom': 'Maïs', 'notes': 'x' * 2000}]}
+        contextes = [grand, grand, {'cultures': []}, None]
+        for contexte in contextes:
+            MessageChat.objects.create(
+                conversation=conversation, est_utilisateur=contexte is None, contenu='Message', contexte_donnees=contexte,
+            )
+
+        apps = self.migrer(self.apres)
+        MessageChat = apps.get_model('agri_app', 'MessageChat')
+        ContexteSnapshot = apps.get_model('agri_app', 'ContexteSnapshot')
+        identifiants = list(MessageChat.objects.order_by('pk').values_list('contexte_id', flat=True))
+        self.assertEqual(ContexteSnapshot.objects.count(), 2)
+        self.assertEqual(identifiants[0], identifiants[1])
+        self.assertNotEqual(identifiants[0], identifiants[2])
+        self.assertIsNone(identifiants[3])
+        self.assertTrue(ContexteSnapshot.objects.get(pk=identifiants[0]).compresse)
+
+        apps = self.migrer(self.avant)
+        MessageChat = apps.get_model('agri_app', 'MessageChat')
+        self.assertEqual(list(MessageChat.objects.order_by('pk').values_list('contexte_donnees', flat=True)), contextes)
+
+
+class VersionDonneesTests(DonneesAgricolesMixin, TestCase):
+    """Réponses mises en cache par version des données (`versioning.reponse_versionnee`)."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = Utilisateur.objects.create_user(username='version', password='secret-version-123')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=self.user).key}'
+
+    def version(self):
+        return Utilisateur.objects.values_list('version_donnees', flat=True).get(pk=self.user.pk)
+
+    def test_304_si_le_client_est_a_jour(self):
+        etag = self.client.get('/api/dashboard/stats/')['ETag']
+        with mock.patch('agri_app.views.get_resume_financier') as resume:
+            response = self.client.get('/api/dashboard/stats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        resume.assert_not_called()
+
+    def test_nouvel_etag_apres_chaque_modification(self):
+        culture = self.culture(self.user)
+        modifications = {
+            'culture': lambda: self.culture(self.user, nom='Soja'),
+            'récolte': lambda: self.recolte(culture),
+            'dépense': lambda: self.depense(self.user),
+            'conseil': lambda: ConseilAgricole.objects.create(utilisateur=self.user, titre='Semis', contenu='Semer tôt.'),
+        }
+        etag = self.client.get('/api/dashboard/stats/')['ETag']
+        for nom, modifier in modifications.items():
+            with self.subTest(modification=nom):
+                with self.captureOnCommitCallbacks(execute=True):
+                    modifier()
+                response = self.client.get('/api/dashboard/stats/', HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                etag = response['ETag']
+
+    def test_reponse_lue_dans_le_cache(self):
+        with mock.patch('agri_app.views.get_resume_financier', wraps=get_resume_financier) as resume:
+            premiere = self.client.get('/api/dashboard/stats/')
+            seconde = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(resume.call_count, 1)
+        self.assertEqual(premiere.json(), seconde.json())
+
+    def test_sauvegarde_complete_conserve_la_version(self):
+        charge = Utilisateur.objects.get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.culture(self.user)
+        version = self.version()
+        self.assertGreater(version, charge.version_donnees)
+
+        # Utilisateur chargé avant l'incrément, puis sauvegardé entièrement
+        charge.first_name = 'Koffi'
+        charge.save()
+        response = self.client.post('/api/auth/change-password/', {
+            'current_password': 'secret-version-123', 'new_password': 'nouveau-secret-456',
+            'confirm_password': 'nouveau-secret-456',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.version(), version)
+
+
+class ContexteIATests(DonneesAgricolesMixin, TestCase):
+    """Contexte des données transmis à l'IA, réutilisé par version des données (`ai_context`)."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = Utilisateur.objects.create_user(username='contexte', password='secret-contexte-123')
+        self.culture_mais = self.culture(self.user)
+        self.service = GroqService()
+
+    def avec_cache(self, contexte_cache):
+        patch = mock.patch('agri_app.ai_context.get_contexte_cache', return_value=contexte_cache)
+        patch.start()
+        self.addCleanup(patch.stop)
+        return contexte_cache
+
+    def contexte(self):
+        # Comme à chaque requête, l'utilisateur est relu (version des données à jour)
+        return contexte_utilisateur(Utilisateur.objects.get(pk=self.user.pk), self.service)
+
+    def test_reutilise_d_un_tour_a_l_autre(self):
+        contextes = self.avec_cache(ContexteCache())
+        premier = self.contexte()
+        with CaptureQueriesContext(connection) as requetes:
+            second = self.contexte()
+        self.assertEqual(second, premier)
+        # Ni les cultures, ni les récoltes, ni les dépenses ne sont relues
+        tables = ('agri_app_culture', 'agri_app_recolte', 'agri_app_depense')
+        self.assertFalse([q['sql'] for q in requetes.captured_queries if any(t in q['sql'] for t in tables)])
+        self.assertEqual(contextes.stats['hits'], 1)
+        self.assertEqual(contextes.stats['misses'], 1)
+        self.assertEqual(contextes.stats['hit_rate'], 0.5)
+
+    def test_reconstruit_apres_modification(self):
+        contextes = self.avec_cache(ContexteCache())
+        donnees, _ = self.contexte()
+        self.assertEqual(donnees['recoltes'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recolte(self.culture_mais)
+        donnees, _ = self.contexte()
+        self.assertEqual(len(donnees['recoltes']), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.depense(self.user, montant='12345')
+        donnees, texte = self.contexte()
+        self.assertEqual(len(donnees['depenses']), 1)
+        self.assertIn('12345', texte)
+        self.assertEqual(contextes.stats['misses'], 3)
+        self.assertEqual(contextes.stats['hits'], 0)
+
+    def test_contexte_trop_volumineux_non_conserve(self):
+        contextes = self.avec_cache(ContexteCache(max_chars=10))
+        self.contexte()
+        self.contexte()
+        self.assertEqual(contextes.stats['misses'], 2)
+        self.assertEqual(contextes.stats['trop_volumineux'], 2)
+        self.assertEqual(contextes.stats['size'], 0)
+
+    def test_partage_entre_workers(self):
+        self.avec_cache(ContexteCache(use_django_cache=True))
+        premier = self.contexte()
+        # Autre worker : cache local vide, contexte lu dans le cache Django
+        autre = self.avec_cache(ContexteCache(use_django_cache=True))
+        self.assertEqual(self.contexte(), premier)
+        self.assertEqual(autre.stats['shared_hits'], 1)
+        self.assertEqual(autre.stats['hits'], 1)
+
+
+@override_settings(AI_CHAT_HISTORY_MESSAGES=4, AI_CHAT_SUMMARY_BATCH=2)
+class MemoireConversationTests(TestCase):
+    """Fenêtre glissante et résumé incrémental des conversations (`ai_memory`)."""
+
+    def setUp(self):
+        self.serveur = FakeLLMServer(latence=0.01, reponse='Résumé des échanges.').demarrer()
+        self.addCleanup(self.serveur.arreter)
+        reglages = override_settings(
+            GROQ_API_KEY='fake', GROQ_BASE_URL=self.serveur.base_url, AI_TELEMETRY_ENABLED=False, AI_HEDGE_DELAY=0,
+        )
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.addCleanup(attendre_relais)
+        user = Utilisateur.objects.create_user(username='memoire', password='secret-memoire-123')
+        self.conversation = Conversation.objects.create(utilisateur=user, titre='Mémoire')
+        self.service = GroqService()
+
+    def echanger(self, n):
+        for i in range(n):
+            MessageChat.objects.create(conversation=self.conversation, est_utilisateur=True, contenu=f'Question {i}')
+            MessageChat.objects.create(conversation=self.conversation, est_utilisateur=False, contenu=f'Réponse {i}')
+
+    def memoire(self):
+        self.conversation.refresh_from_db()
+        return charger_memoire(self.conversation)
+
+    def test_fenetre_des_derniers_messages(self):
+        self.echanger(2)
+        with self.assertNumQueries(1):
+            memoire = charger_memoire(self.conversation)
+        self.assertEqual([contenu for _, _, contenu in memoire.messages],
+                         ['Question 0', 'Réponse 0', 'Question 1', 'Réponse 1'])
+        self.assertEqual(memoire.a_resumer, [])
+        # Un message de plus sort de la fenêtre, mais le lot n'est pas complet
+        self.echanger(1)
+        memoire = self.memoire()
+        self.assertEqual([contenu for _, _, contenu in memoire.a_resumer], ['Question 0', 'Réponse 0'])
+        self.assertEqual(len(memoire.messages), 6)
+
+    def test_resume_incremental(self):
+        self.echanger(3)
+        memoire = self.memoire()
+        self.assertTrue(resumer(memoire, self.service))
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.resume, 'Résumé des échanges.')
+        self.assertEqual(self.conversation.resume_jusqu_a, memoire.a_resumer[-1][0])
+        self.assertEqual(self.serveur.stats['requetes'], 1)
+
+        # Le lot déjà résumé n'est plus transmis ; sans nouveau lot complet, pas d'appel
+        memoire = self.memoire()
+        self.assertEqual(len(memoire.messages), 4)
+        self.assertFalse(resumer(memoire, self.service))
+        self.assertEqual(self.serveur.stats['requetes'], 1)
+        self.assertEqual(historique(memoire)[0]['role'], 'system')
+
+    def test_mise_a_jour_conditionnelle(self):
+        self.echanger(3)
+        memoire = self.memoire()
+        concurrente = self.memoire()
+        self.assertTrue(resumer(memoire, self.service))
+        # Une autre requête a résumé le même lot entre-temps : sa mise à jour est ignorée
+        self.assertFalse(resumer(concurrente, self.service))
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.resume_jusqu_a, memoire.a_resumer[-1][0])
+
+    def test_taille_du_prompt_bornee(self):
+        tailles = []
+        for _ in range(15):
+            self.echanger(1)
+            memoire = self.memoire()
+            tailles.append(len(historique(memoire)))
+            resumer(memoire, self.service)
+        # Résumé + fenêtre + lot en attente au plus, quelle que soit la longueur
+        self.assertLessEqual(max(tailles), 1 + 4 + 2)
+        self.assertEqual(tailles[-4:], tailles[-8:-4])
+        self.assertEqual(self.serveur.stats['requetes'], 13)
+
+
+class ChatbotFluxTests(TestCase):
+    """Endpoint `chatbot/stream/` (SSE synchrone) contre le faux LLM."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = Utilisateur.objects.create_user(username='flux-sync', password='secret-flux-123')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=self.user).key}'
+
+    def serveur(self, **options):
+        serveur = FakeLLMServer(latence=0.01, **options).demarrer()
+        self.addCleanup(serveur.arreter)
+        reglages = override_settings(GROQ_API_KEY='fake', GROQ_BASE_URL=serveur.base_url, AI_TELEMETRY_ENABLED=False)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        return serveur
+
+    def evenements(self):
+        response = self.client.post(
+            '/api/chatbot/stream/', {'message': 'Comment vont mes cultures ?', 'cache': False},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        corps = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(corps.endswith('\n\n'))
+        evenements = []
+        for bloc in corps[:-2].split('\n\n'):
+            lignes = dict(ligne.split(': ', 1) for ligne in bloc.split('\n'))
+            evenements.append((lignes.get('event', 'message'), json.loads(lignes['data'])))
+        return evenements
+
+    def test_fragments_puis_reponse_enregistree(self):
+        self.serveur()
+        evenements = self.evenements()
+
+        self.assertEqual([nom for nom, _ in evenements[:1] + evenements[-1:]], ['conversation', 'done'])
+        self.assertEqual({nom for nom, _ in evenements[1:-1]}, {'message'})
+        texte = ''.join(donnees['delta'] for _, donnees in evenements[1:-1])
+        self.assertEqual(texte, REPONSE_PAR_DEFAUT)
+        # La réponse assemblée est enregistrée avant l'événement final
+        fin = evenements[-1][1]
+        reponse = MessageChat.objects.get(pk=fin['message_id'])
+        self.assertEqual(reponse.contenu, REPONSE_PAR_DEFAUT)
+        self.assertEqual(reponse.conversation_id, evenements[0][1]['conversation_id'])
+        self.assertEqual(reponse.metadonnees['cache'], 'off')
+
+    def test_relais_si_le_premier_modele_echoue(self):
+        serveur = self.serveur(erreurs={PRINCIPAL: 500})
+        evenements = self.evenements()
+
+        texte = ''.join(donnees['delta'] for nom, donnees in evenements if nom == 'message')
+        self.assertEqual(texte, REPONSE_PAR_DEFAUT)
+        self.assertEqual(evenements[-1][0], 'done')
+        self.assertEqual(serveur.stats['par_modele'][PRINCIPAL], 1)
+        self.assertEqual(serveur.stats['par_modele'][SECOURS], 1)
+
+
+class TelemetrieIATests(TestCase):
+    """Mesures des appels aux modèles (`ai_telemetry`) : écriture groupée et agrégats."""
+
+    def test_ecriture_groupee(self):
+        telemetrie = Telemetrie(maxsize=6, buffer=BulkWriteBuffer(AppelIA, max_size=3, flush_interval=60))
+        # Écriture par `vider()`, sans le thread de fond
+        with mock.patch.object(telemetrie, '_ensure_worker'):
+            for i in range(7):
+                telemetrie.enregistrer(
+                    modele=PRINCIPAL, endpoint='chatbot', rang=0, resultat='succes', latence_ms=100.0 + i,
+                )
+        self.assertEqual(telemetrie.get_stats()['submitted'], 6)
+        self.assertEqual(telemetrie.get_stats()['dropped'], 1)
+
+        with CaptureQueriesContext(connection) as requetes:
+            # Les lots complets sont écrits au fil de l'eau, il ne reste rien à la fin
+            self.assertEqual(telemetrie.vider(), 0)
+        insertions = [q for q in requetes.captured_queries if q['sql'].startswith('INSERT')]
+        # Deux lots de trois mesures
+        self.assertEqual(len(insertions), 2)
+        self.assertEqual(AppelIA.objects.count(), 6)
+        self.assertEqual(telemetrie.get_stats()['queue_size'], 0)
+
+    def test_agregats_par_modele_et_par_jour(self):
+        hier = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=1), datetime.min.time()))
+        midi = hier + timedelta(hours=12)
+        appels = [
+            AppelIA(modele=PRINCIPAL, endpoint='chatbot', rang=0, resultat='succes', latence_ms=float(latence),
+                    tokens_prompt=10, tokens_reponse=5, date_appel=midi)
+            for latence in range(1, 101)
+        ] + [
+            # Les échecs ne comptent pas dans les percentiles
+            AppelIA(modele=PRINCIPAL, endpoint='chatbot', rang=0, resultat='limite', code_http=429,
+                    latence_ms=5000.0, date_appel=midi),
+            AppelIA(modele=SECOURS, endpoint='rapport', rang=1, resultat='succes', latence_ms=300.0,
+                    tokens_prompt=100, tokens_reponse=50, date_appel=midi),
+            # Le lendemain : autre groupe
+            AppelIA(modele=PRINCIPAL, endpoint='chatbot', rang=0, resultat='succes', latence_ms=42.0,
+                    date_appel=midi + timedelta(days=1)),
+        ]
+        AppelIA.objects.bulk_create(appels)
+
+        admin = Utilisateur.objects.create_user(username='admin-telemetrie', is_staff=True)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=admin).key}'
+        reponse = self.client.get('/api/monitoring/appels-ia/', {'days': 3}).json()
+
+        jour, lendemain = hier.date().isoformat(), (hier.date() + timedelta(days=1)).isoformat()
+        modeles = {(m['jour'], m['modele']): m for m in reponse['modeles']}
+        self.assertEqual(set(modeles), {(jour, PRINCIPAL), (jour, SECOURS), (lendemain, PRINCIPAL)})
+        self.assertEqual(modeles[jour, PRINCIPAL], {
+            'jour': jour,
+            'modele': PRINCIPAL,
+            'appels': 101,
+            'resultats': {'succes': 100, 'limite': 1},
+            'taux_erreur': round(1 / 101, 4),
+            'appels_relais': 0,
+            'latence_ms': {'p50': 50.0, 'p95': 95.0, 'p99': 99.0},
+            'tokens_prompt': 1000,
+            'tokens_reponse': 500,
+        })
+        self.assertEqual(modeles[jour, SECOURS]['appels_relais'], 1)
+        self.assertEqual(modeles[lendemain, PRINCIPAL]['latence_ms'], {'p50': 42.0, 'p95': 42.0, 'p99': 42.0})
+        rapports = [e for e in reponse['endpoints'] if e['endpoint'] == 'rapport']
+        self.assertEqual([(e['jour'], e['tokens_prompt'], e['tokens_reponse']) for e in rapports], [(jour, 100, 50)])
+
+
+@override_settings(AI_HEALTH_WINDOW=300, AI_CIRCUIT_COOLDOWN=30.0, AI_CIRCUIT_MAX_COOLDOWN=300.0,
+                   AI_CIRCUIT_ERROR_RATE=0.5, AI_CIRCUIT_MIN_CALLS=4)
+class DisjoncteurModelesTests(SimpleTestCase):
+    """État de santé des modèles du relais (`ai_health`) : disjoncteur et classement."""
+
+    modeles = [PRINCIPAL, SECOURS, DERNIER]
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.maintenant = 1_000_000.0
+        patch = mock.patch('agri_app.ai_health.time.time', side_effect=lambda: self.maintenant)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def erreur(self, code, entetes=None):
+        response = httpx.Response(code, headers=entetes, request=httpx.Request('POST', 'http://groq.test/chat'))
+        classe = openai.RateLimitError if code == 429 else openai.InternalServerError
+        return classe(f'Erreur {code}', response=response, body=None)
+
+    def etat(self, modele):
+        return {e['modele']: e for e in etats(self.modeles)}[modele]
+
+    def test_429_ouvre_le_circuit_pour_retry_after(self):
+        enregistrer(PRINCIPAL, False, 50, self.erreur(429, {'retry-after': '12'}))
+        etat = self.etat(PRINCIPAL)
+        self.assertEqual(etat['circuit'], 'ouvert')
+        self.assertEqual(etat['reouverture_dans_s'], 12.0)
+        self.assertEqual(ordre_relais(self.modeles), [SECOURS, DERNIER, PRINCIPAL])
+
+        # Sans Retry-After : AI_CIRCUIT_COOLDOWN
+        enregistrer(SECOURS, False, 50, self.erreur(429))
+        self.assertEqual(self.etat(SECOURS)['reouverture_dans_s'], 30.0)
+
+    def test_reouverture_puis_fermeture(self):
+        enregistrer(PRINCIPAL, False, 50, self.erreur(429, {'retry-after': '12'}))
+        # Délai écoulé : le modèle est de nouveau essayé (à l'essai)
+        self.maintenant += 12
+        self.assertEqual(self.etat(PRINCIPAL)['circuit'], 'ferme')
+        # Nouvel échec à l'essai : le circuit se rouvre aussitôt
+        enregistrer(PRINCIPAL, False, 50, self.erreur(429, {'retry-after': '5'}))
+        self.assertEqual(self.etat(PRINCIPAL)['circuit'], 'ouvert')
+        # Succès à l'essai : le circuit reste fermé
+        self.maintenant += 5
+        enregistrer(PRINCIPAL, True, 80)
+        etat = self.etat(PRINCIPAL)
+        self.assertEqual(etat['circuit'], 'ferme')
+        self.assertEqual(etat['taux_erreur'], round(2 / 3, 4))
+        # Les échecs sortis de la fenêtre glissante ne comptent plus
+        self.maintenant += 300
+        enregistrer(PRINCIPAL, True, 80)
+        self.assertEqual(self.etat(PRINCIPAL)['taux_erreur'], 0.0)
+        self.assertEqual(ordre_relais(self.modeles)[0], PRINCIPAL)
+
+    def test_taux_d_erreur(self):
+        enregistrer(PRINCIPAL, True, 80)
+        enregistrer(PRINCIPAL, False, 50, self.erreur(500))
+        enregistrer(PRINCIPAL, False, 50, self.erreur(500))
+        # Moins de AI_CIRCUIT_MIN_CALLS appels : pas encore écarté
+        self.assertEqual(self.etat(PRINCIPAL)['circuit'], 'ferme')
+        enregistrer(PRINCIPAL, False, 50, self.erreur(500))
+        self.assertEqual(self.etat(PRINCIPAL)['circuit'], 'ouvert')
+        self.assertEqual(self.etat(PRINCIPAL)['reouverture_dans_s'], 30.0)
+
+    def test_classement_par_fiabilite_et_duree(self):
+        # Durées comparables : ordre configuré
+        for modele in self.modeles:
+            enregistrer(modele, True, 100)
+        self.assertEqual(ordre_relais(self.modeles), self.modeles)
+        # Le modèle principal devient lent, le secours peu fiable
+        for _ in range(3):
+            enregistrer(PRINCIPAL, True, 3000)
+        enregistrer(SECOURS, False, 50, self.erreur(500))
+        self.assertEqual(ordre_relais(self.modeles), [DERNIER, SECOURS, PRINCIPAL])
+
+
+class IndicateursCulturesTests(DonneesAgricolesMixin, TestCase):
+    """Indicateurs annotés et vectorisés (`analytics`) égaux au calcul ligne par ligne d'origine."""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(username='kpi', password='secret-kpi-123')
+        mais = self.culture(self.user)
+        self.recolte(mais)
+        Recolte.objects.create(
+            culture=mais, date_recolte=date(2025, 8, 1), quantite_recoltee=Decimal('333.33'),
+            prix_vente_unitaire=Decimal('0.10'), depenses_liees_recolte=Decimal('0'),
+        )
+        self.depense(mais.utilisateur, culture=mais, montant='1234.56')
+        # Sans récolte ni dépense
+        self.culture(self.user, nom='Soja')
+        # Superficie nulle, avec une récolte
+        sans_surface = self.culture(self.user, nom='Tomate')
+        Culture.objects.filter(pk=sans_surface.pk).update(superficie=Decimal('0'))
+        self.recolte(sans_surface)
+        self.depense(self.user)
+
+    def cultures(self):
+        return Culture.objects.filter(utilisateur=self.user).order_by('pk')
+
+    def test_serializer_annote_et_calcul_par_ligne(self):
+        annotees = CultureSerializer(annoter_cultures(self.cultures()), many=True).data
+        par_ligne = CultureSerializer(self.cultures().prefetch_related('recoltes'), many=True).data
+        champs = ('rendement_par_hectare', 'nombre_recoltes', 'revenus_totaux', 'cout_total_initial')
+        for annotee, ligne in zip(annotees, par_ligne, strict=True):
+            for champ in champs:
+                with self.subTest(culture=ligne['nom'], champ=champ):
+                    self.assertAlmostEqual(float(annotee[champ]), float(ligne[champ]), places=6)
+
+    def test_indicateurs_vectorises(self):
+        indicateurs = {i['id']: i for i in IndicateursCultures.depuis_queryset(self.cultures()).par_culture()}
+        self.assertEqual(len(indicateurs), 3)
+        for culture in self.cultures().prefetch_related('recoltes', 'depenses'):
+            revenus = sum((r.revenus_totaux for r in culture.recoltes.all()), Decimal('0'))
+            depenses = culture.cout_total_initial + sum((d.montant for d in culture.depenses.all()), Decimal('0'))
+            benefice = revenus - depenses
+            attendu = {
+                'revenus': float(revenus),
+                'depenses': float(depenses),
+                'benefice': float(benefice),
+                'rendement': float(culture.rendement_par_hectare),
+                'roi': float(benefice / depenses * 100) if depenses > 0 else 0.0,
+                'marge': float(benefice / revenus * 100) if revenus > 0 else 0.0,
+                'nb_recoltes': culture.recoltes.count(),
+            }
+            for champ, valeur in attendu.items():
+                with self.subTest(culture=culture.nom, champ=champ):
+                    self.assertAlmostEqual(indicateurs[culture.pk][champ], valeur, places=6)
+
+
+class ReferentielsRegionauxTests(DonneesAgricolesMixin, TestCase):
+    """Seuil d'agriculteurs, repli vers les groupes plus larges et prix pondéré des référentiels."""
+
+    def setUp(self):
+        self.users = [
+            Utilisateur.objects.create_user(username=f'bench{i}', password='secret-bench-123') for i in range(3)
+        ]
+        # Deux agriculteurs à Abomey-Calavi et un à Parakou, tous en saison sèche
+        self.ajouter(self.users[0], 'Abomey-Calavi', Decimal('1000'), Decimal('100'))
+        self.ajouter(self.users[1], 'Abomey-Calavi', Decimal('3000'), Decimal('200'))
+        self.ajouter(self.users[2], 'Parakou', Decimal('500'), Decimal('150'))
+        # Sans récolte : ignorée
+        Culture.objects.filter(pk=self.culture(self.users[2]).pk).update(zone_geographique='Natitingou')
+
+    def ajouter(self, user, zone, quantite, prix):
+        culture = self.culture(user)
+        Culture.objects.filter(pk=culture.pk).update(zone_geographique=zone)
+        Recolte.objects.create(
+            culture=culture, date_recolte=date(2025, 7, 2), quantite_recoltee=quantite,
+            prix_vente_unitaire=prix, depenses_liees_recolte=Decimal('0'),
+        )
+
+    def groupes(self, min_agriculteurs):
+        return {
+            (r.culture_nom, r.zone, r.saison): r
+            for r in calculer_referentiels(min_agriculteurs=min_agriculteurs)
+        }
+
+    def test_seuil_d_agriculteurs(self):
+        self.assertEqual(set(self.groupes(3)), {('mais', '*', 'seche'), ('mais', '*', 'toutes')})
+        self.assertEqual(set(self.groupes(2)), {
+            ('mais', 'abomey-calavi', 'seche'), ('mais', 'abomey-calavi', 'toutes'),
+            ('mais', '*', 'seche'), ('mais', '*', 'toutes'),
+        })
+        self.assertEqual(self.groupes(4), {})
+        with override_settings(BENCHMARK_MIN_AGRICULTEURS=3):
+            self.assertEqual(len(calculer_referentiels()), 2)
+
+    def test_prix_pondere_par_les_quantites(self):
+        groupes = self.groupes(2)
+        # (1000 × 100 + 3000 × 200) / 4000, et non la moyenne des prix (150)
+        self.assertEqual(groupes[('mais', 'abomey-calavi', 'seche')].prix_vente_moyen, Decimal('175.00'))
+        # (100 000 + 600 000 + 75 000) / 4500
+        self.assertEqual(groupes[('mais', '*', 'seche')].prix_vente_moyen, Decimal('172.22'))
+        self.assertEqual(groupes[('mais', '*', 'seche')].nb_cultures, 3)
+        self.assertEqual(groupes[('mais', '*', 'seche')].rendement_moyen, Decimal('600.00'))
+
+    def test_repli_vers_le_groupe_publie_le_plus_precis(self):
+        publier_referentiels(calculer_referentiels(min_agriculteurs=2))
+        resultats = referentiels_pour([
+            ('zone_saison', 'MAÏS ', 'Abomey-Calavi', date(2025, 2, 1)),
+            ('zone', 'Maïs', 'abomey-calavi', date(2025, 5, 1)),
+            ('zone_sans_date', 'Maïs', 'Abomey-Calavi', None),
+            ('saison', 'Maïs', 'Parakou', date(2025, 12, 1)),
+            ('national', 'Maïs', 'Parakou', date(2025, 9, 1)),
+            ('inconnue', 'Manioc', 'Abomey-Calavi', None),
+        ])
+        portees = {cle: (r['zone'], r['saison']) for cle, r in resultats.items()}
+        self.assertEqual(portees, {
+            'zone_saison': ('abomey-calavi', 'seche'),
+            'zone': ('abomey-calavi', 'toutes'),
+            'zone_sans_date': ('abomey-calavi', 'toutes'),
+            'saison': ('*', 'seche'),
+            'national': ('*', 'toutes'),
+        })
+        self.assertEqual(resultats['national']['portee'], 'nationale')
+        self.assertEqual(resultats['zone']['culture'], 'Maïs')
+
+
+class SeriesTemporellesTests(DonneesAgricolesMixin, TestCase):
+    """Fenêtres `parse_periode`, séries hebdomadaires / trimestrielles et erreurs 400 de l'API."""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(username='serie', password='secret-serie-123')
+        culture = self.culture(self.user)  # 10 mars : 75 000 de coûts initiaux
+        self.recolte(culture)  # 2 juillet : 1200 × 275,50
+        self.depense(self.user)  # 15 avril : 42 000
+
+    def test_parse_periode(self):
+        # Début ramené au lundi de la semaine, au premier jour du trimestre
+        self.assertEqual(
+            parse_periode({'granularity': 'week', 'from': '2025-03-05', 'to': '2025-03-20'}),
+            (date(2025, 3, 3), date(2025, 3, 20), 'week'),
+        )
+        self.assertEqual(
+            parse_periode({'granularity': 'quarter', 'from': '2025-02-15', 'to': '2025-09-30'}),
+            (date(2025, 1, 1), date(2025, 9, 30), 'quarter'),
+        )
+        # Sans `from` : les `months` derniers mois jusqu'à `to`
+        self.assertEqual(parse_periode({'to': '2025-06-20'}), (date(2024, 7, 1), date(2025, 6, 20), 'month'))
+        self.assertEqual(parse_periode({'months': '3', 'to': '2025-06-20'})[0], date(2025, 4, 1))
+
+    def test_parse_periode_invalide(self):
+        for params in (
+            {'granularity': 'day'},
+            {'from': '2025-13-01'},
+            {'to': '20/06/2025'},
+            {'from': '2025-06-02', 'to': '2025-06-01'},
+            {'months': '0'},
+            {'months': 'douze'},
+        ):
+            with self.subTest(params=params), self.assertRaises(ValueError):
+                parse_periode(params)
+
+    def test_max_periodes(self):
+        lundi = date(2015, 1, 5)
+        fin = lundi + timedelta(weeks=MAX_PERIODES, days=-1)
+        debut, _, _ = parse_periode({'granularity': 'week', 'from': lundi.isoformat(), 'to': fin.isoformat()})
+        self.assertEqual(len(lister_periodes(debut, fin, 'week')), MAX_PERIODES)
+        with self.assertRaisesMessage(ValueError, str(MAX_PERIODES)):
+            parse_periode({'granularity': 'week', 'from': lundi.isoformat(), 'to': (fin + timedelta(days=1)).isoformat()})
+
+    def test_series_hebdomadaire_et_trimestrielle(self):
+        trimestres = serie_financiere(self.user, date(2025, 1, 1), date(2025, 9, 30), 'quarter')
+        self.assertEqual(
+            [(p['libelle'], p['revenus'], p['depenses']) for p in trimestres],
+            [
+                ('T1 2025', Decimal('0'), Decimal('75000')),
+                ('T2 2025', Decimal('0'), Decimal('42000')),
+                ('T3 2025', Decimal('330600'), Decimal('0')),
+            ],
+        )
+
+        debut, fin, _ = parse_periode({'granularity': 'week', 'from': '2025-01-01', 'to': '2025-09-30'})
+        semaines = serie_financiere(self.user, debut, fin, 'week')
+        self.assertEqual(len(semaines), len(lister_periodes(debut, fin, 'week')))
+        actives = {p['libelle']: (p['revenus'], p['depenses']) for p in semaines if p['revenus'] or p['depenses']}
+        self.assertEqual(actives, {
+            'S11 2025': (Decimal('0'), Decimal('75000')),
+            'S16 2025': (Decimal('0'), Decimal('42000')),
+            'S27 2025': (Decimal('330600'), Decimal('0')),
+        })
+
+    def test_api_graphiques(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {Token.objects.create(user=self.user).key}'
+        response = self.client.get(
+            '/api/dashboard/graphiques/', {'granularity': 'quarter', 'from': '2025-01-01', 'to': '2025-09-30'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['mois'] for p in response.json()['evolution_mensuelle']], ['T1 2025', 'T2 2025', 'T3 2025'])
+
+        for params in (
+            {'granularity': 'year'},
+            {'from': '2025-06-02', 'to': '2025-06-01'},
+            {'granularity': 'week', 'from': '2000-01-01', 'to': '2025-01-01'},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get('/api/dashboard/graphiques/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+class ClientsIATests(SimpleTestCase):
+    """Clients OpenAI partagés (`ai_clients`) : un client synchrone par processus, un asynchrone par boucle."""
+
+    def setUp(self):
+        self.serveur = FakeLLMServer(latence=0).demarrer()
+        self.addCleanup(self.serveur.arreter)
+        reglages = override_settings(
+            GROQ_API_KEY='fake', GROQ_BASE_URL=self.serveur.base_url, AI_TELEMETRY_ENABLED=False,
+            AI_MODEL_TIMEOUT=5.0, AI_TOTAL_TIMEOUT=10.0, AI_HEDGE_DELAY=5.0,
+        )
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.addCleanup(attendre_relais)
+
+    def test_client_synchrone_partage(self):
+        services = [GroqService() for _ in range(3)]
+        self.assertIsNotNone(services[0].client)
+        self.assertTrue(all(service.client is services[0].client for service in services))
+
+        clients = []
+        fils = [
+            threading.Thread(target=lambda: clients.append(get_client('fake', self.serveur.base_url)))
+            for _ in range(8)
+        ]
+        for fil in fils:
+            fil.start()
+        for fil in fils:
+            fil.join()
+        self.assertEqual({id(client) for client in clients}, {id(services[0].client)})
+
+        # Appels successifs d'instances différentes : une seule connexion, maintenue ouverte
+        for service in services:
+            texte = service._completion(PRINCIPAL, service._messages("Bonjour"), False, 5, 'chatbot', 0)
+            self.assertEqual(texte, REPONSE_PAR_DEFAUT)
+        self.assertEqual(self.serveur.stats['requetes'], 3)
+        self.assertEqual(self.serveur.stats['connexions'], 1)
+
+    def test_client_asynchrone_par_boucle(self):
+        async def dans_une_boucle():
+            boucle = asyncio.get_running_loop()
+            client = get_async_client('fake', self.serveur.base_url, boucle)
+            self.assertIs(get_async_client('fake', self.serveur.base_url, boucle), client)
+            for _ in range(2):
+                texte, erreur = await GroqService()._acall_with_relay("Bonjour", endpoint='chatbot_async')
+                self.assertIsNone(erreur)
+            return client
+
+        premier = asyncio.run(dans_une_boucle())
+        second = asyncio.run(dans_une_boucle())
+        # Les connexions d'un client asynchrone appartiennent à sa boucle
+        self.assertIsNot(premier, second)
+        self.assertIsNot(premier, get_client('fake', self.serveur.base_url))
+        self.assertEqual(self.serveur.stats['requetes'], 4)
+        self.assertEqual(self.serveur.stats['connexions'], 2)
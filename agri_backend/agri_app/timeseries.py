@@ -0,0 +1,204 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Séries temporelles financières (revenus / dépenses) par période.
+
+Chaque table source est agrégée en une seule requête groupée
+(`TruncWeek` / `TruncMonth` / `TruncQuarter`), puis les résultats sont
+fusionnés en Python : le nombre de requêtes ne dépend pas du nombre de
+périodes demandées.
+
+Pour les granularités mensuelle et trimestrielle, les mois complets sont
+lus dans les cumuls mensuels (`UserMonthlyRollup`) ; seul le dernier mois,
+tronqué à la date de fin, est agrégé à partir des tables sources.
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import Sum, F
+from django.db.models.functions import TruncWeek, TruncMonth, TruncQuarter
+from django.utils import timezone
+
+from .models import Culture, Recolte, Depense, UserMonthlyRollup
+
+
+GRANULARITES = {
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+}
+
+# Fenêtre par défaut (en mois) et nombre maximal de périodes renvoyées
+MOIS_PAR_DEFAUT = 12
+MAX_PERIODES = 520
+
+
+def ajouter_mois(jour, nb_mois):
+    """Décale une date au premier du mois, de `nb_mois` mois (positif ou négatif)."""
+    index = jour.year * 12 + jour.month - 1 + nb_mois
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def debut_periode(jour, granularite):
+    """Premier jour de la période (semaine ISO, mois ou trimestre) contenant `jour`."""
+    if granularite == 'week':
+        return jour - timedelta(days=jour.weekday())
+    if granularite == 'quarter':
+        return date(jour.year, 3 * ((jour.month - 1) // 3) + 1, 1)
+    return jour.replace(day=1)
+
+
+def periode_suivante(debut, granularite):
+    if granularite == 'week':
+        return debut + timedelta(days=7)
+    if granularite == 'quarter':
+        return ajouter_mois(debut, 3)
+    return ajouter_mois(debut, 1)
+
+
+def libelle_periode(debut, granularite):
+    if granularite == 'week':
+        annee, semaine, _ = debut.isocalendar()
+        return f"S{semaine:02d} {annee}"
+    if granularite == 'quarter':
+        return f"T{(debut.month - 1) // 3 + 1} {debut.year}"
+    return debut.strftime('%b %Y')
+
+
+def _parse_date(valeur, nom):
+    try:
+        return date.fromisoformat(valeur)
+    except ValueError:
+        raise ValueError(f"Paramètre '{nom}' invalide : date au format AAAA-MM-JJ attendue.")
+
+
+def parse_periode(params):
+    """
+    Lit `granularity`, `months`, `from` et `to` dans les paramètres de requête.
+
+    Retourne `(debut, fin, granularite)` ou lève `ValueError` avec un message
+    destiné au client. Sans `from`, la fenêtre couvre les `months` derniers
+    mois (12 par défaut) jusqu'à `to` (aujourd'hui par défaut).
+    """
+    granularite = params.get('granularity', 'month')
+    if granularite not in GRANULARITES:
+        raise ValueError("Paramètre 'granularity' invalide : week, month ou quarter attendu.")
+
+    fin = _parse_date(params['to'], 'to') if params.get('to') else timezone.localdate()
+
+    if params.get('from'):
+        debut = _parse_date(params['from'], 'from')
+    else:
+        try:
+            nb_mois = int(params.get('months', MOIS_PAR_DEFAUT))
+        except (TypeError, ValueError):
+            raise ValueError("Paramètre 'months' invalide : entier attendu.")
+        if nb_mois < 1:
+            raise ValueError("Paramètre 'months' invalide : il doit être au moins égal à 1.")
+        debut = ajouter_mois(fin, -(nb_mois - 1))
+
+    if debut > fin:
+        raise ValueError("La date 'from' doit précéder la date 'to'.")
+
+    debut = debut_periode(debut, granularite)
+    nb_periodes = len(lister_periodes(debut, fin, granularite, limite=MAX_PERIODES + 1))
+    if nb_periodes > MAX_PERIODES:
+        raise ValueError(f"Fenêtre trop large : {MAX_PERIODES} périodes au maximum.")
+
+    return debut, fin, granularite
+
+
+def lister_periodes(debut, fin, granularite, limite=None):
+    """Débuts de toutes les périodes entre `debut` et `fin` (inclus)."""
+    periodes = []
+    courant = debut_periode(debut, granularite)
+    while courant <= fin and (limite is None or len(periodes) < limite):
+        periodes.append(courant)
+        courant = periode_suivante(courant, granularite)
+    return periodes
+
+
+def _totaux_par_periode(queryset, champ_date, granularite, total):
+    trunc = GRANULARITES[granularite]
+    lignes = queryset.annotate(
+        periode=trunc(champ_date)
+    ).values('periode').annotate(total=total).order_by('periode')
+    return {ligne['periode']: ligne['total'] or Decimal('0') for ligne in lignes}
+
+
+def _totaux_sources(user, debut, fin, granularite):
+    """Revenus, dépenses et coûts initiaux par période, depuis les tables sources."""
+    revenus = _totaux_par_periode(
+        Recolte.objects.filter(culture__utilisateur=user, date_recolte__range=(debut, fin)),
+        'date_recolte', granularite,
+        Sum(F('quantite_recoltee') * F('prix_vente_unitaire')),
+    )
+    depenses = _totaux_par_periode(
+        Depense.objects.filter(utilisateur=user, date_depense__range=(debut, fin)),
+        'date_depense', granularite,
+        Sum('montant'),
+    )
+    # Coûts initiaux des cultures plantées sur la période
+    couts_initiaux = _totaux_par_periode(
+        Culture.objects.filter(utilisateur=user, date_culture__range=(debut, fin)),
+        'date_culture', granularite,
+        Sum('cout_achat_semences') + Sum('cout_main_oeuvre'),
+    )
+
+    totaux = {}
+    for periode in set(revenus) | set(depenses) | set(couts_initiaux):
+        totaux[periode] = (
+            revenus.get(periode, Decimal('0')),
+            depenses.get(periode, Decimal('0')) + couts_initiaux.get(periode, Decimal('0')),
+        )
+    return totaux
+
+
+def _totaux_cumuls(user, debut, fin_exclue, granularite):
+    """Mêmes totaux, lus dans les cumuls mensuels pour les mois de [debut, fin_exclue)."""
+    lignes = UserMonthlyRollup.objects.filter(
+        utilisateur=user, mois__gte=debut, mois__lt=fin_exclue
+    ).values('mois').annotate(
+        total_revenus=Sum('revenus'),
+        total_depenses=Sum(F('depenses_generales') + F('couts_initiaux')),
+    ).order_by()
+
+    totaux = {}
+    for ligne in lignes:
+        periode = debut_periode(ligne['mois'], granularite)
+        revenus, depenses = totaux.get(periode, (Decimal('0'), Decimal('0')))
+        totaux[periode] = (
+            revenus + (ligne['total_revenus'] or Decimal('0')),
+            depenses + (ligne['total_depenses'] or Decimal('0')),
+        )
+    return totaux
+
+
+def serie_financiere(user, debut, fin, granularite='month'):
+    """
+    Revenus et dépenses de l'utilisateur pour chaque période de la fenêtre.
+
+    Les dépenses regroupent les dépenses enregistrées et les coûts initiaux
+    des cultures plantées. Les périodes sans activité sont présentes avec
+    des totaux nuls. Le nombre de requêtes ne dépend pas de la fenêtre.
+    """
+    if granularite == 'week':
+        totaux = _totaux_sources(user, debut, fin, granularite)
+    else:
+        # Mois complets depuis les cumuls, mois de `fin` depuis les sources
+        mois_fin = fin.replace(day=1)
+        totaux = _totaux_cumuls(user, debut, mois_fin, granularite)
+        for periode, (revenus, depenses) in _totaux_sources(user, mois_fin, fin, granularite).items():
+            anciens_revenus, anciennes_depenses = totaux.get(periode, (Decimal('0'), Decimal('0')))
+            totaux[periode] = (anciens_revenus + revenus, anciennes_depenses + depenses)
+
+    serie = []
+    for periode in lister_periodes(debut, fin, granularite):
+        revenus, depenses = totaux.get(periode, (Decimal('0'), Decimal('0')))
+        serie.append({
+            'debut': periode,
+            'libelle': libelle_periode(periode, granularite),
+            'revenus': revenus,
+            'depenses': depenses,
+        })
+    return serie
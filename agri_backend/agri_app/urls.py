@@ -20,6 +20,7 @@ urlpatterns = [
     path('cultures/', views.CultureListCreateView.as_view(), name='culture-list-create'),
     path('cultures/<int:pk>/', views.CultureDetailView.as_view(), name='culture-detail'),
     path('cultures/options/', views.cultures_options, name='cultures-options'),
+    path('cultures/referentiels/', views.referentiels_regionaux, name='referentiels-regionaux'),
     
     # Récoltes
     path('recoltes/', views.RecolteListCreateView.as_view(), name='recolte-list-create'),
@@ -39,12 +40,16 @@ urlpatterns = [
     
     # Chatbot AI et Conversations
     path('chatbot/', views.chatbot_view, name='chatbot'),
+    path('chatbot/stream/', views.chatbot_stream_view, name='chatbot-stream'),
+    path('chatbot/async/', views.chatbot_async_view, name='chatbot-async'),
+    path('chatbot/stream/async/', views.chatbot_stream_async_view, name='chatbot-stream-async'),
     path('conversations/', views.ConversationListView.as_view(), name='conversation-list'),
     path('conversations/<int:id>/', views.ConversationDetailView.as_view(), name='conversation-detail'),
     
     # Rapports IA
     path('rapports/', views.RapportIAListView.as_view(), name='rapport-list'),
     path('rapports/generer/', views.generate_rapport_view, name='generer-rapport'),
+    path('rapports/generer/async/', views.generate_rapport_async_view, name='generer-rapport-async'),
     
     # Support
     path('support/', views.SupportMessageListCreateView.as_view(), name='support-list-create'),
@@ -57,4 +62,11 @@ urlpatterns = [
     path('annonces/mes-annonces/', views.MesAnnoncesListView.as_view(), name='mes-annonces'),
     path('annonces/<int:pk>/', views.ProduitAnnonceDetailView.as_view(), name='annonce-detail'),
     path('annonces/<int:pk>/payer/', views.simuler_paiement_annonce, name='annonce-payer'),
+
+    # Supervision (administrateurs)
+    path('monitoring/geolocalisation/', views.geolocation_stats, name='geolocation-stats'),
+    path('monitoring/contexte-ia/', views.ai_context_stats, name='ai-context-stats'),
+    path('monitoring/reponses-ia/', views.ai_response_cache_stats, name='ai-response-cache-stats'),
+    path('monitoring/modeles-ia/', views.ai_models_health, name='ai-models-health'),
+    path('monitoring/appels-ia/', views.ai_calls_stats, name='ai-calls-stats'),
 ]
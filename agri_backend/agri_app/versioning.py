@@ -0,0 +1,143 @@
+# © 2025 - Développé par BlackBenAI (Fondateur: Marino ATOHOUN)
+"""
+Version des données par utilisateur et cache des réponses associé.
+
+`Utilisateur.version_donnees` est incrémentée par les signaux à chaque
+modification d'une culture, récolte, dépense ou d'un conseil. Les réponses
+coûteuses (tableau de bord, graphiques) sont mises en cache sous la clé
+(espace, utilisateur, version, paramètres) : une modification change la
+version, donc la clé, sans invalidation explicite. La même information
+sert d'`ETag` pour répondre `304 Not Modified` aux clients déjà à jour.
+
+Les listes paginées utilisent `ConditionalGetMixin` : leur validateur
+(nombre de lignes, date la plus récente, version, paramètres) est calculé
+par une seule agrégation, avant toute sérialisation.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Count, Max
+from django.utils.http import http_date, parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def incrementer_version(*user_ids):
+    """Incrémente la version des données des utilisateurs (après commit)."""
+    from .models import Utilisateur
+
+    ids = {user_id for user_id in user_ids if user_id}
+    if not ids:
+        return
+    transaction.on_commit(
+        lambda: Utilisateur.objects.filter(pk__in=ids).update(version_donnees=F('version_donnees') + 1)
+    )
+
+
+def cle_parametres(parametres):
+    """Empreinte courte et stable des paramètres qui influencent la réponse."""
+    if not parametres:
+        return '0'
+    brut = repr(sorted((str(k), str(v)) for k, v in parametres.items()))
+    return hashlib.sha1(brut.encode('utf-8')).hexdigest()[:12]
+
+
+def etag_correspond(request, etag):
+    """Vrai si l'en-tête If-None-Match du client contient `etag`."""
+    entete = request.META.get('HTTP_IF_NONE_MATCH')
+    if not entete:
+        return False
+    etags = parse_etags(entete)
+    # Comparaison faible (RFC 9110) : W/"x" et "x" sont équivalents pour un GET
+    return '*' in etags or etag in [e[2:] if e.startswith('W/') else e for e in etags]
+
+
+def reponse_versionnee(request, espace, construire, parametres=None):
+    """
+    Renvoie la réponse de `construire()` en la mettant en cache par version.
+
+    - si le client possède déjà la version courante (If-None-Match) : 304
+      sans aucun calcul ;
+    - sinon, le contenu est lu dans le cache ou calculé puis mis en cache.
+
+    `parametres` regroupe tout ce dont dépend la réponse en plus des données
+    de l'utilisateur (fenêtre de dates, granularité...).
+    """
+    user = request.user
+    version = user.version_donnees
+    empreinte = cle_parametres(parametres)
+    etag = f'"{espace}-{user.pk}-{version}-{empreinte}"'
+    entetes = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+    if etag_correspond(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=entetes)
+
+    cle = f'reponse:{espace}:{user.pk}:{version}:{empreinte}'
+    donnees = cache.get(cle)
+    if donnees is None:
+        donnees = construire()
+        cache.set(cle, donnees, settings.RESPONSE_CACHE_TIMEOUT)
+    return Response(donnees, headers=entetes)
+
+
+def reponse_conditionnelle(request, espace, queryset, champ_date, construire):
+    """
+    Répond 304 si le client possède déjà le contenu de `queryset`.
+
+    Le validateur combine le nombre de lignes et la plus récente valeur de
+    `champ_date` (une seule agrégation), la version des données de
+    l'utilisateur (modifications sans changement de date) et les paramètres
+    de la requête (filtres, page). Sinon, `construire()` produit la réponse.
+    """
+    user = request.user
+    agregats = queryset.aggregate(nombre=Count('pk'), dernier=Max(champ_date))
+    dernier = agregats['dernier']
+    empreinte = cle_parametres({
+        'version': user.version_donnees,
+        'nombre': agregats['nombre'],
+        'dernier': dernier.isoformat() if dernier else '',
+        'requete': request.META.get('QUERY_STRING', ''),
+    })
+    etag = f'"{espace}-{user.pk}-{empreinte}"'
+    entetes = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if dernier:
+        entetes['Last-Modified'] = http_date(dernier.timestamp())
+
+    if etag_correspond(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=entetes)
+
+    response = construire()
+    if response.status_code == status.HTTP_200_OK:
+        for nom, valeur in entetes.items():
+            response[nom] = valeur
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    GET conditionnel (ETag / 304) pour les vues `ListAPIView`.
+
+    `champ_date_validation` désigne le champ daté le plus récent à chaque
+    modification (`date_modification` s'il existe, sinon `date_creation`).
+    Les vues dont la requête porte des annotations coûteuses redéfinissent
+    `get_queryset_validation()` pour calculer le validateur sans elles.
+    """
+
+    champ_date_validation = 'date_creation'
+    espace_etag = None
+
+    def get_queryset_validation(self):
+        """Lignes de la liste (mêmes filtres que `get_queryset`), pour le validateur."""
+        return self.filter_queryset(self.get_queryset())
+
+    def list(self, request, *args, **kwargs):
+        return reponse_conditionnelle(
+            request,
+            self.espace_etag or self.__class__.__name__.lower(),
+            self.get_queryset_validation(),
+            self.champ_date_validation,
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs),
+        )
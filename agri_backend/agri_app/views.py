@@ -6,16 +6,24 @@ Ce fichier contient toutes les vues Django REST Framework
 pour gérer les endpoints de l'API.
 """
 
-from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework import exceptions, generics, status, permissions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import update_last_login
-from django.db.models import Sum, Avg, Count, Q, F, Subquery, OuterRef, DecimalField, Case, When
-from django.db.models.functions import Coalesce
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from asgiref.sync import sync_to_async
+from django.db.models import Sum, Avg, Count, Q, F, Subquery, OuterRef, DecimalField, FloatField, Case, When, Prefetch
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, Coalesce
 from django.utils import timezone
 from datetime import datetime, timedelta
+import json
 from decimal import Decimal
 
 from .models import Utilisateur, Culture, Recolte, Depense, ConseilAgricole, RapportIA, Conversation, MessageChat, SupportMessage, ProduitAnnonce, NewsletterSubscription, ContactMessage
@@ -28,6 +36,20 @@ from .serializers import (
 )
 from .ai_service import GroqService
 from .utils import generate_report_pdf
+from .geolocation import get_pipeline
+from .summaries import get_resume_financier
+from .timeseries import parse_periode, serie_financiere
+from .analytics import IndicateursCultures, annoter_cultures
+from .versioning import ConditionalGetMixin, reponse_conditionnelle, reponse_versionnee
+from .benchmarks import generation as generation_referentiels, referentiels_pour
+from .ai_context import contexte_utilisateur, get_contexte_cache
+from .ai_health import etats, ordre_relais
+from .ai_response_cache import get_reponse_cache
+from .ai_telemetry import agregats as agregats_appels, get_telemetrie
+from .ai_quotas import appliquer_entetes, consommer_tokens, message_quota_depasse, verifier_quota
+from .ai_memory import acharger_memoire, aresumer, charger_memoire, historique, resumer
+from .snapshots import snapshot_id
+from .streaming import EventStreamRenderer, evenement_sse
 
 
 class UtilisateurCreateView(generics.CreateAPIView):
@@ -108,21 +130,30 @@ def change_password_view(request):
             return Response({'current_password': ['Mot de passe actuel incorrect.']}, status=status.HTTP_400_BAD_REQUEST)
         
         user.set_password(serializer.validated_data['new_password'])
-        user.save()
+        user.save(update_fields=['password'])
         return Response({'message': 'Mot de passe modifié avec succès.'})
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CultureListCreateView(generics.ListCreateAPIView):
+class CultureListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     """
     Vue pour lister et créer des cultures.
     """
     serializer_class = CultureSerializer
     permission_classes = [permissions.IsAuthenticated]
+    espace_etag = 'cultures'
+    champ_date_validation = 'date_modification'
     
     def get_queryset(self):
         """Retourne uniquement les cultures de l'utilisateur connecté."""
+        return annoter_cultures(self._cultures())
+    
+    def get_queryset_validation(self):
+        # Validateur ETag : nombre et date des cultures, sans les totaux annotés
+        return self.filter_queryset(self._cultures())
+    
+    def _cultures(self):
         queryset = Culture.objects.filter(utilisateur=self.request.user)
         
         # Filtres optionnels
@@ -155,15 +186,16 @@ class CultureDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     def get_queryset(self):
         """Retourne uniquement les cultures de l'utilisateur connecté."""
-        return Culture.objects.filter(utilisateur=self.request.user)
+        return annoter_cultures(Culture.objects.filter(utilisateur=self.request.user))
 
 
-class RecolteListCreateView(generics.ListCreateAPIView):
+class RecolteListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     """
     Vue pour lister et créer des récoltes.
     """
     serializer_class = RecolteSerializer
     permission_classes = [permissions.IsAuthenticated]
+    espace_etag = 'recoltes'
     
     def get_queryset(self):
         """Retourne uniquement les récoltes des cultures de l'utilisateur connecté."""
@@ -198,12 +230,13 @@ class RecolteDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Recolte.objects.filter(culture__utilisateur=self.request.user)
 
 
-class DepenseListCreateView(generics.ListCreateAPIView):
+class DepenseListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     """
     Vue pour lister et créer des dépenses.
     """
     serializer_class = DepenseSerializer
     permission_classes = [permissions.IsAuthenticated]
+    espace_etag = 'depenses'
     
     def get_queryset(self):
         """Retourne uniquement les dépenses de l'utilisateur connecté."""
@@ -246,12 +279,13 @@ class DepenseDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Depense.objects.filter(utilisateur=self.request.user)
 
 
-class ConseilAgricoleListView(generics.ListAPIView):
+class ConseilAgricoleListView(ConditionalGetMixin, generics.ListAPIView):
     """
     Vue pour lister les conseils agricoles de l'utilisateur.
     """
     serializer_class = ConseilAgricoleSerializer
     permission_classes = [permissions.IsAuthenticated]
+    espace_etag = 'conseils'
     
     def get_queryset(self):
         """Retourne uniquement les conseils de l'utilisateur connecté."""
@@ -302,105 +336,30 @@ def marquer_conseil_lu(request, conseil_id):
 def dashboard_stats(request):
     """
     Vue pour récupérer les statistiques du tableau de bord.
-    """
-    user = request.user
-    
-    # Statistiques de base
-    total_cultures = Culture.objects.filter(utilisateur=user).count()
-    total_recoltes = Recolte.objects.filter(culture__utilisateur=user).count()
-    
-    # Calculs financiers
-    # CORRIGÉ : Le calcul des revenus totaux était incorrect.
-    # Il multipliait la somme des quantités par la somme des prix.
-    revenus_totaux = Recolte.objects.filter(
-        culture__utilisateur=user
-    ).aggregate(
-        total=Sum(F('quantite_recoltee') * F('prix_vente_unitaire'))
-    )['total'] or Decimal('0')
-    
-    # Dépenses totales (cultures + récoltes + dépenses générales)
-    depenses_cultures = Culture.objects.filter(
-        utilisateur=user
-    ).aggregate(
-        total=Sum('cout_achat_semences') + Sum('cout_main_oeuvre')
-    )['total'] or Decimal('0')
-    
-    depenses_recoltes = Recolte.objects.filter(
-        culture__utilisateur=user
-    ).aggregate(
-        total=Sum('depenses_liees_recolte')
-    )['total'] or Decimal('0')
-    
-    depenses_generales = Depense.objects.filter(
-        utilisateur=user
-    ).aggregate(
-        total=Sum('montant')
-    )['total'] or Decimal('0')
-    
-    depenses_totales = depenses_cultures + depenses_recoltes + depenses_generales
-    benefice_net = revenus_totaux - depenses_totales
-    
-    # Culture la plus rentable (optimisé pour éviter les N+1 queries)
-    revenues_subquery = Recolte.objects.filter(
-        culture=OuterRef('pk')
-    ).values('culture').annotate(
-        total=Sum(F('quantite_recoltee') * F('prix_vente_unitaire'))
-    ).values('total')
 
-    expenses_subquery = Depense.objects.filter(
-        culture=OuterRef('pk')
-    ).values('culture').annotate(
-        total=Sum('montant')
-    ).values('total')
-
-    cultures_rentabilite = Culture.objects.filter(
-        utilisateur=user
-    ).annotate(
-        total_revenus=Coalesce(Subquery(revenues_subquery, output_field=DecimalField()), Decimal('0.0')),
-        total_depenses_associees=Coalesce(Subquery(expenses_subquery, output_field=DecimalField()), Decimal('0.0'))
-    ).annotate(
-        benefice_net_culture=F('total_revenus') - (F('cout_achat_semences') + F('cout_main_oeuvre') + F('total_depenses_associees'))
-    )
+    Les statistiques proviennent du résumé financier dénormalisé
+    (`UserFinancialSummary`), maintenu incrémentalement par les signaux :
+    une seule ligne est lue au lieu d'une dizaine d'agrégats. La réponse est
+    mise en cache par version des données (ETag / 304).
+    """
+    def construire():
+        resume = get_resume_financier(request.user)
+
+        stats = {
+            'total_cultures': resume.total_cultures,
+            'total_recoltes': resume.total_recoltes,
+            'revenus_totaux': resume.revenus_totaux,
+            'depenses_totales': resume.depenses_totales,
+            'benefice_net': resume.benefice_net,
+            'culture_plus_rentable': resume.culture_plus_rentable,
+            'rendement_moyen': resume.rendement_moyen,
+            'conseils_non_lus': resume.conseils_non_lus,
+        }
 
-    culture_plus_rentable_obj = cultures_rentabilite.filter(total_revenus__gt=0).order_by('-benefice_net_culture').first()
+        serializer = DashboardStatsSerializer(stats)
+        return dict(serializer.data)
 
-    culture_plus_rentable = "Aucune"
-    if culture_plus_rentable_obj:
-        culture_plus_rentable = culture_plus_rentable_obj.nom
-    
-    # Rendement moyen
-    # CORRIGÉ : Le calcul du "rendement moyen" calculait en réalité la "superficie moyenne".
-    # Le calcul correct est la moyenne du rendement (quantité récoltée / superficie) pour chaque culture.
-    cultures_avec_rendement = Culture.objects.filter(
-        utilisateur=user,
-        superficie__gt=0,
-        recoltes__isnull=False
-    ).annotate(
-        total_recolte=Sum('recoltes__quantite_recoltee')
-    ).aggregate(
-        moyenne=Avg(F('total_recolte') / F('superficie'))
-    )['moyenne'] or Decimal('0')
-    
-    rendement_moyen = round(cultures_avec_rendement, 2)
-    # Conseils non lus
-    conseils_non_lus = ConseilAgricole.objects.filter(
-        utilisateur=user,
-        lu=False
-    ).count()
-    
-    stats = {
-        'total_cultures': total_cultures,
-        'total_recoltes': total_recoltes,
-        'revenus_totaux': revenus_totaux,
-        'depenses_totales': depenses_totales,
-        'benefice_net': benefice_net,
-        'culture_plus_rentable': culture_plus_rentable,
-        'rendement_moyen': rendement_moyen,
-        'conseils_non_lus': conseils_non_lus,
-    }
-    
-    serializer = DashboardStatsSerializer(stats)
-    return Response(serializer.data)
+    return reponse_versionnee(request, 'dashboard', construire)
 
 
 @api_view(['GET'])
@@ -408,99 +367,71 @@ def dashboard_stats(request):
 def graphiques_donnees(request):
     """
     Vue pour récupérer les données des graphiques avec des analyses avancées.
+
+    Paramètres optionnels : `granularity` (week, month, quarter), `months`
+    (fenêtre en mois, 12 par défaut) ou `from` / `to` (dates AAAA-MM-JJ).
+    La réponse est mise en cache par version des données et par calcul des
+    référentiels régionaux (ETag / 304).
     """
-    user = request.user
-    
-    # 1. Évolution mensuelle (Revenus vs Dépenses)
+    try:
+        debut, fin, granularite = parse_periode(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return reponse_versionnee(
+        request,
+        'graphiques',
+        lambda: _calculer_graphiques(request.user, debut, fin, granularite),
+        parametres={
+            'debut': debut, 'fin': fin, 'granularite': granularite,
+            'referentiels': generation_referentiels(),
+        },
+    )
+
+
+def _calculer_graphiques(user, debut, fin, granularite):
+    """Calcule toutes les données de la vue `graphiques_donnees`."""
+    # 1. Évolution par période (Revenus vs Dépenses)
     evolution_mensuelle = []
     tendance_cumulative = []
     cumul_benefice = Decimal('0')
-    
-    # On récupère les 12 derniers mois
-    for i in range(11, -1, -1):
-        date_debut = (timezone.now().replace(day=1) - timedelta(days=30*i)).replace(day=1)
-        if date_debut.month == 12:
-            date_fin = date_debut.replace(year=date_debut.year + 1, month=1) - timedelta(days=1)
-        else:
-            date_fin = date_debut.replace(month=date_debut.month + 1) - timedelta(days=1)
-        
-        revenus_mois = Recolte.objects.filter(
-            culture__utilisateur=user,
-            date_recolte__range=[date_debut, date_fin]
-        ).aggregate(
-            total=Sum(F('quantite_recoltee') * F('prix_vente_unitaire'))
-        )['total'] or Decimal('0')
-        
-        depenses_mois = Depense.objects.filter(
-            utilisateur=user,
-            date_depense__range=[date_debut, date_fin]
-        ).aggregate(
-            total=Sum('montant')
-        )['total'] or Decimal('0')
-        
-        # Ajouter les coûts initiaux des cultures plantées ce mois-là
-        depenses_initiales = Culture.objects.filter(
-            utilisateur=user,
-            date_culture__range=[date_debut, date_fin]
-        ).aggregate(
-            total=Sum('cout_achat_semences') + Sum('cout_main_oeuvre')
-        )['total'] or Decimal('0')
-        
-        total_depenses_mois = depenses_mois + depenses_initiales
-        benefice_mois = revenus_mois - total_depenses_mois
-        cumul_benefice += benefice_mois
-        
-        mois_label = date_debut.strftime('%b %Y')
-        
+
+    for periode in serie_financiere(user, debut, fin, granularite):
+        cumul_benefice += periode['revenus'] - periode['depenses']
+        # La clé 'mois' est conservée pour compatibilité frontend, quelle que soit la granularité
         evolution_mensuelle.append({
-            'mois': mois_label, 
-            'revenus': float(revenus_mois),
-            'depenses': float(total_depenses_mois)
+            'mois': periode['libelle'],
+            'periode': periode['debut'].isoformat(),
+            'revenus': float(periode['revenus']),
+            'depenses': float(periode['depenses'])
+        })
+        tendance_cumulative.append({
+            'mois': periode['libelle'],
+            'periode': periode['debut'].isoformat(),
+            'benefice_cumule': float(cumul_benefice)
         })
-        tendance_cumulative.append({'mois': mois_label, 'benefice_cumule': float(cumul_benefice)})
-
-    # 2. Performance par culture
-    revenues_subquery = Recolte.objects.filter(
-        culture=OuterRef('pk')
-    ).values('culture').annotate(
-        total=Sum(F('quantite_recoltee') * F('prix_vente_unitaire'))
-    ).values('total')
-
-    expenses_subquery = Depense.objects.filter(
-        culture=OuterRef('pk')
-    ).values('culture').annotate(
-        total=Sum('montant')
-    ).values('total')
 
-    recolte_quantite_subquery = Recolte.objects.filter(
-        culture=OuterRef('pk')
-    ).values('culture').annotate(
-        total=Sum('quantite_recoltee')
-    ).values('total')
+    # 2. Performance par culture (indicateurs vectorisés, une seule requête)
+    indicateurs = IndicateursCultures.depuis_queryset(Culture.objects.filter(utilisateur=user))
+    par_culture = indicateurs.par_culture()
 
-    cultures_stats = Culture.objects.filter(
-        utilisateur=user
-    ).annotate(
-        total_revenus=Coalesce(Subquery(revenues_subquery, output_field=DecimalField()), Decimal('0.0')),
-        total_depenses_associees=Coalesce(Subquery(expenses_subquery, output_field=DecimalField()), Decimal('0.0')),
-        total_recolte=Coalesce(Subquery(recolte_quantite_subquery, output_field=DecimalField()), Decimal('0.0'))
-    ).annotate(
-        total_depenses=F('cout_achat_semences') + F('cout_main_oeuvre') + F('total_depenses_associees'),
-        rendement=Case(
-            When(superficie__gt=0, then=F('total_recolte') / F('superficie')),
-            default=Decimal('0.0'),
-            output_field=DecimalField()
-        )
+    # Moyennes régionales précalculées (une requête indexée, sans parcourir les autres exploitations)
+    referentiels = referentiels_pour(
+        Culture.objects.filter(utilisateur=user).values_list('id', 'nom', 'zone_geographique', 'date_culture')
     )
 
     rendement_par_culture = [
-        {'nom': c.nom, 'rendement': float(c.rendement)} 
-        for c in cultures_stats if c.rendement > 0
+        {
+            'nom': c['nom'],
+            'rendement': c['rendement'],
+            'moyenne_regionale': referentiels[c['id']]['rendement_moyen'] if c['id'] in referentiels else None,
+        }
+        for c in par_culture if c['rendement'] > 0
     ]
 
     benefice_par_culture = [
-        {'nom': c.nom, 'benefice': float(c.total_revenus - c.total_depenses)} 
-        for c in cultures_stats
+        {'nom': c['nom'], 'benefice': c['benefice']}
+        for c in par_culture
     ]
 
     # 3. Dépenses par catégorie
@@ -515,18 +446,13 @@ def graphiques_donnees(request):
         for item in depenses_par_categorie_query
     ]
 
-    # 4. Métriques globales
-    total_revenus = sum(c.total_revenus for c in cultures_stats)
-    total_depenses = sum(c.total_depenses for c in cultures_stats)
-    benefice_total = total_revenus - total_depenses
-
-    roi_moyen = float((benefice_total / total_depenses * 100)) if total_depenses > 0 else 0
-    marge_beneficiaire = float((benefice_total / total_revenus * 100)) if total_revenus > 0 else 0
-    
-    cultures_avec_rendement = [c.rendement for c in cultures_stats if c.rendement > 0]
-    productivite_moyenne = float(sum(cultures_avec_rendement) / len(cultures_avec_rendement)) if cultures_avec_rendement else 0
-    
-    efficacite_couts = float(total_revenus / total_depenses) if total_depenses > 0 else 0
+    # 4. Métriques globales (sommes exactes, ratios en flottants)
+    total_revenus = indicateurs.totaux()['revenus']
+    ratios = indicateurs.ratios_globaux()
+    roi_moyen = ratios['roi']
+    marge_beneficiaire = ratios['marge']
+    productivite_moyenne = indicateurs.productivite_moyenne()
+    efficacite_couts = ratios['efficacite_couts']
 
     # 5. Insights
     insights = []
@@ -546,14 +472,27 @@ def graphiques_donnees(request):
         })
 
     if rendement_par_culture:
-        top_culture = max(cultures_stats, key=lambda x: x.rendement)
+        top_culture = par_culture[indicateurs.meilleure('rendement')]
         insights.append({
             'type': 'info',
             'title': 'Meilleure Performance',
-            'message': f'Le {top_culture.nom} a le meilleur rendement avec {top_culture.rendement:.1f} kg/ha.',
+            'message': f'Le {top_culture["nom"]} a le meilleur rendement avec {top_culture["rendement"]:.1f} kg/ha.',
             'recommendation': 'Identifiez les facteurs clés de succès de cette culture pour les appliquer aux autres.'
         })
 
+    en_retrait = [
+        c for c in rendement_par_culture
+        if c['moyenne_regionale'] and c['rendement'] < 0.8 * c['moyenne_regionale']
+    ]
+    if en_retrait:
+        culture = min(en_retrait, key=lambda c: c['rendement'] / c['moyenne_regionale'])
+        insights.append({
+            'type': 'warning',
+            'title': 'Rendement sous la moyenne régionale',
+            'message': f'Le {culture["nom"]} produit {culture["rendement"]:.1f} kg/ha contre {culture["moyenne_regionale"]:.1f} kg/ha en moyenne dans votre région.',
+            'recommendation': 'Comparez vos pratiques (semences, dates de semis, fertilisation) avec celles des exploitations voisines.'
+        })
+
     # 6. Objectifs (Simulés pour l'instant)
     objectifs = {
         'revenus': {
@@ -570,7 +509,7 @@ def graphiques_donnees(request):
         }
     }
 
-    return Response({
+    return {
         'revenus_par_mois': evolution_mensuelle,  # Gardé pour compatibilité frontend
         'evolution_mensuelle': evolution_mensuelle,
         'tendance_cumulative': tendance_cumulative,
@@ -582,8 +521,13 @@ def graphiques_donnees(request):
         'productivite_moyenne': productivite_moyenne,
         'efficacite_couts': efficacite_couts,
         'insights': insights,
-        'objectifs': objectifs
-    })
+        'objectifs': objectifs,
+        'periode': {
+            'granularite': granularite,
+            'debut': debut.isoformat(),
+            'fin': fin.isoformat()
+        }
+    }
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -593,9 +537,76 @@ def cultures_options(request):
     """
     cultures = Culture.objects.filter(
         utilisateur=request.user
-    ).values('id', 'nom', 'date_culture')
+    )
+
+    return reponse_conditionnelle(
+        request, 'cultures-options', cultures, 'date_modification',
+        lambda: Response(list(cultures.values('id', 'nom', 'date_culture')))
+    )
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def referentiels_regionaux(request):
+    """
+    Référentiels régionaux (rendement, coût/ha, prix de vente moyens).
+
+    Avec `nom` : référentiel d'une culture pour `zone` (zone de l'utilisateur
+    par défaut) et la saison de `date` (AAAA-MM-JJ, optionnelle). Sans
+    paramètre : référentiel de chacune des cultures de l'utilisateur.
+    """
+    nom = request.query_params.get('nom')
+    if nom:
+        jour = None
+        if request.query_params.get('date'):
+            try:
+                jour = datetime.strptime(request.query_params['date'], '%Y-%m-%d').date()
+            except ValueError:
+                return Response({'error': "Paramètre 'date' invalide : date au format AAAA-MM-JJ attendue."}, status=status.HTTP_400_BAD_REQUEST)
+        zone = request.query_params.get('zone') or request.user.zone_geographique
+        referentiel = referentiels_pour([(nom, nom, zone, jour)]).get(nom)
+        if referentiel is None:
+            return Response({'error': 'Aucun référentiel disponible pour cette culture'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(referentiel)
+
+    cultures = list(Culture.objects.filter(
+        utilisateur=request.user
+    ).values_list('id', 'nom', 'zone_geographique', 'date_culture'))
+    referentiels = referentiels_pour(cultures)
+    return Response([
+        {'culture_id': culture_id, 'nom': nom, 'referentiel': referentiels.get(culture_id)}
+        for culture_id, nom, _, _ in cultures
+    ])
+
+
+def _conversations(user, conversation_id):
+    """
+    Conversation `conversation_id` de `user` (requête vide si elle n'existe pas).
+
+    Cherchée avant le contrôle du quota : une conversation introuvable (404)
+    ne consomme aucune requête du quota.
+    """
+    return Conversation.objects.filter(id=conversation_id, utilisateur=user)
+
+
+def _ouvrir_conversation(user, message_text, conversation=None):
+    """
+    `(conversation, message)` : conversation du message (`conversation`, ou
+    une nouvelle) et message de l'utilisateur enregistré.
+    """
+    # Gestion de la conversation
+    if conversation is None:
+        # Créer une nouvelle conversation avec un titre basé sur le premier message
+        titre = message_text[:50] + "..." if len(message_text) > 50 else message_text
+        conversation = Conversation.objects.create(utilisateur=user, titre=titre)
     
-    return Response(list(cultures))
+    # Sauvegarder le message de l'utilisateur
+    message = MessageChat.objects.create(
+        conversation=conversation,
+        est_utilisateur=True,
+        contenu=message_text
+    )
+    return conversation, message
 
 
 @api_view(['POST'])
@@ -604,6 +615,13 @@ def chatbot_view(request):
     """
     Vue pour interagir avec le chatbot Groq en utilisant les données de l'utilisateur.
     Gère maintenant l'historique des conversations.
+    
+    Une question déjà posée sur les mêmes données est servie par le cache des
+    réponses, sauf si le corps contient `"cache": false`.
+    
+    Soumise aux quotas du plan d'abonnement (voir `agri_app.ai_quotas`) :
+    429 avec `Retry-After` une fois le quota atteint, quotas restants dans
+    les en-têtes `X-RateLimit-*`.
     """
     user = request.user
     message_text = request.data.get('message')
@@ -612,78 +630,148 @@ def chatbot_view(request):
     if not message_text:
         return Response({'error': 'Le message est requis'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Gestion de la conversation
+    conversation = None
     if conversation_id:
-        try:
-            conversation = Conversation.objects.get(id=conversation_id, utilisateur=user)
-        except Conversation.DoesNotExist:
+        conversation = _conversations(user, conversation_id).first()
+        if conversation is None:
             return Response({'error': 'Conversation introuvable'}, status=status.HTTP_404_NOT_FOUND)
-    else:
-        # Créer une nouvelle conversation avec un titre basé sur le premier message
-        titre = message_text[:50] + "..." if len(message_text) > 50 else message_text
-        conversation = Conversation.objects.create(utilisateur=user, titre=titre)
     
-    # Sauvegarder le message de l'utilisateur
-    MessageChat.objects.create(
-        conversation=conversation,
-        est_utilisateur=True,
-        contenu=message_text
-    )
-    
-    # Rassembler toutes les données de l'utilisateur pour le contexte
-    cultures = Culture.objects.filter(utilisateur=user)
-    recoltes = Recolte.objects.filter(culture__utilisateur=user)
-    depenses = Depense.objects.filter(utilisateur=user)
-    
-    # On utilise les sérialiseurs pour formater les données
-    cultures_data = CultureSerializer(cultures, many=True).data
-    recoltes_data = RecolteSerializer(recoltes, many=True).data
-    depenses_data = DepenseSerializer(depenses, many=True).data
-    
-    # Calcul rapide des stats pour le contexte
-    revenus_totaux = sum((r.quantite_recoltee * r.prix_vente_unitaire for r in recoltes), Decimal('0'))
-    depenses_totales = (
-        sum((c.cout_achat_semences + c.cout_main_oeuvre for c in cultures), Decimal('0')) +
-        sum((r.depenses_liees_recolte for r in recoltes), Decimal('0')) +
-        sum((d.montant for d in depenses), Decimal('0'))
-    )
+    # Quota du plan d'abonnement (requêtes et tokens)
+    quota = verifier_quota(user, 'chatbot')
+    if not quota.autorise:
+        return appliquer_entetes(
+            Response(message_quota_depasse(user, quota), status=status.HTTP_429_TOO_MANY_REQUESTS), quota
+        )
     
-    user_data = {
-        'cultures': cultures_data,
-        'recoltes': recoltes_data,
-        'depenses': depenses_data,
-        'stats': {
-            'revenus_totaux': float(revenus_totaux),
-            'depenses_totales': float(depenses_totales),
-            'benefice_net': float(revenus_totaux - depenses_totales),
-        }
-    }
+    conversation, message = _ouvrir_conversation(user, message_text, conversation)
     
-    # Ajouter le nom de la culture pour les récoltes
-    for r in user_data['recoltes']:
-        culture = next((c for c in cultures if c.id == r['culture']), None)
-        r['culture_nom'] = culture.nom if culture else "Inconnue"
-
     # Appeler le service Groq
     ai_service = GroqService()
     
-    # Récupérer l'historique récent pour le contexte (optionnel, à implémenter dans ai_service)
-    # history = conversation.messages.order_by('date_envoi')[:10]
+    # Historique : derniers messages tels quels et résumé des plus anciens (une requête)
+    memoire = charger_memoire(conversation, avant_id=message.id)
     
-    response_text = ai_service.generate_response(user_data, message_text)
+    # Contexte des données, réutilisé tant que la version des données ne change pas
+    user_data, context = contexte_utilisateur(user, ai_service)
+    response_text = ai_service.generate_response(
+        user_data, message_text, chat_history=historique(memoire), context=context,
+        user_id=user.pk, use_cache=request.data.get('cache', True) is not False
+    )
     
     # Sauvegarder la réponse de l'IA
     MessageChat.objects.create(
         conversation=conversation,
         est_utilisateur=False,
         contenu=response_text,
-        contexte_donnees=user_data # On sauvegarde le contexte utilisé
+        contexte_id=snapshot_id(user_data), # On sauvegarde le contexte utilisé (stocké une seule fois)
+        metadonnees=ai_service.metadonnees
     )
     
-    return Response({
+    # Intégrer au résumé les messages sortis de la fenêtre (par lots)
+    resumer(memoire, ai_service)
+    
+    quota = consommer_tokens(user, ai_service.tokens_consommes, quota)
+    return appliquer_entetes(Response({
         'response': response_text,
         'conversation_id': conversation.id
-    })
+    }), quota)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def chatbot_stream_view(request):
+    """
+    Variante de `chatbot_view` qui transmet la réponse au fil de l'eau (SSE).
+
+    Événements : `conversation` (identifiant, dès le début), puis un
+    événement sans nom `{"delta": "..."}` par fragment, et enfin `done`
+    (identifiant du message enregistré) ou `error` si la génération est
+    interrompue. La réponse complète est enregistrée à la fin du flux, y
+    compris si le client se déconnecte avant la fin.
+
+    Le flux n'est transmis au fil de l'eau que sous WSGI ; sous ASGI,
+    utiliser `chatbot_stream_async_view`.
+    """
+    user = request.user
+    message_text = request.data.get('message')
+    conversation_id = request.data.get('conversation_id')
+
+    if not message_text:
+        return Response({'error': 'Le message est requis'}, status=status.HTTP_400_BAD_REQUEST)
+
+    conversation = None
+    if conversation_id:
+        conversation = _conversations(user, conversation_id).first()
+        if conversation is None:
+            return Response({'error': 'Conversation introuvable'}, status=status.HTTP_404_NOT_FOUND)
+
+    quota = verifier_quota(user, 'chatbot')
+    if not quota.autorise:
+        return appliquer_entetes(
+            Response(message_quota_depasse(user, quota), status=status.HTTP_429_TOO_MANY_REQUESTS), quota
+        )
+
+    conversation, message = _ouvrir_conversation(user, message_text, conversation)
+
+    ai_service = GroqService()
+    memoire = charger_memoire(conversation, avant_id=message.id)
+    user_data, context = contexte_utilisateur(user, ai_service)
+    use_cache = request.data.get('cache', True) is not False
+
+    def flux():
+        fragments = []
+        termine = False
+        try:
+            yield evenement_sse({'conversation_id': conversation.id}, 'conversation')
+            try:
+                for fragment in ai_service.generate_response_stream(
+                    user_data, message_text, chat_history=historique(memoire), context=context,
+                    user_id=user.pk, use_cache=use_cache
+                ):
+                    fragments.append(fragment)
+                    yield evenement_sse({'delta': fragment})
+            except Exception as e:
+                print(f"Erreur pendant le streaming de la réponse : {e}")
+                yield evenement_sse({'error': 'La réponse a été interrompue. Veuillez réessayer.'}, 'error')
+            else:
+                termine = True
+        finally:
+            # Enregistrer la réponse assemblée (même partielle si le client s'est déconnecté)
+            reponse = None
+            if fragments:
+                reponse = MessageChat.objects.create(
+                    conversation=conversation,
+                    est_utilisateur=False,
+                    contenu="".join(fragments),
+                    contexte_id=snapshot_id(user_data),
+                    metadonnees=ai_service.metadonnees
+                )
+        if termine:
+            yield evenement_sse({'conversation_id': conversation.id, 'message_id': reponse.id if reponse else None}, 'done')
+            # Après l'événement final : le client n'attend pas le résumé
+            resumer(memoire, ai_service)
+
+    def flux_decompte():
+        # Tokens décomptés à la fin du flux (les en-têtes sont déjà partis)
+        try:
+            yield from flux()
+        finally:
+            consommer_tokens(user, ai_service.tokens_consommes)
+
+    response = StreamingHttpResponse(flux_decompte(), content_type='text/event-stream; charset=utf-8')
+    appliquer_entetes(response, quota)
+    response['Cache-Control'] = 'no-cache'
+    # Désactiver la mise en tampon des proxys (nginx)
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _conversations_avec_messages(user):
+    """Conversations de `user` avec leurs messages et snapshots de contexte (deux requêtes)."""
+    return Conversation.objects.filter(utilisateur=user).prefetch_related(
+        Prefetch('messages', queryset=MessageChat.objects.select_related('contexte'))
+    )
 
 
 class ConversationListView(generics.ListAPIView):
@@ -694,7 +782,7 @@ class ConversationListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Conversation.objects.filter(utilisateur=self.request.user)
+        return _conversations_avec_messages(self.request.user)
 
 
 class ConversationDetailView(generics.RetrieveAPIView):
@@ -706,7 +794,7 @@ class ConversationDetailView(generics.RetrieveAPIView):
     lookup_field = 'id'
     
     def get_queryset(self):
-        return Conversation.objects.filter(utilisateur=self.request.user)
+        return _conversations_avec_messages(self.request.user)
 
 
 class RapportIAListView(generics.ListAPIView):
@@ -725,59 +813,44 @@ class RapportIAListView(generics.ListAPIView):
 def generate_rapport_view(request):
     """
     Vue pour générer un nouveau rapport d'analyse IA.
+    Soumise aux quotas du plan d'abonnement, comme `chatbot_view`.
     """
     user = request.user
     
-    # 1. Rassembler les données
-    cultures = Culture.objects.filter(utilisateur=user)
-    recoltes = Recolte.objects.filter(culture__utilisateur=user)
-    depenses = Depense.objects.filter(utilisateur=user)
-    
-    cultures_data = CultureSerializer(cultures, many=True).data
-    recoltes_data = RecolteSerializer(recoltes, many=True).data
-    depenses_data = DepenseSerializer(depenses, many=True).data
-    
-    # Calculs stats rapides
-    revenus_totaux = sum((r.quantite_recoltee * r.prix_vente_unitaire for r in recoltes), Decimal('0'))
-    depenses_totales = (
-        sum((c.cout_achat_semences + c.cout_main_oeuvre for c in cultures), Decimal('0')) +
-        sum((r.depenses_liees_recolte for r in recoltes), Decimal('0')) +
-        sum((d.montant for d in depenses), Decimal('0'))
-    )
-    
-    user_data = {
-        'cultures': cultures_data,
-        'recoltes': recoltes_data,
-        'depenses': depenses_data,
-        'stats': {
-            'revenus_totaux': float(revenus_totaux),
-            'depenses_totales': float(depenses_totales),
-            'benefice_net': float(revenus_totaux - depenses_totales),
-        }
-    }
+    quota = verifier_quota(user, 'rapport')
+    if not quota.autorise:
+        return appliquer_entetes(
+            Response(message_quota_depasse(user, quota), status=status.HTTP_429_TOO_MANY_REQUESTS), quota
+        )
     
-    # Enrichir les données de récolte
-    for r in user_data['recoltes']:
-        culture = next((c for c in cultures if c.id == r['culture']), None)
-        r['culture_nom'] = culture.nom if culture else "Inconnue"
-
-    # 2. Récupérer le résumé du dernier rapport pour la progression
-    last_report = RapportIA.objects.filter(utilisateur=user).first()
-    previous_summary = None
-    if last_report:
-        previous_summary = f"Dernier rapport ({last_report.date_creation}) : {last_report.analyse_complete[:500]}..."
+    # 1. Récupérer le résumé du dernier rapport pour la progression
+    previous_summary = _resume_rapport_precedent(user)
 
-    # 3. Appeler l'IA Groq
+    # 2. Appeler l'IA Groq avec les données (contexte mis en cache par version des données)
     ai_service = GroqService()
-    report_data = ai_service.generate_full_report(user_data, previous_summary)
+    user_data, context = contexte_utilisateur(user, ai_service)
+    report_data = ai_service.generate_full_report(user_data, previous_summary, context=context)
+    quota = consommer_tokens(user, ai_service.tokens_consommes, quota)
     
     if not report_data:
-        return Response(
+        return appliquer_entetes(Response(
             {'error': 'Impossible de générer le rapport pour le moment. Veuillez réessayer.'},
             status=status.HTTP_503_SERVICE_UNAVAILABLE
-        )
+        ), quota)
     
-    # 4. Sauvegarder le rapport
+    # 3. Sauvegarder le rapport et générer le PDF
+    return appliquer_entetes(Response(_enregistrer_rapport(user, report_data)), quota)
+
+
+def _resume_rapport_precedent(user):
+    last_report = RapportIA.objects.filter(utilisateur=user).first()
+    if last_report:
+        return f"Dernier rapport ({last_report.date_creation}) : {last_report.analyse_complete[:500]}..."
+    return None
+
+
+def _enregistrer_rapport(user, report_data):
+    """Enregistre le rapport généré, produit son PDF et retourne sa représentation."""
     rapport = RapportIA.objects.create(
         utilisateur=user,
         titre=report_data.get('titre', 'Rapport d\'analyse'),
@@ -787,7 +860,7 @@ def generate_rapport_view(request):
         points_progression=report_data.get('points_progression', '')
     )
     
-    # 5. Générer le PDF
+    # Générer le PDF
     try:
         pdf_path = generate_report_pdf(rapport)
         rapport.pdf_file = pdf_path
@@ -796,7 +869,214 @@ def generate_rapport_view(request):
         print(f"Erreur génération PDF: {e}")
         # On continue même si le PDF échoue, l'utilisateur aura au moins les données
     
-    return Response(RapportIASerializer(rapport).data)
+    return RapportIASerializer(rapport).data
+
+
+# --- Vues asynchrones (ASGI) ---
+# Pendant l'appel au modèle, aucune ressource du serveur n'est bloquée : un
+# seul processus ASGI sert de nombreuses conversations simultanées. Les
+# accès à la base passent par `sync_to_async` ; l'authentification par
+# jeton de DRF est appliquée manuellement (les vues DRF sont synchrones).
+
+async def _authentifier(request):
+    """Utilisateur authentifié par `Authorization: Token ...`, ou une réponse 401."""
+    authentification = TokenAuthentication()
+    try:
+        resultat = await sync_to_async(authentification.authenticate)(request)
+    except exceptions.AuthenticationFailed as e:
+        resultat, detail = None, e.detail
+    else:
+        detail = exceptions.NotAuthenticated.default_detail
+    if resultat is None:
+        response = JsonResponse({'detail': str(detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        response['WWW-Authenticate'] = authentification.authenticate_header(request)
+        return None, response
+    return resultat[0], None
+
+
+def _corps_json(request):
+    try:
+        donnees = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return donnees if isinstance(donnees, dict) else None
+
+
+@csrf_exempt
+@require_POST
+async def chatbot_async_view(request):
+    """
+    Équivalent asynchrone de `chatbot_view` (mêmes paramètres et réponse).
+    """
+    user, erreur = await _authentifier(request)
+    if erreur:
+        return erreur
+
+    donnees = _corps_json(request)
+    if donnees is None:
+        return JsonResponse({'error': 'Corps JSON invalide'}, status=status.HTTP_400_BAD_REQUEST)
+    message_text = donnees.get('message')
+    if not message_text:
+        return JsonResponse({'error': 'Le message est requis'}, status=status.HTTP_400_BAD_REQUEST)
+
+    conversation = None
+    if donnees.get('conversation_id'):
+        conversation = await _conversations(user, donnees['conversation_id']).afirst()
+        if conversation is None:
+            return JsonResponse({'error': 'Conversation introuvable'}, status=status.HTTP_404_NOT_FOUND)
+
+    quota = await sync_to_async(verifier_quota, thread_sensitive=False)(user, 'chatbot')
+    if not quota.autorise:
+        return appliquer_entetes(
+            JsonResponse(message_quota_depasse(user, quota), status=status.HTTP_429_TOO_MANY_REQUESTS), quota
+        )
+
+    conversation, message = await sync_to_async(_ouvrir_conversation)(user, message_text, conversation)
+
+    ai_service = GroqService()
+    memoire = await acharger_memoire(conversation, avant_id=message.id)
+    user_data, context = await sync_to_async(contexte_utilisateur)(user, ai_service)
+    response_text = await ai_service.agenerate_response(
+        user_data, message_text, chat_history=historique(memoire), context=context,
+        user_id=user.pk, use_cache=donnees.get('cache', True) is not False
+    )
+
+    await MessageChat.objects.acreate(
+        conversation=conversation,
+        est_utilisateur=False,
+        contenu=response_text,
+        contexte_id=await sync_to_async(snapshot_id)(user_data),
+        metadonnees=ai_service.metadonnees
+    )
+    await aresumer(memoire, ai_service)
+
+    quota = await sync_to_async(consommer_tokens, thread_sensitive=False)(user, ai_service.tokens_consommes, quota)
+    return appliquer_entetes(JsonResponse({
+        'response': response_text,
+        'conversation_id': conversation.id
+    }), quota)
+
+
+@csrf_exempt
+@require_POST
+async def chatbot_stream_async_view(request):
+    """
+    Équivalent asynchrone de `chatbot_stream_view` (mêmes paramètres et
+    événements SSE).
+
+    Sous ASGI, un générateur synchrone est entièrement consommé avant
+    d'être envoyé : `chatbot/stream/` n'y transmet donc rien avant la fin
+    de la réponse. Ce générateur asynchrone (client `AsyncOpenAI` en flux)
+    envoie chaque fragment dès sa réception, sans occuper de thread.
+    """
+    user, erreur = await _authentifier(request)
+    if erreur:
+        return erreur
+
+    donnees = _corps_json(request)
+    if donnees is None:
+        return JsonResponse({'error': 'Corps JSON invalide'}, status=status.HTTP_400_BAD_REQUEST)
+    message_text = donnees.get('message')
+    if not message_text:
+        return JsonResponse({'error': 'Le message est requis'}, status=status.HTTP_400_BAD_REQUEST)
+
+    conversation = None
+    if donnees.get('conversation_id'):
+        conversation = await _conversations(user, donnees['conversation_id']).afirst()
+        if conversation is None:
+            return JsonResponse({'error': 'Conversation introuvable'}, status=status.HTTP_404_NOT_FOUND)
+
+    quota = await sync_to_async(verifier_quota, thread_sensitive=False)(user, 'chatbot')
+    if not quota.autorise:
+        return appliquer_entetes(
+            JsonResponse(message_quota_depasse(user, quota), status=status.HTTP_429_TOO_MANY_REQUESTS), quota
+        )
+
+    conversation, message = await sync_to_async(_ouvrir_conversation)(user, message_text, conversation)
+
+    ai_service = GroqService()
+    memoire = await acharger_memoire(conversation, avant_id=message.id)
+    user_data, context = await sync_to_async(contexte_utilisateur)(user, ai_service)
+    use_cache = donnees.get('cache', True) is not False
+
+    async def flux():
+        fragments = []
+        termine = False
+        try:
+            yield evenement_sse({'conversation_id': conversation.id}, 'conversation')
+            try:
+                async for fragment in ai_service.agenerate_response_stream(
+                    user_data, message_text, chat_history=historique(memoire), context=context,
+                    user_id=user.pk, use_cache=use_cache
+                ):
+                    fragments.append(fragment)
+                    yield evenement_sse({'delta': fragment})
+            except Exception as e:
+                print(f"Erreur pendant le streaming de la réponse : {e}")
+                yield evenement_sse({'error': 'La réponse a été interrompue. Veuillez réessayer.'}, 'error')
+            else:
+                termine = True
+        finally:
+            # Enregistrer la réponse assemblée (même partielle si le client s'est déconnecté)
+            reponse = None
+            if fragments:
+                reponse = await MessageChat.objects.acreate(
+                    conversation=conversation,
+                    est_utilisateur=False,
+                    contenu="".join(fragments),
+                    contexte_id=await sync_to_async(snapshot_id)(user_data),
+                    metadonnees=ai_service.metadonnees
+                )
+        if termine:
+            yield evenement_sse({'conversation_id': conversation.id, 'message_id': reponse.id if reponse else None}, 'done')
+            await aresumer(memoire, ai_service)
+
+    async def flux_decompte():
+        try:
+            async for evenement in flux():
+                yield evenement
+        finally:
+            await sync_to_async(consommer_tokens, thread_sensitive=False)(user, ai_service.tokens_consommes)
+
+    response = StreamingHttpResponse(flux_decompte(), content_type='text/event-stream; charset=utf-8')
+    appliquer_entetes(response, quota)
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def generate_rapport_async_view(request):
+    """
+    Équivalent asynchrone de `generate_rapport_view`.
+    """
+    user, erreur = await _authentifier(request)
+    if erreur:
+        return erreur
+
+    quota = await sync_to_async(verifier_quota, thread_sensitive=False)(user, 'rapport')
+    if not quota.autorise:
+        return appliquer_entetes(
+            JsonResponse(message_quota_depasse(user, quota), status=status.HTTP_429_TOO_MANY_REQUESTS), quota
+        )
+
+    previous_summary = await sync_to_async(_resume_rapport_precedent)(user)
+
+    ai_service = GroqService()
+    user_data, context = await sync_to_async(contexte_utilisateur)(user, ai_service)
+    report_data = await ai_service.agenerate_full_report(user_data, previous_summary, context=context)
+    quota = await sync_to_async(consommer_tokens, thread_sensitive=False)(user, ai_service.tokens_consommes, quota)
+
+    if not report_data:
+        return appliquer_entetes(JsonResponse(
+            {'error': 'Impossible de générer le rapport pour le moment. Veuillez réessayer.'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        ), quota)
+
+    return appliquer_entetes(JsonResponse(await sync_to_async(_enregistrer_rapport)(user, report_data)), quota)
+
+
 class SupportMessageListCreateView(generics.ListCreateAPIView):
     """
     Vue pour lister et créer des messages de support.
@@ -888,3 +1168,77 @@ class ContactMessageCreateView(generics.CreateAPIView):
     queryset = ContactMessage.objects.all()
     serializer_class = ContactMessageSerializer
     permission_classes = [permissions.AllowAny]
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def geolocation_stats(request):
+    """
+    Compteurs du pipeline de géolocalisation pour le worker courant
+    (file d'attente, événements ignorés, efficacité du cache de déduplication).
+    """
+    return Response(get_pipeline().get_stats())
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def ai_context_stats(request):
+    """
+    Efficacité du cache des contextes IA pour le worker courant
+    (succès, échecs, entrées refusées car trop volumineuses).
+    """
+    return Response(get_contexte_cache().stats)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def ai_models_health(request):
+    """
+    État des modèles du relais Groq, dans l'ordre où ils seront essayés :
+    circuit (ouvert / fermé), taux d'erreur et p95 de la durée des appels.
+    """
+    ordre = ordre_relais(GroqService().model_names)
+    return Response({'ordre_relais': ordre, 'modeles': etats(ordre)})
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def ai_calls_stats(request):
+    """
+    Télémétrie des appels aux modèles sur les `days` derniers jours (7 par
+    défaut, 90 au plus) : par jour et par modèle, percentiles de latence,
+    résultats et appels de relais ; par jour et par endpoint, tokens consommés.
+    """
+    try:
+        jours = min(90, max(1, int(request.query_params.get('days', 7))))
+    except ValueError:
+        return Response({'error': 'Paramètre days invalide'}, status=status.HTTP_400_BAD_REQUEST)
+
+    depuis = timezone.now() - timedelta(days=jours)
+    return Response({'jours': jours, **agregats_appels(depuis), 'worker': get_telemetrie().get_stats()})
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def ai_response_cache_stats(request):
+    """
+    Cache des réponses du chatbot : compteurs du worker courant et, pour
+    l'ensemble des workers, appels au modèle et temps économisés (d'après
+    les métadonnées des messages des `days` derniers jours, 7 par défaut,
+    90 au plus).
+    """
+    try:
+        jours = min(90, max(1, int(request.query_params.get('days', 7))))
+    except ValueError:
+        return Response({'error': 'Paramètre days invalide'}, status=status.HTTP_400_BAD_REQUEST)
+
+    reponses = MessageChat.objects.filter(
+        est_utilisateur=False, date_envoi__gte=timezone.now() - timedelta(days=jours)
+    )
+    totaux = reponses.aggregate(
+        reponses=Count('id'),
+        appels_economises=Count('id', filter=Q(metadonnees__cache='hit')),
+        latence_economisee_ms=Sum(Cast(KT('metadonnees__latence_economisee_ms'), FloatField())),
+    )
+    totaux['latence_economisee_ms'] = round(totaux['latence_economisee_ms'] or 0, 1)
+    return Response({'jours': jours, 'messages': totaux, 'worker': get_reponse_cache().stats})
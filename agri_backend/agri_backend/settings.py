@@ -77,6 +77,7 @@ JAZZMIN_SETTINGS = {
         "agri_app.Conversation": "fas fa-comments",
         "agri_app.MessageChat": "fas fa-comment-dots",
         "agri_app.UserLocation": "fas fa-map-marker-alt",
+        "agri_app.UserLocationDailySummary": "fas fa-map-marked-alt",
     },
     "default_icon_parents": "fas fa-chevron-circle-right",
     "default_icon_children": "fas fa-circle",
@@ -123,7 +124,7 @@ JAZZMIN_UI_TWEAKS = {
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # CORS doit être en premier
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware', # Ajout pour fichiers statiques
+    'agri_app.middleware.StaticFilesMiddleware', # WhiteNoise (fichiers statiques), compatible ASGI
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -200,6 +201,13 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# En-têtes lisibles par le frontend : quotas restants des endpoints IA
+CORS_EXPOSE_HEADERS = [
+    'Retry-After',
+    'X-RateLimit-Limit-Requests', 'X-RateLimit-Remaining-Requests', 'X-RateLimit-Reset-Requests',
+    'X-RateLimit-Limit-Tokens', 'X-RateLimit-Remaining-Tokens', 'X-RateLimit-Reset-Tokens',
+]
+
 # Permettre tous les headers/origines si configuré (pour debug/flexibilité)
 CORS_ALLOW_ALL_ORIGINS = config('CORS_ALLOW_ALL_ORIGINS', default=False, cast=bool)
 
@@ -224,6 +232,29 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cache Django
+# LocMem par défaut (propre à chaque processus). Pour partager le cache entre
+# plusieurs workers gunicorn, utiliser un backend commun, par exemple :
+# CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache, CACHE_LOCATION=agri_cache
+# (puis `python manage.py createcachetable`). Les quotas IA exigent un cache Redis ou
+# Memcached (voir AI_QUOTA_ENABLED).
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='agri-cache'),
+    }
+}
+
+# Durée de vie (secondes) des réponses mises en cache pour le tableau de bord et
+# les graphiques. Les entrées sont indexées par la version des données de
+# l'utilisateur : toute modification les rend obsolètes immédiatement.
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=600, cast=int)
+
+# Référentiels régionaux (commande nocturne `compute_regional_benchmarks`) :
+# un groupe (culture, zone, saison) n'est publié qu'à partir de ce nombre
+# d'agriculteurs distincts, pour qu'aucune exploitation ne soit identifiable
+BENCHMARK_MIN_AGRICULTEURS = config('BENCHMARK_MIN_AGRICULTEURS', default=5, cast=int)
+
 # Type de champ de clé primaire par défaut
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -232,3 +263,120 @@ AUTH_USER_MODEL = 'agri_app.Utilisateur'
 
 # Configuration Groq AI
 GROQ_API_KEY = config('GROQ_API_KEY', default='')
+# Point d'accès compatible OpenAI (un serveur local, ex. `python manage.py run_fake_llm`, pour les tests de charge)
+GROQ_BASE_URL = config('GROQ_BASE_URL', default='https://api.groq.com/openai/v1')
+# Clients HTTP partagés vers le modèle (agri_app.ai_clients) : taille du pool, connexions
+# maintenues ouvertes et leur durée d'inactivité (secondes)
+AI_HTTP_MAX_CONNECTIONS = config('AI_HTTP_MAX_CONNECTIONS', default=100, cast=int)
+AI_HTTP_MAX_KEEPALIVE = config('AI_HTTP_MAX_KEEPALIVE', default=20, cast=int)
+AI_HTTP_KEEPALIVE_EXPIRY = config('AI_HTTP_KEEPALIVE_EXPIRY', default=60.0, cast=float)
+# Délais de connexion et de lecture (secondes) ; nouvelles tentatives de connexion, et du
+# client après une réponse en erreur (0 : le relais passe directement au modèle suivant)
+AI_HTTP_CONNECT_TIMEOUT = config('AI_HTTP_CONNECT_TIMEOUT', default=5.0, cast=float)
+AI_HTTP_READ_TIMEOUT = config('AI_HTTP_READ_TIMEOUT', default=60.0, cast=float)
+AI_HTTP_CONNECT_RETRIES = config('AI_HTTP_CONNECT_RETRIES', default=2, cast=int)
+AI_HTTP_MAX_RETRIES = config('AI_HTTP_MAX_RETRIES', default=0, cast=int)
+# Relais entre modèles : délai par modèle et délai total (secondes) ; un modèle qui n'a
+# pas répondu après AI_HEDGE_DELAY secondes est doublé par le suivant (0 : relais séquentiel)
+AI_MODEL_TIMEOUT = config('AI_MODEL_TIMEOUT', default=30.0, cast=float)
+AI_TOTAL_TIMEOUT = config('AI_TOTAL_TIMEOUT', default=60.0, cast=float)
+AI_HEDGE_DELAY = config('AI_HEDGE_DELAY', default=5.0, cast=float)
+# Threads partagés par le processus pour les appels du relais synchrone (appels en parallèle
+# de toutes les requêtes en cours ; au-delà, les appels attendent un thread libre)
+AI_RELAY_WORKERS = config('AI_RELAY_WORKERS', default=16, cast=int)
+# Santé des modèles (partagée via le cache Django) : fenêtre glissante (secondes) et
+# nombre d'appels retenus par modèle
+AI_HEALTH_WINDOW = config('AI_HEALTH_WINDOW', default=300, cast=int)
+AI_HEALTH_MAX_EVENTS = config('AI_HEALTH_MAX_EVENTS', default=50, cast=int)
+# Disjoncteur : un modèle limité (429/503, durée Retry-After sinon AI_CIRCUIT_COOLDOWN) ou
+# dépassant AI_CIRCUIT_ERROR_RATE d'échecs sur au moins AI_CIRCUIT_MIN_CALLS appels est
+# essayé en dernier pendant ce délai (AI_CIRCUIT_MAX_COOLDOWN secondes au plus)
+AI_CIRCUIT_COOLDOWN = config('AI_CIRCUIT_COOLDOWN', default=30.0, cast=float)
+AI_CIRCUIT_MAX_COOLDOWN = config('AI_CIRCUIT_MAX_COOLDOWN', default=300.0, cast=float)
+AI_CIRCUIT_ERROR_RATE = config('AI_CIRCUIT_ERROR_RATE', default=0.5, cast=float)
+AI_CIRCUIT_MIN_CALLS = config('AI_CIRCUIT_MIN_CALLS', default=5, cast=int)
+# Cache du contexte des données transmis à l'IA, indexé par version des données :
+# nombre d'entrées, durée de vie (secondes) et taille maximale d'une entrée (caractères)
+AI_CONTEXT_CACHE_MAXSIZE = config('AI_CONTEXT_CACHE_MAXSIZE', default=1000, cast=int)
+AI_CONTEXT_CACHE_TTL = config('AI_CONTEXT_CACHE_TTL', default=3600, cast=int)
+AI_CONTEXT_MAX_CHARS = config('AI_CONTEXT_MAX_CHARS', default=50000, cast=int)
+# Partager aussi ces contextes via le cache Django (utile avec plusieurs workers)
+AI_CONTEXT_CACHE_SHARED = config('AI_CONTEXT_CACHE_SHARED', default=False, cast=bool)
+# Budget (tokens estimés) du contexte des données ; au-delà, le détail des cultures,
+# récoltes et dépenses est résumé et limité à N lignes récentes ou importantes par table
+AI_CONTEXT_TOKEN_BUDGET = config('AI_CONTEXT_TOKEN_BUDGET', default=4000, cast=int)
+AI_CONTEXT_DETAIL_ROWS = config('AI_CONTEXT_DETAIL_ROWS', default=10, cast=int)
+# Mémoire du chatbot : derniers messages transmis tels quels, puis résumé glissant
+# des plus anciens, mis à jour par lots de N messages sortis de la fenêtre
+AI_CHAT_HISTORY_MESSAGES = config('AI_CHAT_HISTORY_MESSAGES', default=10, cast=int)
+AI_CHAT_SUMMARY_BATCH = config('AI_CHAT_SUMMARY_BATCH', default=6, cast=int)
+# Longueur maximale (caractères) d'un message de l'historique et du résumé transmis
+AI_CHAT_MESSAGE_MAX_CHARS = config('AI_CHAT_MESSAGE_MAX_CHARS', default=2000, cast=int)
+AI_CHAT_SUMMARY_MAX_CHARS = config('AI_CHAT_SUMMARY_MAX_CHARS', default=1500, cast=int)
+# Snapshots des données transmises à l'IA (un par contenu distinct) : compression zlib
+# des snapshots d'au moins N octets
+AI_SNAPSHOT_COMPRESSION = config('AI_SNAPSHOT_COMPRESSION', default=True, cast=bool)
+AI_SNAPSHOT_COMPRESS_MIN_BYTES = config('AI_SNAPSHOT_COMPRESS_MIN_BYTES', default=512, cast=int)
+# Cache des réponses du chatbot aux questions répétées (même question, mêmes données) :
+# activation, nombre d'entrées, entrées par utilisateur et durée de vie (secondes)
+AI_RESPONSE_CACHE_ENABLED = config('AI_RESPONSE_CACHE_ENABLED', default=True, cast=bool)
+AI_RESPONSE_CACHE_MAXSIZE = config('AI_RESPONSE_CACHE_MAXSIZE', default=2000, cast=int)
+AI_RESPONSE_CACHE_PER_USER = config('AI_RESPONSE_CACHE_PER_USER', default=20, cast=int)
+AI_RESPONSE_CACHE_TTL = config('AI_RESPONSE_CACHE_TTL', default=1800, cast=int)
+# Télémétrie des appels aux modèles (table AppelIA) : activation, taille de la file
+# (au-delà, les mesures sont abandonnées), écriture par lots de N lignes ou après X secondes
+AI_TELEMETRY_ENABLED = config('AI_TELEMETRY_ENABLED', default=True, cast=bool)
+AI_TELEMETRY_QUEUE_SIZE = config('AI_TELEMETRY_QUEUE_SIZE', default=10000, cast=int)
+AI_TELEMETRY_BATCH_SIZE = config('AI_TELEMETRY_BATCH_SIZE', default=200, cast=int)
+AI_TELEMETRY_FLUSH_INTERVAL = config('AI_TELEMETRY_FLUSH_INTERVAL', default=5.0, cast=float)
+# Durée de conservation des mesures ; au-delà, `purge_ai_telemetry` les supprime
+AI_TELEMETRY_RETENTION_DAYS = config('AI_TELEMETRY_RETENTION_DAYS', default=30, cast=int)
+# Quotas des endpoints IA par plan d'abonnement (compteurs atomiques dans le cache Django :
+# cache Redis ou Memcached requis, LocMem / base de données / fichiers non pris en charge,
+# sinon erreur agri_app.E001 au démarrage) :
+# messages du chatbot par heure, rapports par jour et tokens consommés (prompt + réponse)
+# par jour. Le personnel n'est pas limité. Désactivés par défaut (cache LocMem).
+AI_QUOTA_ENABLED = config('AI_QUOTA_ENABLED', default=False, cast=bool)
+# Durée (secondes) de la fenêtre glissante de chaque quota
+AI_QUOTA_PERIODES = {'chatbot': 3600, 'rapport': 86400, 'tokens': 86400}
+AI_QUOTAS = {
+    'gratuit': {
+        'chatbot': config('AI_QUOTA_GRATUIT_CHATBOT', default=20, cast=int),
+        'rapport': config('AI_QUOTA_GRATUIT_RAPPORT', default=2, cast=int),
+        'tokens': config('AI_QUOTA_GRATUIT_TOKENS', default=150000, cast=int),
+    },
+    'pro': {
+        'chatbot': config('AI_QUOTA_PRO_CHATBOT', default=100, cast=int),
+        'rapport': config('AI_QUOTA_PRO_RAPPORT', default=10, cast=int),
+        'tokens': config('AI_QUOTA_PRO_TOKENS', default=1500000, cast=int),
+    },
+    'expert': {
+        'chatbot': config('AI_QUOTA_EXPERT_CHATBOT', default=500, cast=int),
+        'rapport': config('AI_QUOTA_EXPERT_RAPPORT', default=50, cast=int),
+        'tokens': config('AI_QUOTA_EXPERT_TOKENS', default=7500000, cast=int),
+    },
+}
+
+# Géolocalisation des utilisateurs (résolue en arrière-plan, hors requête)
+# Fournisseur : 'agri_app.geolocation.StaticGeoProvider' pour les tests (aucun appel réseau)
+GEOLOCATION_PROVIDER = config('GEOLOCATION_PROVIDER', default='agri_app.ip_database.OfflineIPProvider')
+# Index local des plages IP (généré par `python manage.py build_ip_index <fichier.csv>`)
+GEOLOCATION_IP_DATABASE = config('GEOLOCATION_IP_DATABASE', default=str(BASE_DIR / 'data' / 'ip_ranges.bin'))
+# Fournisseur en ligne utilisé quand l'IP n'est pas couverte par l'index ('' pour désactiver)
+GEOLOCATION_FALLBACK_PROVIDER = config('GEOLOCATION_FALLBACK_PROVIDER', default='agri_app.geolocation.GeocoderIPProvider')
+# Taille maximale de la file ; au-delà les nouveaux événements sont abandonnés
+GEOLOCATION_QUEUE_SIZE = config('GEOLOCATION_QUEUE_SIZE', default=1000, cast=int)
+# Désactiver pour traiter les événements de façon synchrone (tests, débogage)
+GEOLOCATION_ASYNC = config('GEOLOCATION_ASYNC', default=True, cast=bool)
+# Cache de déduplication : la dernière localisation connue de chaque utilisateur
+# évite l'appel au fournisseur et la lecture de UserLocation tant que l'IP ne change pas
+GEOLOCATION_DEDUP_MAXSIZE = config('GEOLOCATION_DEDUP_MAXSIZE', default=10000, cast=int)
+GEOLOCATION_DEDUP_TTL = config('GEOLOCATION_DEDUP_TTL', default=3600, cast=int)
+# Partager aussi ce cache via le cache Django (utile avec plusieurs workers)
+GEOLOCATION_DEDUP_SHARED = config('GEOLOCATION_DEDUP_SHARED', default=False, cast=bool)
+# Écriture groupée des localisations : insertion par lots de N lignes, ou après X secondes
+GEOLOCATION_WRITE_BATCH_SIZE = config('GEOLOCATION_WRITE_BATCH_SIZE', default=100, cast=int)
+GEOLOCATION_WRITE_FLUSH_INTERVAL = config('GEOLOCATION_WRITE_FLUSH_INTERVAL', default=5.0, cast=float)
+# Durée de conservation des localisations brutes ; au-delà, `compact_user_locations`
+# les consolide dans UserLocationDailySummary puis les supprime
+USER_LOCATION_RETENTION_DAYS = config('USER_LOCATION_RETENTION_DAYS', default=90, cast=int)